@@ -0,0 +1,31 @@
+"""
+Cross-module benchmark suite.
+
+A shared harness (warmup, calibrated repeats, median/IQR statistics, JSON
+results tagged with the git revision and machine) runs one benchmark per hot
+path of the course modules, and compares runs against a stored baseline to
+catch performance regressions. See ``benchmarks/README.md``.
+"""
+
+from .harness import (
+    BenchmarkCase,
+    BenchmarkResult,
+    Comparison,
+    run_benchmark,
+    save_results,
+    load_results,
+    compare,
+)
+from .suite import CASES, benchmark
+
+__all__ = [
+    'BenchmarkCase',
+    'BenchmarkResult',
+    'Comparison',
+    'run_benchmark',
+    'save_results',
+    'load_results',
+    'compare',
+    'CASES',
+    'benchmark',
+]
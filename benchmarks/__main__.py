@@ -0,0 +1,153 @@
+"""
+Command line of the benchmark suite.
+
+Run from the repository root:
+    python -m benchmarks list
+    python -m benchmarks run                       # all benchmarks -> benchmarks/results/
+    python -m benchmarks run -k tokenizer generation --repeats 5
+    python -m benchmarks run --save-baseline       # also store as the baseline
+    python -m benchmarks compare                   # newest result vs the baseline
+    python -m benchmarks compare results.json --baseline other.json --threshold 0.05
+
+``compare`` (and ``run --compare``) exits with status 1 when a benchmark is
+slower than the baseline beyond the threshold and beyond the noise.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+from typing import List, Optional
+
+from .harness import (
+    compare, format_comparison, format_results, git_revision, load_results,
+    run_benchmark, save_results,
+)
+from .suite import CASES
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baselines", "baseline.json")
+
+
+def select(patterns: Optional[List[str]]) -> List[str]:
+    """Benchmark names containing any of the patterns (all without patterns)."""
+    names = [n for n in CASES if not patterns or any(p in n for p in patterns)]
+    if not names:
+        raise SystemExit(f"No benchmark matches {patterns}; see 'python -m benchmarks list'")
+    return names
+
+
+def latest_result() -> str:
+    """Newest file in the results directory."""
+    files = glob.glob(os.path.join(RESULTS_DIR, "*.json"))
+    if not files:
+        raise SystemExit(f"No results in {RESULTS_DIR}; run 'python -m benchmarks run' first")
+    return max(files, key=os.path.getmtime)
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    width = max(len(name) for name in CASES)
+    for name, case in CASES.items():
+        print(f"{name:<{width}}  {case.description}")
+    return 0
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    names = select(args.k)
+    print(f"⏱️ Running {len(names)} benchmarks ({args.repeats} repeats, "
+          f"{args.warmup} warmup)")
+    results = []
+    for name in names:
+        print(f"  {name} ...", end="", flush=True)
+        start = time.perf_counter()
+        results.append(run_benchmark(CASES[name], repeats=args.repeats, warmup=args.warmup,
+                                     min_sample_time=args.min_time))
+        print(f" {time.perf_counter() - start:.1f} s")
+    print()
+    print(format_results(results))
+
+    output = args.output
+    if output is None:
+        commit = git_revision()["commit"][:10] or "unknown"
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    settings = {"repeats": args.repeats, "warmup": args.warmup, "min_time": args.min_time}
+    save_results(results, output, settings)
+    print(f"\nResults written to {output}")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        shutil.copyfile(output, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+    elif args.compare:
+        print()
+        return compare_files(args.baseline, output, args.threshold)
+    return 0
+
+
+def compare_files(baseline_path: str, current_path: str, threshold: float) -> int:
+    """Print the comparison of two result files; 1 if anything regressed."""
+    base_meta, baseline = load_results(baseline_path)
+    cur_meta, current = load_results(current_path)
+    print(f"Baseline: {baseline_path} ({base_meta['git']['commit'][:10]})")
+    print(f"Current:  {current_path} ({cur_meta['git']['commit'][:10]}"
+          f"{', uncommitted changes' if cur_meta['git']['dirty'] else ''})")
+    differences = [key for key in ("processor", "cpu_count", "torch", "torch_threads")
+                   if base_meta["machine"].get(key) != cur_meta["machine"].get(key)]
+    if differences:
+        print(f"⚠️ Different machine or setup ({', '.join(differences)}); "
+              "timings may not be comparable")
+    print()
+    comparisons = compare(baseline, current, threshold)
+    print(format_comparison(comparisons, baseline, current))
+    regressions = [c.name for c in comparisons if c.status == "slower"]
+    print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}"
+          + (f": {', '.join(regressions)}" if regressions else ""))
+    return 1 if regressions else 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    return compare_files(args.baseline, args.current or latest_result(), args.threshold)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Cross-module benchmark suite")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    commands.add_parser("list", help="List the benchmarks").set_defaults(func=cmd_list)
+
+    run = commands.add_parser("run", help="Run benchmarks and write JSON results")
+    run.add_argument("-k", nargs="+", metavar="PATTERN",
+                     help="Only benchmarks whose name contains a pattern")
+    run.add_argument("--repeats", type=int, default=7, help="Timed samples per benchmark")
+    run.add_argument("--warmup", type=int, default=1, help="Untimed calls first")
+    run.add_argument("--min-time", type=float, default=0.1,
+                     help="Minimum seconds per sample (calls are grouped)")
+    run.add_argument("--output", help="Results file (default: benchmarks/results/...)")
+    run.add_argument("--save-baseline", action="store_true",
+                     help="Also store the results as the baseline")
+    run.add_argument("--compare", action="store_true",
+                     help="Compare against the baseline afterwards")
+    run.set_defaults(func=cmd_run)
+
+    comp = commands.add_parser("compare", help="Compare results against a baseline")
+    comp.add_argument("current", nargs="?", help="Results file (default: the newest run)")
+    comp.set_defaults(func=cmd_compare)
+
+    for sub in (run, comp):
+        sub.add_argument("--baseline", default=DEFAULT_BASELINE,
+                         help="Baseline results (default: benchmarks/baselines/baseline.json)")
+        sub.add_argument("--threshold", type=float, default=0.10,
+                         help="Relative slowdown of the median that counts (default: 0.10)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""
+Timing harness shared by the benchmark suite.
+
+Every benchmark is a setup function that returns the callable to time and the
+number of items (tokens, characters, examples...) one call processes.
+``run_benchmark`` warms the callable up, calibrates how many calls make up one
+sample (so short operations are not dominated by timer resolution), then
+takes ``repeats`` samples with the garbage collector paused, as ``timeit``
+does. Results carry robust statistics (median and interquartile range) and
+are written to JSON together with the git revision and a description of the
+machine, so runs on different commits can be compared.
+
+``compare`` flags a benchmark as slower only when its median grew by more
+than the threshold *and* its interquartile range no longer overlaps the
+baseline's, so run-to-run noise alone does not fail a comparison.
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SCHEMA_VERSION = 1
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What a setup function returns: the callable to time and items per call
+Prepared = Tuple[Callable[[], Any], int]
+
+
+@dataclass
+class BenchmarkCase:
+    """
+    A registered benchmark.
+
+    Attributes:
+        name: Unique dotted name, e.g. ``"tokenizer.encode"``
+        setup: Builds the inputs and returns ``(fn, items_per_call)``
+        unit: What the items are (``"tokens"``, ``"chars"``...)
+        description: One line shown by ``list``
+    """
+
+    name: str
+    setup: Callable[[], Prepared]
+    unit: str
+    description: str = ""
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    Timing of one benchmark.
+
+    Attributes:
+        name: Benchmark name
+        unit: Unit of ``items``
+        items: Items processed per call
+        number: Calls per sample
+        samples: Seconds per call of every sample
+    """
+
+    name: str
+    unit: str
+    items: int
+    number: int
+    samples: List[float] = field(default_factory=list)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+    @property
+    def mean(self) -> float:
+        return statistics.fmean(self.samples)
+
+    @property
+    def stdev(self) -> float:
+        return statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0
+
+    @property
+    def quartiles(self) -> Tuple[float, float]:
+        """First and third quartile of the samples."""
+        if len(self.samples) < 2:
+            return self.samples[0], self.samples[0]
+        q1, _, q3 = statistics.quantiles(self.samples, n=4, method="inclusive")
+        return q1, q3
+
+    @property
+    def throughput(self) -> float:
+        """Items per second at the median."""
+        return self.items / self.median if self.median > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        q1, q3 = self.quartiles
+        return dict(asdict(self), median=self.median, mean=self.mean, stdev=self.stdev,
+                    min=min(self.samples), max=max(self.samples), q1=q1, q3=q3,
+                    throughput=self.throughput)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BenchmarkResult":
+        return cls(data["name"], data["unit"], data["items"], data["number"],
+                   list(data["samples"]))
+
+
+@dataclass
+class Comparison:
+    """
+    One benchmark of a current run against the baseline.
+
+    Attributes:
+        name: Benchmark name
+        status: ``"slower"``, ``"faster"``, ``"same"``, ``"new"`` or ``"missing"``
+        ratio: Current median over baseline median (None when one is absent)
+        noisy: The change passed the threshold but stayed within the noise
+    """
+
+    name: str
+    status: str
+    ratio: Optional[float] = None
+    noisy: bool = False
+
+
+def run_benchmark(case: BenchmarkCase, repeats: int = 7, warmup: int = 1,
+                  min_sample_time: float = 0.1) -> BenchmarkResult:
+    """
+    Time one benchmark.
+
+    Args:
+        case: Benchmark to run
+        repeats: Number of timed samples
+        warmup: Untimed calls before calibration
+        min_sample_time: Calls are grouped until one sample takes this long
+
+    Returns:
+        Result with seconds per call for every sample
+    """
+    fn, items = case.setup()
+    for _ in range(warmup):
+        fn()
+
+    # Calibrate: double the calls per sample until a sample is long enough
+    number = 1
+    while True:
+        elapsed = _time_calls(fn, number)
+        if elapsed >= min_sample_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    result = BenchmarkResult(case.name, case.unit, items, number)
+    for _ in range(repeats):
+        result.samples.append(_time_calls(fn, number) / number)
+    return result
+
+
+def _time_calls(fn: Callable[[], Any], number: int) -> float:
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit, branch and whether the working tree has uncommitted changes."""
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {"commit": git("rev-parse", "HEAD"),
+            "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def machine_info() -> Dict[str, Any]:
+    """Hardware and software the results depend on."""
+    import numpy as np
+    import torch
+
+    info = {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "numpy": np.__version__,
+        "torch_threads": torch.get_num_threads(),
+    }
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            info["memory_gb"] = round(int(f.readline().split()[1]) / 1024 ** 2, 1)
+    except OSError:
+        pass
+    return info
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return ""
+
+
+def save_results(results: List[BenchmarkResult], path: str,
+                 settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Write results to JSON with the git revision and machine description.
+
+    Args:
+        results: Benchmark results
+        path: Destination file (directories are created)
+        settings: Harness settings to record, e.g. repeats
+
+    Returns:
+        ``path``
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    report = {
+        "schema": SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": git_revision(),
+        "machine": machine_info(),
+        "settings": settings or {},
+        "results": [r.to_dict() for r in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    return path
+
+
+def load_results(path: str) -> Tuple[Dict[str, Any], Dict[str, BenchmarkResult]]:
+    """
+    Read a file written by ``save_results``.
+
+    Returns:
+        The report's metadata (git, machine, settings) and the results by name
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported results schema {report.get('schema')}")
+    results = {r["name"]: BenchmarkResult.from_dict(r) for r in report.pop("results")}
+    return report, results
+
+
+def compare(baseline: Dict[str, BenchmarkResult], current: Dict[str, BenchmarkResult],
+            threshold: float = 0.10) -> List[Comparison]:
+    """
+    Compare two runs benchmark by benchmark.
+
+    A benchmark is ``"slower"`` (a regression) when its median time grew by
+    more than ``threshold`` and its interquartile range lies entirely above
+    the baseline's; ``"faster"`` is the mirror image. Changes beyond the
+    threshold with overlapping ranges are reported as ``"same"`` with
+    ``noisy`` set.
+
+    Args:
+        baseline: Results by name of the reference run
+        current: Results by name of the new run
+        threshold: Relative change of the median that counts, e.g. 0.10
+
+    Returns:
+        One comparison per benchmark of either run, baseline order first
+    """
+    comparisons = []
+    for name in list(baseline) + [n for n in current if n not in baseline]:
+        if name not in current:
+            comparisons.append(Comparison(name, "missing"))
+            continue
+        if name not in baseline:
+            comparisons.append(Comparison(name, "new"))
+            continue
+        base, cur = baseline[name], current[name]
+        ratio = cur.median / base.median
+        (base_q1, base_q3), (cur_q1, cur_q3) = base.quartiles, cur.quartiles
+        status, noisy = "same", False
+        if ratio > 1 + threshold:
+            status, noisy = ("slower", False) if cur_q1 > base_q3 else ("same", True)
+        elif ratio < 1 / (1 + threshold):
+            status, noisy = ("faster", False) if cur_q3 < base_q1 else ("same", True)
+        comparisons.append(Comparison(name, status, ratio, noisy))
+    return comparisons
+
+
+def format_time(seconds: float) -> str:
+    """Seconds with a unit that keeps three significant digits."""
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    """Table of median time per call, spread and throughput."""
+    width = max([len(r.name) for r in results] + [9])
+    lines = [f"{'benchmark':<{width}} {'median':>10} {'IQR':>10} {'min':>10} "
+             f"{'throughput':>20} {'runs':>8}"]
+    for r in results:
+        q1, q3 = r.quartiles
+        lines.append(f"{r.name:<{width}} {format_time(r.median):>10} "
+                     f"{format_time(q3 - q1):>10} {format_time(min(r.samples)):>10} "
+                     f"{r.throughput:>14,.0f} {r.unit + '/s':<5} "
+                     f"{len(r.samples):>3}x{r.number}")
+    return "\n".join(lines)
+
+
+def format_comparison(comparisons: List[Comparison], baseline: Dict[str, BenchmarkResult],
+                      current: Dict[str, BenchmarkResult]) -> str:
+    """Table of baseline vs current medians with the verdict of each benchmark."""
+    marks = {"slower": "❌ slower", "faster": "🚀 faster", "same": "✅ same",
+             "new": "🆕 new", "missing": "⚠️ missing"}
+    width = max([len(c.name) for c in comparisons] + [9])
+    lines = [f"{'benchmark':<{width}} {'baseline':>10} {'current':>10} {'change':>8}  verdict"]
+    for c in comparisons:
+        base = format_time(baseline[c.name].median) if c.name in baseline else "-"
+        cur = format_time(current[c.name].median) if c.name in current else "-"
+        change = f"{c.ratio - 1:+.1%}" if c.ratio is not None else "-"
+        verdict = marks[c.status] + (" (within noise)" if c.noisy else "")
+        lines.append(f"{c.name:<{width}} {base:>10} {cur:>10} {change:>8}  {verdict}")
+    return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""
+The benchmark cases, one per hot path of the course modules.
+
+Every case is a setup function registered with ``@benchmark``. Setup builds
+its inputs once (outside the timing) and returns the callable to time and the
+number of items one call processes. Sizes are chosen so the whole suite runs
+in a couple of minutes on a laptop CPU; models are small GPT shapes rather
+than the 124M configuration, which would take minutes per case.
+
+The modules are imported inside the setups, so ``list`` and ``compare`` do
+not pay for importing torch.
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+from importlib import import_module
+from typing import Callable, Dict
+
+from .harness import REPO_ROOT, BenchmarkCase, Prepared
+
+CASES: Dict[str, BenchmarkCase] = {}
+
+SAMPLE_TEXT_PATH = os.path.join(REPO_ROOT, "the-verdict.txt")
+SEED = 123
+
+
+def benchmark(name: str, unit: str) -> Callable[[Callable[[], Prepared]], Callable[[], Prepared]]:
+    """Register a setup function as the benchmark ``name``."""
+    def register(setup: Callable[[], Prepared]) -> Callable[[], Prepared]:
+        doc = (setup.__doc__ or "").strip().splitlines()
+        CASES[name] = BenchmarkCase(name, setup, unit, doc[0] if doc else "")
+        return setup
+    return register
+
+
+def _module(name: str):
+    return import_module(f"src.modules.{name}")
+
+
+def _quiet() -> contextlib.redirect_stdout:
+    """The vocabulary helpers print progress; keep it out of the report."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _sample_text() -> str:
+    with open(SAMPLE_TEXT_PATH, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _tokenizer():
+    tokenization = _module("01_tokenization")
+    vocabulary = _module("01_tokenization.build_vocabulary")
+    with _quiet():
+        vocab = vocabulary.build_vocabulary(vocabulary.preprocess_text(_sample_text()))
+    return tokenization.TextTokenizer(vocab)
+
+
+def _small_config(**overrides):
+    gpt = _module("05_gpt_model")
+    settings = dict(vocab_size=5000, context_length=256, emb_dim=256, n_heads=4,
+                    n_layers=4, drop_rate=0.0)
+    settings.update(overrides)
+    return gpt.get_config("124M", **settings)
+
+
+@benchmark("tokenizer.encode", unit="chars")
+def tokenizer_encode() -> Prepared:
+    """Encode the-verdict.txt with TextTokenizer."""
+    tokenizer, text = _tokenizer(), _sample_text()
+    return lambda: tokenizer.encode(text), len(text)
+
+
+@benchmark("tokenizer.decode", unit="tokens")
+def tokenizer_decode() -> Prepared:
+    """Decode the token IDs of the-verdict.txt."""
+    tokenizer = _tokenizer()
+    ids = tokenizer.encode(_sample_text())
+    return lambda: tokenizer.decode(ids), len(ids)
+
+
+@benchmark("vocab.build", unit="chars")
+def vocab_build() -> Prepared:
+    """Preprocess the-verdict.txt and build its vocabulary."""
+    vocabulary = _module("01_tokenization.build_vocabulary")
+    text = _sample_text()
+
+    def build():
+        with _quiet():
+            return vocabulary.build_vocabulary(vocabulary.preprocess_text(text))
+    return build, len(text)
+
+
+@benchmark("dataset.iterate", unit="tokens")
+def dataset_iterate() -> Prepared:
+    """One shuffled epoch of a memory-mapped 256k-token dataset."""
+    import numpy as np
+
+    training = _module("06_training")
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "tokens.bin")
+    rng = np.random.default_rng(SEED)
+    training.save_tokens(rng.integers(0, 50257, 256 * 1024), path)
+    dataset = training.TokenDataset(path, context_length=256)
+    loader = training.create_dataloader(dataset, batch_size=8, seed=SEED)
+
+    def iterate():
+        for _ in loader:
+            pass
+    iterate.workdir = tmp  # Removed together with the benchmark
+    return iterate, len(loader) * 8 * 256
+
+
+@benchmark("attention.forward", unit="tokens")
+def attention_forward() -> Prepared:
+    """Causal multi-head attention, 4 x 256 tokens, d=256, 4 heads."""
+    import torch
+
+    attention = _module("03_attention")
+    torch.manual_seed(SEED)
+    mha = attention.MultiHeadAttention(256, 256, context_length=256, dropout=0.0,
+                                       num_heads=4).eval()
+    x = torch.randn(4, 256, 256)
+
+    @torch.no_grad()
+    def forward():
+        mha(x)
+    return forward, x.shape[0] * x.shape[1]
+
+
+@benchmark("block.forward_backward", unit="tokens")
+def block_forward_backward() -> Prepared:
+    """Transformer block forward + backward, 4 x 128 tokens, d=256."""
+    import torch
+
+    blocks = _module("04_transformer_blocks")
+    torch.manual_seed(SEED)
+    block = blocks.TransformerBlock(_small_config())
+    x = torch.randn(4, 128, 256, requires_grad=True)
+
+    def step():
+        block(x).sum().backward()
+    return step, x.shape[0] * x.shape[1]
+
+
+@benchmark("generation.kv_cache", unit="tokens")
+def generation_kv_cache() -> Prepared:
+    """Greedy generation of 32 tokens for 4 prompts with an fp32 KV cache."""
+    import torch
+
+    gpt, inference = _module("05_gpt_model"), _module("07_inference")
+    tokenizer = _tokenizer()
+    torch.manual_seed(SEED)
+    model = gpt.GPTModel(_small_config(vocab_size=len(tokenizer.str_to_int)))
+    engine = inference.InferenceEngine(model, tokenizer, context_size=256,
+                                       kv_cache_dtype="fp32")
+    prompts = torch.randint(0, len(tokenizer.str_to_int), (4, 16))
+    new_tokens = 32
+    return lambda: engine.generate(prompts, new_tokens), prompts.shape[0] * new_tokens
+
+
+@benchmark("generation.beam_search", unit="tokens")
+def generation_beam_search() -> Prepared:
+    """Beam search with 8 beams for 2 prompts x 32 new tokens (tokens of all beams)."""
+    import torch
+
+    gpt, inference = _module("05_gpt_model"), _module("07_inference")
+    tokenizer = _tokenizer()
+    torch.manual_seed(SEED)
+    model = gpt.GPTModel(_small_config(vocab_size=len(tokenizer.str_to_int)))
+    engine = inference.InferenceEngine(model, tokenizer, context_size=256,
+                                       kv_cache_dtype="fp32")
+    prompts = torch.randint(0, len(tokenizer.str_to_int), (2, 16))
+    num_beams, new_tokens = 8, 32
+
+    def search():
+        return engine.beam_search(prompts, new_tokens, num_beams=num_beams, stop_at_eos=False)
+    return search, prompts.shape[0] * num_beams * new_tokens
+
+
+@benchmark("checkpoint.load", unit="params")
+def checkpoint_load() -> Prepared:
+    """Load a 5.8M-parameter model from a memory-mapped checkpoint."""
+    import torch
+
+    gpt = _module("05_gpt_model")
+    torch.manual_seed(SEED)
+    model = gpt.GPTModel(_small_config())
+    tmp = tempfile.TemporaryDirectory()
+    path = gpt.save_model(model, os.path.join(tmp.name, "model.safetensors"))
+
+    def load():
+        return gpt.load_model(path)
+    load.workdir = tmp  # Removed together with the benchmark
+    return load, gpt.count_parameters(model)
+
+
+@benchmark("visualization.attention_map", unit="cells")
+def visualization_attention_map() -> Prepared:
+    """Render and save a 2048 x 2048 attention map to PNG."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    visualization = import_module("src.utils.visualization")
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "attention.png")
+    weights = np.random.default_rng(SEED).random((2048, 2048), dtype=np.float32)
+    tokens = [f"t{i}" for i in range(2048)]
+
+    def render():
+        plt.close(visualization.plot_attention_weights(weights, tokens, save_path=path,
+                                                       show=False))
+    render.workdir = tmp  # Removed together with the benchmark
+    return render, weights.size
+
+
+@benchmark("visualization.embedding_pca", unit="tokens")
+def visualization_embedding_pca() -> Prepared:
+    """Streaming PCA of a 50257 x 768 embedding table to 2D."""
+    import numpy as np
+
+    visualization = import_module("src.utils.visualization")
+    embeddings = np.random.default_rng(SEED).standard_normal((50257, 768), dtype=np.float32)
+    return lambda: visualization.streaming_pca(embeddings), len(embeddings)
@@ -0,0 +1,135 @@
+"""
+Simple test script for the benchmark suite.
+
+This script tests the harness:
+1. Calibration groups fast calls into samples and records every repeat
+2. Results round-trip through JSON with git and machine information
+3. ``compare`` flags regressions beyond the threshold, but not noise, and
+   reports new and missing benchmarks; the CLI exits with 1 on regressions
+4. Every registered benchmark sets up and runs once
+
+Run from the repository root:
+    python -m benchmarks.test
+"""
+
+import contextlib
+import io
+import os
+import random
+import tempfile
+
+from .__main__ import main as cli_main
+from .harness import BenchmarkCase, BenchmarkResult, compare, load_results, run_benchmark
+from .harness import save_results
+from .suite import CASES
+
+
+def fake_result(name: str, median: float, spread: float = 0.01, n: int = 7,
+                seed: int = 0) -> BenchmarkResult:
+    """Result with samples spread ``spread`` (relative) around ``median``."""
+    rng = random.Random(seed)
+    samples = [median * (1 + spread * rng.uniform(-1, 1)) for _ in range(n)]
+    return BenchmarkResult(name, "items", 100, 1, samples)
+
+
+def test_run_benchmark():
+    """Test warmup, calibration and repeats."""
+    print("\n=== Testing Harness ===")
+
+    calls = []
+    case = BenchmarkCase("sum", lambda: (lambda: calls.append(sum(range(1000))), 1000),
+                         "items")
+    result = run_benchmark(case, repeats=5, warmup=2, min_sample_time=0.01)
+    assert len(result.samples) == 5 and all(s > 0 for s in result.samples)
+    assert result.number > 1, "Fast calls should be grouped into samples"
+    # Warmup + calibration rounds (1, 2, 4, ..., number) + timed samples
+    calibration = 2 * result.number - 1
+    assert len(calls) == 2 + calibration + 5 * result.number, len(calls)
+    q1, q3 = result.quartiles
+    assert min(result.samples) <= q1 <= result.median <= q3 <= max(result.samples)
+    print(f"{result.number} calls per sample, median {result.median * 1e6:.1f} µs, "
+          f"{result.throughput:,.0f} items/s")
+
+
+def test_results_roundtrip():
+    """Test that saved results load back with their metadata."""
+    print("\n=== Testing Results Files ===")
+
+    results = [fake_result("a", 1e-3), fake_result("b", 2e-3, seed=1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_results(results, os.path.join(tmp, "sub", "run.json"), {"repeats": 7})
+        meta, loaded = load_results(path)
+    assert list(loaded) == ["a", "b"]
+    assert loaded["b"].samples == results[1].samples
+    assert meta["settings"] == {"repeats": 7}
+    assert len(meta["git"]["commit"]) == 40 and meta["machine"]["torch"]
+    print(f"Tagged with commit {meta['git']['commit'][:10]} on "
+          f"{meta['machine']['processor'] or meta['machine']['machine']}")
+
+
+def test_compare():
+    """Test regression detection against a baseline."""
+    print("\n=== Testing Comparison ===")
+
+    baseline = {"steady": fake_result("steady", 1.0),
+                "regressed": fake_result("regressed", 1.0),
+                "improved": fake_result("improved", 1.0),
+                "noisy": fake_result("noisy", 1.0, spread=0.3),
+                "removed": fake_result("removed", 1.0)}
+    current = {"steady": fake_result("steady", 1.03, seed=1),
+               "regressed": fake_result("regressed", 1.25, seed=1),
+               "improved": fake_result("improved", 0.7, seed=1),
+               "noisy": fake_result("noisy", 1.2, spread=0.3, seed=1),
+               "added": fake_result("added", 1.0)}
+    status = {c.name: c for c in compare(baseline, current, threshold=0.10)}
+    assert status["steady"].status == "same" and not status["steady"].noisy
+    assert status["regressed"].status == "slower"
+    assert status["improved"].status == "faster"
+    assert status["noisy"].status == "same" and status["noisy"].noisy
+    assert status["removed"].status == "missing" and status["added"].status == "new"
+    assert compare(baseline, current, threshold=0.5)[1].status == "same"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path = save_results(list(baseline.values()), os.path.join(tmp, "base.json"))
+        cur_path = save_results(list(current.values()), os.path.join(tmp, "cur.json"))
+        same_path = save_results(list(baseline.values()), os.path.join(tmp, "same.json"))
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            failed = cli_main(["compare", cur_path, "--baseline", base_path])
+        with contextlib.redirect_stdout(io.StringIO()):
+            passed = cli_main(["compare", same_path, "--baseline", base_path])
+    assert failed == 1 and passed == 0
+    assert out.getvalue().splitlines()[-1] == "1 regression(s) beyond 10%: regressed"
+    print({name: c.status + (" (noisy)" if c.noisy else "") for name, c in status.items()})
+
+
+def test_suite_cases():
+    """Test that every benchmark of the suite runs."""
+    print("\n=== Testing Suite Cases ===")
+
+    for name, case in CASES.items():
+        fn, items = case.setup()
+        fn()
+        assert items > 0, name
+    print(f"{len(CASES)} benchmarks set up and ran once: {', '.join(CASES)}")
+
+
+def main():
+    """Run all tests."""
+    print("🧪 Starting Benchmark Suite Tests")
+    print("=" * 50)
+
+    try:
+        test_run_benchmark()
+        test_results_roundtrip()
+        test_compare()
+        test_suite_cases()
+
+        print("\n✅ All tests completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
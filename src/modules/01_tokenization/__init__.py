@@ -5,15 +5,40 @@ This module provides tools for converting raw text into numerical tokens
 that can be processed by neural networks.
 """
 
-from .simple_tokenizer import TextTokenizer
-from .build_vocabulary import create_full_vocabulary, build_vocabulary
-from .utils import analyze_vocabulary, plot_token_frequencies, compare_tokenizations
+from .simple_tokenizer import TextTokenizer, IncrementalDecoder
+from .build_vocabulary import create_full_vocabulary, build_vocabulary, remove_duplicates
+from .utils import (
+    analyze_vocabulary, plot_token_frequencies, compare_tokenizations,
+    CorpusStats, VocabularyStats, corpus_statistics, corpus_statistics_from_files,
+    vocabulary_statistics,
+)
+
+# dedup needs numpy; it is imported on first use so the tokenizer stays stdlib-only
+_DEDUP_EXPORTS = ('MinHashDeduplicator', 'DedupResult', 'deduplicate_text')
+
+
+def __getattr__(name):
+    if name in _DEDUP_EXPORTS:
+        from . import dedup
+        return getattr(dedup, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'TextTokenizer',
+    'IncrementalDecoder',
     'create_full_vocabulary', 
     'build_vocabulary',
+    'remove_duplicates',
     'analyze_vocabulary',
     'plot_token_frequencies', 
-    'compare_tokenizations'
-]
\ No newline at end of file
+    'compare_tokenizations',
+    'CorpusStats',
+    'VocabularyStats',
+    'corpus_statistics',
+    'corpus_statistics_from_files',
+    'vocabulary_statistics',
+    'MinHashDeduplicator',
+    'DedupResult',
+    'deduplicate_text',
+]
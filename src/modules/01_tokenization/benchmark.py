@@ -0,0 +1,173 @@
+"""
+Benchmark script for the tokenization module.
+
+Sections:
+- dedup: MinHash-LSH near-duplicate removal over a synthetic corpus with
+  one document per line and planted exact and near duplicates; reports
+  docs/s, peak memory of the main and worker processes, and how many of the
+  planted copies (and of the originals) were removed. Each setting runs in its own
+  process so peak memory is measured cleanly.
+
+Run from the repository root:
+    python -m src.modules.01_tokenization.benchmark [dedup|all] [--docs 1000000] [--processes 1 2]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+import numpy as np
+
+from .dedup import MinHashDeduplicator
+
+VOCAB_WORDS = 20_000
+DOC_WORDS = (30, 120)
+EXACT_RATE = 0.10  # Copies, re-cased and re-punctuated
+NEAR_RATE = 0.10   # Copies with 1-3 words replaced
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB (Linux)."""
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def shingle_jaccard(a, b, k: int) -> float:
+    """Exact Jaccard similarity of the k-word shingle sets of two word lists."""
+    a = {tuple(a[i:i + k]) for i in range(max(1, len(a) - k + 1))}
+    b = {tuple(b[i:i + k]) for i in range(max(1, len(b) - k + 1))}
+    return len(a & b) / len(a | b)
+
+
+def write_corpus(path: str, num_docs: int, shingle_size: int,
+                 seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Write a synthetic corpus, one document per line.
+
+    Returns:
+        Kind of every line (0 original, 1 exact copy, 2 near copy) and the
+        true shingle Jaccard similarity of near copies to their source
+    """
+    rng = np.random.default_rng(seed)
+    # Zipf-like word frequencies, as in natural text
+    probabilities = 1 / np.arange(1, VOCAB_WORDS + 1)
+    probabilities /= probabilities.sum()
+    words = np.array([f"w{i}" for i in range(VOCAB_WORDS)], dtype=object)
+
+    kind = rng.choice(3, size=num_docs, p=[1 - EXACT_RATE - NEAR_RATE, EXACT_RATE, NEAR_RATE])
+    kind[:1000] = 0  # Copies need earlier documents
+    similarity = np.ones(num_docs)
+    originals = []
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, num_docs, 10_000):
+            chunk = kind[start:start + 10_000]
+            lengths = rng.integers(*DOC_WORDS, size=len(chunk))
+            drawn = words[rng.choice(VOCAB_WORDS, lengths.sum(), p=probabilities)]
+            new_docs = iter(np.split(drawn, np.cumsum(lengths)[:-1]))
+            lines = []
+            for i, k in enumerate(chunk, start):
+                doc = list(next(new_docs))
+                if k == 0:
+                    originals.append(doc)
+                else:
+                    source = originals[rng.integers(len(originals))]
+                    doc = list(source)
+                    if k == 1:
+                        doc[0] = doc[0].capitalize()
+                        doc[-1] += "."
+                    else:
+                        for position in rng.integers(0, len(doc), rng.integers(1, 4)):
+                            doc[position] = words[rng.integers(VOCAB_WORDS)]
+                        similarity[i] = shingle_jaccard(source, doc, shingle_size)
+                lines.append(" ".join(doc))
+            f.write("\n".join(lines) + "\n")
+    return kind, similarity
+
+
+def dedup_worker(path: str, processes: int, output: str) -> None:
+    """Deduplicate the corpus and print measurements as JSON."""
+    dedup = MinHashDeduplicator()
+    result = dedup.deduplicate_files([path], output, num_processes=processes,
+                                     workdir=os.path.dirname(output))
+    np.save(output + ".keep.npy", result.keep)
+    print(json.dumps(dict(result.to_dict(), peak_rss_mb=peak_rss_mb(),
+                          worker_peak_rss_mb=resource.getrusage(
+                              resource.RUSAGE_CHILDREN).ru_maxrss / 1024)))
+
+
+def benchmark_dedup(num_docs: int, processes_list):
+    """Run the near-duplicate removal benchmark."""
+    dedup = MinHashDeduplicator()
+    print("⏱️ MinHash-LSH Deduplication Benchmark")
+    print("=" * 86)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus.txt")
+        start = time.perf_counter()
+        kind, similarity = write_corpus(corpus, num_docs, dedup.shingle_size)
+        size_mb = os.path.getsize(corpus) / 2 ** 20
+        print(f"{num_docs:,} documents ({size_mb:,.0f} MB, {DOC_WORDS[0]}-{DOC_WORDS[1]} "
+              f"words), {EXACT_RATE:.0%} exact and {NEAR_RATE:.0%} near copies planted "
+              f"(generated in {time.perf_counter() - start:.0f} s)")
+        print(f"{dedup.num_perm} permutations, {dedup.bands} bands x {dedup.rows_per_band} "
+              f"rows (LSH threshold ~{dedup.lsh_threshold:.2f}), verified at "
+              f"{dedup.threshold}, {dedup.shingle_size}-word shingles, {os.cpu_count()} CPU(s)\n")
+
+        planted = kind > 0
+        near = kind == 2
+        above = near & (similarity >= dedup.threshold)
+        print(f"{near.mean():.1%} of the documents are near copies, "
+              f"{above.sum() / near.sum():.0%} of them at true Jaccard >= {dedup.threshold}\n")
+        print(f"{'processes':>9} {'seconds':>8} {'docs/s':>9} {'MB/s':>6} {'main RSS':>9} "
+              f"{'worker RSS':>10} {'removed':>9} {'exact':>7} {'near>=t':>7} {'near<t':>7} "
+              f"{'false +':>8}")
+        for processes in processes_list:
+            output = os.path.join(tmp, f"dedup{processes}.txt")
+            out = subprocess.run(
+                [sys.executable, "-m", __spec__.name, "--worker", corpus,
+                 "--processes", str(processes), "--output", output],
+                check=True, capture_output=True, text=True).stdout
+            stats = json.loads(out.strip().splitlines()[-1])
+            removed = ~np.load(output + ".keep.npy")
+            exact = removed[kind == 1].mean()
+            near_above = removed[above].mean()
+            near_below = removed[near & ~above].mean()
+            false_positives = int((removed & ~planted).sum())
+            worker_rss = (f"{stats['worker_peak_rss_mb']:>8.0f} MB" if processes > 1
+                          else f"{'-':>10}")
+            print(f"{processes:>9} {stats['seconds']:>8.1f} {stats['docs_per_sec']:>9,.0f} "
+                  f"{size_mb / stats['seconds']:>6.1f} {stats['peak_rss_mb']:>6.0f} MB "
+                  f"{worker_rss} {stats['duplicates']:>9,} {exact:>7.1%} {near_above:>7.1%} {near_below:>7.1%} "
+                  f"{false_positives:>8,}")
+    print("\nexact, near>=t, near<t: share of the planted copies removed (near copies split "
+          "by their true\nsimilarity to the source); false +: originals removed.")
+
+
+def main():
+    """Run the selected benchmark sections."""
+    parser = argparse.ArgumentParser(description="Tokenization module benchmarks")
+    parser.add_argument("section", nargs="?", default="all", choices=["dedup", "all"])
+    parser.add_argument("--docs", type=int, default=1_000_000, help="Synthetic documents")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2],
+                        help="Worker process counts to compare")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        dedup_worker(args.worker, args.processes[0], args.output)
+        return
+    if args.section in ("dedup", "all"):
+        benchmark_dedup(args.docs, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,6 @@ Based on "The Verdict" text from the LLMs-from-scratch repository.
 """
 
 import re
-import urllib.request
 from typing import Dict, List
 from pathlib import Path
 
@@ -21,6 +20,8 @@ def download_sample_text(save_path: str = "the-verdict.txt") -> str:
     Returns:
         Path to the downloaded file
     """
+    import urllib.request  # Slow to import, and only needed here
+
     url = ("https://raw.githubusercontent.com/rasbt/"
            "LLMs-from-scratch/main/ch02/01_main-chapter-code/"
            "the-verdict.txt")
@@ -98,12 +99,31 @@ def build_vocabulary(tokens: List[str]) -> Dict[str, int]:
     return vocab
 
 
-def create_full_vocabulary(download_fresh: bool = True) -> Dict[str, int]:
+def remove_duplicates(raw_text: str, separator: str = "\n\n") -> str:
+    """
+    Remove near-duplicate paragraphs before the text is tokenized.
+    
+    Args:
+        raw_text: Raw input text
+        separator: Separator between documents (default: blank lines)
+        
+    Returns:
+        Text without the repeated paragraphs
+    """
+    try:  # numpy is only needed when deduplicating
+        from .dedup import deduplicate_text
+    except ImportError:
+        from dedup import deduplicate_text
+    return deduplicate_text(raw_text, separator)
+
+
+def create_full_vocabulary(download_fresh: bool = True, dedup: bool = False) -> Dict[str, int]:
     """
     Complete pipeline to create vocabulary from sample text.
     
     Args:
         download_fresh: Whether to download text again or use existing file
+        dedup: Remove near-duplicate paragraphs first (see ``dedup.py``)
         
     Returns:
         Complete vocabulary dictionary
@@ -116,6 +136,8 @@ def create_full_vocabulary(download_fresh: bool = True) -> Dict[str, int]:
     
     # Load and analyze text
     raw_text = load_and_analyze_text(file_path)
+    if dedup:
+        raw_text = remove_duplicates(raw_text)
     
     # Preprocess text
     tokens = preprocess_text(raw_text)
@@ -0,0 +1,461 @@
+"""
+Near-duplicate document removal with MinHash and locality-sensitive hashing.
+
+Scraped corpora repeat the same page, boilerplate or article many times
+with small edits. Those copies skew the token counts a vocabulary is built
+from and waste training steps, so they are removed before
+``build_vocabulary`` and before token files are written.
+
+The pipeline:
+
+1. **Shingling**: a document is lower-cased, punctuation becomes
+   whitespace, and every run of ``shingle_size`` consecutive words is one
+   shingle. Words and shingles are hashed with a polynomial hash that numpy
+   evaluates for a whole batch of documents at once (no Python per word).
+2. **MinHash**: for each of ``num_perm`` hash functions
+   ``h(x) = (a * x + b) >> 32``, a document keeps the minimum over its
+   shingles. Two documents agree on a position with probability equal to
+   the Jaccard similarity of their shingle sets.
+3. **LSH banding**: the signature is cut into ``bands`` bands; documents
+   sharing all values of any band become candidates. With ``r`` rows per
+   band the probability of becoming a candidate is ``1 - (1 - J^r)^bands``,
+   a steep S-curve around ``(1 / bands) ** (1 / r)``.
+4. **Verification and clustering**: candidate pairs whose signatures agree
+   on at least ``threshold`` of the positions are joined with union-find;
+   the first document of every cluster is kept.
+
+Signatures are computed in batches, streamed to disk and spread over worker
+processes (file shards are split at line boundaries); only the band keys
+(``bands`` x 8 bytes per document) are held in memory.
+"""
+
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_HASH = np.uint32(0xFFFFFFFF)  # Signature value of a document without words
+_SPACE = 32
+# Lower-cased ASCII punctuation and control characters become spaces;
+# UTF-8 bytes of other scripts are kept, so non-Latin words still hash
+_WORD_BYTES = bytes(c if (chr(c).isalnum() or c >= 128) else _SPACE for c in range(256))
+_P = np.uint64(0x100000001B3)  # Odd, so invertible modulo 2^64
+_P_INV = np.uint64(pow(int(_P), -1, 2 ** 64))
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """Finalizer of splitmix64: spreads every input bit over the output."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+class _Powers:
+    """Cached ``p^j`` and ``p^-j`` modulo 2^64 for the rolling word hash."""
+
+    def __init__(self):
+        self.forward = np.ones(1, dtype=np.uint64)
+        self.inverse = np.ones(1, dtype=np.uint64)
+
+    def get(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        if n > len(self.forward):
+            size = max(n, 2 * len(self.forward))
+            self.forward = np.cumprod(np.r_[np.uint64(1), np.full(size - 1, _P)], dtype=np.uint64)
+            self.inverse = np.cumprod(np.r_[np.uint64(1), np.full(size - 1, _P_INV)],
+                                      dtype=np.uint64)
+        return self.forward[:n], self.inverse[:n]
+
+
+@dataclass
+class DedupResult:
+    """
+    Outcome of a deduplication run.
+
+    Attributes:
+        keep: Boolean per document (input order), False for removed copies
+        representative: Index of the kept document each document duplicates
+            (its own index when kept)
+        candidate_pairs: Pairs proposed by LSH before verification
+        seconds: Wall-clock time
+    """
+
+    keep: np.ndarray
+    representative: np.ndarray
+    candidate_pairs: int = 0
+    seconds: float = 0.0
+
+    @property
+    def num_documents(self) -> int:
+        return len(self.keep)
+
+    @property
+    def num_duplicates(self) -> int:
+        return int(len(self.keep) - self.keep.sum())
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.num_documents / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary without the per-document arrays, ready for ``json.dump``."""
+        return {'documents': self.num_documents, 'duplicates': self.num_duplicates,
+                'kept': self.num_documents - self.num_duplicates,
+                'candidate_pairs': self.candidate_pairs, 'seconds': self.seconds,
+                'docs_per_sec': self.docs_per_sec}
+
+
+class MinHashDeduplicator:
+    """
+    Find and remove near-duplicate documents.
+
+    Args:
+        num_perm: MinHash functions (signature length)
+        bands: LSH bands; must divide ``num_perm``
+        shingle_size: Words per shingle (documents with fewer words form a
+            single shingle)
+        threshold: Minimum estimated Jaccard similarity of a verified pair
+        seed: Seed of the hash functions; results are reproducible across
+            processes and runs
+        batch_size: Documents hashed together
+
+    Example:
+        >>> dedup = MinHashDeduplicator(threshold=0.8)
+        >>> result = dedup.deduplicate(documents, num_processes=4)
+        >>> unique = [d for d, keep in zip(documents, result.keep) if keep]
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5,
+                 threshold: float = 0.8, seed: int = 1, batch_size: int = 2048):
+        """Draw the hash functions."""
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.seed = seed
+        self.batch_size = batch_size
+
+        rng = np.random.default_rng(seed)
+        words = np.iinfo(np.uint64).max
+        self._a = rng.integers(0, words, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, words, num_perm, dtype=np.uint64, endpoint=True)
+        self._shingle_mult = rng.integers(0, words, shingle_size, dtype=np.uint64,
+                                          endpoint=True) | np.uint64(1)
+        self._band_mult = rng.integers(0, words, self.rows_per_band, dtype=np.uint64,
+                                       endpoint=True) | np.uint64(1)
+        self._powers = _Powers()
+        self._empty_key = self.band_keys(np.full((1, num_perm), MAX_HASH))[0, 0]
+
+    @property
+    def rows_per_band(self) -> int:
+        return self.num_perm // self.bands
+
+    @property
+    def lsh_threshold(self) -> float:
+        """Similarity at which a pair becomes a candidate with probability ~1/2."""
+        return (1 / self.bands) ** (1 / self.rows_per_band)
+
+    def settings(self) -> Dict[str, Any]:
+        return {'num_perm': self.num_perm, 'bands': self.bands,
+                'shingle_size': self.shingle_size, 'threshold': self.threshold,
+                'seed': self.seed, 'batch_size': self.batch_size}
+
+    def _shingles(self, docs: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Shingle hashes of a batch and the index of each shingle's document."""
+        encoded = [d.lower().encode("utf-8").translate(_WORD_BYTES) for d in docs]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        buf = np.frombuffer(b" ".join(encoded) + b" ", dtype=np.uint8)
+        doc_starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+
+        # Word boundaries; documents are separated by a space, so no word spans two
+        is_word = buf != _SPACE
+        edges = np.diff(np.concatenate(([False], is_word, [False])).view(np.int8))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        if len(starts) == 0:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+
+        # Polynomial hash of every word from prefix sums of b_j * p^-j:
+        # (S[end] - S[start]) * p^(end-1) = sum_j b_j * p^(end-1-j)  (mod 2^64)
+        forward, inverse = self._powers.get(len(buf))
+        prefix = np.concatenate(([np.uint64(0)],
+                                 np.cumsum(buf.astype(np.uint64) * inverse, dtype=np.uint64)))
+        words = _mix((prefix[ends] - prefix[starts]) * forward[ends - 1])
+        word_doc = np.searchsorted(doc_starts, starts, side="right") - 1
+
+        # Shingle w combines words w .. w+k-1 of the same document
+        k = self.shingle_size
+        num_words = len(words)
+        padded_words = np.concatenate((words, np.zeros(k - 1, dtype=np.uint64)))
+        padded_doc = np.concatenate((word_doc, np.full(k - 1, -1)))
+        shingles = np.zeros(num_words, dtype=np.uint64)
+        for t in range(k):
+            same_doc = padded_doc[t:t + num_words] == word_doc
+            shingles += np.where(same_doc, padded_words[t:t + num_words], 0) * self._shingle_mult[t]
+        # Full windows, plus the single window of documents shorter than k words
+        words_per_doc = np.bincount(word_doc, minlength=len(docs))
+        first_word = np.concatenate(([0], np.cumsum(words_per_doc)[:-1]))
+        position = np.arange(num_words) - first_word[word_doc]
+        remaining = words_per_doc[word_doc] - position
+        valid = (remaining >= k) | ((position == 0) & (words_per_doc[word_doc] < k))
+        return _mix(shingles[valid]), word_doc[valid]
+
+    def signatures(self, docs: Sequence[str]) -> np.ndarray:
+        """
+        MinHash signatures of a batch of documents.
+
+        Args:
+            docs: Documents
+
+        Returns:
+            Array (len(docs), num_perm) of uint32; documents without words
+            have every value set to ``MAX_HASH``
+        """
+        signatures = np.full((len(docs), self.num_perm), MAX_HASH, dtype=np.uint32)
+        shingles, shingle_doc = self._shingles(docs)
+        if len(shingles) == 0:
+            return signatures
+        # Shingles are grouped by document, so reduceat takes each document's minimum
+        offsets = np.flatnonzero(np.r_[True, shingle_doc[1:] != shingle_doc[:-1]])
+        rows = shingle_doc[offsets]
+        # Bound the (shingles x functions) temporary to ~32 MB
+        chunk = max(1, min(self.num_perm, (4 << 20) // len(shingles)))
+        for p in range(0, self.num_perm, chunk):
+            hashed = shingles[:, None] * self._a[None, p:p + chunk] + self._b[None, p:p + chunk]
+            hashed >>= np.uint64(32)
+            signatures[rows, p:p + chunk] = np.minimum.reduceat(hashed, offsets, axis=0)
+        return signatures
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """One 64-bit key per band and document, shape (n, bands)."""
+        values = signatures.reshape(len(signatures), self.bands, self.rows_per_band)
+        return _mix((values.astype(np.uint64) * self._band_mult).sum(axis=2, dtype=np.uint64))
+
+    def _hash_stream(self, docs: Iterable[str], signature_path: str) -> np.ndarray:
+        """Write the signatures of a stream to a file; return its band keys."""
+        keys = []
+        with open(signature_path, "wb") as f:
+            for batch in _batches(docs, self.batch_size):
+                signatures = self.signatures(batch)
+                signatures.tofile(f)
+                keys.append(self.band_keys(signatures))
+        if not keys:
+            return np.zeros((0, self.bands), dtype=np.uint64)
+        return np.concatenate(keys)
+
+    def _run(self, tasks: List[Tuple[str, Any]], num_processes: int,
+             workdir: Optional[str]) -> DedupResult:
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            jobs = [(self.settings(), source, os.path.join(tmp, f"signatures{i}.bin"))
+                    for i, source in enumerate(tasks)]
+            if num_processes > 1 and len(jobs) > 1:
+                import multiprocessing
+
+                context = multiprocessing.get_context("spawn")
+                with context.Pool(min(num_processes, len(jobs))) as pool:
+                    keys = pool.map(_hash_shard, jobs, chunksize=1)
+            else:
+                keys = [_hash_shard(job, self) for job in jobs]
+
+            shards = []  # (first document, documents, signature file) of every shard
+            offset = 0
+            for (_, _, path), shard_keys in zip(jobs, keys):
+                shards.append((offset, len(shard_keys), path))
+                offset += len(shard_keys)
+            band_keys = (np.concatenate(keys) if keys
+                         else np.zeros((0, self.bands), dtype=np.uint64))
+            del keys
+            result = self._cluster(band_keys, shards)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def _cluster(self, band_keys: np.ndarray,
+                 shards: List[Tuple[int, int, str]]) -> DedupResult:
+        """Candidate pairs from the bands, verification, then union-find."""
+        n = len(band_keys)
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return DedupResult(keep=np.zeros(0, dtype=bool), representative=empty)
+        candidates = []
+        for band in range(self.bands):
+            keys = band_keys[:, band]
+            order = np.argsort(keys, kind="stable")  # Ties stay in document order
+            sorted_keys = keys[order]
+            new_group = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+            group_first = order[np.maximum.accumulate(np.where(new_group, np.arange(n), 0))]
+            pair = ~new_group & (sorted_keys != self._empty_key)
+            candidates.append(order[pair].astype(np.int64) << 32 | group_first[pair])
+        codes = np.unique(np.concatenate(candidates)) if candidates else np.zeros(0, np.int64)
+        docs, reps = codes >> 32, codes & 0xFFFFFFFF
+
+        # Verify: estimated Jaccard similarity from the full signatures
+        needed = np.union1d(docs, reps)
+        signatures = _read_rows(shards, needed, self.num_perm)
+        similar = np.zeros(len(codes), dtype=bool)
+        for start in range(0, len(codes), 65536):
+            block = slice(start, start + 65536)
+            agreement = (signatures[np.searchsorted(needed, docs[block])]
+                         == signatures[np.searchsorted(needed, reps[block])]).mean(axis=1)
+            similar[block] = agreement >= self.threshold
+        del signatures
+        docs, reps = docs[similar], reps[similar]
+
+        # Union-find by propagating the smallest index through the pairs
+        labels = np.arange(n)
+        while True:
+            previous = labels.copy()
+            np.minimum.at(labels, docs, labels[reps])
+            np.minimum.at(labels, reps, labels[docs])
+            labels = labels[labels]  # Pointer jumping
+            if np.array_equal(labels, previous):
+                break
+        return DedupResult(keep=labels == np.arange(n), representative=labels,
+                           candidate_pairs=len(codes))
+
+    def deduplicate(self, docs: Sequence[str], num_processes: int = 1,
+                    workdir: Optional[str] = None) -> DedupResult:
+        """
+        Find near-duplicates in a list of documents.
+
+        Args:
+            docs: Documents
+            num_processes: Worker processes for the signatures
+            workdir: Directory for temporary signature files
+
+        Returns:
+            DedupResult; ``keep[i]`` is False when document i is a near-copy
+            of an earlier document
+        """
+        parts = max(1, min(num_processes, len(docs) // self.batch_size))
+        bounds = np.linspace(0, len(docs), parts + 1).astype(int)
+        tasks = [("docs", list(docs[a:b])) for a, b in zip(bounds[:-1], bounds[1:])]
+        return self._run(tasks, num_processes, workdir)
+
+    def deduplicate_files(self, paths: Sequence[str], output_path: Optional[str] = None,
+                          num_processes: int = 1,
+                          workdir: Optional[str] = None) -> DedupResult:
+        """
+        Find near-duplicate lines (one document per line) across files.
+
+        Each file is split at line boundaries into one shard per process,
+        so a single large file is hashed in parallel too. Documents are
+        numbered in file order.
+
+        Args:
+            paths: UTF-8 files with one document per line
+            output_path: Where to write the kept lines (None: do not write)
+            num_processes: Worker processes for the signatures
+            workdir: Directory for temporary signature files
+
+        Returns:
+            DedupResult over all lines of all files
+        """
+        tasks = [("lines", path, start, end) for path in paths
+                 for start, end in _line_ranges(path, num_processes)]
+        result = self._run(tasks, num_processes, workdir)
+        if output_path is not None:
+            start = time.perf_counter()
+            keep = iter(result.keep)
+            with open(output_path, "wb") as out:
+                for path in paths:
+                    with open(path, "rb") as f:
+                        for line in f:
+                            if next(keep):
+                                out.write(line if line.endswith(b"\n") else line + b"\n")
+            result.seconds += time.perf_counter() - start
+        return result
+
+
+def _batches(docs: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _line_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Byte ranges of about equal size that start at line boundaries."""
+    size = os.path.getsize(path)
+    parts = max(1, min(parts, size // (1 << 20) + 1))  # At least ~1 MB per shard
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _read_lines(path: str, start: int, end: int) -> Iterator[str]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            yield line.rstrip(b"\r\n").decode("utf-8", errors="replace")
+
+
+def _hash_shard(job, dedup: Optional[MinHashDeduplicator] = None) -> np.ndarray:
+    """Signatures of one shard (runs in a worker process)."""
+    settings, source, signature_path = job
+    dedup = dedup or MinHashDeduplicator(**settings)
+    docs = source[1] if source[0] == "docs" else _read_lines(*source[1:])
+    return dedup._hash_stream(docs, signature_path)
+
+
+def _read_rows(shards: List[Tuple[int, int, str]], indices: np.ndarray,
+               num_perm: int, chunk_rows: int = 65536) -> np.ndarray:
+    """
+    Signature rows of sorted global document indices.
+
+    The files are read sequentially in chunks rather than memory-mapped, so
+    only the selected rows stay resident.
+    """
+    rows = np.empty((len(indices), num_perm), dtype=np.uint32)
+    for offset, count, path in shards:
+        lo, hi = np.searchsorted(indices, [offset, offset + count])
+        if lo == hi:
+            continue
+        with open(path, "rb") as f:
+            for first in range(0, count, chunk_rows):
+                a, b = np.searchsorted(indices[lo:hi], [offset + first, offset + first + chunk_rows])
+                if a == b:
+                    f.seek(min(chunk_rows, count - first) * num_perm * 4, os.SEEK_CUR)
+                    continue
+                block = np.fromfile(f, dtype=np.uint32,
+                                    count=min(chunk_rows, count - first) * num_perm)
+                block = block.reshape(-1, num_perm)
+                rows[lo + a:lo + b] = block[indices[lo + a:lo + b] - offset - first]
+    return rows
+
+
+def deduplicate_text(text: str, separator: str = "\n\n", **kwargs) -> str:
+    """
+    Remove near-duplicate paragraphs from a text.
+
+    Args:
+        text: Raw text
+        separator: Separator between documents (default: blank lines)
+        **kwargs: Settings of ``MinHashDeduplicator``
+
+    Returns:
+        The text without the repeated paragraphs, in the original order
+    """
+    docs = text.split(separator)
+    result = MinHashDeduplicator(**kwargs).deduplicate(docs)
+    print(f"Removed {result.num_duplicates} near-duplicate documents "
+          f"of {result.num_documents}")
+    return separator.join(d for d, keep in zip(docs, result.keep) if keep)
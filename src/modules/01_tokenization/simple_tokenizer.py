@@ -10,6 +10,10 @@ and handles unknown tokens with a fallback strategy.
 import re
 from typing import Dict, List
 
+# Whitespace before punctuation is dropped when joining tokens back into text
+_SPACING_PATTERN = re.compile(r"\s+([,.:;?!\"()\\'])")
+_TRAILING_SPACE_PATTERN = re.compile(r"\s+$")
+
 
 class TextTokenizer:
     """
@@ -73,5 +77,73 @@ class TextTokenizer:
         text = " ".join([self.int_to_str[i] for i in ids])
 
         # Fix spacing around punctuation
-        text = re.sub(r"\s+([,.:;?!\"()\\'])", r"\1", text)
+        text = _SPACING_PATTERN.sub(r"\1", text)
         return text  # type: ignore
+
+    def incremental_decoder(self) -> "IncrementalDecoder":
+        """
+        Create a stateful decoder for streaming generated tokens.
+
+        Returns:
+            IncrementalDecoder sharing this tokenizer's vocabulary
+        """
+        return IncrementalDecoder(self)
+
+
+class IncrementalDecoder:
+    """
+    Stateful decoder that emits only the new text for each token.
+
+    Re-decoding the full ID list after every generated token costs O(T^2)
+    over a stream. This decoder keeps the not-yet-final trailing whitespace
+    as state and applies the same punctuation-spacing rule as
+    ``TextTokenizer.decode`` to the new piece only, so the concatenation of
+    all fragments plus ``flush()`` equals ``decode(ids)``.
+
+    Args:
+        tokenizer: Tokenizer whose vocabulary is used for decoding
+
+    Example:
+        >>> decoder = tokenizer.incremental_decoder()
+        >>> text = "".join(decoder.step(i) for i in ids) + decoder.flush()
+    """
+
+    def __init__(self, tokenizer: TextTokenizer):
+        """Initialize decoder with empty state."""
+        self.int_to_str = tokenizer.int_to_str
+        self._pending = ""
+        self._started = False
+
+    def step(self, token_id: int) -> str:
+        """
+        Decode one more token.
+
+        Args:
+            token_id: Next token ID in the stream
+
+        Returns:
+            Text that became final with this token (may be empty)
+        """
+        token = self.int_to_str[token_id]
+        piece = " " + token if self._started else token
+        self._started = True
+
+        # Whitespace that might precede punctuation is held back until the
+        # next token shows whether it survives the spacing rule
+        text = _SPACING_PATTERN.sub(r"\1", self._pending + piece)
+        trailing = _TRAILING_SPACE_PATTERN.search(text)
+        if trailing:
+            self._pending = trailing.group()
+            return text[:trailing.start()]
+        self._pending = ""
+        return text
+
+    def flush(self) -> str:
+        """
+        Return any text still held back at the end of the stream.
+
+        Returns:
+            Remaining text fragment
+        """
+        text, self._pending = self._pending, ""
+        return text
@@ -5,11 +5,25 @@ This script tests the complete tokenization pipeline:
 1. Download and build vocabulary
 2. Create tokenizer
 3. Test encoding/decoding on various texts
+4. Test incremental (streaming) decoding against full decoding
+5. Test the single-pass statistics engine: merged shards, parallel file
+   shards and JSON export match a direct computation
+6. Test MinHash-LSH deduplication: planted copies are removed, parallel
+   hashing matches serial, files and text are filtered in order
 """
 
+import json
+import os
+import random
+import tempfile
+
 from build_vocabulary import create_full_vocabulary
+from dedup import MinHashDeduplicator, deduplicate_text
 from simple_tokenizer import TextTokenizer
-from utils import analyze_vocabulary, plot_token_frequencies
+from utils import (
+    analyze_vocabulary, plot_token_frequencies, corpus_statistics,
+    corpus_statistics_from_files, vocabulary_statistics,
+)
 
 
 def test_basic_functionality():
@@ -95,6 +109,135 @@ def test_tokenization_analysis():
         print("Matplotlib not available for plotting")
 
 
+def test_incremental_decoding():
+    """Test that streamed fragments add up to the full decode."""
+    print("\n=== Testing Incremental Decoding ===")
+
+    vocab = create_full_vocabulary(download_fresh=False)
+    tokenizer = TextTokenizer(vocab)
+
+    with open("the-verdict.txt", "r", encoding="utf-8") as f:
+        ids = tokenizer.encode(f.read())
+
+    # Random ID sequences exercise punctuation in unusual positions
+    rng = random.Random(0)
+    sequences = [ids, [rng.randrange(len(vocab)) for _ in range(500)]]
+
+    for seq in sequences:
+        decoder = tokenizer.incremental_decoder()
+        fragments = [decoder.step(i) for i in seq]
+        streamed = "".join(fragments) + decoder.flush()
+        assert streamed == tokenizer.decode(seq), "Streamed text differs from decode"
+
+    print(f"Streamed {len(ids)} tokens; first fragments: {fragments[:8]}")
+
+
+def test_statistics_engine():
+    """Test mergeable corpus and vocabulary statistics."""
+    print("\n=== Testing Statistics Engine ===")
+
+    vocab = create_full_vocabulary(download_fresh=False)
+    tokenizer = TextTokenizer(vocab)
+    with open("the-verdict.txt", "r", encoding="utf-8") as f:
+        texts = [p for p in f.read().split("\n\n") if p.strip()]
+    texts.append("Unseen words: quantum blockchain!")
+
+    # Direct computation, one metric at a time
+    encoded = [tokenizer.encode(t) for t in texts]
+    all_ids = [i for ids in encoded for i in ids]
+    token_lengths = [len(tokenizer.int_to_str[i]) for i in all_ids]
+
+    stats = corpus_statistics(tokenizer, iter(texts))
+    d = stats.to_dict()
+    assert d['total_texts'] == len(texts)
+    assert d['total_characters'] == sum(len(t) for t in texts)
+    assert d['total_tokens'] == len(all_ids)
+    assert abs(d['avg_token_length'] - sum(token_lengths) / len(token_lengths)) < 1e-9
+    assert d['unknown_tokens'] == all_ids.count(vocab["<|unk|>"]) > 0
+    assert d['unique_tokens'] == len(set(all_ids))
+    assert d['max_tokens_per_text'] == max(len(ids) for ids in encoded)
+
+    # Shards merge to the same statistics, in any split
+    merged = corpus_statistics(tokenizer, texts[:7]).merge(corpus_statistics(tokenizer, texts[7:]))
+    assert merged.to_dict(include_counts=True) == stats.to_dict(include_counts=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for shard in range(3):
+            paths.append(os.path.join(tmp, f"shard{shard}.txt"))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                f.write("\n".join(t.replace("\n", " ") for t in texts[shard::3]))
+        serial = corpus_statistics_from_files(tokenizer, paths, by="line")
+        parallel = corpus_statistics_from_files(tokenizer, paths, by="line", num_processes=2)
+    assert serial.to_dict(include_counts=True) == parallel.to_dict(include_counts=True)
+    assert serial.texts == len(texts)
+
+    exported = json.loads(stats.to_json(top_n=5))
+    assert exported['top_tokens'][0][1] == max(stats.token_counts.values())
+
+    vocab_stats = vocabulary_statistics(vocab)
+    assert vocab_stats.size == len(vocab)
+    assert vocab_stats.longest_token == max(vocab, key=len)
+    assert vocab_stats.shortest_token == min(vocab, key=len)
+    assert vocab_stats.punctuation == sum(1 for t in vocab if not t.isalnum())
+    assert vocab_stats.unique_characters == len(set("".join(vocab)))
+
+    print(stats.summary(top_n=5))
+
+
+def test_deduplication():
+    """Test near-duplicate removal."""
+    print("\n=== Testing Deduplication ===")
+
+    with open("the-verdict.txt", "r", encoding="utf-8") as f:
+        paragraphs = [" ".join(p.split()) for p in f.read().split("\n\n")
+                      if len(p.split()) >= 20]
+    rng = random.Random(0)
+    docs, copies = list(paragraphs), {}
+    for _ in range(40):
+        source = rng.randrange(len(paragraphs))
+        words = paragraphs[source].split()
+        if len(words) >= 100:
+            # One edited word changes 5 shingles: still above 0.8 similarity
+            words[rng.randrange(len(words))] = "zebra"
+        copies[len(docs)] = source
+        docs.append(" ".join(words).upper())  # Case differences do not matter
+    docs += ["", "   "]
+
+    dedup = MinHashDeduplicator(batch_size=64)
+    result = dedup.deduplicate(docs)
+    assert dedup.signatures(["a b c"]).shape == (1, dedup.num_perm)
+    assert result.num_documents == len(docs)
+    assert result.keep[:len(paragraphs)].all(), "Distinct paragraphs must be kept"
+    assert result.keep[-2:].all(), "Empty documents are not duplicates of each other"
+    removed = [i for i in copies if not result.keep[i]]
+    assert len(removed) == len(copies), f"Only {len(removed)} of {len(copies)} copies found"
+    for i in removed:
+        assert result.representative[i] < i and result.keep[result.representative[i]]
+    print(f"Removed {len(removed)} of {len(copies)} planted copies "
+          f"({result.candidate_pairs} candidate pairs)")
+
+    parallel = dedup.deduplicate(docs, num_processes=2)
+    assert (parallel.keep == result.keep).all()
+    assert (parallel.representative == result.representative).all()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"part{i}.txt") for i in range(2)]
+        half = len(docs) // 2
+        for path, part in zip(paths, (docs[:half], docs[half:])):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(part) + "\n")
+        output = os.path.join(tmp, "unique.txt")
+        from_files = dedup.deduplicate_files(paths, output)
+        with open(output, "r", encoding="utf-8") as f:
+            kept = f.read().split("\n")[:-1]
+    assert (from_files.keep == result.keep).all()
+    assert kept == [d for d, keep in zip(docs, result.keep) if keep]
+
+    text = "\n\n".join(paragraphs + paragraphs[:3])
+    assert deduplicate_text(text) == "\n\n".join(paragraphs)
+
+
 def main():
     """Run all tests."""
     print("🧪 Starting Tokenization Tests")
@@ -104,6 +247,9 @@ def main():
         test_basic_functionality()
         test_vocabulary_analysis()
         test_tokenization_analysis()
+        test_incremental_decoding()
+        test_statistics_engine()
+        test_deduplication()
         
         print("\n✅ All tests completed successfully!")
         
@@ -5,52 +5,353 @@ This module provides analysis and visualization tools for understanding
 tokenization behavior and vocabulary characteristics.
 """
 
+import json
 from collections import Counter
-from typing import List, Dict, Tuple, Any
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import List, Dict, Tuple, Any, Iterable, Optional
 
+UNKNOWN_TOKEN = "<|unk|>"
 
-def analyze_vocabulary(vocab: Dict[str, int]) -> None:
+
+@dataclass
+class VocabularyStats:
+    """
+    Statistics of a vocabulary, computed in one pass over its tokens.
+
+    Attributes:
+        size: Number of tokens
+        unique_characters: Distinct characters across all tokens
+        total_length: Sum of the token lengths (characters)
+        longest_token: First token of maximal length
+        shortest_token: First token of minimal length
+        alphabetic: Tokens made of letters only
+        numeric: Tokens made of digits only
+        punctuation: Tokens with any non-alphanumeric character
+        samples: The first ten ``(token, id)`` pairs
+    """
+
+    size: int = 0
+    unique_characters: int = 0
+    total_length: int = 0
+    longest_token: str = ""
+    shortest_token: str = ""
+    alphabetic: int = 0
+    numeric: int = 0
+    punctuation: int = 0
+    samples: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def avg_token_length(self) -> float:
+        return self.total_length / self.size if self.size else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dictionary, ready for ``json.dump``."""
+        return {
+            'vocabulary_size': self.size,
+            'unique_characters': self.unique_characters,
+            'avg_token_length': self.avg_token_length,
+            'longest_token': self.longest_token,
+            'shortest_token': self.shortest_token,
+            'alphabetic_tokens': self.alphabetic,
+            'numeric_tokens': self.numeric,
+            'punctuation_tokens': self.punctuation,
+            'sample_tokens': [list(pair) for pair in self.samples],
+        }
+
+
+def vocabulary_statistics(vocab: Dict[str, int]) -> VocabularyStats:
+    """
+    Compute vocabulary statistics in a single pass over the tokens.
+
+    Args:
+        vocab: Vocabulary dictionary mapping tokens to IDs
+
+    Returns:
+        VocabularyStats
+    """
+    stats = VocabularyStats(samples=list(islice(vocab.items(), 10)))
+    if not vocab:
+        return stats
+    chars = set()
+    longest = shortest = next(iter(vocab))
+    total_length = alphabetic = numeric = punctuation = 0
+    for token in vocab:
+        length = len(token)
+        total_length += length
+        if length > len(longest):
+            longest = token
+        elif length < len(shortest):
+            shortest = token
+        chars.update(token)
+        if token.isalnum():  # Letters and digits are both alphanumeric
+            alphabetic += token.isalpha()
+            numeric += token.isnumeric()
+        else:
+            punctuation += 1
+    stats.size, stats.total_length = len(vocab), total_length
+    stats.longest_token, stats.shortest_token = longest, shortest
+    stats.alphabetic, stats.numeric, stats.punctuation = alphabetic, numeric, punctuation
+    stats.unique_characters = len(chars)
+    return stats
+
+
+def analyze_vocabulary(vocab: Dict[str, int]) -> VocabularyStats:
     """
     Analyze and display vocabulary statistics.
     
     Args:
         vocab: Vocabulary dictionary mapping tokens to IDs
+
+    Returns:
+        The statistics that were printed
     """
+    stats = vocabulary_statistics(vocab)
+    size = max(stats.size, 1)
+
     print(f"📊 Vocabulary Analysis")
     print(f"{'='*30}")
-    print(f"Vocabulary size: {len(vocab)}")
-    
-    # Character analysis
-    all_chars = set()
-    for token in vocab.keys():
-        all_chars.update(token)
-    print(f"Unique characters: {len(all_chars)}")
-    
-    # Token length analysis
-    token_lengths = [len(token) for token in vocab.keys()]
-    avg_length = sum(token_lengths) / len(token_lengths)
-    max_length = max(token_lengths)
-    min_length = min(token_lengths)
-    
-    print(f"Average token length: {avg_length:.2f}")
-    print(f"Longest token: '{max(vocab.keys(), key=len)}' (length: {max_length})")
-    print(f"Shortest token: '{min(vocab.keys(), key=len)}' (length: {min_length})")
-    
-    # Token type analysis
-    alphabetic = sum(1 for token in vocab.keys() if token.isalpha())
-    numeric = sum(1 for token in vocab.keys() if token.isnumeric())
-    punctuation = sum(1 for token in vocab.keys() if not token.isalnum())
+    print(f"Vocabulary size: {stats.size}")
+    print(f"Unique characters: {stats.unique_characters}")
+    print(f"Average token length: {stats.avg_token_length:.2f}")
+    print(f"Longest token: '{stats.longest_token}' (length: {len(stats.longest_token)})")
+    print(f"Shortest token: '{stats.shortest_token}' (length: {len(stats.shortest_token)})")
     
     print(f"\n📝 Token Types:")
-    print(f"Alphabetic tokens: {alphabetic} ({alphabetic/len(vocab)*100:.1f}%)")
-    print(f"Numeric tokens: {numeric} ({numeric/len(vocab)*100:.1f}%)")
-    print(f"Punctuation/Other: {punctuation} ({punctuation/len(vocab)*100:.1f}%)")
+    print(f"Alphabetic tokens: {stats.alphabetic} ({stats.alphabetic/size*100:.1f}%)")
+    print(f"Numeric tokens: {stats.numeric} ({stats.numeric/size*100:.1f}%)")
+    print(f"Punctuation/Other: {stats.punctuation} ({stats.punctuation/size*100:.1f}%)")
     
     # Show some examples
     print(f"\n🔤 Sample Tokens:")
-    sample_tokens = list(vocab.items())[:10]
-    for token, idx in sample_tokens:
+    for token, idx in stats.samples:
         print(f"  '{token}' -> {idx}")
+    return stats
+
+
+@dataclass
+class CorpusStats:
+    """
+    Mergeable tokenization statistics of a corpus.
+
+    Every field is a sum, a minimum/maximum or a counter, so statistics of
+    separate shards combine exactly with ``merge``. Nothing grows with the
+    corpus: token frequencies are kept per distinct token, and averages are
+    derived from the sums when asked for.
+
+    Attributes:
+        texts: Number of texts (documents)
+        characters: Total characters
+        tokens: Total tokens
+        min_tokens_per_text: Fewest tokens in one text (None before any text)
+        max_tokens_per_text: Most tokens in one text
+        vocabulary_size: Size of the tokenizer's vocabulary
+        token_counts: Occurrences of every token string
+    """
+
+    texts: int = 0
+    characters: int = 0
+    tokens: int = 0
+    min_tokens_per_text: Optional[int] = None
+    max_tokens_per_text: int = 0
+    vocabulary_size: int = 0
+    token_counts: Counter = field(default_factory=Counter)
+
+    def update(self, tokenizer: Any, text: str) -> None:
+        """
+        Add one text, encoding it once.
+
+        Args:
+            tokenizer: Tokenizer with ``.encode()`` and ``.int_to_str``
+            text: Text to add
+        """
+        ids = tokenizer.encode(text)
+        self.texts += 1
+        self.characters += len(text)
+        self.tokens += len(ids)
+        if self.min_tokens_per_text is None or len(ids) < self.min_tokens_per_text:
+            self.min_tokens_per_text = len(ids)
+        self.max_tokens_per_text = max(self.max_tokens_per_text, len(ids))
+        self.vocabulary_size = len(tokenizer.str_to_int)
+        # Counter.update over an iterable counts in C
+        self.token_counts.update(map(tokenizer.int_to_str.__getitem__, ids))
+
+    def merge(self, other: "CorpusStats") -> "CorpusStats":
+        """Add the statistics of another shard in place; returns ``self``."""
+        self.texts += other.texts
+        self.characters += other.characters
+        self.tokens += other.tokens
+        if other.min_tokens_per_text is not None:
+            self.min_tokens_per_text = (other.min_tokens_per_text
+                                        if self.min_tokens_per_text is None
+                                        else min(self.min_tokens_per_text,
+                                                 other.min_tokens_per_text))
+        self.max_tokens_per_text = max(self.max_tokens_per_text, other.max_tokens_per_text)
+        self.vocabulary_size = max(self.vocabulary_size, other.vocabulary_size)
+        self.token_counts.update(other.token_counts)
+        return self
+
+    @property
+    def unknown_tokens(self) -> int:
+        return self.token_counts.get(UNKNOWN_TOKEN, 0)
+
+    @property
+    def unique_tokens(self) -> int:
+        return len(self.token_counts)
+
+    @property
+    def avg_token_length(self) -> float:
+        """Average length of the tokens' strings, weighted by occurrence."""
+        total = sum(len(token) * count for token, count in self.token_counts.items())
+        return total / self.tokens if self.tokens else 0.0
+
+    def to_dict(self, top_n: int = 10, include_counts: bool = False) -> Dict[str, Any]:
+        """
+        Plain dictionary, ready for ``json.dump``.
+
+        Args:
+            top_n: Number of most frequent tokens to list (0: none)
+            include_counts: Also include every token count, so exported
+                statistics can be merged later
+
+        Returns:
+            Totals, averages and ratios (NaN-free: 0.0 for an empty corpus)
+        """
+        texts, tokens = max(self.texts, 1), max(self.tokens, 1)
+        result = {
+            'total_texts': self.texts,
+            'total_characters': self.characters,
+            'total_tokens': self.tokens,
+            'avg_chars_per_text': self.characters / texts,
+            'avg_tokens_per_text': self.tokens / texts,
+            'min_tokens_per_text': self.min_tokens_per_text or 0,
+            'max_tokens_per_text': self.max_tokens_per_text,
+            'compression_ratio': self.characters / tokens,
+            'avg_token_length': self.avg_token_length,
+            'unknown_tokens': self.unknown_tokens,
+            'unknown_rate': self.unknown_tokens / tokens,
+            'unique_tokens': self.unique_tokens,
+            'vocabulary_size': self.vocabulary_size,
+            'vocabulary_coverage': self.unique_tokens / max(self.vocabulary_size, 1),
+        }
+        if top_n:
+            result['top_tokens'] = [[token, count]
+                                    for token, count in self.token_counts.most_common(top_n)]
+        if include_counts:
+            result['token_counts'] = dict(self.token_counts)
+        return result
+
+    def to_json(self, **kwargs) -> str:
+        """JSON text of ``to_dict(**kwargs)``."""
+        return json.dumps(self.to_dict(**kwargs), indent=2, ensure_ascii=False)
+
+    def summary(self, top_n: int = 10) -> str:
+        """Human-readable report, in the style of ``analyze_vocabulary``."""
+        d = self.to_dict(top_n)
+        lines = [
+            "📊 Corpus Statistics",
+            "=" * 30,
+            f"Texts: {d['total_texts']:,}",
+            f"Characters: {d['total_characters']:,}",
+            f"Tokens: {d['total_tokens']:,} ({d['min_tokens_per_text']:,}-"
+            f"{d['max_tokens_per_text']:,} per text, {d['avg_tokens_per_text']:.1f} on average)",
+            f"Compression ratio: {d['compression_ratio']:.2f} chars/token",
+            f"Average token length: {d['avg_token_length']:.2f}",
+            f"Unknown tokens: {d['unknown_tokens']:,} ({d['unknown_rate']*100:.2f}%)",
+            f"Vocabulary used: {d['unique_tokens']:,} of {d['vocabulary_size']:,} "
+            f"({d['vocabulary_coverage']*100:.1f}%)",
+        ]
+        if top_n:
+            lines.append(f"\n🔝 Top {top_n} Tokens:")
+            lines.extend(f"  {token!r}: {count:,}" for token, count in d['top_tokens'])
+        return "\n".join(lines)
+
+
+def corpus_statistics(tokenizer: Any, texts: Iterable[str]) -> CorpusStats:
+    """
+    Compute corpus statistics in one streaming pass.
+
+    Args:
+        tokenizer: Tokenizer with ``.encode()``, ``.str_to_int`` and ``.int_to_str``
+        texts: Texts; any iterable, consumed once (e.g. a generator over files)
+
+    Returns:
+        CorpusStats
+    """
+    stats = CorpusStats(vocabulary_size=len(tokenizer.str_to_int))
+    for text in texts:
+        stats.update(tokenizer, text)
+    return stats
+
+
+def iter_texts(path: str, by: str = "file") -> Iterable[str]:
+    """
+    Texts of a UTF-8 file.
+
+    Args:
+        path: File to read
+        by: ``"file"`` (the whole file is one text) or ``"line"`` (every
+            non-empty line is a text, e.g. one document per line; the file is
+            streamed)
+    """
+    if by not in ("file", "line"):
+        raise ValueError(f"by must be 'file' or 'line', got {by!r}")
+    with open(path, "r", encoding="utf-8") as f:
+        if by == "file":
+            yield f.read()
+            return
+        for line in f:
+            line = line.rstrip("\n")
+            if line.strip():
+                yield line
+
+
+_worker_tokenizer = None
+
+
+def _init_worker(tokenizer: Any) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def _shard_statistics(args: Tuple[str, str]) -> CorpusStats:
+    path, by = args
+    return corpus_statistics(_worker_tokenizer, iter_texts(path, by))
+
+
+def corpus_statistics_from_files(tokenizer: Any, paths: List[str], by: str = "file",
+                                 num_processes: int = 1) -> CorpusStats:
+    """
+    Compute corpus statistics over file shards, optionally in parallel.
+
+    Every file is processed independently and the per-file statistics are
+    merged, so the result does not depend on ``num_processes``. Worker
+    processes receive the tokenizer once, when they start.
+
+    Args:
+        tokenizer: Tokenizer (must be picklable for ``num_processes > 1``)
+        paths: UTF-8 text files
+        by: ``"file"`` or ``"line"``, see ``iter_texts``
+        num_processes: Worker processes (1: in this process)
+
+    Returns:
+        CorpusStats of all files
+    """
+    stats = CorpusStats(vocabulary_size=len(tokenizer.str_to_int))
+    tasks = [(path, by) for path in paths]
+    if num_processes <= 1 or len(paths) <= 1:
+        for task in tasks:
+            stats.merge(corpus_statistics(tokenizer, iter_texts(*task)))
+        return stats
+
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(min(num_processes, len(paths)), initializer=_init_worker,
+                      initargs=(tokenizer,)) as pool:
+        for shard in pool.imap_unordered(_shard_statistics, tasks):
+            stats.merge(shard)
+    return stats
 
 
 def plot_token_frequencies(tokens: List[str], top_n: int = 20) -> None:
@@ -182,28 +483,7 @@ def tokenization_statistics(tokenizer: Any, texts: List[str]) -> Dict[str, float
     """
     if not texts:
         return {}
-    
-    total_chars = sum(len(text) for text in texts)
-    total_tokens = 0
-    token_lengths = []
-    
-    for text in texts:
-        tokens = tokenizer.encode(text)
-        total_tokens += len(tokens)
-        token_lengths.extend([len(tokenizer.int_to_str[tid]) for tid in tokens])
-    
-    stats = {
-        'total_texts': len(texts),
-        'total_characters': total_chars,
-        'total_tokens': total_tokens,
-        'avg_chars_per_text': total_chars / len(texts),
-        'avg_tokens_per_text': total_tokens / len(texts),
-        'compression_ratio': total_chars / total_tokens,
-        'avg_token_length': sum(token_lengths) / len(token_lengths),
-        'vocabulary_size': len(tokenizer.str_to_int)
-    }
-    
-    return stats
+    return corpus_statistics(tokenizer, texts).to_dict(top_n=0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,12 @@
+"""
+Attention module implementing causal multi-head self-attention.
+
+This module provides the attention mechanism that lets every token gather
+information from the tokens that precede it. ``AttentionCapture`` records
+the attention maps of selected layers and heads for visualization.
+"""
+
+from .multi_head_attention import MultiHeadAttention
+from .capture import AttentionCapture
+
+__all__ = ['MultiHeadAttention', 'AttentionCapture']
@@ -0,0 +1,100 @@
+"""
+Multi-head causal self-attention.
+
+This module implements the masked multi-head attention used in GPT models:
+queries, keys and values are projected from the input, split into heads,
+and every token attends only to itself and the tokens before it.
+"""
+
+from typing import Any, Callable, Optional
+
+import torch
+import torch.nn as nn
+
+
+class MultiHeadAttention(nn.Module):
+    """
+    Causal multi-head self-attention.
+
+    Args:
+        d_in: Input embedding dimension
+        d_out: Output embedding dimension (split evenly across heads)
+        context_length: Maximum sequence length supported by the causal mask
+        dropout: Dropout rate applied to the attention weights
+        num_heads: Number of attention heads
+        qkv_bias: Whether the query/key/value projections use a bias
+
+    Example:
+        >>> mha = MultiHeadAttention(768, 768, 1024, 0.1, num_heads=12)
+        >>> out = mha(torch.randn(2, 16, 768))  # (batch, tokens, d_out)
+    """
+
+    def __init__(self, d_in: int, d_out: int, context_length: int,
+                 dropout: float, num_heads: int, qkv_bias: bool = False):
+        """Initialize projections and causal mask."""
+        super().__init__()
+        assert d_out % num_heads == 0, "d_out must be divisible by num_heads"
+
+        self.d_out = d_out
+        self.num_heads = num_heads
+        self.head_dim = d_out // num_heads
+
+        self.W_query = nn.Linear(d_in, d_out, bias=qkv_bias)
+        self.W_key = nn.Linear(d_in, d_out, bias=qkv_bias)
+        self.W_value = nn.Linear(d_in, d_out, bias=qkv_bias)
+        self.out_proj = nn.Linear(d_out, d_out)
+        self.dropout = nn.Dropout(dropout)
+        self.register_buffer(
+            "mask", torch.triu(torch.ones(context_length, context_length), diagonal=1)
+        )
+        # Called with the attention weights (batch, num_heads, num_tokens,
+        # num_keys) of every forward pass when set; see AttentionCapture
+        self.observer: Optional[Callable[[torch.Tensor], None]] = None
+
+    def forward(self, x: torch.Tensor, kv_cache: Optional[Any] = None,
+                attn_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Apply causal self-attention.
+
+        Args:
+            x: Input of shape (batch, num_tokens, d_in)
+            kv_cache: Optional per-layer cache with an ``update(keys, values)``
+                method returning all cached keys and values; ``x`` then holds
+                only the tokens after the cached ones
+            attn_mask: Optional boolean mask of shape (batch, num_tokens,
+                num_keys), True where a query must not attend to a key (e.g.
+                across document boundaries); applied on top of the causal mask
+
+        Returns:
+            Context vectors of shape (batch, num_tokens, d_out)
+        """
+        b, num_tokens, _ = x.shape
+
+        # (b, num_tokens, d_out) -> (b, num_heads, num_tokens, head_dim)
+        keys = self.W_key(x).view(b, num_tokens, self.num_heads, self.head_dim)
+        queries = self.W_query(x).view(b, num_tokens, self.num_heads, self.head_dim)
+        values = self.W_value(x).view(b, num_tokens, self.num_heads, self.head_dim)
+        keys = keys.transpose(1, 2)
+        queries = queries.transpose(1, 2)
+        values = values.transpose(1, 2)
+
+        if kv_cache is not None:
+            keys, values = kv_cache.update(keys, values)
+        num_keys = keys.shape[2]
+        offset = num_keys - num_tokens  # Position of the first query token
+
+        attn_scores = queries @ keys.transpose(2, 3)
+        mask_bool = self.mask.bool()[offset:offset + num_tokens, :num_keys]
+        attn_scores.masked_fill_(mask_bool, -torch.inf)
+        if attn_mask is not None:
+            attn_scores.masked_fill_(attn_mask.unsqueeze(1), -torch.inf)
+
+        attn_weights = torch.softmax(attn_scores / keys.shape[-1] ** 0.5, dim=-1)
+        if self.observer is not None:
+            self.observer(attn_weights)
+        attn_weights = self.dropout(attn_weights)
+
+        # (b, num_heads, num_tokens, head_dim) -> (b, num_tokens, d_out)
+        context_vec = (attn_weights @ values).transpose(1, 2)
+        context_vec = context_vec.contiguous().view(b, num_tokens, self.d_out)
+        return self.out_proj(context_vec)
@@ -0,0 +1,23 @@
+"""
+Transformer block module.
+
+This module provides the building blocks stacked inside a GPT model:
+layer normalization, the GELU feed-forward network, a sparse
+mixture-of-experts variant of it, and the transformer block that combines
+them with multi-head attention.
+"""
+
+from .layer_norm import LayerNorm
+from .feed_forward import GELU, FeedForward
+from .mixture_of_experts import MOE_DEFAULTS, MoEFeedForward, moe_config
+from .transformer_block import TransformerBlock
+
+__all__ = [
+    'LayerNorm',
+    'GELU',
+    'FeedForward',
+    'MOE_DEFAULTS',
+    'MoEFeedForward',
+    'moe_config',
+    'TransformerBlock',
+]
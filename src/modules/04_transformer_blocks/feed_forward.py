@@ -0,0 +1,40 @@
+"""
+Position-wise feed-forward network with GELU activation.
+"""
+
+from typing import Any, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+
+class GELU(nn.Module):
+    """GELU activation using the tanh approximation from GPT-2."""
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return 0.5 * x * (1 + torch.tanh(
+            torch.sqrt(torch.tensor(2.0 / torch.pi)) * (x + 0.044715 * torch.pow(x, 3))
+        ))
+
+
+class FeedForward(nn.Module):
+    """
+    Two-layer MLP expanding the embedding dimension by a factor of 4.
+
+    Args:
+        cfg: Model configuration with ``emb_dim``
+        hidden_dim: Hidden size (defaults to ``4 * emb_dim``)
+    """
+
+    def __init__(self, cfg: Dict[str, Any], hidden_dim: Optional[int] = None):
+        """Initialize expansion and projection layers."""
+        super().__init__()
+        hidden_dim = hidden_dim or 4 * cfg["emb_dim"]
+        self.layers = nn.Sequential(
+            nn.Linear(cfg["emb_dim"], hidden_dim),
+            GELU(),
+            nn.Linear(hidden_dim, cfg["emb_dim"]),
+        )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.layers(x)
@@ -0,0 +1,29 @@
+"""
+Layer normalization for transformer blocks.
+"""
+
+import torch
+import torch.nn as nn
+
+
+class LayerNorm(nn.Module):
+    """
+    Normalize the last dimension to zero mean and unit variance.
+
+    Args:
+        emb_dim: Embedding dimension to normalize
+        eps: Small constant added to the variance for numerical stability
+    """
+
+    def __init__(self, emb_dim: int, eps: float = 1e-5):
+        """Initialize learnable scale and shift."""
+        super().__init__()
+        self.eps = eps
+        self.scale = nn.Parameter(torch.ones(emb_dim))
+        self.shift = nn.Parameter(torch.zeros(emb_dim))
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        mean = x.mean(dim=-1, keepdim=True)
+        var = x.var(dim=-1, keepdim=True, unbiased=False)
+        norm_x = (x - mean) / torch.sqrt(var + self.eps)
+        return self.scale * norm_x + self.shift
@@ -0,0 +1,161 @@
+"""
+Sparse mixture-of-experts feed-forward layer.
+
+A router scores every token against ``n_experts`` feed-forward networks and
+sends it to its ``moe_top_k`` best; the outputs are mixed with the
+renormalized router probabilities. Parameters grow with the number of
+experts while the FLOPs per token grow only with ``moe_top_k``.
+
+Tokens are grouped by expert (one stable sort of the assignments), so every
+expert runs one matmul per layer over all of its tokens. During training
+each expert takes at most ``capacity_factor * tokens * top_k / n_experts``
+tokens; assignments beyond that are dropped (first choices of all tokens
+rank before second choices) and the token keeps only its residual path. A
+load-balancing auxiliary loss (Switch Transformer) pushes the router towards
+an even spread.
+"""
+
+import math
+from typing import Any, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+from .feed_forward import FeedForward
+
+# Settings of the MoE layer, read from the model configuration
+MOE_DEFAULTS: Dict[str, Any] = {
+    "n_experts": 0,               # Experts per block (0: dense feed forward)
+    "moe_top_k": 2,               # Experts per token
+    "moe_hidden_dim": None,       # Expert hidden size (None: 4 * emb_dim)
+    "moe_capacity_factor": 1.25,  # Expert capacity relative to an even split (0: unlimited)
+    "moe_aux_loss_weight": 0.01,  # Weight of the load-balancing loss
+}
+
+
+def moe_config(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    MoE settings of a model configuration, with defaults filled in.
+
+    Args:
+        cfg: Model configuration
+
+    Returns:
+        The ``MOE_DEFAULTS`` keys, ``moe_hidden_dim`` resolved
+    """
+    settings = {key: cfg.get(key, default) for key, default in MOE_DEFAULTS.items()}
+    settings["moe_hidden_dim"] = settings["moe_hidden_dim"] or 4 * cfg["emb_dim"]
+    return settings
+
+
+class MoEFeedForward(nn.Module):
+    """
+    Top-k routed mixture of ``FeedForward`` experts.
+
+    Args:
+        cfg: Model configuration with ``emb_dim``, ``n_experts`` and
+            optionally the other ``MOE_DEFAULTS`` keys
+
+    Attributes:
+        aux_loss: Weighted load-balancing loss of the last forward pass,
+            detached (for logging; train with ``take_aux_loss``)
+        tokens_per_expert: Assignments each expert processed in the last
+            forward pass (after capacity dropping)
+
+    Example:
+        >>> moe = MoEFeedForward(dict(cfg, n_experts=8, moe_top_k=2))
+        >>> out = moe(torch.randn(2, 16, cfg["emb_dim"]))  # (batch, tokens, emb_dim)
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        """Initialize the router and the experts."""
+        super().__init__()
+        settings = moe_config(cfg)
+        self.num_experts = settings["n_experts"]
+        self.top_k = settings["moe_top_k"]
+        if not 0 < self.top_k <= self.num_experts:
+            raise ValueError(f"moe_top_k ({self.top_k}) must be between 1 and "
+                             f"n_experts ({self.num_experts})")
+        self.capacity_factor = settings["moe_capacity_factor"]
+        self.aux_loss_weight = settings["moe_aux_loss_weight"]
+        self.router = nn.Linear(cfg["emb_dim"], self.num_experts, bias=False)
+        self.experts = nn.ModuleList(
+            FeedForward(cfg, settings["moe_hidden_dim"]) for _ in range(self.num_experts))
+        self.aux_loss: Optional[torch.Tensor] = None
+        self.tokens_per_expert: Optional[torch.Tensor] = None
+        self._aux_loss: Optional[torch.Tensor] = None  # Attached to the graph
+
+    def take_aux_loss(self) -> Optional[torch.Tensor]:
+        """
+        Load-balancing loss of the last forward pass, with its graph.
+
+        The layer lets go of the loss, so it does not keep the router's
+        graph alive (or stop the model from being deep-copied).
+
+        Returns:
+            The weighted loss, or None if it was already taken
+        """
+        loss, self._aux_loss = self._aux_loss, None
+        return loss
+
+    def capacity(self, num_tokens: int) -> Optional[int]:
+        """Assignments each expert accepts for ``num_tokens`` tokens (None: all)."""
+        if not self.training or self.capacity_factor <= 0:
+            return None
+        return math.ceil(self.capacity_factor * num_tokens * self.top_k / self.num_experts)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Route every token to its top-k experts.
+
+        Args:
+            x: Input of shape (batch, num_tokens, emb_dim)
+
+        Returns:
+            Output of the same shape
+        """
+        shape = x.shape
+        x = x.reshape(-1, shape[-1])
+        num_tokens = x.shape[0]
+
+        probs = torch.softmax(self.router(x).float(), dim=-1)
+        gates, experts = probs.topk(self.top_k, dim=-1)
+        gates = gates / gates.sum(dim=-1, keepdim=True)
+
+        # Group the assignments by expert; the stable sort keeps all first
+        # choices ahead of the second choices, each in token order
+        assigned = experts.t().reshape(-1)
+        order = torch.argsort(assigned, stable=True)
+        counts = torch.bincount(assigned, minlength=self.num_experts)
+        capacity = self.capacity(num_tokens)
+        kept = counts
+        if capacity is not None and int(counts.max()) > capacity:
+            starts = torch.cumsum(counts, dim=0) - counts
+            position = (torch.arange(order.numel(), device=x.device)
+                        - starts.repeat_interleave(counts))
+            order = order[position < capacity]
+            kept = counts.clamp(max=capacity)
+        token_ids = order % num_tokens
+
+        # One matmul per expert layer over all of the expert's tokens; when
+        # training, experts without tokens still run (on zero rows) so every
+        # parameter gets a gradient, as data-parallel training expects
+        grouped = x[token_ids].split(kept.tolist())
+        expert_out = torch.cat([expert(chunk) for expert, chunk in zip(self.experts, grouped)
+                                if len(chunk) or torch.is_grad_enabled()])
+        weights = gates.t().reshape(-1)[order].unsqueeze(1).to(expert_out.dtype)
+        out = expert_out.new_zeros(num_tokens, shape[-1])
+        out.index_add_(0, token_ids, expert_out * weights)
+
+        # Fraction of assignments per expert times its mean router probability;
+        # equals 1 (times the weight) for a perfectly even router
+        fraction = counts.float() / (num_tokens * self.top_k)
+        aux_loss = self.aux_loss_weight * self.num_experts * (fraction * probs.mean(dim=0)).sum()
+        self._aux_loss = aux_loss if aux_loss.requires_grad else None
+        self.aux_loss = aux_loss.detach()
+        self.tokens_per_expert = kept
+        return out.to(x.dtype).view(shape)
+
+    def extra_repr(self) -> str:
+        return (f"num_experts={self.num_experts}, top_k={self.top_k}, "
+                f"capacity_factor={self.capacity_factor}")
@@ -0,0 +1,71 @@
+"""
+Transformer block combining attention and feed-forward layers.
+
+Each block applies pre-layer-norm multi-head attention and a feed-forward
+network (dense, or a mixture of experts when the configuration sets
+``n_experts``), both wrapped in residual (shortcut) connections.
+"""
+
+from importlib import import_module
+from typing import Any, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+from .feed_forward import FeedForward
+from .layer_norm import LayerNorm
+from .mixture_of_experts import MoEFeedForward
+
+MultiHeadAttention = import_module("..03_attention", __package__).MultiHeadAttention
+
+
+class TransformerBlock(nn.Module):
+    """
+    GPT transformer block.
+
+    Args:
+        cfg: Model configuration with ``emb_dim``, ``context_length``,
+            ``n_heads``, ``drop_rate`` and ``qkv_bias``; a positive
+            ``n_experts`` selects ``MoEFeedForward`` over ``FeedForward``
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        """Initialize attention, feed-forward and normalization layers."""
+        super().__init__()
+        self.att = MultiHeadAttention(
+            d_in=cfg["emb_dim"],
+            d_out=cfg["emb_dim"],
+            context_length=cfg["context_length"],
+            num_heads=cfg["n_heads"],
+            dropout=cfg["drop_rate"],
+            qkv_bias=cfg["qkv_bias"],
+        )
+        self.ff = MoEFeedForward(cfg) if cfg.get("n_experts") else FeedForward(cfg)
+        self.norm1 = LayerNorm(cfg["emb_dim"])
+        self.norm2 = LayerNorm(cfg["emb_dim"])
+        self.drop_shortcut = nn.Dropout(cfg["drop_rate"])
+
+    def forward(self, x: torch.Tensor, kv_cache: Optional[Any] = None,
+                attn_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Apply the block.
+
+        Args:
+            x: Input of shape (batch, num_tokens, emb_dim)
+            kv_cache: Optional key/value cache for this block's attention
+            attn_mask: Optional extra attention mask (see ``MultiHeadAttention``)
+
+        Returns:
+            Output of the same shape
+        """
+        shortcut = x
+        x = self.norm1(x)
+        x = self.att(x, kv_cache, attn_mask)
+        x = self.drop_shortcut(x)
+        x = x + shortcut
+
+        shortcut = x
+        x = self.norm2(x)
+        x = self.ff(x)
+        x = self.drop_shortcut(x)
+        return x + shortcut
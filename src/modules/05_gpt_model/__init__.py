@@ -0,0 +1,38 @@
+"""
+GPT model module assembling the full language model.
+
+This module provides the GPT-2 style model built from the transformer
+blocks of Module 4, together with the standard model configurations and
+a flat, memory-mapped checkpoint format and a per-layer profiler.
+"""
+
+from .model_config import GPT_CONFIG_124M, MODEL_CONFIGS, get_config
+from .gpt_model import GPTModel, count_parameters, estimate_flops_per_token
+from .checkpoint import (
+    CheckpointReader,
+    open_checkpoint,
+    save_state_dict,
+    save_model,
+    load_model,
+    empty_model,
+)
+from .profiler import PROFILE_ENV, LayerProfiler, ModuleStats, profile_from_env
+
+__all__ = [
+    'GPT_CONFIG_124M',
+    'MODEL_CONFIGS',
+    'get_config',
+    'GPTModel',
+    'count_parameters',
+    'estimate_flops_per_token',
+    'CheckpointReader',
+    'open_checkpoint',
+    'save_state_dict',
+    'save_model',
+    'load_model',
+    'empty_model',
+    'PROFILE_ENV',
+    'LayerProfiler',
+    'ModuleStats',
+    'profile_from_env',
+]
@@ -0,0 +1,279 @@
+"""
+Benchmark script for the GPT model module.
+
+checkpoint: compares worker cold start with a pickled ``torch.save`` checkpoint (build the
+model, ``torch.load``, ``load_state_dict``) against the memory-mapped flat
+checkpoint (``load_model``) for the 124M and 774M configurations. Every load
+runs in a fresh process; page caches are dropped first when permitted.
+
+profiler: step time with and without ``LayerProfiler`` hooks, and the
+per-layer report it produces.
+
+moe: a mixture-of-experts feed forward (8 experts, top-2) against a dense
+feed forward with the same active parameters, and against routing one
+token at a time, for 1 to 4096 tokens; plus FLOPs and parameters per model.
+
+Run from the repository root:
+    python -m src.modules.05_gpt_model.benchmark [checkpoint|profiler|moe|all]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+from typing import Callable, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+from .checkpoint import load_model, save_model
+from .gpt_model import GPTModel, count_parameters, estimate_flops_per_token
+from .model_config import get_config
+from .profiler import LayerProfiler
+
+_blocks = import_module("..04_transformer_blocks", __package__)
+
+SIZES = ["124M", "774M"]
+LOADERS = ["torch.load", "mmap"]
+
+
+def memory_stats() -> Dict[str, float]:
+    """Peak, anonymous and file-backed resident memory of this process in MB."""
+    stats = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmHWM", "RssAnon", "RssFile"):
+                stats[key] = int(value.split()[0]) / 1024
+    return stats
+
+
+def available_mb() -> float:
+    """Memory available to new processes in MB (Linux)."""
+    with open("/proc/meminfo", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) / 1024
+    return float("inf")
+
+
+def drop_page_cache() -> bool:
+    """Try to drop the OS page cache so loads start cold (needs root)."""
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w", encoding="utf-8") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def load_worker(loader: str, path: str, size: str) -> None:
+    """Load a checkpoint, run one forward pass and print a result row."""
+    start = time.perf_counter()
+    if loader == "torch.load":
+        model = GPTModel(get_config(size))
+        model.load_state_dict(torch.load(path))
+        model.eval()
+    else:
+        model = load_model(path)
+    loaded = time.perf_counter() - start
+
+    with torch.no_grad():
+        model(torch.tensor([[0]]))
+    first_token = time.perf_counter() - start
+
+    stats = memory_stats()
+    print(f"{size:>6} {loader:>11} {loaded:>9.2f} {first_token:>13.2f} "
+          f"{stats['VmHWM']:>10.0f} {stats['RssAnon']:>10.0f} {stats['RssFile']:>10.0f}")
+
+
+def benchmark_checkpoints() -> None:
+    """Cold start with torch.load vs the memory-mapped checkpoint."""
+    print("⏱️ Checkpoint Cold-Start Benchmark")
+    print("=" * 72)
+    print(f"{'size':>6} {'loader':>11} {'load (s)':>9} {'first fwd (s)':>13} "
+          f"{'peak (MB)':>10} {'anon (MB)':>10} {'file (MB)':>10}")
+
+    all_cold = True
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        for size in SIZES:
+            torch.manual_seed(0)
+            model = GPTModel(get_config(size))
+            weights_mb = count_parameters(model) * 4 / 1024 ** 2
+            paths = {"torch.load": os.path.join(tmp, f"gpt-{size}.pth"),
+                     "mmap": os.path.join(tmp, f"gpt-{size}.safetensors")}
+            torch.save(model.state_dict(), paths["torch.load"])
+            save_model(model, paths["mmap"])
+            del model
+
+            for loader in LOADERS:
+                # Building the model and unpickling holds two copies at peak
+                needed = weights_mb * (2 if loader == "torch.load" else 1)
+                if needed > available_mb() * 0.9:
+                    print(f"{size:>6} {loader:>11}   skipped: needs ~{needed:.0f} MB")
+                    continue
+                all_cold = drop_page_cache() and all_cold
+                subprocess.run([sys.executable, "-m", __spec__.name, "--worker", loader,
+                                "--path", paths[loader], "--size", size], check=True)
+            for path in paths.values():
+                os.remove(path)
+
+    print("\nPage cache dropped before each load: "
+          f"{'yes' if all_cold else 'no (not permitted)'}")
+
+
+def time_steps(model: GPTModel, idx: torch.Tensor, steps: int,
+               profiler: Optional[LayerProfiler] = None) -> float:
+    """Seconds per forward + backward pass."""
+    start = time.perf_counter()
+    for _ in range(steps):
+        model(idx).sum().backward()
+        if profiler is not None:
+            profiler.step()
+    return (time.perf_counter() - start) / steps
+
+
+def benchmark_profiler(steps: int, repeats: int) -> None:
+    """Overhead of the layer profiler on training steps, and its report."""
+    print("🔍 Layer Profiler Overhead (forward + backward, batch 8 x 128 tokens)")
+    print("=" * 72)
+    print(f"{'model':>22} {'modules':>8} {'off (ms)':>9} {'on (ms)':>9} {'overhead':>9}")
+
+    shapes = [("4 x 256 (small)", 256, 4, 4), ("12 x 768 (124M)", 768, 12, 12)]
+    for label, emb_dim, n_layers, n_heads in shapes:
+        cfg = get_config("124M", context_length=128, emb_dim=emb_dim, n_layers=n_layers,
+                         n_heads=n_heads, drop_rate=0.0)
+        torch.manual_seed(0)
+        model = GPTModel(cfg)
+        idx = torch.randint(0, cfg["vocab_size"], (8, 128))
+        time_steps(model, idx, 1)  # Warm up
+        profiler = LayerProfiler(model)
+        off, on = [], []
+        # Interleave to spread machine noise over both variants
+        for _ in range(repeats):
+            off.append(time_steps(model, idx, steps))
+            with profiler:
+                on.append(time_steps(model, idx, steps, profiler))
+        print(f"{label:>22} {len(profiler.modules):>8} {1000 * min(off):>9.1f} "
+              f"{1000 * min(on):>9.1f} {min(on) / min(off) - 1:>9.1%}")
+
+    print(f"\nPer-layer report of the 124M shape ({profiler.steps} steps):\n")
+    print(profiler.summary(min_share=0.02))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = profiler.export_chrome_trace(os.path.join(tmp, "trace.json"))
+        print(f"\nChrome trace of {min(profiler.steps, profiler.trace_steps)} steps: "
+              f"{os.path.getsize(path) / 1024:.0f} KB")
+
+
+MOE_CONFIG = {"n_experts": 8, "moe_top_k": 2, "moe_hidden_dim": 1536}
+MOE_TOKENS = [1, 16, 512, 4096]
+
+
+def per_token_moe(moe: nn.Module, x: torch.Tensor) -> torch.Tensor:
+    """Reference routing: every token through its top-k experts one at a time."""
+    x = x.reshape(-1, x.shape[-1])
+    gates, experts = torch.softmax(moe.router(x), dim=-1).topk(moe.top_k, dim=-1)
+    gates = gates / gates.sum(dim=-1, keepdim=True)
+    out = torch.zeros_like(x)
+    for t in range(x.shape[0]):
+        for gate, e in zip(gates[t], experts[t].tolist()):
+            out[t] += gate * moe.experts[e](x[t])
+    return out
+
+
+def best_ms(fn: Callable[[], None], repeats: int) -> float:
+    """Fastest of ``repeats`` calls in milliseconds, after a warmup call."""
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return 1000 * min(timings)
+
+
+def benchmark_moe(repeats: int) -> None:
+    """Mixture of experts vs a dense feed forward with the same active parameters."""
+    cfg = get_config("124M", drop_rate=0.0, **MOE_CONFIG)
+    dense_cfg = get_config("124M", drop_rate=0.0)
+    hidden = MOE_CONFIG["moe_top_k"] * MOE_CONFIG["moe_hidden_dim"]
+    torch.manual_seed(0)
+    moe = _blocks.MoEFeedForward(cfg)
+    dense = _blocks.FeedForward(cfg, hidden)
+
+    print(f"🧩 Mixture of Experts vs Dense Feed Forward (emb_dim {cfg['emb_dim']}, "
+          f"{torch.get_num_threads()} thread(s))")
+    print("=" * 96)
+    print(f"MoE: {cfg['n_experts']} experts x hidden {cfg['moe_hidden_dim']}, top-"
+          f"{cfg['moe_top_k']}, capacity factor {moe.capacity_factor} (training only); "
+          f"{count_parameters(moe) / 1e6:.1f}M parameters")
+    print(f"Dense: hidden {hidden} (= top-k x expert hidden), "
+          f"{count_parameters(dense) / 1e6:.1f}M parameters\n")
+    print(f"{'tokens':>6} | {'forward (ms)':^33} | {'forward + backward (ms)':^27} | "
+          f"{'per-token loop':>14}")
+    print(f"{'':>6} | {'dense':>9} {'MoE':>9} {'MoE/dense':>11} | {'dense':>7} {'MoE':>7} "
+          f"{'MoE/dense':>11} | {'(forward, ms)':>14}")
+
+    def train_step(layer: nn.Module, x: torch.Tensor) -> None:
+        out = layer(x)
+        loss = out.square().mean()
+        if hasattr(layer, "take_aux_loss"):
+            loss = loss + layer.take_aux_loss()
+        loss.backward()
+
+    for tokens in MOE_TOKENS:
+        x = torch.randn(1, tokens, cfg["emb_dim"])
+        moe.eval()
+        with torch.no_grad():
+            forward = [best_ms(lambda: layer(x), repeats) for layer in (dense, moe)]
+            loop = best_ms(lambda: per_token_moe(moe, x), 1 if tokens > 512 else repeats)
+        moe.train()
+        train = [best_ms(lambda: train_step(layer, x), repeats) for layer in (dense, moe)]
+        print(f"{tokens:>6} | {forward[0]:>9.2f} {forward[1]:>9.2f} "
+              f"{forward[1] / forward[0]:>10.2f}x | {train[0]:>7.1f} {train[1]:>7.1f} "
+              f"{train[1] / train[0]:>10.2f}x | {loop:>14.1f}")
+
+    print(f"\nWhole model (124M shape, {cfg['n_layers']} layers):")
+    print(f"{'':>28} {'parameters':>11} {'forward GFLOPs/token':>21}")
+    for label, model_cfg in [("dense", dense_cfg),
+                             (f"MoE {cfg['n_experts']} experts, top-{cfg['moe_top_k']}", cfg)]:
+        with torch.device("meta"):
+            params = count_parameters(GPTModel(model_cfg))
+        flops = estimate_flops_per_token(model_cfg, training=False)
+        print(f"{label:>28} {params / 1e6:>10.1f}M {flops / 1e9:>21.3f}")
+
+
+def main():
+    """Run the selected benchmark sections."""
+    parser = argparse.ArgumentParser(description="GPT model benchmarks")
+    parser.add_argument("section", nargs="?", default="all",
+                        choices=["checkpoint", "profiler", "moe", "all"])
+    parser.add_argument("--steps", type=int, default=3,
+                        help="Timed steps per repeat for the profiler section")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--worker", choices=LOADERS, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--size", choices=SIZES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        load_worker(args.worker, args.path, args.size)
+        return
+
+    if args.section in ("checkpoint", "all"):
+        benchmark_checkpoints()
+    if args.section in ("profiler", "all"):
+        if args.section == "all":
+            print()
+        benchmark_profiler(args.steps, args.repeats)
+    if args.section in ("moe", "all"):
+        if args.section == "all":
+            print()
+        benchmark_moe(max(args.repeats, 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Flat tensor checkpoints with zero-copy, memory-mapped loading.
+
+``torch.save`` checkpoints are pickles: loading reads the whole file into
+memory and unpickles it, and building the model first means the weights
+exist twice at peak. This module writes the safetensors layout instead:
+
+    [8-byte little-endian header size][JSON header][raw tensor bytes]
+
+The header records the dtype, shape and byte range of every tensor, so a
+reader can ``mmap`` the file and hand out tensors that point straight into
+the mapping. Nothing is read until a tensor is touched, single tensors can
+be loaded on their own, and large state dicts can be split across shards
+tied together by an index file.
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional
+
+import torch
+import torch.nn as nn
+
+from .gpt_model import GPTModel
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+    "F8_E4M3": torch.float8_e4m3fn,
+}
+_DTYPE_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+INDEX_SUFFIX = ".index.json"
+_ALIGNMENT = 8  # Bytes; the largest element size (F64, I64)
+
+
+def _write_file(tensors: Dict[str, torch.Tensor], path: str,
+                metadata: Optional[Dict[str, str]] = None) -> None:
+    """Write one safetensors file."""
+    header: Dict[str, Any] = {}
+    if metadata:
+        header["__metadata__"] = metadata
+
+    # Every tensor starts on an 8-byte boundary (zero padding in between),
+    # so mapped views are aligned for any dtype
+    offset, starts = 0, []
+    for name, tensor in tensors.items():
+        offset += -offset % _ALIGNMENT
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            "dtype": _DTYPE_NAMES[tensor.dtype],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + nbytes],
+        }
+        starts.append(offset)
+        offset += nbytes
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % _ALIGNMENT)  # Align tensor data
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        written = 0
+        for start, tensor in zip(starts, tensors.values()):
+            if tensor.numel():
+                f.write(b"\0" * (start - written))
+                f.write(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+                written = start + tensor.numel() * tensor.element_size()
+
+
+def save_state_dict(state_dict: Dict[str, torch.Tensor], path: str,
+                    metadata: Optional[Dict[str, str]] = None,
+                    max_shard_size: Optional[int] = None) -> str:
+    """
+    Save tensors in the flat safetensors layout, optionally sharded.
+
+    Args:
+        state_dict: Tensors to save
+        path: Destination, e.g. ``"checkpoints/model.safetensors"``
+        metadata: Optional string metadata stored in the header
+        max_shard_size: Maximum bytes per file; larger state dicts are split
+            into ``model-00001-of-0000N.safetensors`` files plus an index
+
+    Returns:
+        Path to pass to ``open_checkpoint`` (the file, or the index when sharded)
+    """
+    tensors = {name: t.detach().cpu().contiguous() for name, t in state_dict.items()}
+
+    shards: List[Dict[str, torch.Tensor]] = [{}]
+    shard_bytes = 0
+    for name, tensor in tensors.items():
+        nbytes = tensor.numel() * tensor.element_size()
+        if max_shard_size and shards[-1] and shard_bytes + nbytes > max_shard_size:
+            shards.append({})
+            shard_bytes = 0
+        shards[-1][name] = tensor
+        shard_bytes += nbytes
+
+    if len(shards) == 1:
+        _write_file(tensors, path, metadata)
+        return path
+
+    stem = path[:-len(".safetensors")] if path.endswith(".safetensors") else path
+    weight_map = {}
+    for i, shard in enumerate(shards, start=1):
+        shard_path = f"{stem}-{i:05d}-of-{len(shards):05d}.safetensors"
+        _write_file(shard, shard_path, metadata)
+        weight_map.update({name: os.path.basename(shard_path) for name in shard})
+
+    index_path = path + INDEX_SUFFIX
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata or {}, "weight_map": weight_map}, f, indent=2)
+    return index_path
+
+
+class SafeTensorsFile:
+    """
+    Memory-mapped view of a single safetensors file.
+
+    Tensors returned by ``get_tensor`` share memory with the mapping, which is
+    private (copy-on-write): pages are read from disk when first touched and
+    writes never reach the file.
+
+    Args:
+        path: File to open
+    """
+
+    def __init__(self, path: str):
+        """Map the file and parse its header."""
+        self.path = path
+        with open(path, "rb") as f:
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.metadata: Dict[str, str] = header.pop("__metadata__", {})
+        self._entries: Dict[str, Dict[str, Any]] = header
+        self._data_start = 8 + header_size
+
+    def keys(self) -> List[str]:
+        """Names of the tensors in the file."""
+        return list(self._entries)
+
+    def get_tensor(self, name: str) -> torch.Tensor:
+        """
+        Return a tensor backed directly by the memory map.
+
+        Args:
+            name: Tensor name
+
+        Returns:
+            Tensor view into the file (no copy)
+        """
+        entry = self._entries[name]
+        dtype = _DTYPES[entry["dtype"]]
+        start, end = entry["data_offsets"]
+        if end == start:
+            return torch.empty(entry["shape"], dtype=dtype)
+        tensor = torch.frombuffer(self._mmap, dtype=dtype,
+                                  count=(end - start) // dtype.itemsize,
+                                  offset=self._data_start + start)
+        return tensor.view(entry["shape"])
+
+
+class CheckpointReader:
+    """
+    Lazy reader over a single checkpoint file or a sharded checkpoint.
+
+    Shard files are only mapped when one of their tensors is requested.
+
+    Args:
+        path: A ``.safetensors`` file, or the index written for a sharded
+            checkpoint (the ``.index.json`` suffix may be omitted)
+
+    Example:
+        >>> reader = open_checkpoint("checkpoints/model.safetensors")
+        >>> wte = reader.get_tensor("tok_emb.weight")  # Only this tensor is read
+    """
+
+    def __init__(self, path: str):
+        """Read the index (if any) without mapping tensor data."""
+        if not os.path.exists(path) and os.path.exists(path + INDEX_SUFFIX):
+            path = path + INDEX_SUFFIX
+        self._files: Dict[str, SafeTensorsFile] = {}
+
+        if path.endswith(INDEX_SUFFIX):
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            directory = os.path.dirname(path)
+            self.metadata: Dict[str, str] = index.get("metadata", {})
+            self._weight_map = {name: os.path.join(directory, filename)
+                                for name, filename in index["weight_map"].items()}
+        else:
+            single = SafeTensorsFile(path)
+            self._files[path] = single
+            self.metadata = single.metadata
+            self._weight_map = {name: path for name in single.keys()}
+
+    def _file(self, path: str) -> SafeTensorsFile:
+        if path not in self._files:
+            self._files[path] = SafeTensorsFile(path)
+        return self._files[path]
+
+    def keys(self) -> List[str]:
+        """Names of all tensors in the checkpoint."""
+        return list(self._weight_map)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._weight_map
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._weight_map)
+
+    def get_tensor(self, name: str) -> torch.Tensor:
+        """
+        Load one tensor (zero-copy).
+
+        Args:
+            name: Tensor name
+
+        Returns:
+            Tensor backed by the memory-mapped file
+        """
+        return self._file(self._weight_map[name]).get_tensor(name)
+
+    def state_dict(self) -> Dict[str, torch.Tensor]:
+        """Every tensor of the checkpoint as memory-mapped views."""
+        return {name: self.get_tensor(name) for name in self._weight_map}
+
+
+def open_checkpoint(path: str) -> CheckpointReader:
+    """
+    Open a checkpoint for lazy, zero-copy reading.
+
+    Args:
+        path: Checkpoint file or sharded-checkpoint index
+
+    Returns:
+        CheckpointReader for the checkpoint
+    """
+    return CheckpointReader(path)
+
+
+def save_model(model: nn.Module, path: str,
+               max_shard_size: Optional[int] = None) -> str:
+    """
+    Save a ``GPTModel`` together with its configuration.
+
+    Args:
+        model: Model with a ``cfg`` attribute
+        path: Destination, e.g. ``"checkpoints/gpt-124M.safetensors"``
+        max_shard_size: Optional maximum bytes per shard file
+
+    Returns:
+        Path to pass to ``load_model``
+    """
+    metadata = {"format": "pt", "cfg": json.dumps(model.cfg)}
+    return save_state_dict(model.state_dict(), path, metadata, max_shard_size)
+
+
+_INIT_FUNCTIONS = ["uniform_", "normal_", "trunc_normal_", "kaiming_uniform_",
+                   "kaiming_normal_", "xavier_uniform_", "xavier_normal_",
+                   "constant_", "zeros_", "ones_"]
+
+
+@contextlib.contextmanager
+def _skip_init():
+    """Turn ``torch.nn.init`` functions into no-ops while building a model."""
+    originals = {name: getattr(nn.init, name) for name in _INIT_FUNCTIONS}
+    try:
+        for name in _INIT_FUNCTIONS:
+            setattr(nn.init, name, lambda tensor, *args, **kwargs: tensor)
+        yield
+    finally:
+        for name, fn in originals.items():
+            setattr(nn.init, name, fn)
+
+
+def empty_model(cfg: Dict[str, Any]) -> GPTModel:
+    """
+    Build a ``GPTModel`` skeleton on the meta device without initializing it.
+
+    Random initialization is wasted work when weights are loaded right after
+    (and on the meta device it still goes through slow dispatch paths).
+
+    Args:
+        cfg: Model configuration
+
+    Returns:
+        GPTModel whose parameters live on the meta device
+    """
+    with _skip_init(), torch.device("meta"):
+        return GPTModel(cfg)
+
+
+def load_model(path: str) -> GPTModel:
+    """
+    Build a ``GPTModel`` whose weights point into the memory-mapped checkpoint.
+
+    The model is built with ``empty_model``, so no weights are allocated or
+    initialized; the parameters are then assigned the mapped tensors
+    directly. Peak memory stays close to one copy of the weights, and only
+    the pages actually used are read from disk.
+
+    Args:
+        path: Checkpoint written by ``save_model``
+
+    Returns:
+        GPTModel in evaluation mode
+    """
+    reader = open_checkpoint(path)
+    model = empty_model(json.loads(reader.metadata["cfg"]))
+    model.load_state_dict(reader.state_dict(), assign=True)
+    return model.eval()
@@ -0,0 +1,154 @@
+"""
+GPT model architecture.
+
+This module assembles token and positional embeddings, a stack of
+transformer blocks, a final layer norm and a linear output head into the
+GPT-2 style language model.
+"""
+
+from importlib import import_module
+from typing import Any, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+_blocks = import_module("..04_transformer_blocks", __package__)
+LayerNorm = _blocks.LayerNorm
+TransformerBlock = _blocks.TransformerBlock
+moe_config = _blocks.moe_config
+
+
+class GPTModel(nn.Module):
+    """
+    GPT-2 style decoder-only language model.
+
+    Args:
+        cfg: Model configuration (see ``model_config.py``)
+
+    Example:
+        >>> model = GPTModel(GPT_CONFIG_124M)
+        >>> logits = model(torch.tensor([[6109, 3626, 6100, 345]]))
+        >>> logits.shape  # (batch, num_tokens, vocab_size)
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        """Initialize embeddings, transformer blocks and output head."""
+        super().__init__()
+        self.cfg = cfg
+        self.tok_emb = nn.Embedding(cfg["vocab_size"], cfg["emb_dim"])
+        self.pos_emb = nn.Embedding(cfg["context_length"], cfg["emb_dim"])
+        self.drop_emb = nn.Dropout(cfg["drop_rate"])
+
+        self.trf_blocks = nn.Sequential(
+            *[TransformerBlock(cfg) for _ in range(cfg["n_layers"])]
+        )
+
+        self.final_norm = LayerNorm(cfg["emb_dim"])
+        self.out_head = nn.Linear(cfg["emb_dim"], cfg["vocab_size"], bias=False)
+
+    def forward(self, in_idx: torch.Tensor, kv_cache: Optional[Any] = None,
+                position_ids: Optional[torch.Tensor] = None,
+                document_ids: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Compute next-token logits.
+
+        Args:
+            in_idx: Token IDs of shape (batch, num_tokens)
+            kv_cache: Optional cache with ``seq_len`` and one entry per block in
+                ``layers`` (see ``07_inference/kv_cache.py``); ``in_idx`` then
+                holds only the tokens after the cached ones
+            position_ids: Optional positions of shape (batch, num_tokens), e.g.
+                restarting at 0 for every document packed into a row (defaults
+                to consecutive positions)
+            document_ids: Optional document index of every token, shape
+                (batch, num_tokens); tokens then attend only within their own
+                document
+
+        Returns:
+            Logits of shape (batch, num_tokens, vocab_size)
+        """
+        _, seq_len = in_idx.shape
+        start = kv_cache.seq_len if kv_cache is not None else 0
+        if position_ids is None:
+            position_ids = torch.arange(start, start + seq_len, device=in_idx.device)
+        tok_embeds = self.tok_emb(in_idx)
+        pos_embeds = self.pos_emb(position_ids)
+        x = self.drop_emb(tok_embeds + pos_embeds)
+        attn_mask = None
+        if document_ids is not None:
+            # Block-diagonal: True where query and key belong to different documents
+            attn_mask = document_ids.unsqueeze(2) != document_ids.unsqueeze(1)
+        if kv_cache is None and attn_mask is None:
+            x = self.trf_blocks(x)
+        else:
+            layer_caches = (kv_cache.layers if kv_cache is not None
+                            else [None] * len(self.trf_blocks))
+            for block, layer_cache in zip(self.trf_blocks, layer_caches):
+                x = block(x, layer_cache, attn_mask)
+        x = self.final_norm(x)
+        return self.out_head(x)
+
+    def aux_loss(self) -> Optional[torch.Tensor]:
+        """
+        Load-balancing loss of the mixture-of-experts blocks.
+
+        Call once after every forward pass that trains: the blocks hand
+        over their losses (and the router graphs behind them) and clear them.
+
+        Returns:
+            Sum over the blocks for the last forward pass (already weighted
+            by ``moe_aux_loss_weight``), or None for a dense model or a
+            forward pass without gradients
+        """
+        losses = [block.ff.take_aux_loss() for block in self.trf_blocks
+                  if hasattr(block.ff, "take_aux_loss")]
+        losses = [loss for loss in losses if loss is not None]
+        return torch.stack(losses).sum() if losses else None
+
+
+def count_parameters(model: nn.Module) -> int:
+    """
+    Count the parameters of a model.
+
+    Args:
+        model: Model to inspect
+
+    Returns:
+        Total number of parameters
+    """
+    return sum(p.numel() for p in model.parameters())
+
+
+def estimate_flops_per_token(cfg: Dict[str, Any], seq_len: Optional[int] = None,
+                             training: bool = True) -> int:
+    """
+    Estimate the floating point operations spent on one token.
+
+    Counts the matmuls only (2 FLOPs per multiply-add): the attention and
+    feed forward projections and the output head, plus the attention score
+    and weighted-sum products over ``seq_len`` positions. A backward pass
+    costs about twice the forward pass, so training is 3x forward. With
+    ``n_experts`` set, a token pays for the router and its ``moe_top_k``
+    experts only (no capacity dropping).
+
+    Args:
+        cfg: Model configuration
+        seq_len: Sequence length (defaults to the context length)
+        training: Include the backward pass
+
+    Returns:
+        FLOPs per token
+    """
+    seq_len = seq_len or cfg["context_length"]
+    emb_dim, n_layers = cfg["emb_dim"], cfg["n_layers"]
+    moe = moe_config(cfg)
+    if moe["n_experts"]:
+        # Router + the two layers of each active expert
+        ff_params = (moe["n_experts"] * emb_dim
+                     + moe["moe_top_k"] * 2 * emb_dim * moe["moe_hidden_dim"])
+    else:
+        ff_params = 8 * emb_dim ** 2  # 4x hidden
+    # Q, K, V and output projections (4 d^2) + feed forward
+    matmul_params = n_layers * (4 * emb_dim ** 2 + ff_params) + emb_dim * cfg["vocab_size"]
+    forward = 2 * matmul_params + 4 * n_layers * emb_dim * seq_len
+    return 3 * forward if training else forward
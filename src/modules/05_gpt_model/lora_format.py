@@ -0,0 +1,48 @@
+"""
+LoRA adapter names and file format.
+
+The layer names LoRA adapters target and the metadata of adapter files are
+shared by fine-tuning (``08_fine_tuning/lora.py``, which trains and saves
+adapters) and inference (``07_inference/multi_lora.py``, which serves them).
+They live here, next to the checkpoint format, so that serving adapters does
+not import the training stack.
+"""
+
+import fnmatch
+import json
+from typing import Any, Dict, Sequence
+
+from .checkpoint import open_checkpoint
+
+# Suffixes of the linear layers in GPTModel's transformer blocks ("*" matches
+# any part of a name); mixture-of-experts blocks have EXPERT_TARGETS in place
+# of MLP_TARGETS
+ATTENTION_TARGETS = ("att.W_query", "att.W_key", "att.W_value", "att.out_proj")
+MLP_TARGETS = ("ff.layers.0", "ff.layers.2")
+EXPERT_TARGETS = ("ff.experts.*.layers.0", "ff.experts.*.layers.2")
+DEFAULT_TARGETS = ATTENTION_TARGETS
+ALL_TARGETS = ATTENTION_TARGETS + MLP_TARGETS
+
+
+def matches_target(name: str, targets: Sequence[str]) -> bool:
+    """Whether module ``name`` ends with one of the ``targets`` suffixes."""
+    return any(fnmatch.fnmatchcase(name, t) or fnmatch.fnmatchcase(name, "*." + t)
+               for t in targets)
+
+
+def lora_metadata(lora_config: Dict[str, Any]) -> Dict[str, str]:
+    """Header metadata of an adapter file trained with ``lora_config``."""
+    return {"format": "lora", "lora_config": json.dumps(lora_config)}
+
+
+def load_lora_config(path: str) -> Dict[str, Any]:
+    """
+    Read the settings an adapter file was trained with.
+
+    Args:
+        path: File written by ``save_lora``
+
+    Returns:
+        Dict with ``rank``, ``alpha``, ``dropout`` and ``targets``
+    """
+    return json.loads(open_checkpoint(path).metadata["lora_config"])
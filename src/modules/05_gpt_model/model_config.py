@@ -0,0 +1,52 @@
+"""
+Model configurations for GPT-2 sized models.
+
+Configurations are plain dictionaries (following the book), so they can be
+printed, saved alongside checkpoints and tweaked with ``get_config``.
+
+Setting ``n_experts`` (and optionally the other ``moe_*`` keys, see
+``MOE_DEFAULTS`` in Module 4) replaces every block's feed forward with a
+sparse mixture of experts:
+
+    >>> cfg = get_config("124M", n_experts=8, moe_top_k=2, moe_hidden_dim=1536)
+    >>> estimate_flops_per_token(cfg, training=False)  # Active experts only
+"""
+
+from typing import Any, Dict
+
+GPT_CONFIG_124M: Dict[str, Any] = {
+    "vocab_size": 50257,     # Vocabulary size
+    "context_length": 1024,  # Context length
+    "emb_dim": 768,          # Embedding dimension
+    "n_heads": 12,           # Number of attention heads
+    "n_layers": 12,          # Number of layers
+    "drop_rate": 0.1,        # Dropout rate
+    "qkv_bias": False,       # Query-Key-Value bias
+}
+
+MODEL_CONFIGS: Dict[str, Dict[str, Any]] = {
+    "124M": {"emb_dim": 768, "n_layers": 12, "n_heads": 12},
+    "355M": {"emb_dim": 1024, "n_layers": 24, "n_heads": 16},
+    "774M": {"emb_dim": 1280, "n_layers": 36, "n_heads": 20},
+    "1558M": {"emb_dim": 1600, "n_layers": 48, "n_heads": 25},
+}
+
+
+def get_config(name: str = "124M", **overrides: Any) -> Dict[str, Any]:
+    """
+    Build a model configuration by size name.
+
+    Args:
+        name: One of the keys of ``MODEL_CONFIGS``
+        **overrides: Values replacing entries of the configuration
+
+    Returns:
+        New configuration dictionary
+    """
+    if name not in MODEL_CONFIGS:
+        raise ValueError(f"Unknown model size '{name}'. "
+                         f"Choose from: {', '.join(MODEL_CONFIGS)}")
+    cfg = dict(GPT_CONFIG_124M)
+    cfg.update(MODEL_CONFIGS[name])
+    cfg.update(overrides)
+    return cfg
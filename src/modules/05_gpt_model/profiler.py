@@ -0,0 +1,476 @@
+"""
+Per-layer profiling of GPT models.
+
+``LayerProfiler`` attaches forward and backward hooks to the modules of a
+model (by default down to the attention, feed forward and norm layers of
+every block) and records, for each module:
+
+- wall time of the forward and the backward pass
+- matmul FLOPs, counted exactly from the shapes that flow through the
+  ``nn.Linear`` layers and the attention score products
+- bytes of the activations it outputs
+- memory in use when it returns (allocated CUDA memory, or the process's
+  resident set on the CPU), as the maximum over all calls
+
+Statistics accumulate in flat per-module counters, so profiling thousands of
+steps costs the same memory as one; individual events are only kept for the
+first ``trace_steps`` steps and exported as a Chrome trace (open it at
+https://ui.perfetto.dev or chrome://tracing).
+
+Setting the ``BUILD_LLM_PROFILE`` environment variable to a file path turns
+profiling on in ``Trainer`` (Module 6) and ``InferenceEngine`` (Module 7):
+the trace is written to that path and the summary table next to it when the
+process exits.
+
+    BUILD_LLM_PROFILE=trace.json python -m src.modules.06_training.train --steps 20
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+import weakref
+from dataclasses import dataclass
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+MultiHeadAttention = import_module("..03_attention", __package__).MultiHeadAttention
+
+PROFILE_ENV = "BUILD_LLM_PROFILE"
+ROOT_NAME = "model"
+
+# (module index, phase, start ns, duration ns, thread index, flops)
+TraceEvent = Tuple[int, str, int, int, int, int]
+
+# Model -> its attached profiler, so that a model is instrumented only once
+_attached: "weakref.WeakKeyDictionary[nn.Module, LayerProfiler]" = weakref.WeakKeyDictionary()
+
+# Modules whose inputs need no gradient (the model, the embeddings) get their
+# full backward hook early, and torch warns about it on every backward pass.
+# One ignore-filter entry is shared by all attached profilers: added by the
+# first attach, removed (that entry only) by the last detach.
+_HOOK_WARNING = "Full backward hook is firing"
+_filter_lock = threading.Lock()
+_filter_users = 0
+_filter_entry: Optional[tuple] = None
+
+
+def _acquire_warning_filter() -> None:
+    global _filter_users, _filter_entry
+    with _filter_lock:
+        _filter_users += 1
+        if _filter_users == 1:
+            count = len(warnings.filters)
+            warnings.filterwarnings("ignore", message=_HOOK_WARNING)
+            # An identical filter set by the caller is moved, not added: leave it theirs
+            _filter_entry = warnings.filters[0] if len(warnings.filters) > count else None
+
+
+def _release_warning_filter() -> None:
+    global _filter_users, _filter_entry
+    with _filter_lock:
+        _filter_users -= 1
+        if _filter_users == 0 and _filter_entry is not None:
+            # An "ignore" entry leaves nothing in the warning registries
+            # behind, so removing it is enough to bring the warning back
+            if _filter_entry in warnings.filters:
+                warnings.filters.remove(_filter_entry)
+            _filter_entry = None
+
+
+@dataclass
+class ModuleStats:
+    """
+    Statistics of one module, summed over all profiled steps.
+
+    Attributes:
+        name: Qualified module name (``"model"`` for the whole model)
+        calls: Forward calls
+        forward_time: Forward wall time in seconds
+        backward_time: Backward wall time in seconds
+        forward_flops: Matmul FLOPs of the forward passes
+        backward_flops: Matmul FLOPs of the backward passes (2x forward)
+        activation_bytes: Bytes of the tensors the module returned
+        peak_memory: Largest memory in use (bytes) seen when the module returned
+    """
+
+    name: str
+    calls: int = 0
+    forward_time: float = 0.0
+    backward_time: float = 0.0
+    forward_flops: int = 0
+    backward_flops: int = 0
+    activation_bytes: int = 0
+    peak_memory: int = 0
+
+    @property
+    def total_time(self) -> float:
+        return self.forward_time + self.backward_time
+
+    @property
+    def flops_per_sec(self) -> float:
+        """Achieved FLOP rate over forward and backward."""
+        time_ = self.total_time
+        return (self.forward_flops + self.backward_flops) / time_ if time_ > 0 else 0.0
+
+
+def _tensor_bytes(output: Any) -> int:
+    if torch.is_tensor(output):
+        return output.nbytes
+    if isinstance(output, (tuple, list)):
+        return sum(_tensor_bytes(o) for o in output)
+    return 0
+
+
+class LayerProfiler:
+    """
+    Hook-based per-module profiler for a model.
+
+    Call ``step()`` after every training step or generated token, so the
+    summary can report per-step averages and the trace can stop recording.
+
+    Args:
+        model: Model to instrument (hooks go on the model itself, so wrap it
+            in ``DistributedDataParallel`` afterwards if at all)
+        depth: Deepest module name level to instrument, e.g. 3 reaches
+            ``trf_blocks.0.att``; the whole model is always included
+        trace_steps: Steps whose individual events are kept for the trace
+        track_memory: Sample the memory in use at the end of every module
+
+    Example:
+        >>> with LayerProfiler(model) as profiler:
+        ...     for batch in batches:
+        ...         loss = calc_loss_batch(*batch, model)
+        ...         loss.backward()
+        ...         profiler.step()
+        >>> print(profiler.summary())
+        >>> profiler.export_chrome_trace("trace.json")
+
+    Hooks break ``torch.compile`` graphs, so profile uncompiled models.
+    """
+
+    def __init__(self, model: nn.Module, depth: int = 3, trace_steps: int = 20,
+                 track_memory: bool = True):
+        """Select the modules to instrument; ``attach`` adds the hooks."""
+        self.model = model
+        self.trace_steps = trace_steps
+        self.track_memory = track_memory
+        self.modules: List[Tuple[str, nn.Module]] = [(ROOT_NAME, model)] + [
+            (name, module) for name, module in model.named_modules()
+            if name and name.count(".") < depth]
+        self.output_path: Optional[str] = None
+        self._handles: List[Any] = []
+        self._statm: Optional[int] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        n = len(self.modules)
+        self.steps = 0
+        self.calls = [0] * n
+        self.forward_ns = [0] * n
+        self.backward_ns = [0] * n
+        self.forward_flops = [0] * n
+        self.backward_flops = [0] * n
+        self.activation_bytes = [0] * n
+        self.peak_memory = [0] * n
+        self.events: List[TraceEvent] = []
+        self.step_events: List[Tuple[int, int]] = []  # (start ns, duration ns)
+        self._origin = self._step_start = time.perf_counter_ns()
+        self._flop_counter = 0
+        self._forward_open: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+        self._last_flops = [0] * n
+        self._backward_open: Dict[int, int] = {}
+        self._pending: List[int] = []
+        self._last_backward = 0
+        self._threads: Dict[int, int] = {}
+
+    # Hooks
+
+    def attach(self) -> "LayerProfiler":
+        """Register the hooks (idempotent)."""
+        if self._handles:
+            return self
+        if self.track_memory and sys.platform.startswith("linux"):
+            self._statm = os.open("/proc/self/statm", os.O_RDONLY)
+        # Modules whose inputs need no gradient (the model, the embeddings)
+        # get their backward hook early; _close_backward ends their span
+        # instead. torch's warning about it is silenced while any profiler
+        # is attached.
+        _acquire_warning_filter()
+        # FLOP counters first, so an instrumented nn.Linear sees its own FLOPs
+        for module in self.model.modules():
+            if isinstance(module, nn.Linear):
+                self._handles.append(module.register_forward_hook(self._count_linear))
+            elif isinstance(module, MultiHeadAttention):
+                self._handles.append(module.register_forward_hook(self._count_attention,
+                                                                  with_kwargs=True))
+        for index, (_, module) in enumerate(self.modules):
+            self._handles += [
+                module.register_forward_pre_hook(self._forward_pre_hook(index)),
+                module.register_forward_hook(self._forward_hook(index)),
+                module.register_full_backward_pre_hook(self._backward_pre_hook(index)),
+                module.register_full_backward_hook(self._backward_hook(index)),
+            ]
+        for p in self.model.parameters():
+            if p.requires_grad:
+                self._handles.append(p.register_post_accumulate_grad_hook(self._grad_done))
+        _attached[self.model] = self
+        return self
+
+    def detach(self) -> None:
+        """
+        Remove all hooks; the recorded statistics are kept.
+
+        With an ``output_path`` (see ``profile_from_env``) the trace and the
+        summary are saved there.
+        """
+        if not self._handles:
+            return
+        self._close_backward()
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        _release_warning_filter()
+        if _attached.get(self.model) is self:
+            del _attached[self.model]
+        if self._statm is not None:
+            os.close(self._statm)
+            self._statm = None
+        if self.output_path:
+            trace_path, summary_path = self.save(self.output_path)
+            print(f"{self.summary()}\nProfile written to {trace_path} and {summary_path}",
+                  file=sys.stderr)
+            atexit.unregister(self.detach)
+
+    def __enter__(self) -> "LayerProfiler":
+        return self.attach()
+
+    def __exit__(self, *exc) -> None:
+        self.detach()
+
+    def _tracing(self) -> bool:
+        return self.steps < self.trace_steps
+
+    def _thread(self) -> int:
+        ident = threading.get_ident()
+        if ident not in self._threads:
+            self._threads[ident] = len(self._threads)
+        return self._threads[ident]
+
+    def _memory(self, tensor: Any) -> int:
+        if torch.is_tensor(tensor) and tensor.is_cuda:
+            return torch.cuda.memory_allocated(tensor.device)
+        if self._statm is not None:
+            resident_pages = int(os.pread(self._statm, 64, 0).split()[1])
+            return resident_pages * os.sysconf("SC_PAGE_SIZE")
+        return 0
+
+    def _forward_pre_hook(self, index: int) -> Callable:
+        def hook(module, args):
+            if index == 0:
+                self._close_backward()  # Of the previous micro-batch
+            self._forward_open[index].append((time.perf_counter_ns(), self._flop_counter))
+        return hook
+
+    def _forward_hook(self, index: int) -> Callable:
+        def hook(module, args, output):
+            end = time.perf_counter_ns()
+            start, flops_before = self._forward_open[index].pop()
+            flops = self._flop_counter - flops_before
+            self.calls[index] += 1
+            self.forward_ns[index] += end - start
+            self.forward_flops[index] += flops
+            self._last_flops[index] = flops
+            self.activation_bytes[index] += _tensor_bytes(output)
+            if self.track_memory:
+                self.peak_memory[index] = max(self.peak_memory[index],
+                                              self._memory(output))
+            if self._tracing():
+                self.events.append((index, "forward", start, end - start,
+                                    self._thread(), flops))
+        return hook
+
+    def _backward_pre_hook(self, index: int) -> Callable:
+        def hook(module, grad_output):
+            self._backward_open[index] = time.perf_counter_ns()
+        return hook
+
+    def _backward_hook(self, index: int) -> Callable:
+        def hook(module, grad_input, grad_output):
+            if all(g is None for g in grad_input):
+                # Fired before the module's own backward ran; it ends with
+                # the last gradient of the pass
+                self._pending.append(index)
+            else:
+                self._record_backward(index, time.perf_counter_ns())
+        return hook
+
+    def _grad_done(self, param: torch.Tensor) -> None:
+        self._last_backward = time.perf_counter_ns()
+
+    def _record_backward(self, index: int, end: int) -> None:
+        start = self._backward_open.pop(index, None)
+        if start is None:
+            return
+        flops = 2 * self._last_flops[index]
+        self.backward_ns[index] += end - start
+        self.backward_flops[index] += flops
+        self._last_backward = max(self._last_backward, end)
+        if self._tracing():
+            self.events.append((index, "backward", start, end - start, self._thread(), flops))
+
+    def _close_backward(self) -> None:
+        """Close the spans left open by modules that fired their hook early."""
+        end = self._last_backward
+        for index in self._pending:
+            self._record_backward(index, max(end, self._backward_open.get(index, end)))
+        self._pending = []
+
+    def _count_linear(self, module: nn.Linear, args, output) -> None:
+        self._flop_counter += 2 * args[0].numel() * module.out_features
+
+    def _count_attention(self, module: MultiHeadAttention, args, kwargs, output) -> None:
+        # Scores (Q K^T) and weighted values, both over every cached key
+        x = args[0]
+        kv_cache = args[1] if len(args) > 1 else kwargs.get("kv_cache")
+        num_keys = kv_cache.length if kv_cache is not None else x.shape[1]
+        self._flop_counter += 4 * x.shape[0] * x.shape[1] * num_keys * module.d_out
+
+    # Results
+
+    def step(self) -> None:
+        """Mark the end of a training step (or generated token)."""
+        self._close_backward()
+        now = time.perf_counter_ns()
+        if self._tracing():
+            self.step_events.append((self._step_start, now - self._step_start))
+        self._step_start = now
+        self.steps += 1
+
+    def stats(self) -> List[ModuleStats]:
+        """Statistics of every instrumented module, in model order."""
+        self._close_backward()
+        return [ModuleStats(name, self.calls[i], self.forward_ns[i] / 1e9,
+                            self.backward_ns[i] / 1e9, self.forward_flops[i],
+                            self.backward_flops[i], self.activation_bytes[i],
+                            self.peak_memory[i])
+                for i, (name, _) in enumerate(self.modules)]
+
+    def summary(self, min_share: float = 0.0) -> str:
+        """
+        Table of per-step averages.
+
+        Args:
+            min_share: Hide modules below this share of the model's time
+
+        Returns:
+            Text table with calls, forward/backward milliseconds, share of the
+            model's time, GFLOP, achieved GFLOP/s, activation and memory MB
+        """
+        stats = self.stats()
+        steps = max(self.steps, 1)
+        root_time = stats[0].total_time or 1.0
+        width = max(len(self._label(s.name)) for s in stats)
+        lines = [f"{'module':<{width}} {'calls':>6} {'fwd ms':>8} {'bwd ms':>8} "
+                 f"{'time':>6} {'GFLOP':>8} {'GFLOP/s':>8} {'act MB':>8} {'mem MB':>8}"]
+        for s in stats:
+            share = s.total_time / root_time
+            if share < min_share and s.name != ROOT_NAME:
+                continue
+            lines.append(
+                f"{self._label(s.name):<{width}} {s.calls / steps:>6.1f} "
+                f"{1000 * s.forward_time / steps:>8.2f} {1000 * s.backward_time / steps:>8.2f} "
+                f"{share:>6.1%} {(s.forward_flops + s.backward_flops) / steps / 1e9:>8.3f} "
+                f"{s.flops_per_sec / 1e9:>8.1f} {s.activation_bytes / steps / 2 ** 20:>8.1f} "
+                f"{s.peak_memory / 2 ** 20:>8.0f}")
+        lines.append(f"({self.steps} steps; times and sizes per step)")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _label(name: str) -> str:
+        depth = 0 if name == ROOT_NAME else name.count(".") + 1
+        return "  " * depth + (name.rsplit(".", 1)[-1] if depth > 2 else name)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Recorded events in the Chrome trace event format."""
+        self._close_backward()
+        pid = os.getpid()
+        rank = torch.distributed.get_rank() if torch.distributed.is_initialized() else 0
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid,
+             "args": {"name": f"rank {rank}"}},
+        ] + [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+              "args": {"name": "main" if tid == 0 else f"thread {tid}"}}
+             for tid in self._threads.values()]
+        for number, (start, duration) in enumerate(self.step_events):
+            events.append({"name": f"step {number}", "cat": "step", "ph": "X", "pid": pid,
+                           "tid": 0, "ts": (start - self._origin) / 1000,
+                           "dur": duration / 1000})
+        for index, phase, start, duration, tid, flops in self.events:
+            events.append({"name": self.modules[index][0], "cat": phase, "ph": "X",
+                           "pid": pid, "tid": tid, "ts": (start - self._origin) / 1000,
+                           "dur": duration / 1000, "args": {"flops": flops}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> str:
+        """
+        Write the trace as JSON.
+
+        Args:
+            path: Destination file
+
+        Returns:
+            ``path``
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def save(self, path: str) -> Tuple[str, str]:
+        """
+        Write the Chrome trace to ``path`` and the summary next to it (``.txt``).
+
+        Returns:
+            Paths of the trace and the summary
+        """
+        summary_path = os.path.splitext(path)[0] + ".txt"
+        self.export_chrome_trace(path)
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(self.summary() + "\n")
+        return path, summary_path
+
+
+def profile_from_env(model: nn.Module) -> Optional[LayerProfiler]:
+    """
+    Attach a profiler when ``BUILD_LLM_PROFILE`` names an output file.
+
+    The trace and summary are saved when the profiler is detached, or at the
+    latest when the process exits; ranks other than 0 of a process group add
+    ``.rank<N>`` to the file name. A model that already has a profiler
+    attached (e.g. a ``Trainer``'s model handed to an ``InferenceEngine``)
+    is left to that profiler.
+
+    Args:
+        model: Model to instrument
+
+    Returns:
+        The attached profiler, or None when profiling is off or the model is
+        already profiled
+    """
+    path = os.environ.get(PROFILE_ENV)
+    if not path or model in _attached:
+        return None
+    if torch.distributed.is_initialized() and torch.distributed.get_rank() > 0:
+        stem, ext = os.path.splitext(path)
+        path = f"{stem}.rank{torch.distributed.get_rank()}{ext or '.json'}"
+    profiler = LayerProfiler(model).attach()
+    profiler.output_path = path
+    atexit.register(profiler.detach)
+    return profiler
@@ -0,0 +1,283 @@
+"""
+Simple test script for the GPT model.
+
+This script tests the model architecture:
+1. Output shapes for a small configuration
+2. Parameter count of the 124M configuration
+3. Causality: future tokens do not change earlier logits
+4. Flat checkpoints round-trip, shard, and load without copies
+5. The layer profiler counts FLOPs exactly, times forward and backward,
+   exports a Chrome trace and leaves no hooks or warning filters behind;
+   profiling from the environment attaches to a model only once
+6. Mixture-of-experts blocks match a per-token reference, respect the
+   expert capacity, train the router through the load-balancing loss (which
+   no layer keeps attached to the graph) and cost the FLOPs of the active
+   experts only
+
+Run from the repository root:
+    python -m src.modules.05_gpt_model.test
+"""
+
+import copy
+import itertools
+import json
+import os
+import tempfile
+import warnings
+
+import torch
+
+from .checkpoint import load_model, open_checkpoint, save_model, save_state_dict
+from .gpt_model import GPTModel, count_parameters, estimate_flops_per_token
+from .model_config import GPT_CONFIG_124M, get_config
+from .profiler import PROFILE_ENV, LayerProfiler, profile_from_env
+
+
+def test_output_shape():
+    """Test logits shape for a small model."""
+    print("=== Testing Output Shape ===")
+
+    cfg = get_config("124M", vocab_size=100, context_length=32, emb_dim=64,
+                     n_heads=4, n_layers=2)
+    model = GPTModel(cfg)
+    logits = model(torch.randint(0, 100, (2, 10)))
+
+    assert logits.shape == (2, 10, 100), f"Unexpected shape: {logits.shape}"
+    print(f"Logits shape: {tuple(logits.shape)}")
+
+
+def test_parameter_count():
+    """Test the parameter count of GPT-2 small (without weight tying)."""
+    print("\n=== Testing Parameter Count ===")
+
+    model = GPTModel(GPT_CONFIG_124M)
+    total = count_parameters(model)
+
+    assert total == 163_009_536, f"Unexpected parameter count: {total:,}"
+    print(f"Total parameters: {total:,}")
+
+
+def test_causality():
+    """Test that changing a later token leaves earlier logits untouched."""
+    print("\n=== Testing Causality ===")
+
+    cfg = get_config("124M", vocab_size=50, context_length=16, emb_dim=32,
+                     n_heads=2, n_layers=2, drop_rate=0.0)
+    torch.manual_seed(0)
+    model = GPTModel(cfg).eval()
+
+    idx = torch.randint(0, 50, (1, 8))
+    changed = idx.clone()
+    changed[0, -1] = (idx[0, -1] + 1) % 50
+
+    with torch.no_grad():
+        assert torch.allclose(model(idx)[:, :-1], model(changed)[:, :-1])
+    print("Earlier positions are unaffected by later tokens")
+
+
+def test_checkpoint_roundtrip():
+    """Test saving and memory-mapped loading, single file and sharded."""
+    print("\n=== Testing Checkpoints ===")
+
+    cfg = get_config("124M", vocab_size=100, context_length=32, emb_dim=64,
+                     n_heads=4, n_layers=2, drop_rate=0.0)
+    torch.manual_seed(0)
+    model = GPTModel(cfg).eval()
+    idx = torch.randint(0, 100, (2, 8))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single = save_model(model, os.path.join(tmp, "single.safetensors"))
+        sharded = save_model(model, os.path.join(tmp, "sharded.safetensors"),
+                             max_shard_size=64 * 1024)
+        shard_files = [f for f in os.listdir(tmp) if f.startswith("sharded-")]
+        assert sharded.endswith(".index.json") and len(shard_files) > 1
+
+        for path in [single, sharded]:
+            loaded = load_model(path)
+            with torch.no_grad():
+                assert torch.equal(model(idx), loaded(idx)), f"Mismatch for {path}"
+
+        # Parameters are views into the mapping, not copies
+        reader = open_checkpoint(single)
+        with torch.device("meta"):
+            mapped = GPTModel(cfg)
+        mapped.load_state_dict(reader.state_dict(), assign=True)
+        assert (mapped.tok_emb.weight.data_ptr()
+                == reader.get_tensor("tok_emb.weight").data_ptr()), "Weights were copied"
+
+        # Other dtypes and lazy access to a single tensor
+        extra = {"ids": torch.arange(5), "half": torch.ones(3, dtype=torch.bfloat16),
+                 "flags": torch.tensor([True, False]), "empty": torch.zeros(0, 4),
+                 "bytes": torch.arange(3, dtype=torch.uint8),
+                 "wide": torch.arange(3, dtype=torch.float64)}
+        path = save_state_dict(extra, os.path.join(tmp, "extra.safetensors"))
+        reader = open_checkpoint(path)
+        for name, tensor in extra.items():
+            mapped = reader.get_tensor(name)
+            assert torch.equal(mapped, tensor), f"Mismatch for {name}"
+            # Odd-sized tensors before it do not misalign the mapped view
+            assert mapped.numel() == 0 or mapped.data_ptr() % 8 == 0, name
+
+        print(f"Single file: {os.path.getsize(single) / 1024:.0f} KB, "
+              f"sharded into {len(shard_files)} files")
+
+
+def test_layer_profiler():
+    """Test per-layer timing, FLOP counting and trace export."""
+    print("\n=== Testing Layer Profiler ===")
+
+    cfg = get_config("124M", vocab_size=100, context_length=32, emb_dim=64,
+                     n_heads=4, n_layers=2, drop_rate=0.0)
+    torch.manual_seed(0)
+    model = GPTModel(cfg)
+    idx = torch.randint(0, 100, (2, 16))
+    expected = model(idx)
+
+    steps = 3
+    filters = list(warnings.filters)
+    with LayerProfiler(model, trace_steps=2) as profiler:
+        for _ in range(steps):
+            model(idx).sum().backward()
+            profiler.step()
+    stats = {s.name: s for s in profiler.stats()}
+
+    # Same count as the analytic estimate: projections, head and attention scores
+    flops = estimate_flops_per_token(cfg, seq_len=16, training=False) * idx.numel()
+    assert stats["model"].forward_flops == steps * flops, stats["model"]
+    assert stats["model"].backward_flops == 2 * stats["model"].forward_flops
+    assert stats["trf_blocks.0.drop_shortcut"].calls == 2 * steps
+    for s in stats.values():
+        assert s.calls >= steps, s
+        assert s.backward_time > 0, f"No backward time for {s.name}"
+    assert stats["trf_blocks"].forward_time <= stats["model"].forward_time
+    assert stats["out_head"].activation_bytes == steps * expected.nbytes
+
+    trace = profiler.chrome_trace()["traceEvents"]
+    spans = [e for e in trace if e["ph"] == "X" and e["cat"] != "step"]
+    calls_per_step = sum(s.calls for s in stats.values()) // steps
+    # Forward and backward span of every call, for the first two steps only
+    assert len(spans) == 2 * 2 * calls_per_step, len(spans)
+    json.dumps(trace)
+    assert not model._forward_hooks and not model._backward_hooks
+    assert warnings.filters == filters, "Warning filter outlived the profiler"
+    with torch.no_grad():
+        assert torch.equal(model(idx), expected.detach())
+
+    # A trainer and an inference engine sharing a model: one profiler
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ[PROFILE_ENV] = os.path.join(tmp, "trace.json")
+        try:
+            first = profile_from_env(model)
+            assert first is not None and profile_from_env(model) is None
+            hooks = len(model._forward_hooks)
+            first.output_path = None  # Nothing recorded worth writing
+            first.detach()
+            second = profile_from_env(model)
+            assert second is not None and len(model._forward_hooks) == hooks
+            second.output_path = None
+            second.detach()
+        finally:
+            del os.environ[PROFILE_ENV]
+
+    # Profilers detached out of order share one filter entry, and the
+    # caller's own filters survive
+    other = GPTModel(cfg)
+    with warnings.catch_warnings():
+        filters = list(warnings.filters)
+        first, second = LayerProfiler(model).attach(), LayerProfiler(other).attach()
+        warnings.simplefilter("error", DeprecationWarning)
+        first.detach()
+        with warnings.catch_warnings(record=True) as caught:
+            other(idx).sum().backward()  # Would raise if the warning were back
+        assert not caught
+        second.detach()
+        assert warnings.filters[1:] == filters and warnings.filters[0][2] is DeprecationWarning
+        warnings.filters.pop(0)
+        LayerProfiler(model).attach().detach()
+        assert warnings.filters == filters, "Warning filter outlived the profilers"
+
+    print(profiler.summary(min_share=0.05))
+
+
+def test_mixture_of_experts():
+    """Test grouped expert dispatch, capacity, auxiliary loss and FLOPs."""
+    print("\n=== Testing Mixture of Experts ===")
+
+    cfg = get_config("124M", vocab_size=100, context_length=32, emb_dim=64,
+                     n_heads=4, n_layers=2, drop_rate=0.0, n_experts=4,
+                     moe_top_k=2, moe_hidden_dim=128)
+    torch.manual_seed(0)
+    model = GPTModel(cfg).eval()
+    moe = model.trf_blocks[0].ff
+    x = torch.randn(2, 16, cfg["emb_dim"])
+
+    # Grouped dispatch equals mixing each token's top-k experts one by one
+    with torch.no_grad():
+        out = moe(x)
+        probs = torch.softmax(moe.router(x), dim=-1)
+        reference = torch.zeros_like(x)
+        for b, t in itertools.product(range(2), range(16)):
+            gates, experts = probs[b, t].topk(2)
+            for gate, e in zip(gates / gates.sum(), experts.tolist()):
+                reference[b, t] += gate * moe.experts[e](x[b, t])
+    assert torch.allclose(out, reference, atol=1e-5), (out - reference).abs().max()
+    assert int(moe.tokens_per_expert.sum()) == 2 * 16 * 2
+
+    # Training caps every expert's assignments; dropped ones contribute nothing
+    moe.train()
+    moe.capacity_factor = 0.5
+    moe(x)
+    capacity = moe.capacity(32)
+    assert capacity == 8 and int(moe.tokens_per_expert.max()) <= capacity
+
+    # A uniform router gives the minimum auxiliary loss, the loss weight itself
+    with torch.no_grad():
+        moe.router.weight.zero_()
+        moe(x)
+    assert abs(moe.aux_loss.item() - moe.aux_loss_weight) < 1e-6
+    model.train()
+    model(torch.randint(0, 100, (2, 16)))
+    model.aux_loss().backward()
+    assert model.trf_blocks[1].ff.router.weight.grad.abs().sum() > 0
+    # The loss was handed over: no graph left on the model, which copies
+    assert model.aux_loss() is None and not model.trf_blocks[1].ff.aux_loss.requires_grad
+    copy.deepcopy(model)
+
+    # Profiled forward FLOPs equal the estimate, which counts active experts only
+    model.eval()
+    idx = torch.randint(0, 100, (2, 16))
+    with LayerProfiler(model) as profiler, torch.no_grad():
+        model(idx)
+    flops = estimate_flops_per_token(cfg, seq_len=16, training=False)
+    assert profiler.stats()[0].forward_flops == flops * idx.numel()
+    dense = get_config("124M", vocab_size=100, context_length=32, emb_dim=64,
+                       n_heads=4, n_layers=2)
+    router = 2 * cfg["n_layers"] * cfg["emb_dim"] * cfg["n_experts"]
+    assert flops == estimate_flops_per_token(dense, seq_len=16, training=False) + router
+    total = count_parameters(model)
+    print(f"{count_parameters(GPTModel(dense)):,} dense vs {total:,} MoE parameters "
+          f"at {flops:,} FLOPs/token; aux loss {moe.aux_loss.item():.4f}")
+
+
+def main():
+    """Run all tests."""
+    print("🧪 Starting GPT Model Tests")
+    print("=" * 50)
+
+    try:
+        test_output_shape()
+        test_parameter_count()
+        test_causality()
+        test_checkpoint_roundtrip()
+        test_layer_profiler()
+        test_mixture_of_experts()
+
+        print("\n✅ All tests completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Training module for teaching a GPT model to predict the next token.
+
+This module provides a memory-mapped token dataset, the language modeling
+loss, and a trainer with gradient accumulation, mixed precision, a cosine
+learning-rate schedule and throughput telemetry, which can run as several
+data-parallel processes. Variable-length documents can be packed into full
+rows or batched by length.
+"""
+
+from .distributed import (
+    init_distributed,
+    cleanup_distributed,
+    get_rank,
+    get_world_size,
+    is_main_process,
+)
+from .data_loader import save_tokens, TokenDataset, ResumableSampler, create_dataloader
+from .loss_functions import calc_loss_batch, calc_loss_loader
+from .packing import PackingCollator, PaddingCollator, LengthBucketSampler, padding_ratio
+from .training_loop import (
+    TrainingConfig,
+    StepStats,
+    Trainer,
+    cosine_lr,
+    measure_peak_flops,
+    format_stats,
+)
+from .zero import ZeroOptimizer, partition_parameters
+from .checkpointing import AsyncCheckpointer, atomic_save, latest_checkpoint
+
+__all__ = [
+    'init_distributed',
+    'cleanup_distributed',
+    'get_rank',
+    'get_world_size',
+    'is_main_process',
+    'save_tokens',
+    'TokenDataset',
+    'ResumableSampler',
+    'create_dataloader',
+    'calc_loss_batch',
+    'calc_loss_loader',
+    'PackingCollator',
+    'PaddingCollator',
+    'LengthBucketSampler',
+    'padding_ratio',
+    'TrainingConfig',
+    'StepStats',
+    'Trainer',
+    'cosine_lr',
+    'measure_peak_flops',
+    'format_stats',
+    'ZeroOptimizer',
+    'partition_parameters',
+    'AsyncCheckpointer',
+    'atomic_save',
+    'latest_checkpoint',
+]
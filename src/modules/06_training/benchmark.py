@@ -0,0 +1,559 @@
+"""
+Benchmark script for the training module.
+
+Sections:
+- precision: trains ``VERDICT_CPU_CONFIG`` on the-verdict.txt with fp32 and
+  bf16 autocast, each eagerly and under ``torch.compile``, and reports the
+  median step time split (data / forward / backward / optimizer), tokens/sec
+  and MFU (the first steps, including compilation, are excluded)
+- ddp: data-parallel throughput with 1 to N processes on this machine
+  (gloo backend, launched through torchrun, fixed per-process batch)
+- zero: per-rank memory of plain DDP vs ZeRO-1/2, exact shard accounting for
+  the 355M config plus a measured multi-process run of a 2-layer model with
+  the 355M width (the full 355M model does not fit twice in 5 GB)
+- checkpoint: step-time jitter with no checkpoints, synchronous saves and
+  background (async) saves
+- packing: padding ratio and effective tokens/sec on a synthetic corpus of
+  variable-length documents, padded per batch, length-bucketed, and packed
+- evaluation: loss/perplexity over the-verdict.txt repeated ``--scale``
+  times, with a briefly trained ``VERDICT_CPU_CONFIG`` model: the whole
+  corpus in one forward pass, ``calc_loss_loader``, and the streaming
+  ``evaluate_corpus`` of ``src/utils/metrics.py`` (non-overlapping and
+  strided windows, early stop, two processes); tokens/sec and peak memory,
+  each in a fresh process
+
+Run from the repository root:
+    python -m src.modules.06_training.benchmark [precision|ddp|zero|checkpoint|packing|evaluation|all] [--steps 40] [--no-compile]
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+from typing import List
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from .checkpointing import latest_checkpoint
+from .data_loader import TokenDataset, create_dataloader, save_tokens
+from .distributed import cleanup_distributed, init_distributed, is_main_process
+from .loss_functions import calc_loss_loader
+from .packing import LengthBucketSampler, PackingCollator, PaddingCollator, padding_ratio
+from .train import VERDICT_CPU_CONFIG
+from .training_loop import StepStats, Trainer, TrainingConfig
+from .zero import ZeroOptimizer, partition_parameters
+
+tokenization = import_module("..01_tokenization.build_vocabulary", __package__)
+gpt = import_module("..05_gpt_model", __package__)
+metrics = import_module("...utils.metrics", __package__)
+
+BATCH_SIZE = 8
+GRAD_ACCUM_STEPS = 2
+WARMUP_STEPS_EXCLUDED = 3
+
+
+def summarize(name: str, history: List[StepStats], seconds: float) -> None:
+    """Print the median telemetry of the measured steps."""
+    steps = history[WARMUP_STEPS_EXCLUDED:]
+    median = {field: statistics.median(getattr(s, field) for s in steps) * 1000
+              for field in ("data_time", "forward_time", "backward_time",
+                            "optimizer_time", "step_time")}
+    tokens_per_sec = statistics.median(s.tokens_per_sec for s in steps)
+    mfu = statistics.median(s.mfu for s in steps)
+    print(f"{name:>14} {median['step_time']:>8.0f} {median['data_time']:>6.1f} "
+          f"{median['forward_time']:>6.0f} {median['backward_time']:>6.0f} "
+          f"{median['optimizer_time']:>6.0f} {tokens_per_sec:>9,.0f} {mfu:>6.1%} "
+          f"{history[-1].loss:>7.3f} {seconds:>8.1f}")
+
+
+def benchmark_precision(steps: int, use_compile: bool):
+    """Run the precision / compile benchmark."""
+    with open("the-verdict.txt", "r", encoding="utf-8") as f:
+        tokens = tokenization.preprocess_text(f.read())
+    vocab = tokenization.build_vocabulary(tokens)
+    cfg = gpt.get_config("124M", vocab_size=len(vocab), **VERDICT_CPU_CONFIG)
+
+    print("⏱️ Training Benchmark")
+    print("=" * 84)
+    print(f"the-verdict.txt: {len(tokens)} tokens, vocab {len(vocab)}; model "
+          f"{gpt.count_parameters(gpt.GPTModel(cfg)):,} parameters; "
+          f"batch {BATCH_SIZE} x {GRAD_ACCUM_STEPS} accumulation x "
+          f"{cfg['context_length']} tokens")
+    print(f"Median over steps {WARMUP_STEPS_EXCLUDED}-{steps - 1} (ms):\n")
+    print(f"{'run':>14} {'step':>8} {'data':>6} {'fwd':>6} {'bwd':>6} {'opt':>6} "
+          f"{'tok/s':>9} {'MFU':>6} {'loss':>7} {'total s':>8}")
+
+    runs = [("fp32", False), ("bf16", False)]
+    if use_compile:
+        runs += [("fp32", True), ("bf16", True)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "the-verdict.bin")
+        save_tokens([vocab[t] for t in tokens], path)
+        dataset = TokenDataset(path, cfg["context_length"], stride=cfg["context_length"] // 2)
+
+        for precision, compile_model in runs:
+            torch.manual_seed(123)
+            model = gpt.GPTModel(cfg)
+            config = TrainingConfig(max_steps=steps, learning_rate=1e-3,
+                                    min_learning_rate=1e-4, warmup_steps=5,
+                                    grad_accum_steps=GRAD_ACCUM_STEPS,
+                                    precision=precision, compile=compile_model,
+                                    log_interval=0)
+            trainer = Trainer(model, create_dataloader(dataset, BATCH_SIZE, seed=0), config)
+            start = time.perf_counter()
+            history = trainer.train()
+            name = precision + (" + compile" if compile_model else "")
+            summarize(name, history, time.perf_counter() - start)
+
+    print(f"\nMFU is relative to the measured peak matmul rate of each precision "
+          f"({torch.get_num_threads()} threads).")
+
+
+DDP_VOCAB_SIZE = 1000
+DDP_CORPUS_TOKENS = 400_000
+
+
+def ddp_worker(path: str, steps: int, bucket_cap_mb: float) -> None:
+    """Train one data-parallel replica; rank 0 prints a JSON summary."""
+    init_distributed()
+    try:
+        cfg = gpt.get_config("124M", vocab_size=DDP_VOCAB_SIZE, **VERDICT_CPU_CONFIG)
+        torch.manual_seed(123)
+        model = gpt.GPTModel(cfg)
+        loader = create_dataloader(TokenDataset(path, cfg["context_length"]),
+                                   BATCH_SIZE, seed=0)
+        config = TrainingConfig(max_steps=steps, warmup_steps=2, log_interval=0,
+                                bucket_cap_mb=bucket_cap_mb)
+        history = Trainer(model, loader, config).train()[WARMUP_STEPS_EXCLUDED:]
+        if is_main_process():
+            print(json.dumps({
+                "tokens_per_sec": statistics.median(s.tokens_per_sec for s in history),
+                "step_ms": statistics.median(s.step_time for s in history) * 1000,
+                "backward_ms": statistics.median(s.backward_time for s in history) * 1000,
+            }))
+    finally:
+        cleanup_distributed()
+
+
+def benchmark_ddp(steps: int, max_procs: int, bucket_cap_mb: float):
+    """Run the data-parallel scaling benchmark."""
+    print("⏱️ Data-Parallel (DDP, gloo) Scaling Benchmark")
+    print("=" * 60)
+    print(f"{os.cpu_count()} CPU(s); per-process batch {BATCH_SIZE} x "
+          f"{VERDICT_CPU_CONFIG['context_length']} tokens; bucket {bucket_cap_mb} MB\n")
+    print(f"{'procs':>6} {'tok/s':>9} {'step (ms)':>10} {'bwd+comm (ms)':>14} "
+          f"{'speedup':>8} {'efficiency':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.bin")
+        rng = np.random.default_rng(0)
+        save_tokens(rng.integers(0, DDP_VOCAB_SIZE, DDP_CORPUS_TOKENS), path)
+
+        baseline = None
+        for procs in [n for n in (1, 2, 4, 8, 16) if n <= max_procs]:
+            result = subprocess.run(
+                [sys.executable, "-m", "torch.distributed.run", "--standalone",
+                 f"--nproc-per-node={procs}", "-m", __spec__.name, "ddp",
+                 "--worker", "--path", path, "--steps", str(steps),
+                 "--bucket-cap-mb", str(bucket_cap_mb)],
+                check=True, capture_output=True, text=True)
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            baseline = baseline or stats["tokens_per_sec"]
+            speedup = stats["tokens_per_sec"] / baseline
+            print(f"{procs:>6} {stats['tokens_per_sec']:>9,.0f} {stats['step_ms']:>10.0f} "
+                  f"{stats['backward_ms']:>14.0f} {speedup:>7.2f}x {speedup / procs:>10.0%}")
+
+
+ZERO_MEASURED_CONFIG = {"n_layers": 2, "vocab_size": 8192, "context_length": 128,
+                        "drop_rate": 0.0}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB (Linux)."""
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def zero_accounting(world_sizes: List[int]) -> None:
+    """Print exact per-rank bytes of weights, gradients and AdamW state for 355M."""
+    with torch.device("meta"):
+        params = list(gpt.GPTModel(gpt.get_config("355M")).parameters())
+    total = sum(p.numel() for p in params)
+    print(f"355M config ({total / 1e6:.0f}M parameters), fp32, bytes per rank (GB):")
+    print(f"{'ranks':>6} {'mode':>7} {'weights':>8} {'grads':>7} {'AdamW':>7} {'total':>7}")
+    for world_size in world_sizes:
+        owners = partition_parameters(params, world_size)
+        # Largest shard determines the peak across ranks
+        shard = max(sum(p.numel() for p, r in zip(params, owners) if r == rank)
+                    for rank in range(world_size))
+        for mode, grads, state in (("DDP", total, total), ("ZeRO-1", total, shard),
+                                   ("ZeRO-2", shard, shard)):
+            weights_gb, grads_gb, state_gb = total * 4e-9, grads * 4e-9, 2 * state * 4e-9
+            print(f"{world_size:>6} {mode:>7} {weights_gb:>8.2f} {grads_gb:>7.2f} "
+                  f"{state_gb:>7.2f} {weights_gb + grads_gb + state_gb:>7.2f}")
+
+
+def zero_worker(path: str, steps: int, zero_stage: int) -> None:
+    """Train with the given ZeRO stage; rank 0 prints every rank's memory as JSON."""
+    init_distributed()
+    try:
+        cfg = gpt.get_config("355M", **ZERO_MEASURED_CONFIG)
+        torch.manual_seed(123)
+        model = gpt.GPTModel(cfg)
+        loader = create_dataloader(TokenDataset(path, cfg["context_length"]), 4, seed=0)
+        config = TrainingConfig(max_steps=steps, warmup_steps=1, log_interval=0,
+                                peak_flops=1.0, zero_stage=zero_stage)
+        trainer = Trainer(model, loader, config)
+        trainer.train()
+
+        # Gradients held right after a backward pass, before the optimizer step
+        inputs, targets = next(iter(loader))
+        torch.nn.functional.cross_entropy(
+            trainer.forward_model(inputs).flatten(0, 1), targets.flatten()).backward()
+        optimizer = trainer.optimizer
+        if isinstance(optimizer, ZeroOptimizer):
+            grad_bytes, state_bytes = optimizer.gradient_bytes(), optimizer.state_bytes()
+        else:
+            grad_bytes = sum(p.grad.nbytes for p in model.parameters() if p.grad is not None)
+            state_bytes = sum(t.nbytes for st in optimizer.state.values()
+                              for t in st.values() if torch.is_tensor(t))
+        row = {"params_mb": sum(p.nbytes for p in model.parameters()) / 2 ** 20,
+               "grads_mb": grad_bytes / 2 ** 20, "state_mb": state_bytes / 2 ** 20,
+               "peak_rss_mb": peak_rss_mb()}
+        rows = [None] * trainer.world_size if trainer.rank == 0 else None
+        torch.distributed.gather_object(row, rows, dst=0)
+        if is_main_process():
+            print(json.dumps(rows))
+    finally:
+        cleanup_distributed()
+
+
+def benchmark_zero(steps: int, max_procs: int):
+    """Run the ZeRO memory benchmark."""
+    print("⏱️ ZeRO Sharded Optimizer Memory Benchmark")
+    print("=" * 60)
+    zero_accounting([2, 4, 8])
+
+    cfg = gpt.get_config("355M", **ZERO_MEASURED_CONFIG)
+    with torch.device("meta"):
+        num_params = gpt.count_parameters(gpt.GPTModel(cfg))
+    print(f"\nMeasured: 355M width, {cfg['n_layers']} layers, vocab {cfg['vocab_size']} "
+          f"({num_params / 1e6:.0f}M parameters), MB on the largest rank:")
+    print(f"{'ranks':>6} {'mode':>7} {'weights':>8} {'grads':>7} {'AdamW':>7} "
+          f"{'total':>7} {'peak RSS':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.bin")
+        rng = np.random.default_rng(0)
+        save_tokens(rng.integers(0, cfg["vocab_size"], 100_000), path)
+        for procs in [n for n in (2, 4) if n <= max(2, max_procs)]:
+            for stage in (0, 1, 2):
+                result = subprocess.run(
+                    [sys.executable, "-m", "torch.distributed.run", "--standalone",
+                     f"--nproc-per-node={procs}", "-m", __spec__.name, "zero",
+                     "--worker", "--path", path, "--steps", str(steps),
+                     "--zero-stage", str(stage)],
+                    check=True, capture_output=True, text=True)
+                rows = json.loads(result.stdout.strip().splitlines()[-1])
+                worst = {key: max(row[key] for row in rows) for key in rows[0]}
+                total = worst["params_mb"] + worst["grads_mb"] + worst["state_mb"]
+                mode = f"ZeRO-{stage}" if stage else "DDP"
+                print(f"{procs:>6} {mode:>7} {worst['params_mb']:>8.0f} "
+                      f"{worst['grads_mb']:>7.0f} {worst['state_mb']:>7.0f} "
+                      f"{total:>7.0f} {worst['peak_rss_mb']:>9.0f}")
+    print("\nPeak RSS also counts the PyTorch runtime (~500 MB per process) and "
+          "activations.")
+
+
+CHECKPOINT_INTERVAL = 5
+
+
+def benchmark_checkpoint(steps: int):
+    """Run the checkpoint jitter benchmark."""
+    cfg = gpt.get_config("355M", **ZERO_MEASURED_CONFIG)
+    print("⏱️ Checkpoint Step-Time Jitter Benchmark")
+    print("=" * 72)
+
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        path = os.path.join(tmp, "synthetic.bin")
+        rng = np.random.default_rng(0)
+        save_tokens(rng.integers(0, cfg["vocab_size"], 100_000), path)
+        loader = create_dataloader(TokenDataset(path, cfg["context_length"]), 4, seed=0)
+
+        rows = []
+        for mode in ("none", "sync", "async"):
+            torch.manual_seed(123)
+            model = gpt.GPTModel(cfg)
+            config = TrainingConfig(
+                max_steps=steps, warmup_steps=1, log_interval=0, peak_flops=1.0,
+                checkpoint_dir=None if mode == "none" else os.path.join(tmp, mode),
+                checkpoint_interval=CHECKPOINT_INTERVAL, keep_checkpoints=2,
+                async_checkpoint=mode == "async")
+            trainer = Trainer(model, loader, config)
+            start = time.perf_counter()
+            history = trainer.train()[1:]  # Skip the first (warm-up) step
+            total = time.perf_counter() - start
+            if mode != "none":
+                size_mb = os.path.getsize(latest_checkpoint(config.checkpoint_dir)) / 2 ** 20
+            rows.append((mode, sorted(s.step_time * 1000 for s in history),
+                         max(s.checkpoint_time for s in history) * 1000, total))
+            del trainer, model
+
+    print(f"{ZERO_MEASURED_CONFIG['n_layers']}-layer 355M-width model, checkpoint every "
+          f"{CHECKPOINT_INTERVAL} steps ({size_mb:.0f} MB each), {steps} steps (ms):\n")
+    print(f"{'mode':>6} {'median':>8} {'p95':>8} {'max':>8} {'stdev':>8} "
+          f"{'blocked':>8} {'total s':>8}")
+    for mode, times, blocked, total in rows:
+        p95 = times[min(len(times) - 1, int(0.95 * len(times)))]
+        print(f"{mode:>6} {statistics.median(times):>8.0f} {p95:>8.0f} {times[-1]:>8.0f} "
+              f"{statistics.stdev(times):>8.0f} {blocked:>8.0f} {total:>8.1f}")
+    print("\n'blocked' is the longest time a step waited on a save.")
+
+
+PACKING_VOCAB_SIZE = 1000
+PACKING_DOCUMENTS = 4000
+
+
+def synthetic_documents(num_documents: int, max_length: int) -> List[torch.Tensor]:
+    """Documents with log-normally distributed lengths (many short, a few long)."""
+    rng = np.random.default_rng(0)
+    lengths = np.clip(rng.lognormal(mean=3.3, sigma=0.8, size=num_documents),
+                      4, max_length + 1).astype(int)
+    return [torch.from_numpy(rng.integers(0, PACKING_VOCAB_SIZE - 1, n))
+            for n in lengths]
+
+
+def benchmark_packing(steps: int):
+    """Run the padding vs bucketing vs packing benchmark."""
+    cfg = gpt.get_config("124M", vocab_size=PACKING_VOCAB_SIZE, **VERDICT_CPU_CONFIG)
+    context_length, eot = cfg["context_length"], PACKING_VOCAB_SIZE - 1
+    documents = synthetic_documents(PACKING_DOCUMENTS, context_length)
+    lengths = [len(d) for d in documents]
+    mean_length = statistics.mean(lengths)
+    # Documents per packed batch chosen to fill about BATCH_SIZE rows
+    docs_per_pack = int(BATCH_SIZE * (context_length + 1) / (mean_length + 1))
+
+    def padded():
+        return create_dataloader(documents, BATCH_SIZE, seed=0,
+                                 collate_fn=PaddingCollator(context_length, eot))
+
+    def bucketed():
+        sampler = LengthBucketSampler(lengths, BATCH_SIZE, seed=0, drop_last=True)
+        return DataLoader(documents, batch_sampler=sampler,
+                          collate_fn=PaddingCollator(context_length, eot))
+
+    def packed(mask_documents: bool):
+        collate = PackingCollator(context_length, eot, reset_positions=mask_documents,
+                                  mask_documents=mask_documents)
+        return create_dataloader(documents, docs_per_pack, seed=0, collate_fn=collate)
+
+    runs = [("padded", padded()), ("bucketed", bucketed()),
+            ("packed", packed(False)), ("packed + mask", packed(True))]
+
+    print("⏱️ Packing Benchmark")
+    print("=" * 72)
+    print(f"{PACKING_DOCUMENTS} synthetic documents, {mean_length:.0f} tokens on "
+          f"average ({min(lengths)}-{max(lengths)}); context {context_length}; "
+          f"{BATCH_SIZE} documents per padded batch, {docs_per_pack} per packed batch")
+    print(f"Median over steps {WARMUP_STEPS_EXCLUDED}-{steps - 1}:\n")
+    print(f"{'run':>14} {'rows':>5} {'width':>6} {'padding':>8} {'step ms':>8} "
+          f"{'eff tok/s':>10} {'speedup':>8}")
+
+    baseline = None
+    for name, loader in runs:
+        batches = [batch for _, batch in zip(range(200), loader)]
+        ratio = statistics.mean(padding_ratio(batch[1]) for batch in batches)
+        rows = statistics.mean(batch[0].shape[0] for batch in batches)
+        width = statistics.mean(batch[0].shape[1] for batch in batches)
+
+        torch.manual_seed(123)
+        config = TrainingConfig(max_steps=steps, warmup_steps=1, log_interval=0,
+                                peak_flops=1.0)
+        history = Trainer(gpt.GPTModel(cfg), loader, config).train()
+        measured = history[WARMUP_STEPS_EXCLUDED:]
+        step_ms = statistics.median(s.step_time for s in measured) * 1000
+        tokens_per_sec = (sum(s.tokens for s in measured)
+                          / sum(s.step_time for s in measured))
+        baseline = baseline or tokens_per_sec
+        print(f"{name:>14} {rows:>5.1f} {width:>6.0f} {ratio:>8.1%} {step_ms:>8.0f} "
+              f"{tokens_per_sec:>10,.0f} {tokens_per_sec / baseline:>7.2f}x")
+
+    print("\n'padding' is the share of positions without a target; effective "
+          "tokens/sec counts only positions with one.")
+
+
+EVAL_BATCH_SIZE = 8
+EARLY_STOP_BATCHES = 20
+EVAL_TRAIN_STEPS = 150
+EVAL_METHODS = {
+    "one forward pass": "naive",
+    "calc_loss_loader": "loader",
+    "evaluate_corpus": "windows",
+    "stride L/2": "strided",
+    f"max_batches={EARLY_STOP_BATCHES}": "early",
+    "2 processes": "processes",
+}
+
+
+def current_rss_mb() -> float:
+    """Resident memory of this process in MB (Linux)."""
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def evaluation_worker(path: str, method: str, checkpoint: str, vocab_size: int) -> None:
+    """Evaluate the corpus at ``path`` one way and print a JSON summary."""
+    cfg = gpt.get_config("124M", vocab_size=vocab_size, **VERDICT_CPU_CONFIG)
+    context_length = cfg["context_length"]
+    model = gpt.GPTModel(cfg)
+    model.load_state_dict(torch.load(checkpoint))
+    model.eval()
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    if method == "naive":
+        # Every window of the corpus in memory and through the model at once
+        token_ids = torch.from_numpy(np.fromfile(path, dtype=np.uint16).astype(np.int64))
+        n = (len(token_ids) - 1) // context_length * context_length
+        with torch.no_grad():
+            logits = model(token_ids[:n].view(-1, context_length))
+            loss = torch.nn.functional.cross_entropy(
+                logits.flatten(0, 1), token_ids[1:n + 1]).item()
+        tokens = n
+    elif method == "loader":
+        loader = create_dataloader(TokenDataset(path, context_length), EVAL_BATCH_SIZE,
+                                   shuffle=False, drop_last=False, seed=0)
+        loss = calc_loss_loader(loader, model)
+        tokens = len(loader.dataset) * context_length
+    else:
+        result = metrics.evaluate_corpus(
+            model, path, context_length, batch_size=EVAL_BATCH_SIZE,
+            stride=context_length // 2 if method == "strided" else None,
+            max_batches=EARLY_STOP_BATCHES if method == "early" else None,
+            num_processes=2 if method == "processes" else 1)
+        loss, tokens = result.loss, result.tokens
+    seconds = time.perf_counter() - start
+    print(json.dumps({"loss": loss, "tokens": tokens, "seconds": seconds,
+                      "rss_mb": peak_rss_mb() - rss_before}))
+
+
+def benchmark_evaluation(scales: List[int]):
+    """Run the corpus evaluation benchmark."""
+    with open("the-verdict.txt", "r", encoding="utf-8") as f:
+        words = tokenization.preprocess_text(f.read())
+    vocab = tokenization.build_vocabulary(words)
+    token_ids = [vocab[t] for t in words]
+    cfg = gpt.get_config("124M", vocab_size=len(vocab), **VERDICT_CPU_CONFIG)
+
+    print("⏱️ Corpus Evaluation Benchmark")
+    print("=" * 84)
+    with tempfile.TemporaryDirectory() as tmp:
+        # A briefly trained model, so that perplexities are meaningful
+        path = os.path.join(tmp, "the-verdict.bin")
+        save_tokens(token_ids, path)
+        torch.manual_seed(123)
+        model = gpt.GPTModel(cfg)
+        config = TrainingConfig(max_steps=EVAL_TRAIN_STEPS, learning_rate=1e-3,
+                                warmup_steps=5, log_interval=0)
+        Trainer(model, create_dataloader(TokenDataset(path, cfg["context_length"]),
+                                         BATCH_SIZE, seed=0), config).train()
+        checkpoint = os.path.join(tmp, "model.pt")
+        torch.save(model.state_dict(), checkpoint)
+
+        print(f"the-verdict.txt ({len(token_ids):,} tokens) repeated; model trained "
+              f"{EVAL_TRAIN_STEPS} steps; batch {EVAL_BATCH_SIZE} x "
+              f"{cfg['context_length']} tokens ({torch.get_num_threads()} threads)\n")
+        print(f"{'method':>18} {'corpus':>9} {'scored':>9} {'loss':>7} {'ppl':>8} "
+              f"{'seconds':>8} {'tok/s':>8} {'eval RSS MB':>12}")
+        for scale in scales:
+            path = os.path.join(tmp, f"the-verdict-x{scale}.bin")
+            save_tokens(token_ids * scale, path)
+            for name, method in EVAL_METHODS.items():
+                result = subprocess.run(
+                    [sys.executable, "-m", __spec__.name, "evaluation", "--worker",
+                     "--path", path, "--method", method, "--checkpoint", checkpoint,
+                     "--vocab-size", str(len(vocab))],
+                    check=True, capture_output=True, text=True)
+                row = json.loads(result.stdout.strip().splitlines()[-1])
+                print(f"{name:>18} {len(token_ids) * scale:>9,} {row['tokens']:>9,} "
+                      f"{row['loss']:>7.3f} {math.exp(row['loss']):>8.2f} "
+                      f"{row['seconds']:>8.2f} {row['tokens'] / row['seconds']:>8,.0f} "
+                      f"{row['rss_mb']:>12.0f}")
+            os.remove(path)
+
+    print("\n'eval RSS MB' is the growth of peak memory during evaluation (worker "
+          "processes not included).")
+
+
+def main():
+    """Run the selected benchmark sections."""
+    parser = argparse.ArgumentParser(description="Training benchmarks")
+    parser.add_argument("section", nargs="?", default="all",
+                        choices=["precision", "ddp", "zero", "checkpoint", "packing",
+                                 "evaluation", "all"])
+    parser.add_argument("--steps", type=int, help="Optimizer steps per run")
+    parser.add_argument("--no-compile", action="store_true",
+                        help="Skip the torch.compile runs")
+    parser.add_argument("--max-procs", type=int, default=max(2, os.cpu_count() or 1),
+                        help="Largest process count for the ddp section")
+    parser.add_argument("--bucket-cap-mb", type=float, default=25.0)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100],
+                        help="Corpus repetitions for the evaluation section")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--method", help=argparse.SUPPRESS)
+    parser.add_argument("--checkpoint", help=argparse.SUPPRESS)
+    parser.add_argument("--vocab-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--zero-stage", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker and args.section == "zero":
+        zero_worker(args.path, args.steps, args.zero_stage)
+        return
+    if args.worker and args.section == "evaluation":
+        evaluation_worker(args.path, args.method, args.checkpoint, args.vocab_size)
+        return
+    if args.worker:
+        ddp_worker(args.path, args.steps, args.bucket_cap_mb)
+        return
+    if args.section in ("precision", "all"):
+        benchmark_precision(args.steps or 40, not args.no_compile)
+    if args.section in ("ddp", "all"):
+        if args.section == "all":
+            print()
+        benchmark_ddp(args.steps or 15, args.max_procs, args.bucket_cap_mb)
+    if args.section in ("zero", "all"):
+        if args.section == "all":
+            print()
+        benchmark_zero(args.steps or 3, args.max_procs)
+    if args.section in ("checkpoint", "all"):
+        if args.section == "all":
+            print()
+        benchmark_checkpoint(args.steps or 31)
+    if args.section in ("packing", "all"):
+        if args.section == "all":
+            print()
+        benchmark_packing(args.steps or 20)
+    if args.section in ("evaluation", "all"):
+        if args.section == "all":
+            print()
+        benchmark_evaluation(args.scales)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Resumable training checkpoints written in the background.
+
+Writing a multi-gigabyte checkpoint takes seconds, and doing it inside the
+training loop stalls every rank for that long. Instead the training state is
+first copied to CPU memory (fast, a memcpy per tensor), and a background
+thread serializes the copy while training continues. Files are written under
+a temporary name and renamed into place, so a crash mid-write never leaves a
+truncated checkpoint behind, and only the newest few are kept.
+"""
+
+import glob
+import os
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+
+CHECKPOINT_PATTERN = "step_{step:08d}.pt"
+_STEP_RE = re.compile(r"step_(\d+)\.pt$")
+
+
+def snapshot(obj: Any) -> Any:
+    """
+    Copy every tensor in a nested state (dicts, lists, tuples) to CPU memory.
+
+    The copy is detached from the live training state, so the model and
+    optimizer can keep updating while it is written out.
+
+    Args:
+        obj: State, e.g. ``{"model": model.state_dict(), ...}``
+
+    Returns:
+        The same structure with CPU copies of all tensors
+    """
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(value) for value in obj)
+    return obj
+
+
+def capture_rng_state() -> Dict[str, Any]:
+    """Random number generator states of Python, NumPy and PyTorch."""
+    return {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+
+
+def restore_rng_state(state: Dict[str, Any]) -> None:
+    """
+    Restore generator states captured by ``capture_rng_state``.
+
+    Args:
+        state: Captured states
+    """
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+
+
+def atomic_save(state: Dict[str, Any], path: str) -> None:
+    """
+    Save with ``torch.save`` so that ``path`` is either complete or absent.
+
+    The data goes to a temporary file in the same directory, is flushed to
+    disk, and then replaces ``path`` with an atomic rename.
+
+    Args:
+        state: Object to save
+        path: Destination file
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        torch.save(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def list_checkpoints(directory: str) -> List[str]:
+    """
+    Completed checkpoints in a directory, oldest first.
+
+    Args:
+        directory: Checkpoint directory
+
+    Returns:
+        Paths sorted by training step
+    """
+    paths = [p for p in glob.glob(os.path.join(directory, "step_*.pt"))
+             if _STEP_RE.search(p)]
+    return sorted(paths, key=lambda p: int(_STEP_RE.search(p).group(1)))
+
+
+def latest_checkpoint(directory: str) -> Optional[str]:
+    """
+    Newest completed checkpoint in a directory.
+
+    Args:
+        directory: Checkpoint directory
+
+    Returns:
+        Path of the checkpoint with the highest step, or None
+    """
+    paths = list_checkpoints(directory)
+    return paths[-1] if paths else None
+
+
+class AsyncCheckpointer:
+    """
+    Write checkpoints on a background thread with a retention policy.
+
+    At most one write is in flight: ``save`` first waits for the previous one,
+    so memory holds at most one snapshot besides the live state.
+
+    Args:
+        directory: Where ``step_XXXXXXXX.pt`` files are written
+        keep_last: Number of checkpoints to keep (older ones are deleted)
+        asynchronous: Write on a background thread (False writes inline)
+
+    Example:
+        >>> checkpointer = AsyncCheckpointer("checkpoints", keep_last=3)
+        >>> checkpointer.save(trainer.state_dict(), step=trainer.step)
+        >>> checkpointer.wait()
+    """
+
+    def __init__(self, directory: str, keep_last: int = 3, asynchronous: bool = True):
+        """Create the directory and an idle writer."""
+        if keep_last < 1:
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.keep_last = keep_last
+        self.asynchronous = asynchronous
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def save(self, state: Dict[str, Any], step: int) -> str:
+        """
+        Snapshot ``state`` to CPU and write it (in the background if enabled).
+
+        Args:
+            state: Training state; its tensors are copied before returning
+            step: Training step, used in the file name
+
+        Returns:
+            Path the checkpoint will have once written
+        """
+        self.wait()
+        path = os.path.join(self.directory, CHECKPOINT_PATTERN.format(step=step))
+        cpu_state = snapshot(state)
+        if self.asynchronous:
+            self._thread = threading.Thread(target=self._write, args=(cpu_state, path),
+                                            name="checkpoint-writer", daemon=True)
+            self._thread.start()
+        else:
+            self._write(cpu_state, path)
+            self._raise_error()
+        return path
+
+    def _write(self, state: Dict[str, Any], path: str) -> None:
+        try:
+            atomic_save(state, path)
+            for old in list_checkpoints(self.directory)[:-self.keep_last]:
+                os.remove(old)
+        except BaseException as e:  # Re-raised on the training thread
+            self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Checkpoint write failed") from error
+
+    def wait(self) -> None:
+        """Block until the pending write (if any) is on disk."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
@@ -0,0 +1,155 @@
+"""
+Memory-mapped token datasets for language model training.
+
+The corpus is tokenized once and written to disk as a flat array of token
+IDs. Training then reads fixed-length windows straight from a ``np.memmap``,
+so the whole corpus never has to fit in memory and data-loader workers share
+the same page cache instead of each holding a copy.
+"""
+
+import itertools
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, DistributedSampler
+
+from .distributed import get_rank, get_world_size, is_distributed
+
+
+def save_tokens(token_ids: Sequence[int], path: str,
+                dtype: np.dtype = np.uint16) -> None:
+    """
+    Write token IDs to a flat binary file for ``TokenDataset``.
+
+    Args:
+        token_ids: Token IDs of the whole corpus
+        path: Destination, e.g. ``"data/the-verdict.bin"``
+        dtype: Unsigned integer type on disk; uint16 holds vocabularies of up
+            to 65,536 tokens, which covers GPT-2's 50,257
+    """
+    tokens = np.asarray(token_ids, dtype=np.int64)
+    if tokens.size and (tokens.min() < 0 or tokens.max() > np.iinfo(dtype).max):
+        raise ValueError(f"Token IDs must be in [0, {np.iinfo(dtype).max}] "
+                         f"to be stored as {np.dtype(dtype).name}")
+    tokens.astype(dtype).tofile(path)
+
+
+class TokenDataset(Dataset):
+    """
+    Input/target windows read from a memory-mapped token file.
+
+    Window ``i`` starts at token ``i * stride``; the target is the input
+    shifted by one token.
+
+    Args:
+        path: File written by ``save_tokens``
+        context_length: Tokens per training example
+        stride: Distance between window starts (defaults to ``context_length``,
+            i.e. non-overlapping windows)
+        dtype: Token type used when the file was written
+
+    Example:
+        >>> dataset = TokenDataset("data/the-verdict.bin", context_length=256)
+        >>> input_ids, target_ids = dataset[0]
+    """
+
+    def __init__(self, path: str, context_length: int, stride: Optional[int] = None,
+                 dtype: np.dtype = np.uint16):
+        """Map the token file without reading it."""
+        self.path = path
+        self.tokens = np.memmap(path, dtype=dtype, mode="r")
+        self.context_length = context_length
+        self.stride = stride or context_length
+        if len(self.tokens) <= context_length:
+            raise ValueError(f"{path} holds {len(self.tokens)} tokens, need more than "
+                             f"context_length ({context_length})")
+
+    def __len__(self) -> int:
+        return (len(self.tokens) - self.context_length - 1) // self.stride + 1
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        start = idx * self.stride
+        window = torch.from_numpy(
+            self.tokens[start:start + self.context_length + 1].astype(np.int64))
+        return window[:-1], window[1:]
+
+
+class ResumableSampler(DistributedSampler):
+    """
+    Epoch-seeded sampler that can start an epoch part-way through.
+
+    The order of every epoch depends only on ``seed`` and the epoch number
+    (``set_epoch``), so after a restart ``set_start_index`` can skip exactly
+    the samples that were already consumed. With ``num_replicas > 1`` each
+    rank gets a disjoint share, as with ``DistributedSampler``.
+
+    Args:
+        dataset: Dataset to sample from
+        num_replicas: Number of ranks sharing the dataset
+        rank: Rank of this process
+        shuffle: Shuffle every epoch
+        seed: Seed of the shuffling order (identical on all ranks)
+        drop_last: Drop the tail that does not divide evenly across ranks
+    """
+
+    def __init__(self, dataset: Dataset, num_replicas: int = 1, rank: int = 0,
+                 shuffle: bool = True, seed: int = 0, drop_last: bool = False):
+        """Set up the sampler at the start of epoch 0."""
+        super().__init__(dataset, num_replicas=num_replicas, rank=rank,
+                         shuffle=shuffle, seed=seed, drop_last=drop_last)
+        self.start_index = 0
+
+    def set_start_index(self, index: int) -> None:
+        """Skip the first ``index`` samples of the current epoch (this rank)."""
+        self.start_index = index
+
+    def __iter__(self) -> Iterator[int]:
+        return itertools.islice(super().__iter__(), self.start_index, None)
+
+    def __len__(self) -> int:
+        return max(0, self.num_samples - self.start_index)
+
+
+def create_dataloader(dataset: Dataset, batch_size: int = 4, shuffle: bool = True,
+                      drop_last: bool = True, num_workers: int = 0,
+                      seed: Optional[int] = None,
+                      distributed: Optional[bool] = None,
+                      collate_fn: Optional[Callable] = None) -> DataLoader:
+    """
+    Create a resumable data loader over a token dataset.
+
+    Batches come from a ``ResumableSampler``: the trainer calls ``set_epoch``
+    so the shuffle changes every epoch, and ``set_start_index`` to continue
+    from a checkpoint. In data-parallel training every rank gets a disjoint
+    ``1 / world_size`` share of the windows.
+
+    Args:
+        dataset: Dataset yielding (input_ids, target_ids) pairs
+        batch_size: Examples per batch
+        shuffle: Shuffle the windows every epoch
+        drop_last: Drop the last incomplete batch
+        num_workers: Background worker processes
+        seed: Seed for the shuffling order (drawn from the torch RNG if None;
+            pass one explicitly when distributed so all ranks agree)
+        distributed: Shard the dataset across ranks (defaults to whether a
+            multi-process group is active)
+        collate_fn: Function merging examples into a batch, e.g. a
+            ``PackingCollator`` for variable-length documents
+
+    Returns:
+        DataLoader yielding (input_ids, target_ids) batches
+    """
+    if distributed is None:
+        distributed = is_distributed()
+    if seed is None:
+        seed = 0 if distributed else int(torch.randint(0, 2 ** 31 - 1, ()).item())
+    sampler = ResumableSampler(dataset,
+                               num_replicas=get_world_size() if distributed else 1,
+                               rank=get_rank() if distributed else 0,
+                               shuffle=shuffle, seed=seed, drop_last=drop_last)
+    # A private generator keeps the loader's per-epoch seed draws out of the
+    # global RNG, so dropout masks after a resume match an uninterrupted run
+    return DataLoader(dataset, batch_size=batch_size, sampler=sampler,
+                      drop_last=drop_last, num_workers=num_workers,
+                      collate_fn=collate_fn, generator=torch.Generator().manual_seed(seed))
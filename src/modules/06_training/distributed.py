@@ -0,0 +1,86 @@
+"""
+Multi-process data-parallel training helpers.
+
+Each process (rank) holds a full model replica and trains on its own slice
+of the data; gradients are averaged with all-reduce so the replicas stay in
+sync. On CPU the ``gloo`` backend handles the communication. Processes are
+started by ``torchrun``, which passes ``RANK``, ``WORLD_SIZE``, ``LOCAL_RANK``
+and the rendezvous address through environment variables.
+"""
+
+import os
+from typing import Tuple
+
+import torch
+import torch.distributed as dist
+
+
+def init_distributed(backend: str = "gloo") -> Tuple[int, int]:
+    """
+    Join the process group described by the ``torchrun`` environment.
+
+    Does nothing when ``WORLD_SIZE`` is unset or 1, so the same script runs
+    as a single process.
+
+    Args:
+        backend: Process group backend (``gloo`` for CPU)
+
+    Returns:
+        Tuple of (rank, world_size)
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", "1"))
+    if world_size > 1 and not dist.is_initialized():
+        dist.init_process_group(backend=backend)
+        # Split the cores between the processes on this machine
+        local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world_size))
+    return get_rank(), get_world_size()
+
+
+def is_distributed() -> bool:
+    """Whether a process group with more than one rank is active."""
+    return dist.is_available() and dist.is_initialized() and dist.get_world_size() > 1
+
+
+def get_rank() -> int:
+    """Rank of this process (0 when not distributed)."""
+    return dist.get_rank() if is_distributed() else 0
+
+
+def get_world_size() -> int:
+    """Number of processes (1 when not distributed)."""
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main_process() -> bool:
+    """Whether this process should log and write checkpoints."""
+    return get_rank() == 0
+
+
+def barrier() -> None:
+    """Wait for all ranks (no-op when not distributed)."""
+    if is_distributed():
+        dist.barrier()
+
+
+def all_reduce_mean(value: float) -> float:
+    """
+    Average a Python number over all ranks.
+
+    Args:
+        value: This rank's value
+
+    Returns:
+        Mean over ranks (``value`` itself when not distributed)
+    """
+    if not is_distributed():
+        return value
+    tensor = torch.tensor([value], dtype=torch.float64)
+    dist.all_reduce(tensor)
+    return tensor.item() / dist.get_world_size()
+
+
+def cleanup_distributed() -> None:
+    """Leave the process group."""
+    if dist.is_available() and dist.is_initialized():
+        dist.destroy_process_group()
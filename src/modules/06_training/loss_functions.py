@@ -0,0 +1,77 @@
+"""
+Language modeling loss.
+
+Next-token prediction is a classification over the vocabulary at every
+position, so the loss is the cross entropy between the logits and the input
+shifted by one token.
+"""
+
+from typing import Dict, Iterable, Optional, Sequence
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# Target value of positions without a next token (padding); skipped by the loss
+IGNORE_INDEX = -100
+
+
+def calc_loss_batch(input_batch: torch.Tensor, target_batch: torch.Tensor,
+                    model: nn.Module, device: Optional[torch.device] = None,
+                    model_inputs: Optional[Dict[str, torch.Tensor]] = None,
+                    reduction: str = "mean") -> torch.Tensor:
+    """
+    Compute the cross-entropy loss of one batch.
+
+    Args:
+        input_batch: Token IDs of shape (batch, num_tokens)
+        target_batch: Next-token IDs of the same shape; positions set to
+            ``IGNORE_INDEX`` (padding) do not count
+        model: Language model returning (batch, num_tokens, vocab_size) logits
+        device: Device to move the batch to (defaults to leaving it in place)
+        model_inputs: Extra keyword arguments for the model, such as the
+            ``position_ids`` and ``document_ids`` of packed batches
+        reduction: ``"mean"`` over the target tokens (0 when every target is
+            ignored), or ``"sum"`` to normalize over several batches yourself
+
+    Returns:
+        Scalar loss tensor
+    """
+    model_inputs = model_inputs or {}
+    if device is not None:
+        input_batch, target_batch = input_batch.to(device), target_batch.to(device)
+        model_inputs = {name: t.to(device) for name, t in model_inputs.items()}
+    logits = model(input_batch, **model_inputs)
+    loss = F.cross_entropy(logits.flatten(0, 1).float(), target_batch.flatten(),
+                           ignore_index=IGNORE_INDEX, reduction="sum")
+    if reduction == "sum":
+        return loss
+    # A plain mean would be 0/0 = NaN for a batch without any target
+    return loss / (target_batch != IGNORE_INDEX).sum().clamp(min=1)
+
+
+@torch.no_grad()
+def calc_loss_loader(data_loader: Iterable[Sequence],
+                     model: nn.Module, device: Optional[torch.device] = None,
+                     num_batches: Optional[int] = None) -> float:
+    """
+    Compute the average loss over (the first batches of) a data loader.
+
+    Args:
+        data_loader: Iterable of (input_ids, target_ids) batches, optionally
+            followed by a dict of extra model inputs
+        model: Language model
+        device: Device to run on
+        num_batches: Stop after this many batches (defaults to all)
+
+    Returns:
+        Average loss per target token, or ``nan`` if there is none
+    """
+    total, count = 0.0, 0
+    for i, (input_batch, target_batch, *extra) in enumerate(data_loader):
+        if num_batches is not None and i >= num_batches:
+            break
+        total += calc_loss_batch(input_batch, target_batch, model, device,
+                                 *extra, reduction="sum").item()
+        count += int((target_batch != IGNORE_INDEX).sum())
+    return total / count if count else float("nan")
@@ -0,0 +1,243 @@
+"""
+Batching variable-length documents without wasting compute on padding.
+
+Padding every example to the longest one in its batch means that, for a
+corpus of short and long documents, most positions in a batch hold padding
+that is still pushed through every matmul. Two remedies:
+
+- Packing: documents are concatenated, each followed by ``<|endoftext|>``,
+  and cut into full-length rows. Position IDs restart at every document and
+  a block-diagonal attention mask keeps tokens from attending across
+  document boundaries, so each document is processed as if it were alone.
+- Length bucketing: when examples must stay in separate rows (e.g. one
+  prompt per row), batches are formed from examples of similar length, so
+  the padding up to the longest one is small.
+"""
+
+import itertools
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import torch
+from torch.utils.data import Sampler
+
+from .loss_functions import IGNORE_INDEX
+
+EOT_TOKEN_ID = 50256  # <|endoftext|> in the GPT-2 vocabulary
+
+Document = Union[Sequence[int], torch.Tensor]
+
+
+def _as_list(document: Document) -> List[int]:
+    return document.tolist() if torch.is_tensor(document) else list(document)
+
+
+class PackingCollator:
+    """
+    Collate documents into full rows of packed, end-of-text separated tokens.
+
+    The documents of a batch are concatenated (each followed by ``eot_id``)
+    and cut into rows of ``context_length + 1`` tokens, giving input and
+    target rows of ``context_length``. Only the last row is padded, so the
+    number of rows depends on the total length of the documents.
+
+    Args:
+        context_length: Tokens per row
+        eot_id: End-of-text token appended to every document
+        pad_id: Token used to fill the last row (defaults to ``eot_id``)
+        reset_positions: Restart position IDs at 0 for every document
+        mask_documents: Keep tokens from attending to other documents in the
+            same row (block-diagonal causal attention); the target following
+            each end-of-text token is then ignored, as nothing in the
+            document can predict the start of the next one
+
+    Returns (when called):
+        ``(input_ids, target_ids, model_inputs)`` where ``model_inputs`` holds
+        ``position_ids`` and/or ``document_ids`` for ``GPTModel``, or
+        ``(input_ids, target_ids)`` if both options are off
+
+    Example:
+        >>> collate = PackingCollator(context_length=256)
+        >>> loader = create_dataloader(documents, batch_size=32, collate_fn=collate)
+        >>> input_ids, target_ids, model_inputs = next(iter(loader))
+    """
+
+    def __init__(self, context_length: int, eot_id: int = EOT_TOKEN_ID,
+                 pad_id: Optional[int] = None, reset_positions: bool = True,
+                 mask_documents: bool = True):
+        """Store the packing options."""
+        self.context_length = context_length
+        self.eot_id = eot_id
+        self.pad_id = eot_id if pad_id is None else pad_id
+        self.reset_positions = reset_positions
+        self.mask_documents = mask_documents
+
+    def __call__(self, documents: List[Document]) -> Tuple:
+        tokens: List[int] = []
+        doc_ids: List[int] = []
+        for i, document in enumerate(documents):
+            ids = _as_list(document) + [self.eot_id]
+            tokens += ids
+            doc_ids += [i] * len(ids)
+
+        row_len = self.context_length + 1
+        num_rows = max(1, -(-len(tokens) // row_len))
+        padding = num_rows * row_len - len(tokens)
+        # Padding gets its own document ID so it never mixes with real tokens
+        rows = torch.tensor(tokens + [self.pad_id] * padding).view(num_rows, row_len)
+        docs = torch.tensor(doc_ids + [len(documents)] * padding).view(num_rows, row_len)
+
+        input_ids, target_ids = rows[:, :-1], rows[:, 1:].clone()
+        document_ids = docs[:, :-1]
+        target_ids[docs[:, 1:] == len(documents)] = IGNORE_INDEX
+        if self.mask_documents:
+            target_ids[docs[:, 1:] != document_ids] = IGNORE_INDEX
+
+        model_inputs: Dict[str, torch.Tensor] = {}
+        if self.reset_positions:
+            model_inputs["position_ids"] = _document_positions(document_ids)
+        if self.mask_documents:
+            model_inputs["document_ids"] = document_ids
+        if not model_inputs:
+            return input_ids, target_ids
+        return input_ids, target_ids, model_inputs
+
+
+def _document_positions(document_ids: torch.Tensor) -> torch.Tensor:
+    """Position of every token within its document, restarting at each row."""
+    num_tokens = document_ids.shape[1]
+    index = torch.arange(num_tokens).expand_as(document_ids)
+    is_start = torch.ones_like(document_ids, dtype=torch.bool)
+    is_start[:, 1:] = document_ids[:, 1:] != document_ids[:, :-1]
+    # Index of the most recent document start at or before every position
+    starts = torch.cummax(torch.where(is_start, index, 0), dim=1).values
+    return index - starts
+
+
+class PaddingCollator:
+    """
+    Collate documents into one row each, right-padded to the longest.
+
+    Each document ``d`` yields input ``d[:-1]`` and target ``d[1:]``; padded
+    targets are ``IGNORE_INDEX`` so they do not count in the loss.
+
+    Args:
+        context_length: Maximum input length (longer documents are truncated)
+        pad_id: Token used for padding
+    """
+
+    def __init__(self, context_length: int, pad_id: int = EOT_TOKEN_ID):
+        """Store the padding options."""
+        self.context_length = context_length
+        self.pad_id = pad_id
+
+    def __call__(self, documents: List[Document]) -> Tuple[torch.Tensor, torch.Tensor]:
+        docs = [_as_list(d)[:self.context_length + 1] for d in documents]
+        width = max(len(d) for d in docs) - 1
+        input_ids = torch.full((len(docs), width), self.pad_id)
+        target_ids = torch.full((len(docs), width), IGNORE_INDEX)
+        for i, doc in enumerate(docs):
+            n = len(doc) - 1
+            input_ids[i, :n] = torch.tensor(doc[:-1])
+            target_ids[i, :n] = torch.tensor(doc[1:])
+        return input_ids, target_ids
+
+
+def padding_ratio(target_batch: torch.Tensor) -> float:
+    """
+    Fraction of positions in a batch that do not train on a target.
+
+    These are the padded positions, plus the last token of every document
+    when packing with ``mask_documents``.
+
+    Args:
+        target_batch: Target IDs, with ``IGNORE_INDEX`` at unused positions
+
+    Returns:
+        Unused positions divided by all positions
+    """
+    return (target_batch == IGNORE_INDEX).float().mean().item()
+
+
+class LengthBucketSampler(Sampler[List[int]]):
+    """
+    Batch sampler that groups examples of similar length.
+
+    Every epoch the examples are shuffled, split into buckets of
+    ``bucket_size``, and each bucket is sorted by length before being cut
+    into batches; the batches are then shuffled again. Batches stay random
+    across the dataset, but the examples within one are close in length.
+
+    Like ``ResumableSampler`` the order depends only on ``seed`` and the
+    epoch, and ``set_start_index`` skips batches already consumed. With
+    ``num_replicas > 1`` each rank gets a disjoint, equally long list of
+    batches.
+
+    Args:
+        lengths: Length of every example in the dataset
+        batch_size: Examples per batch
+        bucket_size: Examples sorted together (defaults to 50 batches);
+            larger buckets pad less but make batches less random
+        shuffle: Shuffle every epoch (otherwise sort the whole dataset)
+        seed: Seed of the shuffling order (identical on all ranks)
+        drop_last: Drop the last incomplete batch of each bucket
+        num_replicas: Number of ranks sharing the dataset
+        rank: Rank of this process
+
+    Example:
+        >>> sampler = LengthBucketSampler([len(d) for d in documents], batch_size=16)
+        >>> loader = DataLoader(documents, batch_sampler=sampler,
+        ...                     collate_fn=PaddingCollator(context_length=256))
+    """
+
+    def __init__(self, lengths: Sequence[int], batch_size: int,
+                 bucket_size: Optional[int] = None, shuffle: bool = True,
+                 seed: int = 0, drop_last: bool = False, num_replicas: int = 1,
+                 rank: int = 0):
+        """Set up the sampler at the start of epoch 0."""
+        self.lengths = torch.as_tensor(lengths)
+        self.batch_size = batch_size
+        self.bucket_size = bucket_size or 50 * batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+        self.start_index = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """Use the order of ``epoch``."""
+        self.epoch = epoch
+
+    def set_start_index(self, index: int) -> None:
+        """Skip the first ``index`` batches of the current epoch (this rank)."""
+        self.start_index = index
+
+    def _all_batches(self) -> List[List[int]]:
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        if self.shuffle:
+            order = torch.randperm(len(self.lengths), generator=generator)
+            bucket_size = self.bucket_size
+        else:
+            order = torch.arange(len(self.lengths))
+            bucket_size = len(self.lengths)
+
+        batches = []
+        for bucket in order.split(bucket_size):
+            bucket = bucket[torch.argsort(self.lengths[bucket], stable=True)]
+            for batch in bucket.split(self.batch_size):
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch.tolist())
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches),
+                                                          generator=generator)]
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches = self._all_batches()
+        per_rank = len(batches) // self.num_replicas
+        shard = batches[self.rank::self.num_replicas][:per_rank]
+        return itertools.islice(iter(shard), self.start_index, None)
+
+    def __len__(self) -> int:
+        return max(0, len(self._all_batches()) // self.num_replicas - self.start_index)
@@ -0,0 +1,483 @@
+"""
+Simple test script for the training module.
+
+This script tests the training pipeline:
+1. Memory-mapped token windows line up with the corpus
+2. Cosine learning-rate schedule with warmup
+3. Gradient accumulation matches one large batch, also when micro-batches
+   have different numbers of (or no) unmasked targets
+4. Training lowers the loss, in fp32 and bf16, with telemetry filled in
+5. Two-process DDP (gloo): disjoint data shards, identical replicas, and a
+   rank-0 checkpoint
+6. ZeRO stages 1 and 2 match plain DDP with half the optimizer state per rank
+7. Async checkpoints: retention, atomic files, and exact mid-epoch resume
+8. Packed documents give the same logits as each document alone; length
+   buckets cover every example once and pad less than random batches
+9. Streaming corpus evaluation (``src/utils/metrics.py``) scores every token
+   once, matches a window-by-window reference, and stops early on request
+10. ``BUILD_LLM_PROFILE`` profiles every training step without code changes
+
+Run from the repository root:
+    python -m src.modules.06_training.test
+"""
+
+import math
+import os
+import socket
+import tempfile
+from importlib import import_module
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from .checkpointing import list_checkpoints
+from .data_loader import TokenDataset, create_dataloader, save_tokens
+from .distributed import cleanup_distributed, init_distributed
+from .loss_functions import IGNORE_INDEX, calc_loss_batch
+from .packing import LengthBucketSampler, PackingCollator, PaddingCollator, padding_ratio
+from .training_loop import Trainer, TrainingConfig, cosine_lr
+from .zero import ZeroOptimizer
+
+gpt = import_module("..05_gpt_model", __package__)
+metrics = import_module("...utils.metrics", __package__)
+
+TINY_CONFIG = gpt.get_config("124M", vocab_size=50, context_length=16, emb_dim=32,
+                             n_heads=2, n_layers=2, drop_rate=0.0)
+
+
+def test_token_dataset():
+    """Test that dataset windows are shifted slices of the token file."""
+    print("=== Testing Token Dataset ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tokens.bin")
+        save_tokens(list(range(100)), path)
+        dataset = TokenDataset(path, context_length=8, stride=4)
+
+        input_ids, target_ids = dataset[2]
+        assert input_ids.tolist() == list(range(8, 16)), input_ids
+        assert target_ids.tolist() == list(range(9, 17)), target_ids
+        assert len(dataset) == 23, len(dataset)
+
+        last_input, last_target = dataset[len(dataset) - 1]
+        assert last_target[-1].item() <= 99
+        print(f"{len(dataset)} windows; last input starts at {last_input[0].item()}")
+
+        try:
+            save_tokens([70000], path)
+            raise AssertionError("Out-of-range token ID should be rejected")
+        except ValueError:
+            print("Rejected token ID that does not fit in uint16")
+
+
+def test_cosine_schedule():
+    """Test warmup and decay of the learning rate."""
+    print("\n=== Testing Cosine Schedule ===")
+
+    lrs = [cosine_lr(step, 1.0, 0.1, warmup_steps=10, max_steps=110)
+           for step in range(120)]
+    assert abs(lrs[0] - 0.1) < 1e-9 and abs(lrs[9] - 1.0) < 1e-9
+    assert abs(lrs[60] - 0.55) < 1e-9, lrs[60]
+    assert all(a >= b for a, b in zip(lrs[10:], lrs[11:]))
+    assert lrs[119] == 0.1
+    print(f"lr at steps 0/9/60/110: {lrs[0]:.2f} {lrs[9]:.2f} {lrs[60]:.2f} {lrs[110]:.2f}")
+
+
+def test_gradient_accumulation():
+    """Test that 2 micro-batches of 2 give the gradient of one batch of 4."""
+    print("\n=== Testing Gradient Accumulation ===")
+
+    torch.manual_seed(0)
+    batches = [(torch.randint(0, 50, (4, 16)), torch.randint(0, 50, (4, 16)))]
+    halves = [(x[:2], y[:2]) for x, y in batches] + [(x[2:], y[2:]) for x, y in batches]
+
+    grads = []
+    for loader, accum in ((batches, 1), (halves, 2)):
+        torch.manual_seed(1)
+        model = gpt.GPTModel(TINY_CONFIG)
+        config = TrainingConfig(max_steps=1, warmup_steps=0, grad_accum_steps=accum,
+                                max_grad_norm=0, log_interval=0, peak_flops=1e9)
+        trainer = Trainer(model, loader, config)
+        # Capture gradients before the optimizer step clears them
+        trainer.optimizer.zero_grad = lambda set_to_none=True: None
+        trainer.train_step()
+        grads.append(torch.cat([p.grad.flatten() for p in model.parameters()]))
+
+    diff = (grads[0] - grads[1]).abs().max().item()
+    assert diff < 1e-6, f"Accumulated gradient differs by {diff}"
+
+    # Also with masked targets: a micro-batch with few (or no) targets must
+    # not weigh as much as a full one, nor turn the loss into NaN
+    x, y = batches[0]
+    y = y.clone()
+    y[:2, :14] = IGNORE_INDEX
+    y[2:] = IGNORE_INDEX
+    y[3, 5] = 7
+    for split in ([(x, y)], [(x[i:i + 1], y[i:i + 1]) for i in range(4)]):
+        loader = [tuple(t.clone() for t in batch) for batch in split]
+        torch.manual_seed(1)
+        model = gpt.GPTModel(TINY_CONFIG)
+        config = TrainingConfig(max_steps=1, warmup_steps=0, grad_accum_steps=len(split),
+                                max_grad_norm=0, log_interval=0, peak_flops=1e9)
+        trainer = Trainer(model, loader, config)
+        trainer.optimizer.zero_grad = lambda set_to_none=True: None
+        stats = trainer.train_step()
+        grads.append(torch.cat([p.grad.flatten() for p in model.parameters()]))
+        assert stats.tokens == 5 and math.isfinite(stats.loss)
+    masked_diff = (grads[2] - grads[3]).abs().max().item()
+    assert masked_diff < 1e-6, f"Masked accumulated gradient differs by {masked_diff}"
+
+    # A batch whose targets are all masked has zero loss, not NaN
+    loss = calc_loss_batch(x[2:3], torch.full_like(y[2:3], IGNORE_INDEX), model)
+    assert loss.item() == 0.0
+    print(f"Max gradient difference: {diff:.2e} (masked targets: {masked_diff:.2e})")
+
+
+def test_training_reduces_loss():
+    """Test fp32 and bf16 training on a repeating sequence, with telemetry."""
+    print("\n=== Testing Training Loop ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tokens.bin")
+        save_tokens([i % 10 for i in range(2000)], path)
+        dataset = TokenDataset(path, TINY_CONFIG["context_length"])
+
+        for precision in ("fp32", "bf16"):
+            torch.manual_seed(0)
+            model = gpt.GPTModel(TINY_CONFIG)
+            loader = create_dataloader(dataset, batch_size=8, seed=0)
+            config = TrainingConfig(max_steps=30, learning_rate=1e-2, min_learning_rate=1e-3,
+                                    warmup_steps=5, grad_accum_steps=2,
+                                    precision=precision, log_interval=0)
+            trainer = Trainer(model, loader, config, val_loader=loader)
+
+            history = trainer.train()
+            val_loss = trainer.evaluate()
+            assert len(history) == 30 and trainer.epoch >= 1
+            assert history[-1].loss < history[0].loss / 2, (history[0].loss,
+                                                             history[-1].loss)
+            last = history[-1]
+            assert last.tokens == 2 * 8 * TINY_CONFIG["context_length"]
+            assert last.tokens_per_sec > 0 and 0 < last.mfu < 1
+            assert min(last.data_time, last.forward_time, last.backward_time,
+                       last.optimizer_time) >= 0
+            print(f"{precision}: loss {history[0].loss:.3f} -> {last.loss:.3f}, "
+                  f"val {val_loss:.3f}, {last.tokens_per_sec:,.0f} tok/s, "
+                  f"MFU {last.mfu:.2%}")
+
+        # MFU counts FLOPs at the batch's sequence length, not the context length
+        seq_len = TINY_CONFIG["context_length"] // 4
+        loader = create_dataloader(TokenDataset(path, seq_len), batch_size=8, seed=0)
+        trainer = Trainer(gpt.GPTModel(TINY_CONFIG), loader,
+                          TrainingConfig(max_steps=1, log_interval=0, peak_flops=1e9))
+        stats = trainer.train_step()
+        flops = stats.tokens * gpt.estimate_flops_per_token(TINY_CONFIG, seq_len=seq_len)
+        assert abs(stats.mfu * stats.step_time * 1e9 / flops - 1) < 1e-6, stats.mfu
+
+
+def _ddp_rank(rank: int, world_size: int, port: int, tmp: str):
+    """One rank of ``test_data_parallel`` (the same environment torchrun sets)."""
+    os.environ.update(RANK=str(rank), WORLD_SIZE=str(world_size), LOCAL_RANK=str(rank),
+                      MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port))
+    init_distributed()
+    try:
+        dataset = TokenDataset(os.path.join(tmp, "tokens.bin"),
+                               TINY_CONFIG["context_length"])
+        loader = create_dataloader(dataset, batch_size=4, seed=0)
+
+        # Each rank sees its own windows
+        first_inputs = next(iter(loader))[0]
+        gathered = [torch.empty_like(first_inputs) for _ in range(world_size)]
+        dist.all_gather(gathered, first_inputs)
+        assert not torch.equal(gathered[0], gathered[1]), "Ranks got the same batch"
+
+        torch.manual_seed(0)
+        model = gpt.GPTModel(TINY_CONFIG)
+        config = TrainingConfig(max_steps=3, learning_rate=1e-2, warmup_steps=1,
+                                grad_accum_steps=2, log_interval=0, peak_flops=1e9)
+        trainer = Trainer(model, loader, config)
+        history = trainer.train()
+        trainer.save_checkpoint(os.path.join(tmp, "ckpt.pth"))
+
+        # All-reduced gradients keep the replicas identical
+        params = torch.cat([p.detach().flatten() for p in model.parameters()])
+        gathered = [torch.empty_like(params) for _ in range(world_size)]
+        dist.all_gather(gathered, params)
+        assert torch.equal(gathered[0], gathered[1]), "Replicas diverged"
+        assert history[-1].tokens == world_size * 2 * 4 * TINY_CONFIG["context_length"]
+    finally:
+        cleanup_distributed()
+
+
+def test_data_parallel():
+    """Test two-process data-parallel training with the gloo backend."""
+    print("\n=== Testing Data-Parallel Training ===")
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save_tokens([i % 10 for i in range(2000)], os.path.join(tmp, "tokens.bin"))
+        mp.spawn(_ddp_rank, args=(2, port, tmp), nprocs=2, join=True)
+
+        state = torch.load(os.path.join(tmp, "ckpt.pth"), weights_only=False)
+        assert state["step"] == 3 and "tok_emb.weight" in state["model"]
+        print(f"2 ranks trained {state['step']} steps with identical replicas; "
+              f"rank 0 saved the checkpoint")
+
+
+def _zero_rank(rank: int, world_size: int, port: int, tmp: str):
+    """One rank of ``test_zero_sharding``."""
+    os.environ.update(RANK=str(rank), WORLD_SIZE=str(world_size), LOCAL_RANK=str(rank),
+                      MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port))
+    init_distributed()
+    try:
+        dataset = TokenDataset(os.path.join(tmp, "tokens.bin"),
+                               TINY_CONFIG["context_length"])
+        results = {}
+        for stage in (0, 1, 2):
+            torch.manual_seed(0)
+            model = gpt.GPTModel(TINY_CONFIG)
+            config = TrainingConfig(max_steps=3, learning_rate=1e-2, warmup_steps=1,
+                                    grad_accum_steps=2, max_grad_norm=0.5,
+                                    log_interval=0, peak_flops=1e9, zero_stage=stage)
+            trainer = Trainer(model, create_dataloader(dataset, batch_size=4, seed=0),
+                              config)
+            trainer.train()
+            params = torch.cat([p.detach().flatten() for p in model.parameters()])
+            if isinstance(trainer.optimizer, ZeroOptimizer):
+                state_bytes = trainer.optimizer.state_bytes()
+            else:
+                state_bytes = sum(t.nbytes for st in trainer.optimizer.state.values()
+                                  for t in st.values() if torch.is_tensor(t))
+            results[stage] = (params, state_bytes)
+            trainer.save_checkpoint(os.path.join(tmp, f"zero{stage}.pth"))
+
+        for stage in (1, 2):
+            diff = (results[stage][0] - results[0][0]).abs().max().item()
+            assert diff < 1e-5, f"ZeRO-{stage} diverged from DDP by {diff}"
+            ratio = results[stage][1] / results[0][1]
+            assert 0.4 < ratio < 0.6, f"ZeRO-{stage} keeps {ratio:.0%} of the state"
+        if rank == 0:
+            torch.save({stage: r[1] for stage, r in results.items()},
+                       os.path.join(tmp, "state_bytes.pth"))
+    finally:
+        cleanup_distributed()
+
+
+def test_zero_sharding():
+    """Test ZeRO-1/2 against plain DDP on two ranks."""
+    print("\n=== Testing ZeRO Sharded Optimizer ===")
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save_tokens([(i * 7) % 50 for i in range(3000)], os.path.join(tmp, "tokens.bin"))
+        mp.spawn(_zero_rank, args=(2, port, tmp), nprocs=2, join=True)
+
+        state_bytes = torch.load(os.path.join(tmp, "state_bytes.pth"))
+        shards = torch.load(os.path.join(tmp, "zero2.pth"),
+                            weights_only=False)["optimizer"]["shards"]
+        assert len(shards) == 2, "Rank 0 should gather both optimizer shards"
+        print("Optimizer state on rank 0: " + ", ".join(
+            f"stage {stage} {nbytes / 1024:.0f} KB" for stage, nbytes in state_bytes.items()))
+
+
+def test_resumable_checkpoints():
+    """Test that stopping and resuming reproduces an uninterrupted run."""
+    print("\n=== Testing Resumable Checkpoints ===")
+
+    cfg = dict(TINY_CONFIG, drop_rate=0.1)  # Dropout makes the RNG state matter
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tokens.bin")
+        save_tokens([(i * 7) % 50 for i in range(2000)], path)
+        dataset = TokenDataset(path, cfg["context_length"])
+
+        def make_trainer(checkpoint_dir=None):
+            torch.manual_seed(0)
+            model = gpt.GPTModel(cfg)
+            config = TrainingConfig(max_steps=12, learning_rate=1e-2, warmup_steps=2,
+                                    grad_accum_steps=2, log_interval=0, peak_flops=1e9,
+                                    checkpoint_dir=checkpoint_dir, checkpoint_interval=5,
+                                    keep_checkpoints=2)
+            return Trainer(model, create_dataloader(dataset, batch_size=8, seed=0), config)
+
+        reference = make_trainer()
+        expected = [s.loss for s in reference.train()]
+
+        # Interrupted run: steps 0-9 save at 5 and 10, then "crash"
+        checkpoint_dir = os.path.join(tmp, "checkpoints")
+        first = make_trainer(checkpoint_dir)
+        first.train(max_steps=10)
+        saved = list_checkpoints(checkpoint_dir)
+        assert [os.path.basename(p) for p in saved] == ["step_00000005.pt",
+                                                       "step_00000010.pt"], saved
+        assert not [f for f in os.listdir(checkpoint_dir) if f.endswith(".tmp")]
+
+        # Resume from step 5 (mid-epoch: 7 steps per epoch) in a fresh trainer
+        os.remove(saved[-1])
+        resumed = make_trainer(checkpoint_dir)
+        torch.manual_seed(999)  # Must be overridden by the restored RNG state
+        assert resumed.resume() and resumed.step == 5 and resumed.batch_in_epoch == 10
+        losses = [s.loss for s in resumed.train()]
+
+        assert losses == expected[5:], (losses, expected[5:])
+        for p, q in zip(resumed.model.parameters(), reference.model.parameters()):
+            assert torch.equal(p, q), "Resumed weights differ from the reference run"
+        print(f"Resumed mid-epoch at step 5; steps 5-11 match exactly; "
+              f"kept {len(list_checkpoints(checkpoint_dir))} checkpoints")
+
+
+def test_packing():
+    """Test packed rows against unpacked documents, and length bucketing."""
+    print("\n=== Testing Packing and Length Buckets ===")
+
+    torch.manual_seed(0)
+    model = gpt.GPTModel(TINY_CONFIG).eval()
+    eot = 49
+    documents = [torch.randint(0, 49, (n,)) for n in (5, 3, 7)]  # 18 tokens with EOTs
+    input_ids, target_ids, model_inputs = PackingCollator(16, eot_id=eot)(documents)
+    assert input_ids.shape == (2, 16), input_ids.shape
+    assert model_inputs["position_ids"][0, :8].tolist() == [0, 1, 2, 3, 4, 5, 0, 1]
+    assert target_ids[0, 5] == -100, "Target across a document boundary must be ignored"
+
+    with torch.no_grad():
+        packed = model(input_ids, **model_inputs)
+        start = 0
+        for doc in documents[:2]:  # Both fit entirely in the first row
+            alone = model(doc.unsqueeze(0))
+            assert torch.allclose(packed[0, start:start + len(doc)], alone[0], atol=1e-5)
+            start += len(doc) + 1
+
+    plain = PackingCollator(16, eot_id=eot, reset_positions=False, mask_documents=False)
+    assert len(plain(documents)) == 2, "Plain packing needs no extra model inputs"
+
+    _, padded_targets = PaddingCollator(16, pad_id=eot)(documents)
+    assert padded_targets.shape == (3, 6)
+    assert abs(padding_ratio(padded_targets) - 6 / 18) < 1e-6
+    print(f"Packed {len(documents)} documents into {len(input_ids)} rows; "
+          f"logits match each document run alone")
+
+    lengths = torch.randint(1, 200, (500,)).tolist()
+    sampler = LengthBucketSampler(lengths, batch_size=8, bucket_size=80, seed=1)
+    batches = list(sampler)
+    assert sorted(i for b in batches for i in b) == list(range(500))
+
+    def waste(batches):
+        return sum(len(b) * max(lengths[i] for i in b) - sum(lengths[i] for i in b)
+                   for b in batches)
+
+    random_batches = torch.randperm(500).split(8)
+    assert waste(batches) < waste([b.tolist() for b in random_batches]) / 4
+    sampler.set_start_index(10)
+    assert list(sampler) == batches[10:], "Resumed epoch should skip consumed batches"
+    shards = [list(LengthBucketSampler(lengths, 8, 80, seed=1, num_replicas=2, rank=r))
+              for r in range(2)]
+    assert not set(map(tuple, shards[0])) & set(map(tuple, shards[1]))
+
+    config = TrainingConfig(max_steps=2, log_interval=0, peak_flops=1e9)
+    loader = create_dataloader(documents * 4, batch_size=4, seed=0,
+                               collate_fn=PackingCollator(16, eot_id=eot))
+    stats = Trainer(model, loader, config).train()
+    assert stats[-1].tokens < 2 * 16, "Ignored targets must not count as tokens"
+    print(f"Bucketed padding {waste(batches)} vs random "
+          f"{waste([b.tolist() for b in random_batches])} tokens; packed training OK")
+
+
+def test_corpus_evaluation():
+    """Test strided streaming evaluation against a direct computation."""
+    print("\n=== Testing Corpus Evaluation ===")
+
+    for stride in (16, 5, 1):
+        windows = metrics.sliding_windows(300, 16, stride)
+        scored = [i for _, end, score_from in windows for i in range(score_from, end)]
+        assert scored == list(range(299)), f"Stride {stride} scores some tokens twice"
+    # Windows are computed from their index; the sequence holds no list
+    windows = metrics.sliding_windows(10 ** 12, 1024, 512)
+    assert len(windows) == (10 ** 12 - 1 - 1024) // 512 + 2
+    assert windows[-1][1] == 10 ** 12 - 1 and windows[-1][2] == windows[-2][1]
+    assert windows[3:5] == [windows[3], windows[4]]
+    assert len(metrics.sliding_windows(1, 16)) == 0
+
+    torch.manual_seed(0)
+    model = gpt.GPTModel(TINY_CONFIG).eval()
+    tokens = torch.randint(0, 50, (300,))
+    with torch.no_grad():
+        expected = sum(torch.nn.functional.cross_entropy(
+            model(tokens[begin:end][None])[0, score_from - begin:],
+            tokens[score_from + 1:end + 1], reduction="sum").item()
+            for begin, end, score_from in metrics.sliding_windows(300, 16, 4)) / 299
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.bin")
+        save_tokens(tokens.tolist(), path)
+        result = metrics.evaluate_corpus(model, path, context_length=16, stride=4,
+                                         batch_size=7)
+        assert result.tokens == 299 and abs(result.loss - expected) < 1e-5, result
+        early = metrics.evaluate_corpus(model, path, context_length=16, batch_size=4,
+                                        max_batches=2)
+        assert early.batches == 2 and early.tokens == 2 * 4 * 16, early
+    print(f"stride 4: loss {result.loss:.4f} over {result.tokens} tokens "
+          f"(perplexity {result.perplexity:.2f}); early stop after {early.tokens} tokens")
+
+
+def test_profiling_from_env():
+    """Test that the trainer profiles itself when BUILD_LLM_PROFILE is set."""
+    print("\n=== Testing Profiling From Environment ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tokens.bin")
+        save_tokens([i % 10 for i in range(500)], path)
+        loader = create_dataloader(TokenDataset(path, TINY_CONFIG["context_length"]),
+                                   batch_size=4, seed=0)
+        trace = os.path.join(tmp, "trace.json")
+        os.environ[gpt.PROFILE_ENV] = trace
+        try:
+            trainer = Trainer(gpt.GPTModel(TINY_CONFIG), loader,
+                              TrainingConfig(max_steps=3, grad_accum_steps=2, log_interval=0))
+        finally:
+            del os.environ[gpt.PROFILE_ENV]
+        trainer.train()
+        profiler = trainer.profiler
+        profiler.detach()  # Writes the trace and summary (otherwise at exit)
+
+        root = profiler.stats()[0]
+        assert profiler.steps == 3 and root.calls == 3 * 2, (profiler.steps, root.calls)
+        assert root.backward_time > 0
+        assert os.path.getsize(trace) > 0 and os.path.exists(os.path.join(tmp, "trace.txt"))
+        assert Trainer(gpt.GPTModel(TINY_CONFIG), loader, TrainingConfig(
+            max_steps=1, log_interval=0)).profiler is None
+        print(f"{profiler.steps} steps, {root.calls} forward passes profiled, "
+              f"trace {os.path.getsize(trace) / 1024:.0f} KB")
+
+
+def main():
+    """Run all tests."""
+    print("🧪 Starting Training Tests")
+    print("=" * 50)
+
+    try:
+        test_token_dataset()
+        test_cosine_schedule()
+        test_gradient_accumulation()
+        test_training_reduces_loss()
+        test_data_parallel()
+        test_zero_sharding()
+        test_resumable_checkpoints()
+        test_packing()
+        test_corpus_evaluation()
+        test_profiling_from_env()
+
+        print("\n✅ All tests completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Training entry point, single- or multi-process.
+
+Runs as a plain script or under ``torchrun``; with ``--nproc-per-node`` above
+1 it starts ``torchrun`` itself. Every process trains a data-parallel replica
+on its shard of the token file, and rank 0 logs and saves the checkpoint.
+
+Run from the repository root:
+    python -m src.modules.06_training.train --steps 100
+    python -m src.modules.06_training.train --steps 100 --save-model model.safetensors --save-vocab vocabulary.txt
+    python -m src.modules.06_training.train --nproc-per-node 4 --data tokens.bin --vocab-size 50257
+    torchrun --standalone --nproc-per-node 4 -m src.modules.06_training.train
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from importlib import import_module
+from typing import List, Optional
+
+import torch
+
+from .data_loader import TokenDataset, create_dataloader, save_tokens
+from .distributed import cleanup_distributed, init_distributed, is_main_process
+from .training_loop import StepStats, Trainer, TrainingConfig
+
+tokenization = import_module("..01_tokenization.build_vocabulary", __package__)
+gpt = import_module("..05_gpt_model", __package__)
+
+# Small enough to train on one CPU core in minutes
+VERDICT_CPU_CONFIG = {
+    "context_length": 128,
+    "emb_dim": 256,
+    "n_heads": 4,
+    "n_layers": 4,
+    "drop_rate": 0.1,
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description="Train a GPT model")
+    parser.add_argument("--nproc-per-node", type=int, default=1,
+                        help="Processes to start via torchrun (data parallel)")
+    parser.add_argument("--data", help="Token file written by save_tokens "
+                        "(defaults to the-verdict.txt tokenized on the fly)")
+    parser.add_argument("--vocab-size", type=int, help="Vocabulary size of --data")
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=8, help="Per-process batch size")
+    parser.add_argument("--grad-accum", type=int, default=1)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--precision", choices=["fp32", "bf16"], default="fp32")
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--bucket-cap-mb", type=float, default=25.0)
+    parser.add_argument("--log-interval", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=123)
+    parser.add_argument("--checkpoint", help="Where rank 0 saves the final state")
+    parser.add_argument("--save-model", help="Where rank 0 saves the trained model "
+                        "for inference (safetensors, see load_model)")
+    parser.add_argument("--dedup", action="store_true", help="Remove near-duplicate "
+                        "paragraphs of the-verdict.txt before tokenizing (without --data)")
+    parser.add_argument("--save-vocab", help="Where to save the vocabulary built "
+                        "from the-verdict.txt (without --data)")
+    args = parser.parse_args(argv)
+    if args.data and not args.vocab_size:
+        parser.error("--vocab-size is required with --data")
+    return args
+
+
+def launch(args: argparse.Namespace, argv: List[str]) -> None:
+    """Re-run this module under torchrun with ``args.nproc_per_node`` processes."""
+    command = [sys.executable, "-m", "torch.distributed.run", "--standalone",
+               f"--nproc-per-node={args.nproc_per_node}", "-m", __spec__.name]
+    # Drop the launcher option so the workers run the training itself
+    passthrough, skip = [], False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == "--nproc-per-node":
+            skip = True
+        elif not arg.startswith("--nproc-per-node="):
+            passthrough.append(arg)
+    subprocess.run(command + passthrough, check=True)
+
+
+def train(args: argparse.Namespace) -> List[StepStats]:
+    """
+    Train on this process's shard and return its telemetry.
+
+    Args:
+        args: Parsed command line
+
+    Returns:
+        Telemetry of every step
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path, vocab_size = args.data, args.vocab_size
+        if path is None:
+            with open("the-verdict.txt", "r", encoding="utf-8") as f:
+                text = f.read()
+            if args.dedup:
+                text = tokenization.remove_duplicates(text)
+            tokens = tokenization.preprocess_text(text)
+            vocab = tokenization.build_vocabulary(tokens)
+            path, vocab_size = os.path.join(tmp, "the-verdict.bin"), len(vocab)
+            save_tokens([vocab[t] for t in tokens], path)
+            if args.save_vocab and is_main_process():
+                tokenization.save_vocabulary(vocab, args.save_vocab)
+
+        cfg = gpt.get_config("124M", vocab_size=vocab_size, **VERDICT_CPU_CONFIG)
+        torch.manual_seed(args.seed)  # Same initial weights on every rank
+        model = gpt.GPTModel(cfg)
+        dataset = TokenDataset(path, cfg["context_length"])
+        loader = create_dataloader(dataset, args.batch_size, seed=args.seed)
+        config = TrainingConfig(max_steps=args.steps, learning_rate=args.lr,
+                                min_learning_rate=args.lr / 10,
+                                warmup_steps=min(100, args.steps // 10),
+                                grad_accum_steps=args.grad_accum,
+                                precision=args.precision, compile=args.compile,
+                                bucket_cap_mb=args.bucket_cap_mb,
+                                log_interval=args.log_interval)
+        trainer = Trainer(model, loader, config)
+        history = trainer.train()
+        if args.checkpoint:
+            trainer.save_checkpoint(args.checkpoint)
+        if args.save_model and is_main_process():
+            gpt.save_model(model, args.save_model)
+    return history
+
+
+def main(argv: Optional[List[str]] = None):
+    """Train, launching torchrun first if several processes are requested."""
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.nproc_per_node > 1 and "RANK" not in os.environ:
+        launch(args, argv)
+        return
+
+    _, world_size = init_distributed()
+    try:
+        if is_main_process():
+            print(f"Training with {world_size} process(es), "
+                  f"{torch.get_num_threads()} thread(s) each")
+        train(args)
+    finally:
+        cleanup_distributed()
+
+
+if __name__ == "__main__":
+    main()
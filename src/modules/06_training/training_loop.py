@@ -0,0 +1,572 @@
+"""
+Training loop for GPT models.
+
+``Trainer`` runs optimizer steps made of several micro-batches (gradient
+accumulation), optionally under bf16 autocast and ``torch.compile``, with
+gradient clipping and a cosine learning-rate schedule with linear warmup.
+Every step reports throughput, where the time went (data loading, forward,
+backward, optimizer) and the model FLOPs utilization (MFU): the fraction of
+the hardware's peak FLOP rate spent on the model's own matmuls.
+
+Started under ``torchrun`` with several processes, the trainer wraps the
+model in ``DistributedDataParallel``: gradients are all-reduced in buckets
+while the backward pass is still running, and only rank 0 logs and writes
+checkpoints. ``zero_stage`` shards the optimizer state (stage 1) and also the
+gradients (stage 2) across the ranks (see ``zero.py``).
+
+Checkpoints hold the model, optimizer, RNG states and the position in the
+data, so training resumes at exactly the next sample. Periodic checkpoints
+are written on a background thread (see ``checkpointing.py``).
+
+Setting ``BUILD_LLM_PROFILE=trace.json`` adds a per-layer profile (see
+``05_gpt_model/profiler.py``) without changing the training script.
+"""
+
+import contextlib
+import math
+import time
+from dataclasses import dataclass
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import torch
+import torch.distributed as dist
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader
+
+from .checkpointing import (
+    AsyncCheckpointer, atomic_save, capture_rng_state, latest_checkpoint,
+    restore_rng_state,
+)
+from .distributed import (
+    all_reduce_mean, barrier, get_rank, get_world_size, is_distributed,
+    is_main_process,
+)
+from .loss_functions import IGNORE_INDEX, calc_loss_batch, calc_loss_loader
+from .zero import ZeroOptimizer
+
+_gpt = import_module("..05_gpt_model", __package__)
+estimate_flops_per_token = _gpt.estimate_flops_per_token
+profile_from_env = _gpt.profile_from_env
+
+PRECISIONS = ("fp32", "bf16")
+
+
+@dataclass
+class TrainingConfig:
+    """
+    Optimization settings for ``Trainer``.
+
+    Attributes:
+        max_steps: Optimizer steps to run (also the end of the LR schedule)
+        learning_rate: Peak learning rate reached after warmup
+        min_learning_rate: Final learning rate of the cosine decay
+        warmup_steps: Steps of linear warmup from 0
+        weight_decay: AdamW weight decay (applied to matrices only)
+        betas: AdamW betas
+        grad_accum_steps: Micro-batches per optimizer step
+        max_grad_norm: Clip the global gradient norm (0 disables clipping)
+        precision: ``"fp32"`` or ``"bf16"`` (autocast; weights stay fp32)
+        compile: Run the model through ``torch.compile``
+        log_interval: Print telemetry every this many steps (0 disables)
+        eval_interval: Evaluate on the validation loader every this many steps
+        eval_batches: Validation batches per evaluation
+        peak_flops: Hardware peak FLOP/s per process for MFU (measured when None)
+        bucket_cap_mb: Gradient bucket size for data-parallel all-reduce;
+            smaller buckets start communicating earlier in the backward pass
+        zero_stage: 0 for plain data parallelism, 1 to shard the optimizer
+            state across ranks, 2 to shard gradients as well
+        checkpoint_dir: Directory for periodic checkpoints (None disables them)
+        checkpoint_interval: Save every this many steps (0 disables)
+        keep_checkpoints: Number of periodic checkpoints to keep
+        async_checkpoint: Write periodic checkpoints on a background thread
+        device: Device to train on
+    """
+
+    max_steps: int = 1000
+    learning_rate: float = 4e-4
+    min_learning_rate: float = 4e-5
+    warmup_steps: int = 100
+    weight_decay: float = 0.1
+    betas: Tuple[float, float] = (0.9, 0.95)
+    grad_accum_steps: int = 1
+    max_grad_norm: float = 1.0
+    precision: str = "fp32"
+    compile: bool = False
+    log_interval: int = 10
+    eval_interval: int = 0
+    eval_batches: int = 10
+    peak_flops: Optional[float] = None
+    bucket_cap_mb: float = 25.0
+    zero_stage: int = 0
+    checkpoint_dir: Optional[str] = None
+    checkpoint_interval: int = 0
+    keep_checkpoints: int = 3
+    async_checkpoint: bool = True
+    device: str = "cpu"
+
+
+@dataclass
+class StepStats:
+    """
+    Telemetry for one optimizer step (times in seconds).
+
+    ``loss``, ``tokens`` and ``tokens_per_sec`` cover all ranks; the times
+    are those of the local process. Only tokens with a target count, so
+    padding does not inflate the throughput (or the MFU). ``checkpoint_time`` is how long the step
+    was blocked by saving a checkpoint.
+    """
+
+    step: int
+    loss: float
+    lr: float
+    grad_norm: float
+    tokens: int
+    data_time: float
+    forward_time: float
+    backward_time: float
+    optimizer_time: float
+    tokens_per_sec: float
+    mfu: float
+    checkpoint_time: float = 0.0
+
+    @property
+    def step_time(self) -> float:
+        """Wall time of the whole step."""
+        return (self.data_time + self.forward_time + self.backward_time
+                + self.optimizer_time + self.checkpoint_time)
+
+
+def cosine_lr(step: int, max_lr: float, min_lr: float, warmup_steps: int,
+              max_steps: int) -> float:
+    """
+    Learning rate with linear warmup followed by cosine decay.
+
+    Args:
+        step: Current optimizer step (0-based)
+        max_lr: Learning rate at the end of warmup
+        min_lr: Learning rate at ``max_steps`` and after
+        warmup_steps: Number of warmup steps
+        max_steps: Step at which the decay reaches ``min_lr``
+
+    Returns:
+        Learning rate for ``step``
+    """
+    if step < warmup_steps:
+        return max_lr * (step + 1) / warmup_steps
+    if step >= max_steps:
+        return min_lr
+    progress = (step - warmup_steps) / max(1, max_steps - warmup_steps)
+    return min_lr + 0.5 * (max_lr - min_lr) * (1 + math.cos(math.pi * progress))
+
+
+def measure_peak_flops(dtype: torch.dtype = torch.float32, size: int = 1024,
+                       repeats: int = 5, device: str = "cpu") -> float:
+    """
+    Measure the achievable matmul FLOP rate, used as the MFU denominator.
+
+    Args:
+        dtype: Matmul dtype
+        size: Side length of the square matrices
+        repeats: Timed repetitions (the best one is kept)
+        device: Device to measure
+
+    Returns:
+        FLOP/s of the fastest repetition
+    """
+    a = torch.randn(size, size, device=device).to(dtype)
+    b = torch.randn(size, size, device=device).to(dtype)
+    a @ b  # Warm up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        a @ b
+        best = min(best, time.perf_counter() - start)
+    return 2 * size ** 3 / best
+
+
+class Trainer:
+    """
+    Train a language model on (input_ids, target_ids) batches.
+
+    A batch may carry a third element, a dict of extra model inputs (the
+    ``position_ids`` and ``document_ids`` of a ``PackingCollator``).
+
+    In a multi-process group (see ``distributed.py``) the model is wrapped in
+    ``DistributedDataParallel`` and each rank should get its own shard of the
+    data, e.g. from ``create_dataloader``.
+
+    Args:
+        model: Model to train (a ``GPTModel`` for MFU reporting)
+        train_loader: Loader over the training set; it is cycled for as many
+            epochs as ``max_steps`` needs
+        config: Optimization settings
+        val_loader: Optional validation loader
+        optimizer: Optimizer to use instead of the default AdamW
+
+    Example:
+        >>> trainer = Trainer(model, create_dataloader(dataset, batch_size=8),
+        ...                   TrainingConfig(max_steps=200, precision="bf16"))
+        >>> history = trainer.train()
+    """
+
+    def __init__(self, model: nn.Module, train_loader: DataLoader,
+                 config: Optional[TrainingConfig] = None,
+                 val_loader: Optional[DataLoader] = None,
+                 optimizer: Optional[torch.optim.Optimizer] = None):
+        """Set up the optimizer, compiled model and FLOP accounting."""
+        self.config = config or TrainingConfig()
+        if self.config.precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}, "
+                             f"got '{self.config.precision}'")
+        if len(train_loader) == 0:
+            raise ValueError("train_loader yields no batches; use a smaller batch "
+                             "size or more data (per rank when distributed)")
+        self.device = torch.device(self.config.device)
+        self.model = model.to(self.device)
+        # Per-layer profile when BUILD_LLM_PROFILE is set (hooks go on the bare model)
+        self.profiler = profile_from_env(self.model)
+        self.train_loader = train_loader
+        self.val_loader = val_loader
+        self.optimizer = optimizer or self._build_optimizer()
+
+        self.rank, self.world_size = get_rank(), get_world_size()
+        # ZeRO-2 reduces gradients itself, straight to their owning rank
+        if self.world_size > 1 and self.config.zero_stage < 2:
+            self.ddp_model: nn.Module = DistributedDataParallel(
+                self.model, bucket_cap_mb=self.config.bucket_cap_mb,
+                gradient_as_bucket_view=True)
+        else:
+            self.ddp_model = self.model
+        self.forward_model = (torch.compile(self.ddp_model) if self.config.compile
+                              else self.ddp_model)
+
+        self.step = 0
+        self.epoch = 0
+        self.batch_in_epoch = 0
+        self._batches: Optional[Iterator] = None
+        self.checkpointer = None
+        if self.config.checkpoint_dir and is_main_process():
+            self.checkpointer = AsyncCheckpointer(self.config.checkpoint_dir,
+                                                  self.config.keep_checkpoints,
+                                                  self.config.async_checkpoint)
+
+        cfg = getattr(model, "cfg", None)
+        self.model_cfg = cfg
+        # At the full context length; steps count FLOPs at their batches' length
+        self.flops_per_token = estimate_flops_per_token(cfg) if cfg else 0
+        if self.config.peak_flops is None and self.flops_per_token:
+            dtype = torch.bfloat16 if self.config.precision == "bf16" else torch.float32
+            self.config.peak_flops = measure_peak_flops(dtype, device=self.config.device)
+
+    def _build_optimizer(self) -> torch.optim.Optimizer:
+        """AdamW with weight decay on matrices only (not biases, norms)."""
+        params = [p for p in self.model.parameters() if p.requires_grad]
+        groups = [
+            {"params": [p for p in params if p.dim() >= 2],
+             "weight_decay": self.config.weight_decay},
+            {"params": [p for p in params if p.dim() < 2], "weight_decay": 0.0},
+        ]
+        if self.config.zero_stage:
+            return ZeroOptimizer(groups, stage=self.config.zero_stage,
+                                 lr=self.config.learning_rate, betas=self.config.betas)
+        return torch.optim.AdamW(groups, lr=self.config.learning_rate,
+                                 betas=self.config.betas)
+
+    def _next_batch(self) -> Tuple:
+        """Next training batch, starting a new epoch when the loader runs out."""
+        if self._batches is None:
+            self._start_epoch(skip_batches=self.batch_in_epoch)
+        try:
+            batch = next(self._batches)
+        except StopIteration:
+            self.epoch += 1
+            self._start_epoch()
+            batch = next(self._batches)
+        self.batch_in_epoch += 1
+        return batch
+
+    def _start_epoch(self, skip_batches: int = 0) -> None:
+        """Start ``self.epoch``, skipping batches already consumed before a resume."""
+        sampler = getattr(self.train_loader, "sampler", None)
+        batch_sampler = getattr(self.train_loader, "batch_sampler", None)
+        for s in (sampler, batch_sampler):
+            if hasattr(s, "set_epoch"):
+                s.set_epoch(self.epoch)  # Reshuffle (the shards, when distributed)
+        if hasattr(batch_sampler, "set_start_index"):
+            # Samplers of whole batches, e.g. ``LengthBucketSampler``
+            batch_sampler.set_start_index(skip_batches)
+            self._batches = iter(self.train_loader)
+        elif hasattr(sampler, "set_start_index"):
+            sampler.set_start_index(skip_batches * self.train_loader.batch_size)
+            self._batches = iter(self.train_loader)
+        else:
+            self._batches = iter(self.train_loader)
+            for _ in range(skip_batches):
+                next(self._batches)
+        self.batch_in_epoch = skip_batches
+
+    def _autocast(self):
+        return torch.autocast(self.device.type, dtype=torch.bfloat16,
+                              enabled=self.config.precision == "bf16")
+
+    def aux_loss(self) -> Optional[torch.Tensor]:
+        """Auxiliary loss of the last forward pass (``GPTModel.aux_loss``), if any."""
+        aux_loss = getattr(self.model, "aux_loss", None)
+        return aux_loss() if callable(aux_loss) else None
+
+    def train_step(self) -> StepStats:
+        """
+        Run one optimizer step over ``grad_accum_steps`` micro-batches.
+
+        Returns:
+            Telemetry for the step
+        """
+        cfg = self.config
+        self.model.train()
+        lr = cosine_lr(self.step, cfg.learning_rate, cfg.min_learning_rate,
+                       cfg.warmup_steps, cfg.max_steps)
+        for group in self.optimizer.param_groups:
+            group["lr"] = lr
+
+        # Fetch the whole accumulation window first: the loss is normalized by
+        # its number of target tokens (over all ranks), so that masked or
+        # padded targets weigh the same as in one large batch
+        start = time.perf_counter()
+        batches, tokens, flops = [], 0, 0
+        for _ in range(cfg.grad_accum_steps):
+            input_batch, target_batch, *extra = self._next_batch()
+            input_batch = input_batch.to(self.device)
+            target_batch = target_batch.to(self.device)
+            model_inputs = {name: t.to(self.device) for name, t in extra[0].items()
+                            } if extra else None
+            batch_tokens = int((target_batch != IGNORE_INDEX).sum())
+            tokens += batch_tokens
+            if self.flops_per_token:
+                flops += batch_tokens * estimate_flops_per_token(
+                    self.model_cfg, seq_len=input_batch.shape[1])
+            batches.append((input_batch, target_batch, model_inputs))
+        # DDP and ZeRO average gradients over ranks, hence the world size
+        global_tokens = round(all_reduce_mean(float(tokens)) * self.world_size)
+        scale = self.world_size / global_tokens if global_tokens else 0.0
+        data_time = time.perf_counter() - start
+
+        forward_time = backward_time = 0.0
+        total_loss = 0.0
+        for micro_step, (input_batch, target_batch, model_inputs) in enumerate(batches):
+            # All-reduce gradients only on the last micro-batch of the step
+            sync = (micro_step == cfg.grad_accum_steps - 1
+                    or not isinstance(self.ddp_model, DistributedDataParallel))
+            start = time.perf_counter()
+            with contextlib.nullcontext() if sync else self.ddp_model.no_sync():
+                with self._autocast():
+                    loss_sum = calc_loss_batch(input_batch, target_batch,
+                                               self.forward_model,
+                                               model_inputs=model_inputs,
+                                               reduction="sum")
+                    # Mixture-of-experts load balancing; logged loss stays the LM loss
+                    aux_loss = self.aux_loss()
+                forward_end = time.perf_counter()
+
+                objective = loss_sum * scale
+                if aux_loss is not None:
+                    objective = objective + aux_loss / cfg.grad_accum_steps
+                objective.backward()
+                backward_end = time.perf_counter()
+
+            total_loss += loss_sum.item()
+            forward_time += forward_end - start
+            backward_time += backward_end - forward_end
+
+        start = time.perf_counter()
+        if cfg.max_grad_norm > 0 and isinstance(self.optimizer, ZeroOptimizer):
+            grad_norm = self.optimizer.clip_grad_norm_(cfg.max_grad_norm)
+        elif cfg.max_grad_norm > 0:
+            grad_norm = torch.nn.utils.clip_grad_norm_(self.model.parameters(),
+                                                       cfg.max_grad_norm).item()
+        else:
+            grad_norm = float("nan")
+        self.optimizer.step()
+        self.optimizer.zero_grad(set_to_none=True)
+        optimizer_time = time.perf_counter() - start
+        if self.profiler is not None:
+            self.profiler.step()
+
+        step_time = data_time + forward_time + backward_time + optimizer_time
+        tokens *= self.world_size
+        tokens_per_sec = tokens / step_time
+        # Every rank runs batches of the same shape
+        mfu = (flops / step_time / cfg.peak_flops
+               if self.flops_per_token and cfg.peak_flops else 0.0)
+        # Mean over every target token of the step (0 when all were masked)
+        loss = all_reduce_mean(total_loss) * self.world_size / max(global_tokens, 1)
+        stats = StepStats(self.step, loss, lr, grad_norm, tokens, data_time,
+                          forward_time, backward_time, optimizer_time,
+                          tokens_per_sec, mfu)
+        self.step += 1
+        return stats
+
+    @torch.no_grad()
+    def evaluate(self, data_loader: Optional[DataLoader] = None,
+                 num_batches: Optional[int] = None) -> float:
+        """
+        Average loss on a data loader (the validation loader by default).
+
+        Args:
+            data_loader: Loader to evaluate on
+            num_batches: Batches to use (defaults to ``config.eval_batches``)
+
+        Returns:
+            Average loss (over all ranks)
+        """
+        data_loader = data_loader or self.val_loader
+        if data_loader is None:
+            raise ValueError("No data loader to evaluate on")
+        self.model.eval()
+        with self._autocast():
+            loss = calc_loss_loader(data_loader, self.forward_model, self.device,
+                                    num_batches or self.config.eval_batches)
+        return all_reduce_mean(loss)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        Model, optimizer, RNG states of every rank and the data position.
+
+        Gathers per-rank state on rank 0 when distributed, so it must be
+        called on every rank.
+        """
+        rng = [capture_rng_state()]
+        if is_distributed():
+            rng = [None] * self.world_size if self.rank == 0 else None
+            dist.gather_object(capture_rng_state(), rng, dst=0)
+        return {
+            "model": self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "step": self.step,
+            "epoch": self.epoch,
+            "batch_in_epoch": self.batch_in_epoch,
+            "rng": rng,
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restore the state returned by ``state_dict``."""
+        self.model.load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.step, self.epoch = state["step"], state["epoch"]
+        self.batch_in_epoch = state.get("batch_in_epoch", 0)
+        if state.get("rng"):
+            if len(state["rng"]) != self.world_size:
+                raise ValueError(f"Checkpoint has RNG states for {len(state['rng'])} "
+                                 f"ranks, resuming with {self.world_size}")
+            restore_rng_state(state["rng"][self.rank])
+        self._batches = None  # Resume at batch_in_epoch of the saved epoch
+
+    def save_checkpoint(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Save the training state from rank 0 (replicas are identical).
+
+        Without ``path`` the state goes to ``config.checkpoint_dir`` through
+        the background writer and this returns as soon as it is copied to CPU.
+
+        Args:
+            path: Destination file, written synchronously and atomically
+
+        Returns:
+            Path of the checkpoint on rank 0, None on other ranks
+        """
+        if path is None and self.config.checkpoint_dir is None:
+            raise ValueError("Pass a path or set config.checkpoint_dir")
+        state = self.state_dict()  # Collective when distributed
+        saved = None
+        if is_main_process():
+            if path is None:
+                saved = self.checkpointer.save(state, self.step)
+            else:
+                atomic_save(state, path)
+                saved = path
+        if path is not None:
+            barrier()  # The file exists once every rank returns
+        return saved
+
+    def load_checkpoint(self, path: str) -> None:
+        """
+        Restore the training state on every rank.
+
+        Args:
+            path: File written by ``save_checkpoint``
+        """
+        self.load_state_dict(torch.load(path, map_location=self.device,
+                                        weights_only=False))
+
+    def resume(self, directory: Optional[str] = None) -> bool:
+        """
+        Load the newest checkpoint of a directory, if there is one.
+
+        Args:
+            directory: Checkpoint directory (defaults to ``config.checkpoint_dir``)
+
+        Returns:
+            Whether a checkpoint was loaded
+        """
+        path = latest_checkpoint(directory or self.config.checkpoint_dir)
+        if path is not None:
+            self.load_checkpoint(path)
+        return path is not None
+
+    def wait_for_checkpoint(self) -> None:
+        """Block until the background checkpoint write (if any) has finished."""
+        if self.checkpointer is not None:
+            self.checkpointer.wait()
+
+    def train(self, max_steps: Optional[int] = None,
+              log: Callable[[str], None] = print) -> List[StepStats]:
+        """
+        Train until ``max_steps`` optimizer steps have run.
+
+        Args:
+            max_steps: Stop at this step (defaults to ``config.max_steps``)
+            log: Function receiving telemetry lines
+
+        Returns:
+            Telemetry of every step run by this call
+        """
+        cfg = self.config
+        max_steps = cfg.max_steps if max_steps is None else max_steps
+        history = []
+        while self.step < max_steps:
+            stats = self.train_step()
+            history.append(stats)
+            if cfg.checkpoint_interval and cfg.checkpoint_dir \
+                    and self.step % cfg.checkpoint_interval == 0:
+                start = time.perf_counter()
+                self.save_checkpoint()
+                stats.checkpoint_time = time.perf_counter() - start
+            if cfg.log_interval and is_main_process() and (
+                    stats.step % cfg.log_interval == 0 or self.step == max_steps):
+                log(format_stats(stats))
+            if cfg.eval_interval and self.val_loader is not None \
+                    and self.step % cfg.eval_interval == 0:
+                val_loss = self.evaluate()  # Every rank takes part
+                if is_main_process():
+                    log(f"step {stats.step:>5} | val loss {val_loss:.4f}")
+        self.wait_for_checkpoint()
+        return history
+
+
+def format_stats(stats: StepStats) -> str:
+    """
+    Format step telemetry as one log line.
+
+    Args:
+        stats: Telemetry of one step
+
+    Returns:
+        Line with loss, learning rate, throughput, time split and MFU
+    """
+    ms = {name: 1000 * getattr(stats, f"{name}_time")
+          for name in ("data", "forward", "backward", "optimizer")}
+    return (f"step {stats.step:>5} | loss {stats.loss:.4f} | lr {stats.lr:.2e} | "
+            f"{stats.tokens_per_sec:,.0f} tok/s | data {ms['data']:.1f} "
+            f"fwd {ms['forward']:.1f} bwd {ms['backward']:.1f} "
+            f"opt {ms['optimizer']:.1f} ms | MFU {stats.mfu:.1%}")
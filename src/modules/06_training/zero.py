@@ -0,0 +1,218 @@
+"""
+ZeRO-style sharded optimizer for data-parallel training.
+
+With plain data parallelism every rank holds the full AdamW state: two fp32
+tensors per parameter, twice the size of the model. ZeRO partitions it:
+
+- Stage 1: each rank keeps optimizer state only for the parameters it owns.
+  Gradients are still all-reduced in full (by DDP); after its local step each
+  owner broadcasts its updated parameters to the other ranks.
+- Stage 2: gradients are sharded too. As soon as a parameter's gradient is
+  ready in the backward pass it is reduced to the owning rank and freed
+  everywhere else, so no rank holds a full set of gradients.
+
+Only collectives supported by the ``gloo`` backend are used (``reduce``,
+``broadcast``, ``all_reduce``, ``gather_object``).
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import torch
+import torch.distributed as dist
+import torch.nn as nn
+
+from .distributed import get_rank, get_world_size, is_distributed
+
+ZERO_STAGES = (1, 2)
+
+
+def partition_parameters(params: List[nn.Parameter], world_size: int) -> List[int]:
+    """
+    Assign each parameter to a rank, balancing the number of elements.
+
+    Args:
+        params: Parameters in a fixed order (identical on every rank)
+        world_size: Number of ranks
+
+    Returns:
+        Owning rank of each parameter
+    """
+    owners = [0] * len(params)
+    loads = [0] * world_size
+    # Largest first keeps the shards balanced (greedy longest-processing-time)
+    for i in sorted(range(len(params)), key=lambda i: -params[i].numel()):
+        rank = loads.index(min(loads))
+        owners[i] = rank
+        loads[rank] += params[i].numel()
+    return owners
+
+
+class ZeroOptimizer:
+    """
+    AdamW whose state (and, in stage 2, gradients) is sharded across ranks.
+
+    Use it like a regular optimizer: ``zero_grad``, ``step`` and
+    ``param_groups`` (for learning-rate schedules) behave the same. With
+    stage 1 the model should be wrapped in DDP; with stage 2 it must not be,
+    since gradients are reduced by this class.
+
+    Args:
+        param_groups: Parameter groups as for ``torch.optim.AdamW``
+        stage: ZeRO stage, 1 (optimizer state) or 2 (+ gradients)
+        **defaults: AdamW arguments (``lr``, ``betas``, ``weight_decay``, ...)
+
+    Example:
+        >>> optimizer = ZeroOptimizer(model.parameters(), stage=2, lr=3e-4)
+        >>> loss.backward()   # Gradients are reduced to their owners here
+        >>> optimizer.step()  # Each rank updates its shard, then broadcasts it
+    """
+
+    def __init__(self, param_groups: Iterable[Any], stage: int = 1, **defaults: Any):
+        """Partition the parameters and build the local AdamW."""
+        if stage not in ZERO_STAGES:
+            raise ValueError(f"stage must be one of {ZERO_STAGES}, got {stage}")
+        groups = list(param_groups)
+        if groups and not isinstance(groups[0], dict):
+            groups = [{"params": groups}]
+        groups = [dict(group, params=list(group["params"])) for group in groups]
+
+        self.stage = stage
+        self.rank, self.world_size = get_rank(), get_world_size()
+        self.params: List[nn.Parameter] = [p for g in groups for p in g["params"]]
+        owners = partition_parameters(self.params, self.world_size)
+        self.owner: Dict[nn.Parameter, int] = dict(zip(self.params, owners))
+        self.shards: List[List[nn.Parameter]] = [
+            [p for p in self.params if self.owner[p] == rank]
+            for rank in range(self.world_size)]
+
+        # The local optimizer only ever sees (and allocates state for) our shard
+        local_groups = [dict(group, params=[p for p in group["params"]
+                                            if self.owner[p] == self.rank])
+                        for group in groups]
+        self.optimizer = torch.optim.AdamW(local_groups, **defaults)
+
+        self._grad_shards: Dict[nn.Parameter, torch.Tensor] = {}
+        if is_distributed():
+            # Start every replica from rank 0's weights, as DDP does
+            for p in self.params:
+                dist.broadcast(p.data, src=0)
+        if stage == 2:
+            for p in self.params:
+                p.register_post_accumulate_grad_hook(self._reduce_gradient)
+
+    @property
+    def param_groups(self) -> List[Dict[str, Any]]:
+        """Parameter groups of the local shard (set ``"lr"`` here)."""
+        return self.optimizer.param_groups
+
+    def _reduce_gradient(self, param: nn.Parameter) -> None:
+        """Stage 2 hook: send a finished gradient to its owner and free it."""
+        grad = param.grad
+        param.grad = None
+        if is_distributed():
+            dist.reduce(grad, dst=self.owner[param])
+        if self.owner[param] == self.rank:
+            # Accumulate across micro-batches in the owner's shard buffer
+            if param in self._grad_shards:
+                self._grad_shards[param] += grad
+            else:
+                self._grad_shards[param] = grad
+
+    def _finalize_gradients(self) -> None:
+        """Turn the reduced sums into averaged ``.grad`` of the owned parameters."""
+        if self.stage == 2:
+            for p, grad in self._grad_shards.items():
+                p.grad = grad.div_(self.world_size)
+            self._grad_shards = {}
+
+    def _broadcast_parameters(self) -> None:
+        """Send every shard from its owner to the other ranks, one flat buffer each."""
+        for rank, shard in enumerate(self.shards):
+            if not shard:
+                continue
+            flat = torch.cat([p.data.reshape(-1) for p in shard])
+            dist.broadcast(flat, src=rank)
+            if rank != self.rank:
+                offset = 0
+                for p in shard:
+                    p.data.copy_(flat[offset:offset + p.numel()].view_as(p))
+                    offset += p.numel()
+
+    def clip_grad_norm_(self, max_norm: float) -> float:
+        """
+        Clip gradients by the global norm over all shards.
+
+        Args:
+            max_norm: Maximum total gradient norm
+
+        Returns:
+            Total norm before clipping
+        """
+        self._finalize_gradients()
+        owned = [p.grad for p in self.shards[self.rank] if p.grad is not None]
+        sq_norm = torch.zeros((), dtype=torch.float64)
+        for grad in owned:
+            sq_norm += grad.detach().double().pow(2).sum()
+        if is_distributed():
+            dist.all_reduce(sq_norm)
+        total_norm = math.sqrt(sq_norm.item())
+        clip = max_norm / (total_norm + 1e-6)
+        if clip < 1:
+            for grad in owned:
+                grad.mul_(clip)
+        return total_norm
+
+    @torch.no_grad()
+    def step(self) -> None:
+        """Update the local shard, then share the new weights with every rank."""
+        self._finalize_gradients()
+        self.optimizer.step()
+        if is_distributed():
+            self._broadcast_parameters()
+
+    def zero_grad(self, set_to_none: bool = True) -> None:
+        """Clear the gradients of every parameter (not only the local shard)."""
+        for p in self.params:
+            if set_to_none:
+                p.grad = None
+            elif p.grad is not None:
+                p.grad.zero_()
+        self._grad_shards = {}
+
+    def state_bytes(self) -> int:
+        """Bytes of optimizer state held by this rank."""
+        return sum(t.nbytes for state in self.optimizer.state.values()
+                   for t in state.values() if torch.is_tensor(t))
+
+    def gradient_bytes(self) -> int:
+        """Bytes of gradients currently held by this rank."""
+        grads = sum(p.grad.nbytes for p in self.params if p.grad is not None)
+        return grads + sum(g.nbytes for g in self._grad_shards.values())
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        Gather the optimizer shards on rank 0 (collective: call on every rank).
+
+        Returns:
+            Dict with the stage, world size and, on rank 0, the list of shard
+            states (``None`` on the other ranks)
+        """
+        local = self.optimizer.state_dict()
+        shards: Optional[List[Any]] = [local]
+        if is_distributed():
+            shards = [None] * self.world_size if self.rank == 0 else None
+            dist.gather_object(local, shards, dst=0)
+        return {"stage": self.stage, "world_size": self.world_size, "shards": shards}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """
+        Restore this rank's shard from a state returned by ``state_dict``.
+
+        Args:
+            state: Gathered optimizer state (same world size)
+        """
+        if state["world_size"] != self.world_size:
+            raise ValueError(f"Optimizer state was saved with {state['world_size']} "
+                             f"ranks, cannot load it on {self.world_size}")
+        self.optimizer.load_state_dict(state["shards"][self.rank])
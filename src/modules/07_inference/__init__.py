@@ -0,0 +1,45 @@
+"""
+Inference module for generating text with a trained GPT model.
+
+This module provides sampling strategies that turn model logits into
+next-token choices for a whole batch of sequences at once, batched beam
+search, tensor-parallel sharding across local processes, an engine that
+generates and streams text (optionally with a different LoRA adapter per
+row), and a small SSE server for local testing.
+"""
+
+from .sampling_strategies import (
+    SamplingParams,
+    BatchedSampler,
+    sample_next_tokens,
+    apply_repetition_penalty,
+)
+from .beam_search import BeamHypotheses, BeamSearchOutput, beam_search
+from .text_generation import InferenceEngine
+from .multi_lora import AdapterBank, MultiLoRALinear
+from .tensor_parallel import (
+    RowParallelLinear,
+    load_tensor_parallel,
+    shard_model,
+    shard_state_dict,
+)
+from .server import start_server, format_sse
+
+__all__ = [
+    'SamplingParams',
+    'BatchedSampler',
+    'sample_next_tokens',
+    'apply_repetition_penalty',
+    'BeamHypotheses',
+    'BeamSearchOutput',
+    'beam_search',
+    'InferenceEngine',
+    'AdapterBank',
+    'MultiLoRALinear',
+    'RowParallelLinear',
+    'load_tensor_parallel',
+    'shard_model',
+    'shard_state_dict',
+    'start_server',
+    'format_sse',
+]
@@ -0,0 +1,195 @@
+"""
+Beam search over a batch of prompts.
+
+All beams of all prompts run as one batch of ``batch * num_beams`` rows, so
+each step is a single forward pass. When beams are pruned, the surviving
+rows are picked by index and the KV cache is reordered in place with the
+same index (``KVCache.reorder``) rather than cloned per beam. The prompt is
+prefilled once per prompt and then fanned out to its beams; since every
+beam of a prompt shares it, reordering only moves the generated tokens.
+"""
+
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+import torch
+
+
+@dataclass
+class BeamSearchOutput:
+    """
+    Finished hypotheses of a beam search.
+
+    Attributes:
+        sequences: Per prompt, up to ``num_return_sequences`` token ID
+            tensors (prompt included), best first; lengths differ when
+            hypotheses end at ``<|endoftext|>``
+        scores: Matching length-normalized log-probabilities
+    """
+
+    sequences: List[List[torch.Tensor]]
+    scores: List[List[float]]
+
+    @property
+    def best(self) -> List[torch.Tensor]:
+        """Highest-scoring sequence of every prompt."""
+        return [hypotheses[0] for hypotheses in self.sequences]
+
+
+class BeamHypotheses:
+    """
+    The best finished hypotheses of one prompt.
+
+    Args:
+        num_beams: Number of hypotheses to keep
+        length_penalty: Exponent of the length normalization; a hypothesis
+            of ``n`` generated tokens scores ``sum_logprobs / n ** length_penalty``
+            (0 ranks by total log-probability, > 0 favours longer outputs)
+        early_stopping: Stop as soon as ``num_beams`` hypotheses finished;
+            otherwise continue while a running beam could still score higher
+    """
+
+    def __init__(self, num_beams: int, length_penalty: float = 1.0,
+                 early_stopping: bool = True):
+        """Start with no finished hypotheses."""
+        self.num_beams = num_beams
+        self.length_penalty = length_penalty
+        self.early_stopping = early_stopping
+        self.hypotheses: List[Tuple[float, torch.Tensor]] = []
+
+    def __len__(self) -> int:
+        return len(self.hypotheses)
+
+    def score(self, sum_logprobs: float, length: int) -> float:
+        """Length-normalized score of ``length`` generated tokens."""
+        return sum_logprobs / max(length, 1) ** self.length_penalty
+
+    def add(self, tokens: torch.Tensor, sum_logprobs: float, length: int) -> None:
+        """Keep a finished hypothesis if it is among the ``num_beams`` best."""
+        score = self.score(sum_logprobs, length)
+        if len(self.hypotheses) < self.num_beams or score > self.hypotheses[-1][0]:
+            self.hypotheses.append((score, tokens))
+            self.hypotheses.sort(key=lambda h: h[0], reverse=True)
+            del self.hypotheses[self.num_beams:]
+
+    def is_done(self, best_sum_logprobs: float, length: int) -> bool:
+        """
+        Whether no running beam can improve the finished set.
+
+        Args:
+            best_sum_logprobs: Log-probability of the best running beam
+            length: Its number of generated tokens
+        """
+        if len(self.hypotheses) < self.num_beams:
+            return False
+        if self.early_stopping:
+            return True
+        return self.score(best_sum_logprobs, length) <= self.hypotheses[-1][0]
+
+
+@torch.no_grad()
+def beam_search(engine: Any, idx: torch.Tensor, max_new_tokens: int,
+                num_beams: int = 4, length_penalty: float = 1.0,
+                early_stopping: bool = True, num_return_sequences: int = 1,
+                eos_id: Optional[int] = None) -> BeamSearchOutput:
+    """
+    Beam search for a batch of prompts of equal length.
+
+    Args:
+        engine: ``InferenceEngine`` providing ``next_logits`` and ``new_cache``
+        idx: Prompt token IDs of shape (batch, seq_len)
+        max_new_tokens: Maximum number of tokens to generate
+        num_beams: Beams per prompt
+        length_penalty: See ``BeamHypotheses``
+        early_stopping: See ``BeamHypotheses``
+        num_return_sequences: Hypotheses to return per prompt
+        eos_id: Token that finishes a hypothesis (None: all run to
+            ``max_new_tokens``)
+
+    Returns:
+        BeamSearchOutput with the best hypotheses of every prompt
+    """
+    if num_return_sequences > num_beams:
+        raise ValueError(f"num_return_sequences ({num_return_sequences}) "
+                         f"exceeds num_beams ({num_beams})")
+    idx = idx.to(engine.device)
+    batch, prompt_len = idx.shape
+    hypotheses = [BeamHypotheses(num_beams, length_penalty, early_stopping)
+                  for _ in range(batch)]
+    done = [False] * batch
+
+    # Prefill each prompt once, then give every beam its own copy of the rows
+    cache = engine.new_cache(batch, prompt_len + max_new_tokens)
+    logits = engine.next_logits(idx, cache)
+    fan_out = torch.arange(batch, device=idx.device).repeat_interleave(num_beams)
+    if cache is not None:
+        cache = cache.index_select(fan_out)
+    logits, sequences = logits[fan_out], idx[fan_out]
+    # Beams of a prompt start identical: only the first may expand at step 0
+    beam_scores = torch.zeros(batch, num_beams, device=idx.device)
+    beam_scores[:, 1:] = float("-inf")
+    beam_scores = beam_scores.view(-1)
+
+    for step in range(max_new_tokens):
+        log_probs = torch.log_softmax(logits.float(), dim=-1) + beam_scores[:, None]
+        vocab_size = log_probs.shape[-1]
+        # 2 * num_beams candidates leave num_beams running even if all others end
+        top_scores, top_ids = log_probs.view(batch, -1).topk(
+            min(2 * num_beams, num_beams * vocab_size), dim=1)
+        top_scores, top_rows, top_tokens = (
+            top_scores.tolist(), (top_ids // vocab_size).tolist(),
+            (top_ids % vocab_size).tolist())
+
+        next_scores, next_rows, next_tokens = [], [], []
+        for b in range(batch):
+            first, chosen = len(next_scores), 0
+            if not done[b]:
+                for rank, (score, beam, token) in enumerate(
+                        zip(top_scores[b], top_rows[b], top_tokens[b])):
+                    row = b * num_beams + beam
+                    if token == eos_id:
+                        if rank < num_beams:  # Only among the num_beams best candidates
+                            finished = torch.cat([sequences[row], idx.new_tensor([token])])
+                            hypotheses[b].add(finished, score, step + 1)
+                        continue
+                    next_scores.append(score)
+                    next_rows.append(row)
+                    next_tokens.append(token)
+                    chosen += 1
+                    if chosen == num_beams:
+                        break
+                best = next_scores[first] if chosen else float("-inf")
+                done[b] = hypotheses[b].is_done(best, step + 1)
+            # Finished prompts keep their rows; their tokens are never read
+            for beam in range(chosen, num_beams):
+                next_scores.append(0.0 if done[b] else float("-inf"))
+                next_rows.append(b * num_beams + beam)
+                next_tokens.append(0 if eos_id is None else eos_id)
+        if all(done):
+            break
+
+        beam_index = torch.tensor(next_rows, device=idx.device)
+        step_ids = torch.tensor(next_tokens, device=idx.device).unsqueeze(1)
+        sequences = torch.cat([sequences[beam_index], step_ids], dim=1)
+        beam_scores = torch.tensor(next_scores, device=idx.device)
+        if step + 1 < max_new_tokens:
+            if cache is not None:
+                cache.reorder(beam_index, start=prompt_len)  # The prompt is shared
+                logits = engine.next_logits(step_ids, cache)
+            else:
+                logits = engine.next_logits(sequences)
+
+    # Prompts that ran out of tokens finish with their running beams
+    length = sequences.shape[1] - prompt_len
+    scores = beam_scores.tolist()
+    for b in range(batch):
+        if not done[b]:
+            for row in range(b * num_beams, (b + 1) * num_beams):
+                if scores[row] != float("-inf"):
+                    hypotheses[b].add(sequences[row], scores[row], length)
+
+    return BeamSearchOutput(
+        sequences=[[tokens for _, tokens in h.hypotheses[:num_return_sequences]]
+                   for h in hypotheses],
+        scores=[[score for score, _ in h.hypotheses[:num_return_sequences]]
+                for h in hypotheses])
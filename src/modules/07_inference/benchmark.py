@@ -0,0 +1,569 @@
+"""
+Benchmark script for the inference module.
+
+Sections:
+- sampling: batched sampler vs a per-sequence Python loop that sorts the full
+  vocabulary for every row, over batch sizes 1-256 with a 50k vocab
+- quantization: perplexity on the-verdict.txt, tokens/sec and RSS for fp32,
+  bf16, int8 and int4 weights (each variant loads in its own process)
+- kv-cache: largest batch x context that fits a fixed KV-cache memory budget,
+  plus decode speed and accuracy of int8/fp8 caches against fp32
+- multi-lora: cached generation for a batch whose rows use 1, 8 or 32
+  distinct LoRA adapters, served from one base model with gathered batched
+  matmuls vs one generation pass per adapter
+- beam-search: beam widths 1-16, batched beams with an in-place reordered
+  KV cache vs one forward pass and a cloned cache per beam; tokens/sec and
+  peak memory (each run in its own process)
+- tensor-parallel: single-request latency of the 774M model sharded over 1,
+  2 and 4 local processes (torchrun, gloo all-reduce), with each rank's
+  resident memory after loading its shard from a memory-mapped checkpoint
+
+Run from the repository root:
+    python -m src.modules.07_inference.benchmark [sampling|quantization|kv-cache|multi-lora|beam-search|tensor-parallel|all]
+"""
+
+import argparse
+import copy
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+from typing import Callable, Dict, Tuple
+
+import torch
+
+from .beam_search import beam_search
+from .kv_cache import KVCache
+from .quantization import load_quantized, quantize_model, save_quantized
+from .sampling_strategies import SamplingParams, BatchedSampler
+from .tensor_parallel import load_tensor_parallel
+from .text_generation import InferenceEngine
+
+tokenization = import_module("..01_tokenization.build_vocabulary", __package__)
+gpt = import_module("..05_gpt_model", __package__)
+lora = import_module("..08_fine_tuning.lora", __package__)
+distributed = import_module("..06_training.distributed", __package__)
+
+VOCAB_SIZE = 50257
+BATCH_SIZES = [1, 4, 16, 64, 256]
+
+
+def loop_sample(logits: torch.Tensor, params: SamplingParams,
+                prev_tokens: torch.Tensor) -> torch.Tensor:
+    """Reference sampler: one sequence at a time with a full-vocab sort."""
+    tokens = []
+    for row, history in zip(logits, prev_tokens):
+        row = row.clone()
+        for token_id in set(history.tolist()):
+            value = row[token_id]
+            row[token_id] = (value / params.repetition_penalty if value > 0
+                             else value * params.repetition_penalty)
+        row = row / params.temperature
+        sorted_logits, sorted_ids = torch.sort(row, descending=True)
+        sorted_logits[params.top_k:] = float("-inf")
+        probs = torch.softmax(sorted_logits, dim=-1)
+        cumulative = torch.cumsum(probs, dim=-1)
+        sorted_logits[(cumulative - probs) >= params.top_p] = float("-inf")
+        choice = torch.multinomial(torch.softmax(sorted_logits, dim=-1), 1)
+        tokens.append(sorted_ids[choice])
+    return torch.cat(tokens)
+
+
+def time_call(fn: Callable[[], torch.Tensor], repeats: int = 10) -> float:
+    """Return the median wall time of ``fn`` in milliseconds."""
+    fn()  # warmup
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def benchmark_sampling():
+    """Run the sampling benchmark."""
+    print("⏱️ Batched Sampling Benchmark")
+    print(f"Vocabulary size: {VOCAB_SIZE}, history length: 64")
+    print("=" * 60)
+    print(f"{'batch':>6} {'loop (ms)':>12} {'batched (ms)':>14} "
+          f"{'top-k only (ms)':>16} {'speedup':>8}")
+
+    params = SamplingParams(temperature=0.8, top_k=50, top_p=0.95,
+                            repetition_penalty=1.2)
+    top_k_only = SamplingParams(temperature=0.8, top_k=50)
+
+    for batch_size in BATCH_SIZES:
+        logits = torch.randn(batch_size, VOCAB_SIZE)
+        history = torch.randint(0, VOCAB_SIZE, (batch_size, 64))
+
+        sampler = BatchedSampler([params] * batch_size, seed=0)
+        fast_sampler = BatchedSampler([top_k_only] * batch_size, seed=0)
+
+        loop_ms = time_call(lambda: loop_sample(logits, params, history), repeats=3)
+        batched_ms = time_call(lambda: sampler(logits, prev_tokens=history))
+        top_k_ms = time_call(lambda: fast_sampler(logits))
+
+        print(f"{batch_size:>6} {loop_ms:>12.2f} {batched_ms:>14.2f} "
+              f"{top_k_ms:>16.2f} {loop_ms / batched_ms:>7.1f}x")
+
+
+WEIGHT_MODES = ["fp32", "bf16", "int8", "int4"]
+
+
+def to_mode(model: torch.nn.Module, mode: str) -> torch.nn.Module:
+    """Return a copy of ``model`` with weights in the given format."""
+    model = copy.deepcopy(model)
+    if mode == "bf16":
+        return model.to(torch.bfloat16)
+    if mode in ("int8", "int4"):
+        return quantize_model(model, bits=int(mode[-1]), group_size=32)
+    return model
+
+
+@torch.no_grad()
+def perplexity(model: torch.nn.Module, token_ids: torch.Tensor,
+               context_length: int) -> float:
+    """Perplexity over non-overlapping windows of ``token_ids``."""
+    n_windows = (len(token_ids) - 1) // context_length
+    inputs = token_ids[:n_windows * context_length].view(n_windows, context_length)
+    targets = token_ids[1:n_windows * context_length + 1].view(n_windows, context_length)
+    logits = model(inputs).float()
+    loss = torch.nn.functional.cross_entropy(logits.flatten(0, 1), targets.flatten())
+    return float(torch.exp(loss))
+
+
+def rss_mb() -> Dict[str, float]:
+    """Current and peak resident set size of this process in MB (Linux)."""
+    stats = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split(":")
+                stats[key] = int(value.split()[0]) / 1024
+    return {"rss": stats.get("VmRSS", 0.0), "peak": stats.get("VmHWM", 0.0)}
+
+
+def pss_mb() -> float:
+    """Proportional set size of this process in MB: shared pages are split
+    between the processes mapping them (Linux)."""
+    with open("/proc/self/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def quantization_worker(mode: str, checkpoint: str, new_tokens: int = 32) -> None:
+    """Load one checkpoint variant, generate greedily and print a result row."""
+    torch.manual_seed(0)
+    if mode in ("int8", "int4"):
+        model = load_quantized(checkpoint)
+    else:
+        saved = torch.load(checkpoint)
+        with torch.device("meta"):
+            model = gpt.GPTModel(saved["cfg"])
+        model.load_state_dict(saved["state_dict"], assign=True)
+        model.eval()
+    loaded = rss_mb()
+
+    idx = torch.randint(0, model.cfg["vocab_size"], (1, 32))
+    with torch.no_grad():
+        model(idx)  # warmup
+        start = time.perf_counter()
+        for _ in range(new_tokens):
+            next_id = model(idx)[:, -1, :].argmax(dim=-1, keepdim=True)
+            idx = torch.cat([idx, next_id], dim=1)
+        elapsed = time.perf_counter() - start
+
+    print(f"{mode:>6} {new_tokens / elapsed:>10.2f} {loaded['rss']:>14.0f} "
+          f"{rss_mb()['peak']:>12.0f}")
+
+
+def benchmark_quantization():
+    """Run the quantization benchmark."""
+    print("⏱️ Weight-Only Quantization Benchmark")
+    print("=" * 60)
+
+    # Perplexity: a small model trained briefly on the-verdict.txt
+    with open("the-verdict.txt", "r", encoding="utf-8") as f:
+        tokens = tokenization.preprocess_text(f.read())
+    vocab = tokenization.build_vocabulary(tokens)
+    token_ids = torch.tensor([vocab[t] for t in tokens])
+
+    cfg = gpt.get_config("124M", vocab_size=len(vocab), context_length=64,
+                         emb_dim=128, n_heads=4, n_layers=2, drop_rate=0.0)
+    torch.manual_seed(123)
+    model = gpt.GPTModel(cfg)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
+    for _ in range(150):
+        starts = torch.randint(0, len(token_ids) - cfg["context_length"] - 1, (8,))
+        batch = torch.stack([token_ids[i:i + cfg["context_length"] + 1] for i in starts])
+        logits = model(batch[:, :-1])
+        loss = torch.nn.functional.cross_entropy(logits.flatten(0, 1),
+                                                 batch[:, 1:].flatten())
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+    model.eval()
+
+    print(f"\nPerplexity on the-verdict.txt (vocab {len(vocab)}, 150 steps):")
+    for mode in WEIGHT_MODES:
+        ppl = perplexity(to_mode(model, mode), token_ids, cfg["context_length"])
+        print(f"  {mode:>5}: {ppl:.3f}")
+
+    # Throughput and memory: 124M model, each format loaded in a fresh process
+    cfg = gpt.get_config("124M", drop_rate=0.0)
+    torch.manual_seed(123)
+    model = gpt.GPTModel(cfg).eval()
+
+    print(f"\n124M model, batch 1, 32-token prompt, 32 new tokens:")
+    print(f"{'mode':>6} {'tokens/s':>10} {'RSS loaded (MB)':>14} {'peak (MB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for mode in WEIGHT_MODES:
+            paths[mode] = os.path.join(tmp, f"gpt-124M-{mode}.pth")
+            variant = to_mode(model, mode)
+            if mode in ("int8", "int4"):
+                save_quantized(variant, paths[mode], bits=int(mode[-1]), group_size=32)
+            else:
+                torch.save({"cfg": cfg, "state_dict": variant.state_dict()}, paths[mode])
+            del variant
+        del model
+
+        for mode in WEIGHT_MODES:
+            subprocess.run([sys.executable, "-m", __spec__.name, "quantization",
+                            "--worker", mode, "--checkpoint", paths[mode]], check=True)
+
+
+KV_BUDGET_GB = 4
+KV_DTYPES = ["fp32", "bf16", "int8", "fp8"]
+
+
+def benchmark_kv_cache():
+    """Run the KV-cache benchmark."""
+    print("⏱️ Quantized KV Cache Benchmark")
+    print("=" * 60)
+
+    budget = KV_BUDGET_GB * 1024 ** 3
+    for name in ["124M", "774M"]:
+        cfg = gpt.get_config(name)
+        print(f"\n{name}: max batch size within a {KV_BUDGET_GB} GB KV-cache budget")
+        print(f"{'context':>8} " + " ".join(f"{d:>8}" for d in KV_DTYPES))
+        for context in [256, 512, 1024]:
+            batches = [budget // (KVCache.bytes_per_token(cfg, d) * context)
+                       for d in KV_DTYPES]
+            print(f"{context:>8} " + " ".join(f"{b:>8}" for b in batches))
+
+    # Decode speed and accuracy on the 124M model
+    cfg = gpt.get_config("124M", drop_rate=0.0)
+    torch.manual_seed(123)
+    model = gpt.GPTModel(cfg).eval()
+    batch_size, prompt_len, new_tokens = 4, 256, 32
+    prompt = torch.randint(0, cfg["vocab_size"], (batch_size, prompt_len))
+
+    print(f"\n124M decode: batch {batch_size}, prompt {prompt_len}, "
+          f"{new_tokens} new tokens (greedy)")
+    print(f"{'kv dtype':>8} {'cache (MB)':>11} {'tokens/s':>10} "
+          f"{'logit err':>10} {'token match':>12}")
+
+    reference = None
+    for kv_dtype in KV_DTYPES:
+        cache = KVCache(cfg, batch_size, max_len=prompt_len + new_tokens,
+                        kv_dtype=kv_dtype)
+        with torch.no_grad():
+            logits = model(prompt, kv_cache=cache)[:, -1, :]
+            step_logits, tokens = [logits], []
+            start = time.perf_counter()
+            for _ in range(new_tokens - 1):
+                # Teacher-force the fp32 tokens so every format sees the same inputs
+                next_ids = (logits.argmax(dim=-1) if reference is None
+                            else reference[1][:, len(tokens)])
+                tokens.append(logits.argmax(dim=-1))
+                logits = model(next_ids.unsqueeze(1), kv_cache=cache)[:, -1, :]
+                step_logits.append(logits)
+            elapsed = time.perf_counter() - start
+            tokens.append(logits.argmax(dim=-1))
+
+        step_logits = torch.stack(step_logits, dim=1)
+        tokens = torch.stack(tokens, dim=1)
+        if reference is None:
+            reference = (step_logits, tokens)
+        error = ((step_logits - reference[0]).norm() / reference[0].norm()).item()
+        match = (tokens == reference[1]).float().mean().item()
+        print(f"{kv_dtype:>8} {cache.nbytes() / 1024 ** 2:>11.1f} "
+              f"{batch_size * (new_tokens - 1) / elapsed:>10.1f} "
+              f"{error:>10.4f} {match:>11.1%}")
+
+
+ADAPTER_COUNTS = [1, 8, 32]
+LORA_RANK = 8
+
+
+class IdTokenizer:
+    """Tokenizer stand-in for engines fed with token IDs directly."""
+
+    str_to_int: Dict[str, int] = {}
+
+
+def benchmark_multi_lora():
+    """Run the multi-adapter serving benchmark."""
+    cfg = gpt.get_config("124M", drop_rate=0.0)
+    batch_size, prompt_len, new_tokens = 32, 16, 16
+    print("⏱️ Multi-Adapter (LoRA) Serving Benchmark")
+    print("=" * 72)
+    print(f"124M, batch {batch_size}, prompt {prompt_len}, {new_tokens} new tokens "
+          f"(greedy, fp32 KV cache), rank-{LORA_RANK} adapters on all block layers\n")
+
+    torch.manual_seed(123)
+    base = gpt.GPTModel(cfg).eval()
+    adapted = lora.apply_lora(copy.deepcopy(base), rank=LORA_RANK, alpha=2 * LORA_RANK,
+                              targets=lora.ALL_TARGETS)
+    engine = InferenceEngine(base, IdTokenizer(), context_size=cfg["context_length"],
+                             kv_cache_dtype="fp32")
+    prompt = torch.randint(0, cfg["vocab_size"], (batch_size, prompt_len))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(max(ADAPTER_COUNTS)):
+            for p in lora.lora_state_dict(adapted).values():
+                torch.nn.init.normal_(p, std=0.02)
+            engine.load_adapter(f"adapter-{i}",
+                                lora.save_lora(adapted, os.path.join(tmp, f"{i}.safetensors")))
+    del adapted
+    bank_mb = sum(layer.lora_A.nbytes + layer.lora_B.nbytes
+                  for layer in engine.adapters.layers.values()) / 2 ** 20
+    print(f"{len(engine.adapters.names)} adapters loaded: {bank_mb:.0f} MB next to "
+          f"{gpt.count_parameters(base) * 4 / 2 ** 20:.0f} MB of shared base weights\n")
+
+    def timed(fn: Callable[[], None]) -> float:
+        start = time.perf_counter()
+        fn()
+        return batch_size * new_tokens / (time.perf_counter() - start)
+
+    engine.generate(prompt[:2], 2)  # Warm up
+    base_rate = timed(lambda: engine.generate(prompt, new_tokens))
+    print(f"{'adapters':>9} {'gathered tok/s':>15} {'per-adapter tok/s':>18} "
+          f"{'speedup':>8} {'vs base':>8}")
+    for count in ADAPTER_COUNTS:
+        names = [f"adapter-{i % count}" for i in range(batch_size)]
+
+        def per_adapter():
+            # One generation pass per adapter over the rows that use it
+            for i in range(count):
+                rows = [r for r, name in enumerate(names) if name == f"adapter-{i}"]
+                engine.generate(prompt[rows], new_tokens, adapters=[names[r] for r in rows])
+
+        gathered = timed(lambda: engine.generate(prompt, new_tokens, adapters=names))
+        looped = timed(per_adapter)
+        print(f"{count:>9} {gathered:>15.1f} {looped:>18.1f} {gathered / looped:>7.2f}x "
+              f"{gathered / base_rate:>7.0%}")
+    print(f"\nBase model without adapters: {base_rate:.1f} tokens/s")
+
+
+BEAM_WIDTHS = [1, 2, 4, 8, 16]
+BEAM_PROMPT_LEN, BEAM_NEW_TOKENS = 128, 32
+
+
+@torch.no_grad()
+def naive_beam_search(model: torch.nn.Module, prompt: torch.Tensor, max_new_tokens: int,
+                      num_beams: int) -> torch.Tensor:
+    """Reference: one forward pass per beam and a deep copy of the cache per new beam."""
+    cache = KVCache(model.cfg, 1, max_len=prompt.shape[1] + max_new_tokens)
+    logits = model(prompt, kv_cache=cache)[:, -1, :]
+    beams = [(0.0, prompt[0], cache, logits)]
+    for step in range(max_new_tokens):
+        candidates = []
+        for parent, (score, tokens, _, logits) in enumerate(beams):
+            top = (torch.log_softmax(logits[0], dim=-1) + score).topk(num_beams)
+            candidates += [(s, parent, t) for s, t in zip(top.values.tolist(),
+                                                           top.indices.tolist())]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        new_beams = []
+        for score, parent, token in candidates[:num_beams]:
+            cache = copy.deepcopy(beams[parent][2])
+            tokens = torch.cat([beams[parent][1], torch.tensor([token])])
+            logits = (model(tokens[None, -1:], kv_cache=cache)[:, -1, :]
+                      if step + 1 < max_new_tokens else None)
+            new_beams.append((score, tokens, cache, logits))
+        beams = new_beams
+    return beams[0][1]
+
+
+def beam_worker(method: str, num_beams: int) -> None:
+    """Run one beam search configuration and print its measurements as JSON."""
+    cfg = gpt.get_config("124M", drop_rate=0.0)
+    torch.manual_seed(123)
+    model = gpt.GPTModel(cfg).eval()
+    engine = InferenceEngine(model, IdTokenizer(), context_size=cfg["context_length"],
+                             kv_cache_dtype="fp32")
+    prompt = torch.randint(0, cfg["vocab_size"], (1, BEAM_PROMPT_LEN))
+    beam_search(engine, prompt[:, :8], 2, num_beams=2)  # Warm up
+    loaded = rss_mb()["rss"]
+
+    start = time.perf_counter()
+    if method == "batched":
+        tokens = beam_search(engine, prompt, BEAM_NEW_TOKENS, num_beams=num_beams,
+                             length_penalty=0.0).best[0]
+    else:
+        tokens = naive_beam_search(model, prompt, BEAM_NEW_TOKENS, num_beams)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_mb": rss_mb()["peak"] - loaded,
+                      "tokens": tokens[BEAM_PROMPT_LEN:].tolist()}))
+
+
+def benchmark_beam_search():
+    """Run the beam search benchmark."""
+    cfg = gpt.get_config("124M")
+    cache_mb = (KVCache.bytes_per_token(cfg) * (BEAM_PROMPT_LEN + BEAM_NEW_TOKENS)
+                / 2 ** 20)
+    print("⏱️ Beam Search Benchmark")
+    print("=" * 84)
+    print(f"124M, prompt {BEAM_PROMPT_LEN}, {BEAM_NEW_TOKENS} new tokens, fp32 KV cache "
+          f"({cache_mb:.1f} MB per beam), {os.cpu_count()} CPU(s)")
+    print("tokens/s counts the tokens of all beams; peak memory is above the loaded model\n")
+    print(f"{'beams':>5} {'batched tok/s':>14} {'naive tok/s':>12} {'speedup':>8} "
+          f"{'batched peak':>13} {'naive peak':>11} {'same best':>10}")
+
+    def run(method: str, num_beams: int) -> Dict:
+        out = subprocess.run([sys.executable, "-m", __spec__.name, "--beam-worker", method,
+                              "--beams", str(num_beams)],
+                             check=True, capture_output=True, text=True).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+    for num_beams in BEAM_WIDTHS:
+        batched, naive = run("batched", num_beams), run("naive", num_beams)
+        rates = [num_beams * BEAM_NEW_TOKENS / r["seconds"] for r in (batched, naive)]
+        print(f"{num_beams:>5} {rates[0]:>14.1f} {rates[1]:>12.1f} "
+              f"{rates[0] / rates[1]:>7.2f}x {batched['peak_mb']:>10.0f} MB "
+              f"{naive['peak_mb']:>8.0f} MB {str(batched['tokens'] == naive['tokens']):>10}")
+
+
+TP_PROCESSES = [1, 2, 4]
+TP_PROMPT_LEN = 32
+TP_NEW_TOKENS = 16
+
+
+def tensor_parallel_worker(checkpoint: str, repeats: int = 3) -> None:
+    """One torchrun rank: load a shard, time greedy generation, rank 0 prints JSON."""
+    rank, world_size = distributed.init_distributed()
+    try:
+        start = time.perf_counter()
+        model = load_tensor_parallel(checkpoint)
+        load_seconds = time.perf_counter() - start
+        shard_mb = sum(p.nbytes for name, p in model.named_parameters()
+                       if "trf_blocks" in name) / 2 ** 20
+        cfg = model.cfg
+        engine = InferenceEngine(model, IdTokenizer(), context_size=cfg["context_length"],
+                                 kv_cache_dtype="fp32")
+        torch.manual_seed(0)  # Every rank must feed the same prompt
+        prompt = torch.randint(0, cfg["vocab_size"], (1, TP_PROMPT_LEN))
+        engine.generate(prompt[:, :8], 2)  # Warm up
+
+        def latency(new_tokens: int) -> Tuple[float, torch.Tensor]:
+            timings = []
+            for _ in range(repeats):
+                distributed.barrier()
+                start = time.perf_counter()
+                tokens = engine.generate(prompt, new_tokens)
+                timings.append(time.perf_counter() - start)
+            return sorted(timings)[len(timings) // 2], tokens
+
+        first_token, _ = latency(1)
+        total, tokens = latency(TP_NEW_TOKENS)
+        memory = [None] * world_size
+        stats = {"pss_mb": pss_mb(), "shard_mb": shard_mb}
+        if world_size > 1:
+            torch.distributed.all_gather_object(memory, stats)
+        else:
+            memory = [stats]
+        if rank == 0:
+            print(json.dumps({"load_seconds": load_seconds, "first_token": first_token,
+                              "total": total, "memory": memory,
+                              "tokens": tokens[0, TP_PROMPT_LEN:].tolist()}))
+    finally:
+        distributed.cleanup_distributed()
+
+
+def benchmark_tensor_parallel():
+    """Run the tensor-parallel latency benchmark."""
+    cfg = gpt.get_config("774M", drop_rate=0.0)
+    print("⏱️ Tensor-Parallel Inference Benchmark")
+    print("=" * 96)
+    print(f"774M ({cfg['n_layers']} layers, {cfg['n_heads']} heads), batch 1, prompt "
+          f"{TP_PROMPT_LEN}, {TP_NEW_TOKENS} greedy tokens, fp32 KV cache, "
+          f"{os.cpu_count()} CPU(s)")
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        torch.manual_seed(123)
+        model = gpt.GPTModel(cfg).eval()
+        checkpoint = gpt.save_model(model, os.path.join(tmp, "gpt-774M.safetensors"))
+        del model
+        print(f"Checkpoint: {os.path.getsize(checkpoint) / 2 ** 30:.2f} GB "
+              f"(written in {time.perf_counter() - start:.0f} s)\n")
+        print(f"{'procs':>5} {'load s':>7} {'first token':>12} {'ms/token':>9} "
+              f"{'total s':>8} {'speedup':>8} {'block MB/rank':>14} {'PSS/rank':>9} "
+              f"{'PSS sum':>9} {'same':>5}")
+
+        baseline = None
+        for procs in TP_PROCESSES:
+            out = subprocess.run(
+                [sys.executable, "-m", "torch.distributed.run", "--standalone",
+                 f"--nproc-per-node={procs}", "-m", __spec__.name, "tensor-parallel",
+                 "--tp-worker", checkpoint],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            baseline = baseline or result
+            decode_ms = ((result["total"] - result["first_token"])
+                         / (TP_NEW_TOKENS - 1) * 1000)
+            pss = [m["pss_mb"] for m in result["memory"]]
+            print(f"{procs:>5} {result['load_seconds']:>7.1f} "
+                  f"{result['first_token'] * 1000:>9.0f} ms {decode_ms:>9.0f} "
+                  f"{result['total']:>8.2f} {baseline['total'] / result['total']:>7.2f}x "
+                  f"{result['memory'][0]['shard_mb']:>14,.0f} {max(pss):>6,.0f} MB "
+                  f"{sum(pss):>6,.0f} MB "
+                  f"{str(result['tokens'] == baseline['tokens']):>5}")
+    print("\nblock MB/rank: transformer-block weights held by each rank (embeddings, "
+          "norms and\nthe output head are replicated); PSS: proportional set size after "
+          "generating,\npages of the shared checkpoint mapping split between the ranks.")
+
+
+def main():
+    """Run the selected benchmark sections."""
+    parser = argparse.ArgumentParser(description="Inference module benchmarks")
+    parser.add_argument("section", nargs="?", default="all",
+                        choices=["sampling", "quantization", "kv-cache", "multi-lora",
+                                 "beam-search", "tensor-parallel", "all"])
+    parser.add_argument("--worker", choices=WEIGHT_MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--checkpoint", help=argparse.SUPPRESS)
+    parser.add_argument("--beam-worker", choices=["batched", "naive"], help=argparse.SUPPRESS)
+    parser.add_argument("--beams", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--tp-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        quantization_worker(args.worker, args.checkpoint)
+        return
+    if args.beam_worker:
+        beam_worker(args.beam_worker, args.beams)
+        return
+    if args.tp_worker:
+        tensor_parallel_worker(args.tp_worker)
+        return
+    if args.section in ("sampling", "all"):
+        benchmark_sampling()
+    if args.section in ("quantization", "all"):
+        benchmark_quantization()
+    if args.section in ("kv-cache", "all"):
+        benchmark_kv_cache()
+    if args.section in ("multi-lora", "all"):
+        benchmark_multi_lora()
+    if args.section in ("beam-search", "all"):
+        benchmark_beam_search()
+    if args.section in ("tensor-parallel", "all"):
+        benchmark_tensor_parallel()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Key/value caches for incremental decoding.
+
+Without a cache, every generation step recomputes keys and values for the
+whole context. A KV cache stores them per layer so each step only processes
+the newest token. At long contexts and high concurrency the cache itself
+becomes the largest tensor in memory, so it can also be stored in int8 or
+(emulated) fp8 with one scale per head and token, and dequantized when the
+attention layer reads it. Beam search reorders the rows of a cache in place
+(``reorder``) instead of copying it per beam.
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+KV_DTYPES = ("fp32", "bf16", "int8", "fp8")
+
+_FLOAT_STORAGE = {"fp32": torch.float32, "bf16": torch.bfloat16}
+_QMAX = {"int8": 127.0, "fp8": 448.0}  # 448 is the largest float8_e4m3fn value
+
+
+class LayerKVCache:
+    """
+    Preallocated key/value storage for one attention layer.
+
+    Args:
+        batch_size: Number of sequences
+        num_heads: Number of attention heads
+        max_len: Maximum number of cached tokens
+        head_dim: Dimension of each head
+        dtype: Storage dtype
+        device: Device to allocate the cache on
+    """
+
+    def __init__(self, batch_size: int, num_heads: int, max_len: int, head_dim: int,
+                 dtype: torch.dtype = torch.float32,
+                 device: Optional[torch.device] = None):
+        """Allocate empty key/value buffers."""
+        shape = (batch_size, num_heads, max_len, head_dim)
+        self.keys = torch.zeros(shape, dtype=dtype, device=device)
+        self.values = torch.zeros(shape, dtype=dtype, device=device)
+        self.max_len = max_len
+        self.length = 0
+
+    def _reserve(self, num_tokens: int) -> Tuple[int, int]:
+        """Return the slot range for ``num_tokens`` new tokens."""
+        start, end = self.length, self.length + num_tokens
+        if end > self.max_len:
+            raise ValueError(f"KV cache overflow: {end} tokens > max_len {self.max_len}")
+        self.length = end
+        return start, end
+
+    def update(self, keys: torch.Tensor,
+               values: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Append new keys/values and return everything cached so far.
+
+        Args:
+            keys: New keys of shape (batch, num_heads, num_tokens, head_dim)
+            values: New values of the same shape
+
+        Returns:
+            Tuple of all keys and values, shape (batch, num_heads, length, head_dim),
+            in the dtype of the inputs
+        """
+        start, end = self._reserve(keys.shape[2])
+        self.keys[:, :, start:end] = keys
+        self.values[:, :, start:end] = values
+        return (self.keys[:, :, :end].to(keys.dtype),
+                self.values[:, :, :end].to(values.dtype))
+
+    def _buffers(self) -> Tuple[str, ...]:
+        """Names of the per-row, per-token tensors."""
+        return ("keys", "values")
+
+    def reorder(self, index: torch.Tensor, start: int = 0) -> None:
+        """
+        Replace every row by row ``index[i]``, in place.
+
+        Only the cached tokens from ``start`` on are moved, so a prefix that
+        is already identical across the rows involved (e.g. a prompt shared
+        by all beams) is not copied.
+
+        Args:
+            index: Source row of every row, shape (batch,)
+            start: First token position to move
+        """
+        for name in self._buffers():
+            buffer = getattr(self, name)
+            buffer[:, :, start:self.length] = buffer[index, :, start:self.length]
+
+    def index_select(self, index: torch.Tensor) -> "LayerKVCache":
+        """
+        New cache whose rows are the rows ``index`` of this one.
+
+        Args:
+            index: Source row of every new row, shape (new_batch,)
+
+        Returns:
+            Cache with ``len(index)`` rows and the same length and capacity
+        """
+        selected = copy.copy(self)
+        for name in self._buffers():
+            setattr(selected, name, getattr(self, name).index_select(0, index))
+        return selected
+
+    def nbytes(self) -> int:
+        """Total bytes allocated by this layer's cache."""
+        return self.keys.nbytes + self.values.nbytes
+
+
+class QuantizedLayerKVCache(LayerKVCache):
+    """
+    Key/value storage in int8 or emulated fp8 with per-head, per-token scales.
+
+    Each cached vector of ``head_dim`` values is scaled by its own absolute
+    maximum, so an outlier token or head does not cost precision elsewhere.
+
+    Args:
+        batch_size: Number of sequences
+        num_heads: Number of attention heads
+        max_len: Maximum number of cached tokens
+        head_dim: Dimension of each head
+        kv_dtype: ``"int8"`` or ``"fp8"`` (float8_e4m3fn storage)
+        device: Device to allocate the cache on
+    """
+
+    def __init__(self, batch_size: int, num_heads: int, max_len: int, head_dim: int,
+                 kv_dtype: str = "int8", device: Optional[torch.device] = None):
+        """Allocate quantized buffers and scales."""
+        if kv_dtype not in _QMAX:
+            raise ValueError(f"Quantized kv_dtype must be one of {tuple(_QMAX)}")
+        storage = torch.int8 if kv_dtype == "int8" else torch.float8_e4m3fn
+        super().__init__(batch_size, num_heads, max_len, head_dim, storage, device)
+        self.kv_dtype = kv_dtype
+        self.qmax = _QMAX[kv_dtype]
+        scale_shape = (batch_size, num_heads, max_len, 1)
+        self.key_scales = torch.zeros(scale_shape, dtype=torch.float16, device=device)
+        self.value_scales = torch.zeros(scale_shape, dtype=torch.float16, device=device)
+
+    def _quantize(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Quantize vectors along the last dimension."""
+        # Clamp in fp16: all-zero (or tiny) vectors must not get a zero scale
+        scales = (x.abs().amax(dim=-1, keepdim=True) / self.qmax).to(torch.float16)
+        scales = scales.clamp(min=torch.finfo(torch.float16).tiny)
+        q = x / scales.to(x.dtype)
+        if self.kv_dtype == "int8":
+            q = torch.round(q).clamp(-self.qmax, self.qmax)
+        return q.to(self.keys.dtype), scales
+
+    def update(self, keys: torch.Tensor,
+               values: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        start, end = self._reserve(keys.shape[2])
+        self.keys[:, :, start:end], self.key_scales[:, :, start:end] = self._quantize(keys)
+        self.values[:, :, start:end], self.value_scales[:, :, start:end] = \
+            self._quantize(values)
+
+        # Dequantize on read, in the attention layer's compute dtype
+        dtype = keys.dtype
+        all_keys = self.keys[:, :, :end].to(dtype) * self.key_scales[:, :, :end].to(dtype)
+        all_values = (self.values[:, :, :end].to(dtype)
+                      * self.value_scales[:, :, :end].to(dtype))
+        return all_keys, all_values
+
+    def _buffers(self) -> Tuple[str, ...]:
+        return ("keys", "values", "key_scales", "value_scales")
+
+    def nbytes(self) -> int:
+        return super().nbytes() + self.key_scales.nbytes + self.value_scales.nbytes
+
+
+class KVCache:
+    """
+    Key/value cache for every layer of a GPT model.
+
+    Pass it to ``GPTModel.forward(idx, kv_cache=cache)``: the first call fills
+    the cache with the prompt, later calls take only the new tokens.
+
+    Args:
+        cfg: Model configuration (``n_layers``, ``n_heads``, ``emb_dim``,
+            ``context_length``)
+        batch_size: Number of sequences
+        max_len: Maximum number of cached tokens (defaults to the context length)
+        kv_dtype: Storage format, one of ``KV_DTYPES``
+        device: Device to allocate the cache on
+
+    Example:
+        >>> cache = KVCache(model.cfg, batch_size=4, kv_dtype="int8")
+        >>> logits = model(prompt_ids, kv_cache=cache)
+        >>> logits = model(next_ids, kv_cache=cache)
+    """
+
+    def __init__(self, cfg: Dict[str, Any], batch_size: int,
+                 max_len: Optional[int] = None, kv_dtype: str = "fp32",
+                 device: Optional[torch.device] = None):
+        """Allocate one layer cache per transformer block."""
+        if kv_dtype not in KV_DTYPES:
+            raise ValueError(f"kv_dtype must be one of {KV_DTYPES}, got '{kv_dtype}'")
+        max_len = max_len or cfg["context_length"]
+        if max_len > cfg["context_length"]:
+            raise ValueError(f"max_len ({max_len}) exceeds the model context length "
+                             f"({cfg['context_length']})")
+
+        num_heads = cfg["n_heads"]
+        head_dim = cfg["emb_dim"] // num_heads
+        self.kv_dtype = kv_dtype
+        self.layers: List[LayerKVCache] = []
+        for _ in range(cfg["n_layers"]):
+            if kv_dtype in _FLOAT_STORAGE:
+                layer = LayerKVCache(batch_size, num_heads, max_len, head_dim,
+                                     _FLOAT_STORAGE[kv_dtype], device)
+            else:
+                layer = QuantizedLayerKVCache(batch_size, num_heads, max_len,
+                                              head_dim, kv_dtype, device)
+            self.layers.append(layer)
+
+    @property
+    def seq_len(self) -> int:
+        """Number of tokens currently cached."""
+        return self.layers[0].length
+
+    def nbytes(self) -> int:
+        """Total bytes allocated by the cache."""
+        return sum(layer.nbytes() for layer in self.layers)
+
+    def reorder(self, index: torch.Tensor, start: int = 0) -> None:
+        """
+        Replace every sequence by sequence ``index[i]``, in place.
+
+        Args:
+            index: Source row of every row, shape (batch,)
+            start: First token position to move; earlier tokens must already
+                match between each row and its source
+        """
+        for layer in self.layers:
+            layer.reorder(index, start)
+
+    def index_select(self, index: torch.Tensor) -> "KVCache":
+        """
+        New cache holding the sequences ``index`` of this one, e.g. a
+        prefilled prompt repeated once per beam.
+
+        Args:
+            index: Source row of every new row, shape (new_batch,)
+
+        Returns:
+            Cache with ``len(index)`` rows
+        """
+        selected = copy.copy(self)
+        selected.layers = [layer.index_select(index) for layer in self.layers]
+        return selected
+
+    @staticmethod
+    def bytes_per_token(cfg: Dict[str, Any], kv_dtype: str = "fp32") -> int:
+        """
+        Cache bytes needed per token of one sequence.
+
+        Args:
+            cfg: Model configuration
+            kv_dtype: Storage format
+
+        Returns:
+            Bytes for keys and values across all layers, including scales
+        """
+        per_layer = cfg["emb_dim"] * {"fp32": 4, "bf16": 2, "int8": 1, "fp8": 1}[kv_dtype]
+        if kv_dtype in _QMAX:
+            per_layer += cfg["n_heads"] * 2  # float16 scale per head
+        return 2 * cfg["n_layers"] * per_layer
@@ -0,0 +1,253 @@
+"""
+Serving many LoRA adapters from one copy of the base model.
+
+A LoRA adapter (see ``08_fine_tuning/lora.py``) is a few megabytes, the base
+model hundreds. Instead of merging each adapter into its own model copy, an
+``AdapterBank`` keeps the base weights once and stacks the low-rank matrices
+of every loaded adapter per layer. A batch can then mix adapters freely: each
+row names its adapter, and every adapted layer computes
+
+    y = x W^T + (x A[ids]^T) B[ids]^T
+
+where ``A[ids]`` and ``B[ids]`` gather each row's matrices, so the low-rank
+updates of all rows run as two batched matmuls (``torch.bmm``) next to the
+single shared base matmul, whatever the number of distinct adapters.
+"""
+
+import contextlib
+import itertools
+import threading
+from importlib import import_module
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+
+_lora = import_module("..05_gpt_model.lora_format", __package__)
+_checkpoint = import_module("..05_gpt_model.checkpoint", __package__)
+
+BASE_SLOT = 0  # Slot of "no adapter": all zeros, the base model's output
+
+
+class MultiLoRALinear(nn.Module):
+    """
+    Linear layer with a bank of LoRA updates, selected per batch row.
+
+    Slot ``i`` holds one adapter's ``A`` (rank, in) and ``B`` (out, rank), with
+    the ``alpha / rank`` scaling folded into ``B``. Adapters of lower rank are
+    zero-padded to the largest rank in the bank.
+
+    Inputs are (batch, num_tokens, in_features), as in the transformer blocks.
+
+    Args:
+        base: Shared layer (``nn.Linear`` or ``QuantizedLinear``)
+        bank: Bank providing the per-row slot IDs of the current batch
+    """
+
+    def __init__(self, base: nn.Module, bank: "AdapterBank"):
+        """Start with the base slot only."""
+        super().__init__()
+        self.base = base
+        self.bank = bank
+        self.in_features = base.in_features
+        self.out_features = base.out_features
+        weight = next(itertools.chain(base.parameters(), base.buffers()))
+        factory = {"device": weight.device,  # Quantized weights: fp32 adapters
+                   "dtype": weight.dtype if weight.is_floating_point() else torch.float32}
+        # Non-persistent: the model's state_dict stays that of the base model
+        self.register_buffer("lora_A", torch.zeros(1, 1, self.in_features, **factory),
+                             persistent=False)
+        self.register_buffer("lora_B", torch.zeros(1, self.out_features, 1, **factory),
+                             persistent=False)
+        self._gathered: Optional[Tuple[torch.Tensor, torch.dtype, torch.Tensor, torch.Tensor]] = None
+
+    @property
+    def num_slots(self) -> int:
+        return self.lora_A.shape[0]
+
+    @property
+    def rank(self) -> int:
+        return self.lora_A.shape[1]
+
+    def _grow(self, num_slots: int, rank: int) -> None:
+        """Reallocate the stacks with room for ``num_slots`` and ``rank``."""
+        if num_slots <= self.num_slots and rank <= self.rank:
+            return
+        num_slots, rank = max(num_slots, self.num_slots), max(rank, self.rank)
+        A = self.lora_A.new_zeros(num_slots, rank, self.in_features)
+        B = self.lora_B.new_zeros(num_slots, self.out_features, rank)
+        A[:self.num_slots, :self.rank] = self.lora_A
+        B[:self.num_slots, :, :self.rank] = self.lora_B
+        self.lora_A, self.lora_B = A, B
+
+    def set_slot(self, slot: int, A: Optional[torch.Tensor] = None,
+                 B: Optional[torch.Tensor] = None, scaling: float = 1.0) -> None:
+        """
+        Store an adapter in a slot (or clear the slot when ``A`` is None).
+
+        Args:
+            slot: Slot index (grown as needed)
+            A: Down projection of shape (rank, in_features)
+            B: Up projection of shape (out_features, rank)
+            scaling: ``alpha / rank`` of the adapter
+        """
+        self._grow(slot + 1, A.shape[0] if A is not None else 1)
+        self._gathered = None
+        self.lora_A[slot].zero_()
+        self.lora_B[slot].zero_()
+        if A is not None:
+            rank = A.shape[0]
+            self.lora_A[slot, :rank] = A.to(self.lora_A.dtype)
+            self.lora_B[slot, :, :rank] = (B * scaling).to(self.lora_B.dtype)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        out = self.base(x)
+        ids = self.bank.active_ids
+        if ids is None:
+            return out
+        # Gather each row's matrices once per batch: the rows keep their
+        # adapters for every decoding step of a generation run
+        cached = self._gathered
+        if cached is None or cached[0] is not ids or cached[1] != x.dtype:
+            A_t = self.lora_A[ids].transpose(1, 2).to(x.dtype).contiguous()  # (b, in, r)
+            B_t = self.lora_B[ids].transpose(1, 2).to(x.dtype).contiguous()  # (b, r, out)
+            cached = self._gathered = (ids, x.dtype, A_t, B_t)
+        _, _, A_t, B_t = cached
+        return out + torch.bmm(torch.bmm(x, A_t), B_t)
+
+    def extra_repr(self) -> str:
+        return f"slots={self.num_slots}, rank={self.rank}"
+
+
+class AdapterBank:
+    """
+    Many LoRA adapters attached to one model, chosen per batch row.
+
+    The target layers of the model are wrapped in ``MultiLoRALinear`` once;
+    ``add`` then loads adapter files (written by ``save_lora``) into free
+    slots. ``use`` activates one adapter per row for the duration of a
+    forward pass; row IDs come from ``ids``, with ``None`` meaning the base
+    model.
+
+    Args:
+        model: Model to serve (for example a ``GPTModel``)
+        targets: Layer name suffixes that adapters may touch
+
+    Example:
+        >>> bank = AdapterBank(model)
+        >>> bank.add("spam", "adapters/spam.safetensors")
+        >>> bank.add("legal", "adapters/legal.safetensors")
+        >>> with bank.use(bank.ids(["spam", None, "legal"])):
+        ...     logits = model(idx)  # Row 1 uses the base model
+    """
+
+    def __init__(self, model: nn.Module, targets: Sequence[str] = _lora.ALL_TARGETS):
+        """Wrap the target layers of ``model``."""
+        self.model = model
+        self.targets = list(targets)
+        self.active_ids: Optional[torch.Tensor] = None
+        self.slots: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.layers: Dict[str, MultiLoRALinear] = {}
+        for name, module in list(model.named_modules()):
+            for child_name, child in list(module.named_children()):
+                full_name = f"{name}.{child_name}" if name else child_name
+                if (hasattr(child, "in_features") and _lora.matches_target(full_name, targets)
+                        and not isinstance(child, MultiLoRALinear)):
+                    layer = MultiLoRALinear(child, self)
+                    setattr(module, child_name, layer)
+                    self.layers[full_name] = layer
+        if not self.layers:
+            raise ValueError(f"No linear layer matches the targets {self.targets}")
+
+    @property
+    def names(self) -> List[str]:
+        """Names of the loaded adapters."""
+        return list(self.slots)
+
+    def _free_slot(self) -> int:
+        used = set(self.slots.values())
+        slot = BASE_SLOT + 1
+        while slot in used:
+            slot += 1
+        return slot
+
+    def add(self, name: str, path: str) -> int:
+        """
+        Load an adapter file into a free slot (replacing one of the same name).
+
+        Args:
+            name: Name requests use to select the adapter
+            path: File written by ``save_lora``
+
+        Returns:
+            Slot index of the adapter
+        """
+        reader = _checkpoint.open_checkpoint(path)
+        config = _lora.load_lora_config(path)
+        layer_names = {key.rsplit(".", 1)[0] for key in reader.keys()}
+        unknown = layer_names - set(self.layers)
+        if unknown:
+            raise ValueError(f"Adapter '{name}' adapts layers outside the bank's "
+                             f"targets: {sorted(unknown)[:3]}")
+
+        slot = self.slots.get(name) or self._free_slot()
+        scaling = config["alpha"] / config["rank"]
+        with self._lock:
+            for layer_name, layer in self.layers.items():
+                if layer_name in layer_names:
+                    layer.set_slot(slot, reader.get_tensor(f"{layer_name}.lora_A"),
+                                   reader.get_tensor(f"{layer_name}.lora_B"), scaling)
+                else:
+                    layer.set_slot(slot)  # Zeros: this adapter leaves the layer as is
+            self.slots[name] = slot
+        return slot
+
+    def remove(self, name: str) -> None:
+        """
+        Unload an adapter; its slot is reused by the next ``add``.
+
+        Args:
+            name: Adapter name
+        """
+        slot = self.slots.pop(name)
+        with self._lock:
+            for layer in self.layers.values():
+                if slot < layer.num_slots:
+                    layer.set_slot(slot)
+
+    def ids(self, names: Sequence[Optional[str]],
+            device: Optional[torch.device] = None) -> torch.Tensor:
+        """
+        Slot index of every row.
+
+        Args:
+            names: Adapter name per row (``None`` for the base model)
+            device: Device of the result
+
+        Returns:
+            Tensor of shape (batch,)
+        """
+        unknown = {n for n in names if n is not None and n not in self.slots}
+        if unknown:
+            raise ValueError(f"Unknown adapter(s) {sorted(unknown)}; loaded: {self.names}")
+        return torch.tensor([BASE_SLOT if n is None else self.slots[n] for n in names],
+                            device=device)
+
+    @contextlib.contextmanager
+    def use(self, ids: torch.Tensor) -> Iterator[None]:
+        """
+        Apply per-row adapters to forward passes inside the block.
+
+        Forward passes through the bank are serialized, so concurrent
+        requests cannot see each other's rows.
+
+        Args:
+            ids: Slot index per row, from ``ids``
+        """
+        with self._lock:
+            self.active_ids = ids
+            try:
+                yield
+            finally:
+                self.active_ids = None
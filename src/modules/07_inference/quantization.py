@@ -0,0 +1,283 @@
+"""
+Post-training weight-only quantization for CPU inference.
+
+On CPU, generating text with fp32 weights is limited by memory bandwidth:
+every token reads every weight once. Storing ``nn.Linear`` weights as int8
+(one scale per output channel) or packed int4 (one scale per group of input
+columns) cuts those reads by 4x or 8x. Activations stay in floating point and
+the weights are dequantized block by block inside the matmul, so the full
+fp32 weight matrix is never materialized.
+"""
+
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+empty_model = import_module("..05_gpt_model", __package__).empty_model
+
+SUPPORTED_BITS = (8, 4)
+
+# Linear layers always kept in floating point: mixture-of-experts routers are
+# tiny, and rounding their logits changes which experts a token goes to
+FLOAT_LAYERS = ("router",)
+
+
+def quantize_int8(weight: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Symmetric per-output-channel int8 quantization.
+
+    Args:
+        weight: Weight matrix of shape (out_features, in_features)
+
+    Returns:
+        Tuple of int8 weights (out_features, in_features) and float scales
+        (out_features,)
+    """
+    max_abs = weight.abs().amax(dim=1).clamp(min=1e-8)
+    scales = max_abs / 127.0
+    qweight = torch.round(weight / scales.unsqueeze(1)).clamp(-127, 127)
+    return qweight.to(torch.int8), scales
+
+
+def quantize_int4(weight: torch.Tensor,
+                  group_size: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Symmetric group-wise int4 quantization, two values packed per byte.
+
+    Args:
+        weight: Weight matrix of shape (out_features, in_features)
+        group_size: Number of input columns sharing one scale
+
+    Returns:
+        Tuple of packed uint8 weights (out_features, in_features // 2) and
+        float scales (out_features, in_features // group_size)
+    """
+    out_features, in_features = weight.shape
+    grouped = weight.reshape(out_features, in_features // group_size, group_size)
+    scales = grouped.abs().amax(dim=2).clamp(min=1e-8) / 7.0
+    q = torch.round(grouped / scales.unsqueeze(2)).clamp(-8, 7)
+    q = (q.reshape(out_features, in_features) + 8).to(torch.uint8)
+    packed = q[:, 0::2] | (q[:, 1::2] << 4)
+    return packed, scales
+
+
+def unpack_int4(packed: torch.Tensor) -> torch.Tensor:
+    """
+    Unpack int4 values stored two per byte.
+
+    Args:
+        packed: Packed uint8 tensor of shape (rows, in_features // 2)
+
+    Returns:
+        int8 tensor of shape (rows, in_features) with values in [-8, 7]
+    """
+    low = (packed & 0x0F).to(torch.int8) - 8
+    high = (packed >> 4).to(torch.int8) - 8
+    return torch.stack([low, high], dim=-1).reshape(packed.shape[0], -1)
+
+
+class QuantizedLinear(nn.Module):
+    """
+    Drop-in replacement for ``nn.Linear`` with int8 or int4 weights.
+
+    Args:
+        in_features: Size of each input sample
+        out_features: Size of each output sample
+        bias: Whether the layer has a bias
+        bits: 8 for per-channel int8, 4 for group-wise int4
+        group_size: Input columns per scale for int4
+        block_size: Output rows dequantized at a time in the matmul
+    """
+
+    def __init__(self, in_features: int, out_features: int, bias: bool = True,
+                 bits: int = 8, group_size: int = 128, block_size: int = 1024):
+        """Initialize empty quantized buffers."""
+        super().__init__()
+        if bits not in SUPPORTED_BITS:
+            raise ValueError(f"bits must be one of {SUPPORTED_BITS}, got {bits}")
+        group_size = min(group_size, in_features)
+        if bits == 4 and (in_features % group_size or group_size % 2):
+            raise ValueError(f"in_features ({in_features}) must be divisible by an "
+                             f"even group_size ({group_size}) for int4")
+
+        self.in_features = in_features
+        self.out_features = out_features
+        self.bits = bits
+        self.group_size = group_size
+        self.block_size = block_size
+
+        if bits == 8:
+            self.register_buffer("qweight", torch.empty(out_features, in_features,
+                                                        dtype=torch.int8))
+            self.register_buffer("scales", torch.empty(out_features))
+        else:
+            self.register_buffer("qweight", torch.empty(out_features, in_features // 2,
+                                                        dtype=torch.uint8))
+            self.register_buffer("scales", torch.empty(out_features,
+                                                       in_features // group_size))
+        if bias:
+            self.register_buffer("bias", torch.empty(out_features))
+        else:
+            self.bias = None
+
+    @classmethod
+    def from_linear(cls, linear: nn.Linear, bits: int = 8,
+                    group_size: int = 128) -> "QuantizedLinear":
+        """
+        Quantize an existing linear layer.
+
+        Args:
+            linear: Layer to quantize
+            bits: 8 or 4
+            group_size: Input columns per scale for int4
+
+        Returns:
+            New QuantizedLinear holding the quantized weights
+        """
+        layer = cls(linear.in_features, linear.out_features,
+                    bias=linear.bias is not None, bits=bits, group_size=group_size)
+        weight = linear.weight.detach().float()
+        if bits == 8:
+            layer.qweight, layer.scales = quantize_int8(weight)
+        else:
+            layer.qweight, layer.scales = quantize_int4(weight, layer.group_size)
+        if linear.bias is not None:
+            layer.bias = linear.bias.detach().float().clone()
+        return layer
+
+    def dequantize(self, start: int = 0, end: Optional[int] = None,
+                   dtype: torch.dtype = torch.float32) -> torch.Tensor:
+        """
+        Dequantize a block of output rows.
+
+        Args:
+            start: First output row
+            end: One past the last output row (defaults to all rows)
+            dtype: Floating point type of the result
+
+        Returns:
+            Weight block of shape (end - start, in_features)
+        """
+        end = self.out_features if end is None else end
+        scales = self.scales[start:end].to(dtype)
+        if self.bits == 8:
+            return self.qweight[start:end].to(dtype) * scales.unsqueeze(1)
+
+        q = unpack_int4(self.qweight[start:end]).to(dtype)
+        q = q.view(end - start, -1, self.group_size) * scales.unsqueeze(2)
+        return q.view(end - start, self.in_features)
+
+    def _linear_block(self, x: torch.Tensor, start: int, end: int) -> torch.Tensor:
+        """Compute output columns ``start:end`` from quantized weights."""
+        if self.bits == 8:
+            # Per-channel scales commute with the matmul: scale the output
+            # instead of the weights, saving one pass over the weight block
+            out = F.linear(x, self.qweight[start:end].to(x.dtype))
+            out = out * self.scales[start:end].to(x.dtype)
+        else:
+            out = F.linear(x, self.dequantize(start, end, x.dtype))
+        if self.bias is not None:
+            out = out + self.bias[start:end].to(x.dtype)
+        return out
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.out_features <= self.block_size:
+            return self._linear_block(x, 0, self.out_features)
+
+        # Dequantize a block of rows at a time to bound temporary memory
+        out = x.new_empty(*x.shape[:-1], self.out_features)
+        for start in range(0, self.out_features, self.block_size):
+            end = min(start + self.block_size, self.out_features)
+            out[..., start:end] = self._linear_block(x, start, end)
+        return out
+
+    def extra_repr(self) -> str:
+        return (f"in_features={self.in_features}, out_features={self.out_features}, "
+                f"bits={self.bits}, group_size={self.group_size}")
+
+
+def _replace_linear(model: nn.Module, factory: Callable[[nn.Linear], nn.Module],
+                    exclude: Iterable[str] = ()) -> nn.Module:
+    """Swap every ``nn.Linear`` but ``exclude`` and ``FLOAT_LAYERS`` for ``factory(linear)``."""
+    exclude = set(exclude)
+    for name, module in list(model.named_modules()):
+        for child_name, child in list(module.named_children()):
+            full_name = f"{name}.{child_name}" if name else child_name
+            if (isinstance(child, nn.Linear) and full_name not in exclude
+                    and child_name not in FLOAT_LAYERS):
+                setattr(module, child_name, factory(child))
+    return model
+
+
+def quantize_model(model: nn.Module, bits: int = 8, group_size: int = 128,
+                   exclude: Iterable[str] = ()) -> nn.Module:
+    """
+    Replace every ``nn.Linear`` of a model with a ``QuantizedLinear`` in place.
+
+    Args:
+        model: Model to quantize (for example a ``GPTModel``)
+        bits: 8 or 4
+        group_size: Input columns per scale for int4
+        exclude: Qualified module names to keep in floating point (the
+            ``FLOAT_LAYERS``, i.e. MoE routers, always are)
+
+    Returns:
+        The same model, quantized
+    """
+    return _replace_linear(
+        model, lambda linear: QuantizedLinear.from_linear(linear, bits, group_size),
+        exclude)
+
+
+def save_quantized(model: nn.Module, path: str, bits: int, group_size: int = 128,
+                   exclude: Iterable[str] = ()) -> None:
+    """
+    Save a quantized GPT model with the metadata needed to rebuild it.
+
+    Args:
+        model: Quantized ``GPTModel``
+        path: Destination file
+        bits: Bit width the model was quantized with
+        group_size: Group size the model was quantized with
+        exclude: Modules that were kept in floating point
+    """
+    torch.save({
+        "cfg": model.cfg,
+        "bits": bits,
+        "group_size": group_size,
+        "exclude": sorted(exclude),
+        "state_dict": model.state_dict(),
+    }, path)
+
+
+def load_quantized(path: str, map_location: Any = "cpu") -> nn.Module:
+    """
+    Load a quantized GPT model without materializing fp32 weights.
+
+    The model skeleton is built on the meta device, its linear layers are
+    swapped for empty ``QuantizedLinear`` layers, and the stored tensors are
+    then loaded into it.
+
+    Args:
+        path: File written by ``save_quantized``
+        map_location: Device to load the tensors onto
+
+    Returns:
+        Quantized ``GPTModel`` in evaluation mode
+    """
+    checkpoint: Dict[str, Any] = torch.load(path, map_location=map_location)
+    bits, group_size = checkpoint["bits"], checkpoint["group_size"]
+
+    with torch.device("meta"):
+        model = _replace_linear(
+            empty_model(checkpoint["cfg"]),
+            lambda linear: QuantizedLinear(linear.in_features, linear.out_features,
+                                           bias=linear.bias is not None, bits=bits,
+                                           group_size=group_size),
+            checkpoint["exclude"])
+
+    model.load_state_dict(checkpoint["state_dict"], assign=True)
+    return model.eval()
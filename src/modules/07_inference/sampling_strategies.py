@@ -0,0 +1,211 @@
+"""
+Batched sampling strategies for text generation.
+
+This module turns the logits of the last position of every sequence in a
+batch into next-token IDs. Each row of the batch can use its own temperature,
+top-k, top-p (nucleus) and repetition penalty, and all filters are applied as
+tensor operations over the whole batch instead of a Python loop per sequence.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import torch
+
+
+@dataclass
+class SamplingParams:
+    """
+    Sampling settings for a single sequence.
+
+    Args:
+        temperature: Softmax temperature; 0 selects greedy decoding
+        top_k: Keep only the k most likely tokens; 0 disables the filter
+        top_p: Keep the smallest set of tokens whose probability mass reaches p;
+            1.0 disables the filter
+        repetition_penalty: CTRL-style penalty for tokens already generated;
+            1.0 disables the penalty
+    """
+
+    temperature: float = 1.0
+    top_k: int = 0
+    top_p: float = 1.0
+    repetition_penalty: float = 1.0
+
+
+def apply_repetition_penalty(logits: torch.Tensor,
+                             prev_tokens: torch.Tensor,
+                             penalty: torch.Tensor) -> torch.Tensor:
+    """
+    Penalize logits of tokens that already appear in each sequence.
+
+    Positive logits are divided by the penalty and negative logits are
+    multiplied by it, so a penalty above 1 always makes a repeat less likely.
+
+    Args:
+        logits: Logits of shape (batch, vocab_size)
+        prev_tokens: Token IDs of shape (batch, seq_len); negative IDs are padding
+        penalty: Per-row penalty of shape (batch,)
+
+    Returns:
+        New logits tensor of shape (batch, vocab_size)
+    """
+    vocab_size = logits.shape[-1]
+    valid = prev_tokens >= 0
+    gathered = logits.gather(1, prev_tokens.clamp(min=0))
+
+    penalty = penalty.to(logits.dtype).unsqueeze(1)
+    penalized = torch.where(gathered > 0, gathered / penalty, gathered * penalty)
+
+    # Padding writes into an extra sink column so it never clobbers a real token
+    target = torch.where(valid, prev_tokens, torch.full_like(prev_tokens, vocab_size))
+    out = torch.cat([logits, logits.new_zeros(logits.shape[0], 1)], dim=1)
+    out.scatter_(1, target, penalized)
+    return out[:, :vocab_size]
+
+
+def _top_p_mask(sorted_logits: torch.Tensor, top_p: torch.Tensor) -> torch.Tensor:
+    """Return a mask of sorted positions that fall outside the nucleus."""
+    probs = torch.softmax(sorted_logits, dim=-1)
+    cumulative = torch.cumsum(probs, dim=-1)
+    # Mass *before* each token; the most likely token is therefore always kept
+    return (cumulative - probs) >= top_p.unsqueeze(1)
+
+
+def sample_next_tokens(logits: torch.Tensor,
+                       temperature: torch.Tensor,
+                       top_k: torch.Tensor,
+                       top_p: torch.Tensor,
+                       repetition_penalty: Optional[torch.Tensor] = None,
+                       prev_tokens: Optional[torch.Tensor] = None,
+                       generator: Optional[torch.Generator] = None) -> torch.Tensor:
+    """
+    Sample one token per row with per-row sampling settings.
+
+    When every row uses top-k, candidates are taken with ``torch.topk`` and
+    top-p is applied inside that small candidate set, so the full vocabulary
+    is never sorted. A full sort only happens when some row asks for top-p
+    without a top-k bound.
+
+    Args:
+        logits: Logits of shape (batch, vocab_size)
+        temperature: Per-row temperature of shape (batch,); values <= 0 mean greedy
+        top_k: Per-row top-k of shape (batch,); 0 disables the filter
+        top_p: Per-row top-p of shape (batch,); 1.0 disables the filter
+        repetition_penalty: Optional per-row penalty of shape (batch,)
+        prev_tokens: Token IDs already in each sequence, shape (batch, seq_len)
+        generator: Optional random generator for reproducible sampling
+
+    Returns:
+        Sampled token IDs of shape (batch,)
+    """
+    logits = logits.float()
+    vocab_size = logits.shape[-1]
+    device = logits.device
+
+    if (repetition_penalty is not None and prev_tokens is not None
+            and prev_tokens.numel() > 0 and bool((repetition_penalty != 1.0).any())):
+        logits = apply_repetition_penalty(logits, prev_tokens, repetition_penalty)
+
+    greedy = temperature <= 0
+    greedy_tokens = logits.argmax(dim=-1)
+    if bool(greedy.all()):
+        return greedy_tokens
+
+    scaled = logits / temperature.clamp(min=1e-5).unsqueeze(1)
+
+    k = torch.where(top_k > 0, top_k.clamp(max=vocab_size),
+                    torch.full_like(top_k, vocab_size))
+    use_top_p = bool((top_p < 1.0).any())
+    positions = torch.arange(vocab_size, device=device)
+
+    if bool((top_k > 0).all()):
+        # Every row is bounded by top-k: work in the (sorted) candidate set only
+        k_max = int(k.max())
+        candidates, candidate_ids = torch.topk(scaled, k_max, dim=-1)
+        candidates = candidates.masked_fill(positions[:k_max] >= k.unsqueeze(1),
+                                            float("-inf"))
+        if use_top_p:
+            candidates = candidates.masked_fill(_top_p_mask(candidates, top_p),
+                                                float("-inf"))
+        choice = torch.multinomial(torch.softmax(candidates, dim=-1), 1,
+                                   generator=generator)
+        sampled = candidate_ids.gather(1, choice).squeeze(1)
+    elif use_top_p:
+        # Nucleus filtering without a top-k bound needs the full ordering
+        sorted_logits, sorted_ids = torch.sort(scaled, dim=-1, descending=True)
+        remove = (positions >= k.unsqueeze(1)) | _top_p_mask(sorted_logits, top_p)
+        sorted_logits = sorted_logits.masked_fill(remove, float("-inf"))
+        choice = torch.multinomial(torch.softmax(sorted_logits, dim=-1), 1,
+                                   generator=generator)
+        sampled = sorted_ids.gather(1, choice).squeeze(1)
+    else:
+        if bool((top_k > 0).any()):
+            k_max = int(k[top_k > 0].max())
+            kth = torch.topk(scaled, k_max, dim=-1).values
+            threshold = kth.gather(1, (k.clamp(max=k_max) - 1).unsqueeze(1))
+            threshold = threshold.masked_fill((top_k <= 0).unsqueeze(1),
+                                              float("-inf"))
+            scaled = scaled.masked_fill(scaled < threshold, float("-inf"))
+        sampled = torch.multinomial(torch.softmax(scaled, dim=-1), 1,
+                                    generator=generator).squeeze(1)
+
+    return torch.where(greedy, greedy_tokens, sampled)
+
+
+class BatchedSampler:
+    """
+    Sampler holding per-row sampling settings for a batch of sequences.
+
+    The settings are stored as tensors once, so every generation step is a
+    single call to ``sample_next_tokens`` for the whole batch.
+
+    Args:
+        params: One ``SamplingParams`` per row of the batch
+        device: Device to place the parameter tensors on
+        seed: Optional seed for a private random generator
+
+    Example:
+        >>> sampler = BatchedSampler([SamplingParams(top_k=50),
+        ...                           SamplingParams(temperature=0.0)], seed=123)
+        >>> next_ids = sampler(logits[:, -1, :], prev_tokens=idx)
+    """
+
+    def __init__(self, params: Sequence[SamplingParams],
+                 device: Optional[torch.device] = None,
+                 seed: Optional[int] = None):
+        """Initialize sampler with per-row settings."""
+        self.params: List[SamplingParams] = list(params)
+        self.temperature = torch.tensor([p.temperature for p in self.params],
+                                        dtype=torch.float32, device=device)
+        self.top_k = torch.tensor([p.top_k for p in self.params],
+                                  dtype=torch.long, device=device)
+        self.top_p = torch.tensor([p.top_p for p in self.params],
+                                  dtype=torch.float32, device=device)
+        self.repetition_penalty = torch.tensor(
+            [p.repetition_penalty for p in self.params],
+            dtype=torch.float32, device=device)
+
+        self.generator = None
+        if seed is not None:
+            self.generator = torch.Generator(device=device or "cpu")
+            self.generator.manual_seed(seed)
+
+    def __len__(self) -> int:
+        return len(self.params)
+
+    def __call__(self, logits: torch.Tensor,
+                 prev_tokens: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Sample the next token for every row.
+
+        Args:
+            logits: Logits of shape (batch, vocab_size)
+            prev_tokens: Optional token history of shape (batch, seq_len)
+
+        Returns:
+            Token IDs of shape (batch,)
+        """
+        return sample_next_tokens(logits, self.temperature, self.top_k,
+                                  self.top_p, self.repetition_penalty,
+                                  prev_tokens, self.generator)
@@ -0,0 +1,134 @@
+"""
+Minimal HTTP server streaming generated text as Server-Sent Events (SSE).
+
+This is a local stand-in for a real serving stack, built only on asyncio so
+it has no extra dependencies. A request such as
+
+    GET /generate?prompt=Every+effort&max_new_tokens=40&temperature=0.8
+
+is answered with a ``text/event-stream`` response carrying one ``data:``
+event per decoded fragment, followed by a final ``done`` event. Adding
+``adapter=<name>`` selects a LoRA adapter loaded with ``load_adapter``.
+"""
+
+import asyncio
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .sampling_strategies import SamplingParams
+from .text_generation import InferenceEngine
+
+
+def format_sse(data: str, event: Optional[str] = None) -> bytes:
+    """
+    Format one Server-Sent Event.
+
+    Args:
+        data: Event payload; newlines are split over several ``data:`` lines
+        event: Optional event name
+
+    Returns:
+        Encoded event bytes
+    """
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def parse_sampling_params(query: Dict[str, str]) -> SamplingParams:
+    """
+    Build sampling settings from query-string values.
+
+    Args:
+        query: Query parameters (single values)
+
+    Returns:
+        SamplingParams with defaults for missing values
+    """
+    return SamplingParams(
+        temperature=float(query.get("temperature", 0.0)),
+        top_k=int(query.get("top_k", 0)),
+        top_p=float(query.get("top_p", 1.0)),
+        repetition_penalty=float(query.get("repetition_penalty", 1.0)),
+    )
+
+
+async def _send_error(writer: asyncio.StreamWriter, status: str, message: str) -> None:
+    """Write a plain-text error response."""
+    body = message.encode("utf-8")
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+                 .encode("utf-8") + body)
+    await writer.drain()
+
+
+async def handle_request(engine: InferenceEngine,
+                         reader: asyncio.StreamReader,
+                         writer: asyncio.StreamWriter) -> None:
+    """
+    Serve a single HTTP connection.
+
+    Args:
+        engine: Engine used to generate text
+        reader: Connection reader
+        writer: Connection writer
+    """
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass  # Headers are not needed
+
+        if len(request_line) < 2 or request_line[0] != "GET":
+            await _send_error(writer, "405 Method Not Allowed", "Only GET is supported")
+            return
+
+        url = urlsplit(request_line[1])
+        if url.path != "/generate":
+            await _send_error(writer, "404 Not Found", "Use /generate?prompt=...")
+            return
+
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            params = parse_sampling_params(query)
+            max_new_tokens = int(query.get("max_new_tokens", 50))
+            seed = int(query["seed"]) if "seed" in query else None
+        except ValueError as e:
+            await _send_error(writer, "400 Bad Request", f"Invalid parameter: {e}")
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+
+        try:
+            async for fragment in engine.stream(query.get("prompt", ""),
+                                                max_new_tokens, params, seed,
+                                                adapter=query.get("adapter")):
+                writer.write(format_sse(fragment))
+                await writer.drain()  # Flush every token for low latency
+        except ValueError as e:
+            writer.write(format_sse(str(e), event="error"))
+        writer.write(format_sse("", event="done"))
+        await writer.drain()
+    except ConnectionError:
+        pass  # Client went away mid-stream
+    finally:
+        writer.close()
+
+
+async def start_server(engine: InferenceEngine, host: str = "127.0.0.1",
+                       port: int = 8000) -> asyncio.AbstractServer:
+    """
+    Start the SSE server.
+
+    Args:
+        engine: Engine used to generate text
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+
+    Returns:
+        Running asyncio server
+    """
+    return await asyncio.start_server(
+        lambda reader, writer: handle_request(engine, reader, writer), host, port)
@@ -0,0 +1,205 @@
+"""
+Tensor-parallel inference across local processes.
+
+Every transformer block is split over ``world_size`` ranks (Megatron-style):
+
+- **Attention**: each rank owns ``n_heads / world_size`` heads, i.e. the
+  matching rows of ``W_query``, ``W_key`` and ``W_value`` (column-parallel)
+  and the matching input columns of ``out_proj`` (row-parallel).
+- **Feed forward**: each rank owns ``4 * emb_dim / world_size`` hidden
+  units, i.e. rows of the first linear layer and input columns of the second.
+
+A row-parallel layer produces a partial sum on every rank, so each block
+needs two all-reduces per forward pass (``gloo`` on CPU); nothing else is
+communicated. Embeddings, layer norms and the output head are replicated.
+Each rank's KV cache holds only its own heads.
+
+Ranks read their slices straight from the memory-mapped checkpoint: every
+shard is a (possibly strided) view into the mapping, so a rank pages in only
+its own ``1 / world_size`` of the block weights and nothing is copied. Column
+slices keep the full row stride, which BLAS handles without a copy.
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+import torch.distributed as dist
+import torch.nn as nn
+import torch.nn.functional as F
+
+from importlib import import_module
+
+gpt = import_module("..05_gpt_model", __package__)
+
+# Parameter name suffix -> dimension split across ranks (0: rows, 1: columns)
+_SPLITS = {
+    "att.W_query.weight": 0, "att.W_query.bias": 0,
+    "att.W_key.weight": 0, "att.W_key.bias": 0,
+    "att.W_value.weight": 0, "att.W_value.bias": 0,
+    "att.out_proj.weight": 1,
+    "ff.layers.0.weight": 0, "ff.layers.0.bias": 0,
+    "ff.layers.2.weight": 1,
+}
+
+
+class RowParallelLinear(nn.Module):
+    """
+    Linear layer whose input features are split across ranks.
+
+    Each rank multiplies its slice of the input by its columns of the
+    weight; the partial results are summed with an all-reduce and the
+    (replicated) bias is added once.
+
+    Args:
+        in_features: Input features held by this rank
+        out_features: Output features (full size)
+        bias: Whether to add a bias
+    """
+
+    def __init__(self, in_features: int, out_features: int, bias: bool = True):
+        """Allocate this rank's weight columns and the full bias."""
+        super().__init__()
+        self.weight = nn.Parameter(torch.empty(out_features, in_features))
+        self.bias = nn.Parameter(torch.empty(out_features)) if bias else None
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        out = F.linear(x, self.weight)
+        if dist.is_initialized() and dist.get_world_size() > 1:
+            dist.all_reduce(out)
+        return out + self.bias if self.bias is not None else out
+
+    def extra_repr(self) -> str:
+        return (f"in_features={self.weight.shape[1]} (per rank), "
+                f"out_features={self.weight.shape[0]}, bias={self.bias is not None}")
+
+
+def _split(name: str) -> Optional[int]:
+    """Dimension along which parameter ``name`` is sharded (None: replicated)."""
+    for suffix, dim in _SPLITS.items():
+        if name.endswith(suffix):
+            return dim
+    return None
+
+
+def shard_state_dict(state_dict: Dict[str, torch.Tensor], rank: int,
+                     world_size: int) -> Dict[str, torch.Tensor]:
+    """
+    This rank's slice of every tensor of a full ``GPTModel`` state dict.
+
+    Args:
+        state_dict: Full state dict (e.g. memory-mapped from a checkpoint)
+        rank: Rank to shard for
+        world_size: Number of ranks
+
+    Returns:
+        State dict for ``tensor_parallel_model``; shards are views of
+        ``state_dict``'s tensors
+    """
+    shard = {}
+    for name, tensor in state_dict.items():
+        dim = _split(name)
+        if dim is None:
+            shard[name] = tensor
+        else:
+            size = tensor.shape[dim] // world_size
+            shard[name] = tensor.narrow(dim, rank * size, size)
+    return shard
+
+
+def local_config(cfg: Dict[str, Any], world_size: int) -> Dict[str, Any]:
+    """
+    Configuration describing one rank's attention shard, for its KV cache.
+
+    Args:
+        cfg: Full model configuration
+        world_size: Number of ranks
+
+    Returns:
+        ``cfg`` with ``n_heads`` and ``emb_dim`` divided by ``world_size``
+        (the head dimension is unchanged)
+    """
+    if cfg.get("n_experts"):
+        raise ValueError("Tensor parallelism supports dense feed-forward blocks only")
+    if cfg["n_heads"] % world_size:
+        raise ValueError(f"n_heads ({cfg['n_heads']}) must be divisible by "
+                         f"the number of ranks ({world_size})")
+    return dict(cfg, n_heads=cfg["n_heads"] // world_size,
+                emb_dim=cfg["emb_dim"] // world_size)
+
+
+def tensor_parallel_model(cfg: Dict[str, Any], world_size: int) -> nn.Module:
+    """
+    Build an uninitialized (meta-device) ``GPTModel`` with sharded blocks.
+
+    Args:
+        cfg: Full model configuration
+        world_size: Number of ranks
+
+    Returns:
+        GPTModel skeleton whose blocks hold one rank's shard; ``cfg`` is the
+        full configuration and ``kv_cache_cfg`` the per-rank one
+    """
+    local = local_config(cfg, world_size)
+    emb_dim, hidden = cfg["emb_dim"], 4 * cfg["emb_dim"] // world_size
+    model = gpt.empty_model(cfg)
+    with torch.device("meta"):
+        for block in model.trf_blocks:
+            att = block.att
+            att.num_heads, att.d_out = local["n_heads"], local["emb_dim"]
+            for name in ("W_query", "W_key", "W_value"):
+                setattr(att, name, nn.Linear(emb_dim, local["emb_dim"], bias=cfg["qkv_bias"]))
+            att.out_proj = RowParallelLinear(local["emb_dim"], emb_dim)
+            block.ff.layers[0] = nn.Linear(emb_dim, hidden)
+            block.ff.layers[2] = RowParallelLinear(hidden, emb_dim)
+    model.kv_cache_cfg = local
+    return model
+
+
+def shard_model(model: nn.Module, rank: int, world_size: int) -> nn.Module:
+    """
+    Tensor-parallel copy of an in-memory ``GPTModel`` for one rank.
+
+    Args:
+        model: Full model
+        rank: Rank to shard for
+        world_size: Number of ranks
+
+    Returns:
+        Sharded model in evaluation mode
+    """
+    sharded = tensor_parallel_model(model.cfg, world_size)
+    sharded.load_state_dict(shard_state_dict(model.state_dict(), rank, world_size),
+                            assign=True)
+    return sharded.eval()
+
+
+def load_tensor_parallel(path: str, rank: Optional[int] = None,
+                         world_size: Optional[int] = None) -> nn.Module:
+    """
+    Load this rank's shard of a checkpoint written by ``save_model``.
+
+    Args:
+        path: Checkpoint file or sharded-checkpoint index
+        rank: Rank to load (defaults to the process group's rank)
+        world_size: Number of ranks (defaults to the process group's size)
+
+    Returns:
+        Sharded model in evaluation mode; run the same forward calls on
+        every rank
+    """
+    rank, world_size = _rank_and_size(rank, world_size)
+    reader = gpt.open_checkpoint(path)
+    model = tensor_parallel_model(json.loads(reader.metadata["cfg"]), world_size)
+    model.load_state_dict(shard_state_dict(reader.state_dict(), rank, world_size),
+                          assign=True)
+    return model.eval()
+
+
+def _rank_and_size(rank: Optional[int], world_size: Optional[int]) -> Tuple[int, int]:
+    initialized = dist.is_initialized()
+    if rank is None:
+        rank = dist.get_rank() if initialized else 0
+    if world_size is None:
+        world_size = dist.get_world_size() if initialized else 1
+    return rank, world_size
@@ -0,0 +1,547 @@
+"""
+Simple test script for the inference module.
+
+This script tests the inference module:
+1. Seeded sampling is reproducible
+2. Greedy, top-k and top-p rows respect their own settings in a mixed batch
+3. Repetition penalty lowers the logits of tokens already generated
+4. The engine streams text that matches a full decode, also over SSE
+5. Weight-only int8/int4 quantization stays close to fp32 and round-trips
+   through a checkpoint; mixture-of-experts routers stay in fp32
+6. Cached decoding matches full recomputation; int8/fp8 caches stay close
+   to the fp32 cache
+7. A batch mixing LoRA adapters (and the base model) row by row matches
+   running each adapter on its own; importing the module does not load the
+   training or fine-tuning modules
+8. Beam search finds the exhaustive optimum, reduces to greedy with one
+   beam, gives the same beams with and without a (reordered) KV cache and
+   finishes hypotheses at <|endoftext|>
+9. A model sharded over two processes (tensor parallel) gives the logits
+   and tokens of the full model, loading each shard from a checkpoint
+
+Run from the repository root:
+    python -m src.modules.07_inference.test
+"""
+
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from importlib import import_module
+
+import torch
+import torch.multiprocessing as mp
+
+from .sampling_strategies import (
+    SamplingParams,
+    BatchedSampler,
+    apply_repetition_penalty,
+    sample_next_tokens,
+)
+from .kv_cache import KVCache, QuantizedLayerKVCache
+from .multi_lora import AdapterBank
+from .quantization import (
+    QuantizedLinear,
+    load_quantized,
+    quantize_int4,
+    quantize_model,
+    save_quantized,
+    unpack_int4,
+)
+from .server import start_server
+from .tensor_parallel import RowParallelLinear, load_tensor_parallel, shard_model
+from .text_generation import InferenceEngine
+
+tokenization = import_module("..01_tokenization", __package__)
+gpt = import_module("..05_gpt_model", __package__)
+lora = import_module("..08_fine_tuning.lora", __package__)
+distributed = import_module("..06_training.distributed", __package__)
+
+TINY_CONFIG = gpt.get_config("124M", vocab_size=100, context_length=32,
+                             emb_dim=64, n_heads=4, n_layers=2, drop_rate=0.0)
+
+
+class BigramModel(torch.nn.Module):
+    """Tiny stand-in language model: logits depend only on the last token."""
+
+    def __init__(self, vocab_size: int):
+        super().__init__()
+        torch.manual_seed(0)
+        self.logits = torch.nn.Embedding(vocab_size, vocab_size)
+
+    def forward(self, idx: torch.Tensor) -> torch.Tensor:
+        return self.logits(idx)
+
+
+def build_engine() -> InferenceEngine:
+    """Create an engine over a small vocabulary with punctuation tokens."""
+    tokens = ["Every", "effort", "moves", "you", ",", ".", "!", "\"", "(", ")",
+              "forward", "onward", "<|endoftext|>", "<|unk|>"]
+    tokenizer = tokenization.TextTokenizer({t: i for i, t in enumerate(tokens)})
+    return InferenceEngine(BigramModel(len(tokens)), tokenizer, context_size=8)
+
+
+def test_seeded_sampling():
+    """Test that the same seed gives the same tokens."""
+    print("=== Testing Seeded Sampling ===")
+
+    logits = torch.randn(8, 1000, generator=torch.Generator().manual_seed(0))
+    params = [SamplingParams(temperature=0.8, top_k=40, top_p=0.9)] * 8
+
+    first = BatchedSampler(params, seed=123)(logits)
+    second = BatchedSampler(params, seed=123)(logits)
+    other = BatchedSampler(params, seed=7)(logits)
+
+    assert torch.equal(first, second), "Same seed produced different tokens"
+    print(f"Seed 123: {first.tolist()}")
+    print(f"Seed 7:   {other.tolist()}")
+
+
+def test_mixed_batch():
+    """Test that every row follows its own sampling settings."""
+    print("\n=== Testing Mixed Batch ===")
+
+    vocab_size = 500
+    logits = torch.randn(4, vocab_size, generator=torch.Generator().manual_seed(1))
+    sampler = BatchedSampler([
+        SamplingParams(temperature=0.0),
+        SamplingParams(top_k=5),
+        SamplingParams(top_p=0.5),
+        SamplingParams(temperature=1.5),
+    ], seed=0)
+
+    top5 = set(torch.topk(logits[1], 5).indices.tolist())
+    probs = torch.softmax(logits[2], dim=-1)
+    sorted_probs, sorted_ids = torch.sort(probs, descending=True)
+    nucleus_size = int((torch.cumsum(sorted_probs, 0) - sorted_probs < 0.5).sum())
+    nucleus = set(sorted_ids[:nucleus_size].tolist())
+
+    for _ in range(50):
+        tokens = sampler(logits)
+        assert tokens[0] == logits[0].argmax(), "Greedy row did not take argmax"
+        assert int(tokens[1]) in top5, "Top-k row sampled outside the top 5"
+        assert int(tokens[2]) in nucleus, "Top-p row sampled outside the nucleus"
+        assert 0 <= int(tokens[3]) < vocab_size
+
+    print(f"Top-5 candidates: {sorted(top5)}")
+    print(f"Nucleus size for p=0.5: {nucleus_size}")
+
+
+def test_top_k_paths_agree():
+    """Test that the top-k candidate path and full-sort path agree on support."""
+    print("\n=== Testing Top-k / Top-p Paths ===")
+
+    logits = torch.randn(2, 300, generator=torch.Generator().manual_seed(2))
+    temperature = torch.ones(2)
+    top_p = torch.full((2,), 0.8)
+
+    # Both rows bounded by top-k -> candidate path; second row unbounded -> sort path
+    bounded = torch.tensor([20, 20])
+    mixed = torch.tensor([20, 0])
+
+    generator = torch.Generator().manual_seed(3)
+    support = set()
+    for _ in range(200):
+        support.add(int(sample_next_tokens(logits, temperature, bounded, top_p,
+                                           generator=generator)[0]))
+        token = int(sample_next_tokens(logits, temperature, mixed, top_p,
+                                       generator=generator)[0])
+        assert token in set(torch.topk(logits[0], 20).indices.tolist())
+
+    assert support <= set(torch.topk(logits[0], 20).indices.tolist())
+    print(f"Distinct tokens sampled from row 0: {len(support)}")
+
+
+def test_repetition_penalty():
+    """Test repetition penalty on positive and negative logits."""
+    print("\n=== Testing Repetition Penalty ===")
+
+    logits = torch.tensor([[2.0, -2.0, 1.0, 0.5]])
+    prev_tokens = torch.tensor([[0, 1, 1, -1]])  # -1 is padding
+    penalized = apply_repetition_penalty(logits, prev_tokens, torch.tensor([2.0]))
+
+    expected = torch.tensor([[1.0, -4.0, 1.0, 0.5]])
+    assert torch.allclose(penalized, expected), f"Unexpected logits: {penalized}"
+
+    # A strong penalty moves greedy decoding away from the repeated token
+    sampler = BatchedSampler([SamplingParams(temperature=0.0,
+                                             repetition_penalty=4.0)])
+    token = sampler(logits, prev_tokens=torch.tensor([[0]]))
+    assert int(token) == 2, "Penalized token was still chosen"
+    print(f"Penalized logits: {penalized.tolist()}")
+
+
+def test_streaming_matches_decode():
+    """Test that streamed fragments continue the prompt exactly like decode."""
+    print("\n=== Testing Streaming Generation ===")
+
+    engine = build_engine()
+    tokenizer = engine.tokenizer
+    prompt = "Every, effort!"
+    prompt_ids = tokenizer.encode(prompt)
+    params = SamplingParams(temperature=1.0)
+
+    async def collect():
+        return [f async for f in engine.stream(prompt, 30, params, seed=5)]
+
+    fragments = asyncio.run(collect())
+    ids = engine.generate(torch.tensor([prompt_ids]), 30,
+                          [params], seed=5)[0].tolist()
+    if engine.eos_id in ids:
+        ids = ids[:ids.index(engine.eos_id)]
+
+    streamed = tokenizer.decode(prompt_ids) + "".join(fragments)
+    assert streamed == tokenizer.decode(ids), \
+        "Streamed text differs from full decode"
+    print(f"Fragments: {fragments[:10]}")
+
+
+def test_sse_server():
+    """Test the SSE stand-in end to end over a local socket."""
+    print("\n=== Testing SSE Server ===")
+
+    engine = build_engine()
+
+    async def roundtrip():
+        server = await start_server(engine, port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /generate?prompt=Every%2C+effort&max_new_tokens=10 "
+                     b"HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        response = (await reader.read()).decode("utf-8")
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = asyncio.run(roundtrip())
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert "text/event-stream" in response
+    assert response.rstrip().endswith("event: done\ndata:")
+
+    events = response.split("\r\n\r\n", 1)[1].split("\n\n")
+    fragments = [e[len("data: "):] for e in events if e.startswith("data: ")]
+    print(f"Received {len(fragments)} events: {fragments}")
+
+
+def test_quantized_linear():
+    """Test int8/int4 linear layers against the fp32 layer."""
+    print("\n=== Testing Quantized Linear ===")
+
+    torch.manual_seed(0)
+    linear = torch.nn.Linear(256, 2048)
+    x = torch.randn(2, 8, 256)
+    reference = linear(x)
+
+    # Integer weights with a max of 7 per group quantize with a scale of 1
+    weight = torch.randint(-7, 8, (4, 256)).float()
+    weight[:, 0] = weight[:, 128] = 7
+    packed, scales = quantize_int4(weight, group_size=128)
+    assert packed.shape == (4, 128) and torch.allclose(scales, torch.ones(4, 2))
+    assert torch.equal(unpack_int4(packed).float(), weight), "int4 packing is lossy"
+
+    for bits, tolerance in [(8, 0.01), (4, 0.1)]:
+        layer = QuantizedLinear.from_linear(linear, bits=bits, group_size=64)
+        layer.block_size = 512  # Exercise the blocked matmul path
+        error = ((layer(x) - reference).norm() / reference.norm()).item()
+        assert error < tolerance, f"int{bits} relative error too large: {error:.4f}"
+        print(f"int{bits} relative error: {error:.4f}")
+
+
+def test_quantized_checkpoint():
+    """Test quantizing a GPT model and reloading it from disk."""
+    print("\n=== Testing Quantized Checkpoint ===")
+
+    torch.manual_seed(0)
+    model = gpt.GPTModel(TINY_CONFIG).eval()
+    idx = torch.randint(0, TINY_CONFIG["vocab_size"], (2, 16))
+    with torch.no_grad():
+        reference = model(idx)
+        quantize_model(model, bits=4, group_size=32, exclude=["out_head"])
+        quantized = model(idx)
+
+    assert isinstance(model.trf_blocks[0].att.W_query, QuantizedLinear)
+    assert isinstance(model.out_head, torch.nn.Linear)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model-int4.pth")
+        save_quantized(model, path, bits=4, group_size=32, exclude=["out_head"])
+        loaded = load_quantized(path)
+        with torch.no_grad():
+            reloaded = loaded(idx)
+        size_kb = os.path.getsize(path) / 1024
+
+    assert torch.equal(quantized, reloaded), "Reloaded model gives different logits"
+    error = ((quantized - reference).norm() / reference.norm()).item()
+
+    # Mixture-of-experts routers stay in floating point, also through a file
+    torch.manual_seed(0)
+    moe = gpt.GPTModel(dict(TINY_CONFIG, n_experts=4, moe_top_k=2)).eval()
+    router = moe.trf_blocks[0].ff.router.weight.clone()
+    quantize_model(moe, bits=4, group_size=32)
+    assert isinstance(moe.trf_blocks[0].ff.experts[0].layers[0], QuantizedLinear)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "moe-int4.pth")
+        save_quantized(moe, path, bits=4, group_size=32)
+        loaded = load_quantized(path)
+    for model in (moe, loaded):
+        assert type(model.trf_blocks[0].ff.router) is torch.nn.Linear
+        assert torch.equal(model.trf_blocks[0].ff.router.weight, router)
+    print(f"Checkpoint size: {size_kb:.1f} KB, logits relative error: {error:.4f}; "
+          f"MoE routers kept in fp32")
+
+
+def test_kv_cache_matches_recompute():
+    """Test that cached generation gives the same tokens as recomputation."""
+    print("\n=== Testing KV Cache ===")
+
+    torch.manual_seed(0)
+    model = gpt.GPTModel(TINY_CONFIG)
+    tokenizer = tokenization.TextTokenizer({str(i): i for i in range(100)})
+    prompt = torch.randint(0, 100, (3, 5))
+
+    outputs = {}
+    for kv_cache_dtype in [None, "fp32"]:
+        engine = InferenceEngine(model, tokenizer, context_size=32,
+                                 kv_cache_dtype=kv_cache_dtype)
+        outputs[kv_cache_dtype] = engine.generate(prompt, 20)
+
+    assert torch.equal(outputs[None], outputs["fp32"]), "Cached tokens differ"
+
+    # Runs longer than the context window fall back to recomputation
+    long_run = engine.generate(prompt, 40)
+    assert long_run.shape == (3, 45)
+    print(f"Greedy tokens match for {outputs[None].shape[1] - 5} steps")
+
+
+def test_quantized_kv_cache():
+    """Test int8/fp8 caches against the fp32 cache, step by step."""
+    print("\n=== Testing Quantized KV Cache ===")
+
+    torch.manual_seed(0)
+    model = gpt.GPTModel(TINY_CONFIG).eval()
+    idx = torch.randint(0, 100, (2, 24))
+
+    def cached_logits(kv_dtype):
+        cache = KVCache(TINY_CONFIG, batch_size=2, kv_dtype=kv_dtype)
+        with torch.no_grad():
+            steps = [model(idx[:, :8], kv_cache=cache)]
+            steps += [model(idx[:, i:i + 1], kv_cache=cache) for i in range(8, 24)]
+        return torch.cat(steps, dim=1), cache.nbytes()
+
+    reference, reference_bytes = cached_logits("fp32")
+    with torch.no_grad():
+        assert torch.allclose(reference, model(idx), atol=1e-5)
+
+    for kv_dtype, tolerance in [("int8", 0.02), ("fp8", 0.08)]:
+        logits, nbytes = cached_logits(kv_dtype)
+        error = ((logits - reference).norm() / reference.norm()).item()
+        assert error < tolerance, f"{kv_dtype} cache error too large: {error:.4f}"
+        print(f"{kv_dtype}: relative logits error {error:.4f}, "
+              f"{reference_bytes / nbytes:.2f}x smaller than fp32")
+
+    # All-zero and tiny vectors dequantize to (near) zero, not NaN
+    for kv_dtype in ("int8", "fp8"):
+        layer = QuantizedLayerKVCache(1, 2, 4, 8, kv_dtype=kv_dtype)
+        x = torch.zeros(1, 2, 2, 8)
+        x[:, 1] = 1e-7
+        keys, values = layer.update(x, x)
+        assert torch.isfinite(keys).all() and torch.isfinite(values).all()
+        assert (keys - x).abs().max() < 1e-6
+
+
+def test_multi_adapter_batch():
+    """Test per-row adapters against one adapted model per adapter."""
+    print("\n=== Testing Multi-Adapter Batches ===")
+
+    def base_model():
+        torch.manual_seed(0)
+        return gpt.GPTModel(TINY_CONFIG).eval()
+
+    idx = torch.randint(0, 100, (4, 10), generator=torch.Generator().manual_seed(5))
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, expected = {}, {None: base_model()(idx)}
+        for name, rank, targets in [("a", 4, lora.ALL_TARGETS),
+                                    ("b", 2, lora.ATTENTION_TARGETS)]:
+            adapted = lora.apply_lora(base_model(), rank=rank, alpha=8, targets=targets)
+            for p in lora.lora_state_dict(adapted).values():
+                torch.nn.init.normal_(p, std=0.2)  # Nonzero B, unlike a fresh adapter
+            paths[name] = lora.save_lora(adapted, os.path.join(tmp, f"{name}.safetensors"))
+            with torch.no_grad():
+                expected[name] = adapted(idx)
+
+        model = base_model()
+        bank = AdapterBank(model)
+        for name, path in paths.items():
+            bank.add(name, path)
+        rows = ["a", None, "b", "a"]
+        with torch.no_grad(), bank.use(bank.ids(rows)):
+            mixed = model(idx)
+        for i, name in enumerate(rows):
+            assert torch.allclose(mixed[i], expected[name][i], atol=1e-5), (i, name)
+        with torch.no_grad():
+            assert torch.equal(model(idx), expected[None]), "No active adapters: base model"
+
+        bank.remove("a")
+        assert bank.add("c", paths["b"]) == 1, "Freed slot should be reused"
+        try:
+            bank.ids(["a"])
+            raise AssertionError("Removed adapter should be unknown")
+        except ValueError:
+            pass
+
+        tokenizer = tokenization.TextTokenizer({str(i): i for i in range(100)})
+        engine = InferenceEngine(base_model(), tokenizer, context_size=32,
+                                 kv_cache_dtype="fp32")
+        for name, path in paths.items():
+            engine.load_adapter(name, path)
+        together = engine.generate(idx[:3, :5], 8, adapters=["a", "b", None])
+        for i, name in enumerate(["a", "b", None]):
+            alone = engine.generate(idx[i:i + 1, :5], 8, adapters=[name])
+            assert torch.equal(together[i], alone[0]), f"Row {i} ({name}) differs"
+    print(f"Rows {rows} match their own adapters; cached generation matches per-row runs")
+
+    # Serving adapters must not drag in the training stack
+    code = ("import importlib, sys; importlib.import_module(sys.argv[1]); "
+            "print(' '.join(m for m in sys.modules if m.startswith('src.')))")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+    loaded = subprocess.run([sys.executable, "-c", code, __package__], cwd=root,
+                            capture_output=True, text=True, check=True).stdout.split()
+    heavy = [m for m in loaded if m.split(".")[2:3] in (["06_training"], ["08_fine_tuning"])]
+    assert not heavy, f"Importing the inference module loads {heavy[:3]}"
+    print(f"Importing {__package__} loads {len(loaded)} modules, none from 06 or 08")
+
+
+def test_beam_search():
+    """Test batched beam search against exhaustive search, greedy and recomputation."""
+    print("\n=== Testing Beam Search ===")
+
+    # With vocab^(steps-1) beams, beam search is exhaustive
+    engine = build_engine()
+    vocab_size = len(engine.tokenizer.str_to_int)
+    log_probs = torch.log_softmax(engine.model.logits.weight.detach(), dim=-1)
+    prompts = torch.tensor([[0, 1], [2, 3]])
+    out = engine.beam_search(prompts, 3, num_beams=vocab_size ** 2, length_penalty=0.0,
+                             stop_at_eos=False, num_return_sequences=3)
+    for prompt, sequences, scores in zip(prompts, out.sequences, out.scores):
+        def total(tokens):
+            path = [int(prompt[-1])] + list(tokens)
+            return sum(log_probs[a, b].item() for a, b in zip(path, path[1:]))
+        best = max(itertools.product(range(vocab_size), repeat=3), key=total)
+        assert sequences[0].tolist() == prompt.tolist() + list(best)
+        assert abs(scores[0] - total(best)) < 1e-4
+        assert scores == sorted(scores, reverse=True)
+
+    # Hypotheses end at <|endoftext|>, scored with the length penalty
+    out = engine.beam_search(prompts[:1], 6, num_beams=3, num_return_sequences=3,
+                             early_stopping=False)
+    for sequence, score in zip(out.sequences[0], out.scores[0]):
+        generated = sequence[2:].tolist()
+        assert engine.eos_id not in generated[:-1]
+        path = [1] + generated
+        total = sum(log_probs[a, b].item() for a, b in zip(path, path[1:]))
+        assert abs(score - total / len(generated)) < 1e-4
+    print(f"Best hypothesis: {out.sequences[0][0].tolist()} (score {out.scores[0][0]:.3f})")
+
+    # One beam is greedy decoding; the cache (reordered in place) changes nothing
+    torch.manual_seed(0)
+    model = gpt.GPTModel(TINY_CONFIG)
+    tokenizer = tokenization.TextTokenizer({str(i): i for i in range(100)})
+    prompt = torch.randint(0, 100, (3, 5))
+    results = {}
+    for kv_cache_dtype in [None, "fp32"]:
+        engine = InferenceEngine(model, tokenizer, context_size=32,
+                                 kv_cache_dtype=kv_cache_dtype)
+        greedy = engine.beam_search(prompt, 10, num_beams=1, stop_at_eos=False)
+        assert torch.equal(torch.stack(greedy.best), engine.generate(prompt, 10))
+        results[kv_cache_dtype] = engine.beam_search(prompt, 10, num_beams=4,
+                                                     num_return_sequences=4,
+                                                     stop_at_eos=False)
+    for cached, recomputed in zip(results["fp32"].sequences, results[None].sequences):
+        assert all(torch.equal(a, b) for a, b in zip(cached, recomputed))
+    print("4 beams x 3 prompts match with and without the KV cache")
+
+
+def _tensor_parallel_rank(rank: int, world_size: int, port: int, path: str):
+    """One rank of ``test_tensor_parallel`` (the same environment torchrun sets)."""
+    os.environ.update(RANK=str(rank), WORLD_SIZE=str(world_size), LOCAL_RANK=str(rank),
+                      MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port))
+    distributed.init_distributed()
+    try:
+        full = gpt.load_model(path).eval()
+        sharded = load_tensor_parallel(path)
+        block = sharded.trf_blocks[0]
+        assert block.att.W_query.weight.shape[0] == TINY_CONFIG["emb_dim"] // world_size
+        assert isinstance(block.ff.layers[2], RowParallelLinear)
+
+        torch.manual_seed(0)
+        idx = torch.randint(0, TINY_CONFIG["vocab_size"], (2, 12))
+        with torch.no_grad():
+            diff = (sharded(idx) - full(idx)).abs().max().item()
+        assert diff < 1e-5, f"Sharded logits differ by {diff}"
+
+        # Each rank caches only its own heads; all ranks decode in lockstep
+        tokenizer = tokenization.TextTokenizer({str(i): i for i in range(100)})
+        outputs = [InferenceEngine(model, tokenizer, context_size=32,
+                                   kv_cache_dtype="fp32").generate(idx[:, :5], 15)
+                   for model in (full, sharded)]
+        assert torch.equal(*outputs), "Sharded model generated different tokens"
+
+        # Sharding an in-memory model gives the same weights
+        again = shard_model(full, rank, world_size)
+        assert torch.equal(again.trf_blocks[1].att.out_proj.weight,
+                           sharded.trf_blocks[1].att.out_proj.weight)
+    finally:
+        distributed.cleanup_distributed()
+
+
+def test_tensor_parallel():
+    """Test a GPT model sharded over two processes against the full model."""
+    print("\n=== Testing Tensor-Parallel Inference ===")
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    torch.manual_seed(0)
+    model = gpt.GPTModel(dict(TINY_CONFIG, qkv_bias=True))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.safetensors")
+        gpt.save_model(model, path)
+        mp.spawn(_tensor_parallel_rank, args=(2, port, path), nprocs=2, join=True)
+    print("2 ranks match the full model's logits and greedy tokens (KV cache on)")
+
+
+def main():
+    """Run all tests."""
+    print("🧪 Starting Inference Tests")
+    print("=" * 50)
+
+    try:
+        test_seeded_sampling()
+        test_mixed_batch()
+        test_top_k_paths_agree()
+        test_repetition_penalty()
+        test_streaming_matches_decode()
+        test_sse_server()
+        test_quantized_linear()
+        test_quantized_checkpoint()
+        test_kv_cache_matches_recompute()
+        test_quantized_kv_cache()
+        test_multi_adapter_batch()
+        test_beam_search()
+        test_tensor_parallel()
+
+        print("\n✅ All tests completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
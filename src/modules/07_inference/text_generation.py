@@ -0,0 +1,279 @@
+"""
+Text generation engine built on top of the batched sampler.
+
+The engine wraps a GPT-style model (token IDs of shape (batch, seq_len) in,
+logits of shape (batch, seq_len, vocab_size) out) together with a tokenizer.
+It offers batched generation of token IDs, beam search, and an async
+generator that streams decoded text fragments one token at a time. LoRA adapters can be
+loaded into the engine and chosen per row of a batch.
+"""
+
+import asyncio
+import contextlib
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, Optional, Sequence
+
+import torch
+
+from .beam_search import BeamSearchOutput, beam_search
+from .kv_cache import KVCache
+from .sampling_strategies import SamplingParams, BatchedSampler
+
+if TYPE_CHECKING:
+    from .multi_lora import AdapterBank
+
+profile_from_env = import_module("..05_gpt_model", __package__).profile_from_env
+
+
+class InferenceEngine:
+    """
+    Generate text from a GPT-style model.
+
+    Args:
+        model: Module mapping token IDs (batch, seq_len) to logits
+            (batch, seq_len, vocab_size)
+        tokenizer: Tokenizer with ``encode``, ``decode``, ``str_to_int`` and
+            ``incremental_decoder``
+        context_size: Maximum number of tokens the model can attend to
+        device: Device to run the model on
+        kv_cache_dtype: Storage format of the key/value cache (``"fp32"``,
+            ``"bf16"``, ``"int8"`` or ``"fp8"``); ``None`` recomputes the full
+            context every step. Caching requires a ``GPTModel``-style model
+            with a ``cfg`` and a ``kv_cache`` argument
+
+    Example:
+        >>> engine = InferenceEngine(model, tokenizer, context_size=256)
+        >>> async for fragment in engine.stream("Every effort moves you"):
+        ...     print(fragment, end="", flush=True)
+    """
+
+    def __init__(self, model: torch.nn.Module, tokenizer: Any,
+                 context_size: int, device: Optional[torch.device] = None,
+                 kv_cache_dtype: Optional[str] = None):
+        """Initialize engine and put the model in evaluation mode."""
+        self.device = device or torch.device("cpu")
+        self.model = model.to(self.device).eval()
+        self.tokenizer = tokenizer
+        self.context_size = context_size
+        self.kv_cache_dtype = kv_cache_dtype
+        self.eos_id = tokenizer.str_to_int.get("<|endoftext|>")
+        self.adapters: Optional["AdapterBank"] = None
+        # Per-layer profile, one step per forward pass, when BUILD_LLM_PROFILE is set
+        self.profiler = profile_from_env(self.model)
+
+    def load_adapter(self, name: str, path: str) -> None:
+        """
+        Load a LoRA adapter that requests can select by name.
+
+        The first call wraps the model's linear layers in an ``AdapterBank``;
+        all adapters share the base weights.
+
+        Args:
+            name: Adapter name used in ``generate(adapters=...)`` and ``stream``
+            path: File written by ``save_lora``
+        """
+        if self.adapters is None:
+            from .multi_lora import AdapterBank
+            self.adapters = AdapterBank(self.model)
+        self.adapters.add(name, path)
+
+    def adapter_ids(self, names: Optional[Sequence[Optional[str]]],
+                    batch_size: int) -> Optional[torch.Tensor]:
+        """
+        Adapter slot of every row, or None when no row uses an adapter.
+
+        Args:
+            names: Adapter name per row (``None`` entries use the base model)
+            batch_size: Number of rows
+
+        Returns:
+            Tensor of shape (batch,) for ``next_logits``, or None
+        """
+        if names is None or all(name is None for name in names):
+            return None
+        if len(names) != batch_size:
+            raise ValueError(f"Got {len(names)} adapter names for {batch_size} rows")
+        if self.adapters is None:
+            raise ValueError("No adapters loaded; call load_adapter first")
+        return self.adapters.ids(names, device=self.device)
+
+    def new_cache(self, batch_size: int, total_len: int) -> Optional[KVCache]:
+        """
+        Allocate a KV cache for a generation run, if caching applies.
+
+        Args:
+            batch_size: Number of sequences
+            total_len: Prompt length plus the number of tokens to generate
+
+        Returns:
+            A ``KVCache``, or ``None`` when caching is disabled or the run does
+            not fit in the context window (positions cannot slide in a cache)
+        """
+        if self.kv_cache_dtype is None or total_len > self.context_size:
+            return None
+        # Tensor-parallel shards cache only their own heads
+        cfg = getattr(self.model, "kv_cache_cfg", self.model.cfg)
+        return KVCache(cfg, batch_size, max_len=total_len,
+                       kv_dtype=self.kv_cache_dtype, device=self.device)
+
+    @torch.no_grad()
+    def next_logits(self, idx: torch.Tensor, kv_cache: Optional[KVCache] = None,
+                    adapter_ids: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Run the model and return the logits of the last position.
+
+        Args:
+            idx: Token IDs of shape (batch, seq_len); with a cache, only the
+                tokens not yet cached
+            kv_cache: Optional key/value cache
+            adapter_ids: Optional adapter slot per row (see ``adapter_ids``)
+
+        Returns:
+            Logits of shape (batch, vocab_size)
+        """
+        with (self.adapters.use(adapter_ids) if adapter_ids is not None
+              else contextlib.nullcontext()):
+            if kv_cache is None:
+                logits = self.model(idx[:, -self.context_size:])[:, -1, :]
+            else:
+                logits = self.model(idx, kv_cache=kv_cache)[:, -1, :]
+        if self.profiler is not None:
+            self.profiler.step()
+        return logits
+
+    def generate_tokens(self, idx: torch.Tensor, max_new_tokens: int,
+                        sampler: BatchedSampler,
+                        adapter_ids: Optional[torch.Tensor] = None) -> Iterator[torch.Tensor]:
+        """
+        Yield the next token IDs for the whole batch, one step at a time.
+
+        Args:
+            idx: Prompt token IDs of shape (batch, seq_len)
+            max_new_tokens: Number of tokens to generate
+            sampler: Sampler with one set of settings per row
+            adapter_ids: Optional adapter slot per row
+
+        Yields:
+            Token IDs of shape (batch,) for each step
+        """
+        idx = idx.to(self.device)
+        cache = self.new_cache(idx.shape[0], idx.shape[1] + max_new_tokens)
+        logits = self.next_logits(idx, cache, adapter_ids)
+
+        for step in range(max_new_tokens):
+            next_ids = sampler(logits, prev_tokens=idx)
+            idx = torch.cat([idx, next_ids.unsqueeze(1)], dim=1)
+            yield next_ids
+            if step + 1 < max_new_tokens:
+                step_ids = next_ids.unsqueeze(1) if cache is not None else idx
+                logits = self.next_logits(step_ids, cache, adapter_ids)
+
+    def generate(self, idx: torch.Tensor, max_new_tokens: int,
+                 params: Optional[Sequence[SamplingParams]] = None,
+                 seed: Optional[int] = None,
+                 adapters: Optional[Sequence[Optional[str]]] = None) -> torch.Tensor:
+        """
+        Generate tokens for a batch of prompts of equal length.
+
+        Args:
+            idx: Prompt token IDs of shape (batch, seq_len)
+            max_new_tokens: Number of tokens to generate
+            params: One ``SamplingParams`` per row (greedy if omitted)
+            seed: Optional seed for reproducible sampling
+            adapters: Optional LoRA adapter name per row (``None`` entries use
+                the base model); rows with different adapters share each
+                forward pass
+
+        Returns:
+            Token IDs of shape (batch, seq_len + max_new_tokens)
+        """
+        if params is None:
+            params = [SamplingParams(temperature=0.0)] * idx.shape[0]
+        sampler = BatchedSampler(params, device=self.device, seed=seed)
+        adapter_ids = self.adapter_ids(adapters, idx.shape[0])
+
+        steps = list(self.generate_tokens(idx, max_new_tokens, sampler, adapter_ids))
+        if not steps:
+            return idx
+        return torch.cat([idx.to(self.device), torch.stack(steps, dim=1)], dim=1)
+
+    def beam_search(self, idx: torch.Tensor, max_new_tokens: int, num_beams: int = 4,
+                    length_penalty: float = 1.0, early_stopping: bool = True,
+                    num_return_sequences: int = 1,
+                    stop_at_eos: bool = True) -> BeamSearchOutput:
+        """
+        Beam search for a batch of prompts of equal length.
+
+        All beams run as one batch and share the KV cache of the engine's
+        ``kv_cache_dtype``, reordered in place as beams are pruned.
+
+        Args:
+            idx: Prompt token IDs of shape (batch, seq_len)
+            max_new_tokens: Maximum number of tokens to generate
+            num_beams: Beams per prompt
+            length_penalty: Hypotheses score ``sum_logprobs / length ** length_penalty``
+            early_stopping: Stop a prompt once ``num_beams`` hypotheses ended
+            num_return_sequences: Hypotheses to return per prompt
+            stop_at_eos: Whether ``<|endoftext|>`` finishes a hypothesis
+
+        Returns:
+            BeamSearchOutput with sequences and scores per prompt, best first
+        """
+        return beam_search(self, idx, max_new_tokens, num_beams=num_beams,
+                           length_penalty=length_penalty, early_stopping=early_stopping,
+                           num_return_sequences=num_return_sequences,
+                           eos_id=self.eos_id if stop_at_eos else None)
+
+    async def stream(self, prompt: str, max_new_tokens: int = 50,
+                     params: Optional[SamplingParams] = None,
+                     seed: Optional[int] = None,
+                     adapter: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text fragments for a single prompt.
+
+        Each model step runs in the default executor so the event loop stays
+        free to flush earlier fragments to clients. Only the newly decoded
+        text is produced per token, so streaming stays linear in the number
+        of generated tokens.
+
+        Args:
+            prompt: Input text
+            max_new_tokens: Maximum number of tokens to generate
+            params: Sampling settings (greedy if omitted)
+            seed: Optional seed for reproducible sampling
+            adapter: Optional name of a loaded LoRA adapter
+
+        Yields:
+            Decoded text fragments that continue the prompt; stops early at
+            ``<|endoftext|>``
+        """
+        loop = asyncio.get_running_loop()
+        sampler = BatchedSampler([params or SamplingParams(temperature=0.0)],
+                                 device=self.device, seed=seed)
+        prompt_ids = self.tokenizer.encode(prompt)
+        if not prompt_ids:
+            raise ValueError("Prompt must contain at least one token")
+        idx = torch.tensor([prompt_ids], device=self.device)
+        adapter_ids = self.adapter_ids([adapter], batch_size=1)
+
+        # Prime the decoder so the first fragment is spaced as a continuation
+        decoder = self.tokenizer.incremental_decoder()
+        for token_id in prompt_ids:
+            decoder.step(token_id)
+
+        steps = self.generate_tokens(idx, max_new_tokens, sampler, adapter_ids)
+        while True:
+            next_ids = await loop.run_in_executor(None, next, steps, None)
+            if next_ids is None:
+                break
+            token_id = int(next_ids[0])
+            if token_id == self.eos_id:
+                break
+
+            fragment = decoder.step(token_id)
+            if fragment:
+                yield fragment
+
+        tail = decoder.flush()
+        if tail:
+            yield tail
@@ -0,0 +1,68 @@
+"""
+Fine-tuning module for adapting a pretrained GPT model to new tasks.
+
+This module provides LoRA adapters: low-rank updates trained on top of
+frozen linear layers, saved as small standalone files and merged back into
+the base weights for inference, and classification fine-tuning that caches
+the output of the frozen layers in memory-mapped files, and an instruction
+data pipeline that templates and tokenizes a dataset once into a compact
+cache with response-only loss masks.
+"""
+
+from .lora import (
+    ATTENTION_TARGETS,
+    MLP_TARGETS,
+    EXPERT_TARGETS,
+    ALL_TARGETS,
+    LoRALinear,
+    apply_lora,
+    lora_state_dict,
+    save_lora,
+    load_lora,
+    load_lora_config,
+    merge_lora,
+    count_trainable_parameters,
+)
+from .classification import (
+    GPTClassifier,
+    ClassificationCollator,
+    build_feature_cache,
+    CachedFeatures,
+    collate_cached_features,
+    train_classifier_epoch,
+    calc_accuracy,
+)
+from .instruction_data import (
+    format_prompt,
+    tokenize_entry,
+    build_instruction_cache,
+    InstructionDataset,
+    InstructionCollator,
+)
+
+__all__ = [
+    'ATTENTION_TARGETS',
+    'MLP_TARGETS',
+    'EXPERT_TARGETS',
+    'ALL_TARGETS',
+    'LoRALinear',
+    'apply_lora',
+    'lora_state_dict',
+    'save_lora',
+    'load_lora',
+    'load_lora_config',
+    'merge_lora',
+    'count_trainable_parameters',
+    'GPTClassifier',
+    'ClassificationCollator',
+    'build_feature_cache',
+    'CachedFeatures',
+    'collate_cached_features',
+    'train_classifier_epoch',
+    'calc_accuracy',
+    'format_prompt',
+    'tokenize_entry',
+    'build_instruction_cache',
+    'InstructionDataset',
+    'InstructionCollator',
+]
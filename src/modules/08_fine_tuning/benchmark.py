@@ -0,0 +1,340 @@
+"""
+Benchmark script for the fine-tuning module.
+
+Sections:
+- lora: full fine-tuning vs LoRA (attention only, and attention + MLP) of
+  the 124M model on CPU; reports trainable parameters, gradient and AdamW
+  memory, peak RSS, median step time and the size of the saved weights.
+  Each variant runs in its own process so peak memory is measured cleanly.
+- classification: spam-style classification of the 124M model with the last
+  block(s) trainable; epoch time of end-to-end training vs building a
+  memory-mapped cache of frozen-layer features once and training from it.
+- instruction: Alpaca-style instruction data; examples/s of templating and
+  tokenizing every epoch vs building the pre-tokenized cache once and
+  loading batches from it, plus cache size and padding per batch.
+
+Run from the repository root:
+    python -m src.modules.08_fine_tuning.benchmark [lora|classification|instruction|all] [--steps 8]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from .classification import (
+    CachedFeatures, ClassificationCollator, GPTClassifier, build_feature_cache,
+    collate_cached_features, train_classifier_epoch,
+)
+from .instruction_data import (
+    InstructionCollator, InstructionDataset, build_instruction_cache, format_prompt,
+    tokenize_entry,
+)
+from .lora import (
+    ALL_TARGETS, ATTENTION_TARGETS, apply_lora, count_trainable_parameters, save_lora,
+)
+
+gpt = import_module("..05_gpt_model", __package__)
+training = import_module("..06_training", __package__)
+tokenization = import_module("..01_tokenization", __package__)
+vocabulary = import_module("..01_tokenization.build_vocabulary", __package__)
+
+MODEL_OVERRIDES = {"context_length": 256, "drop_rate": 0.0}
+BATCH_SIZE = 2
+SEQ_LEN = 128
+VARIANTS = {
+    "full": None,
+    "lora-attn": ATTENTION_TARGETS,
+    "lora-all": ALL_TARGETS,
+}
+WARMUP_STEPS_EXCLUDED = 2
+NUM_EXAMPLES = 256
+MAX_EXAMPLE_TOKENS = 120
+CLASSIFIER_BATCH_SIZE = 8
+NUM_INSTRUCTIONS = 20_000
+INSTRUCTION_BATCH_SIZE = 8
+WORDS = ("the model data text answer question list word number value time result "
+         "example task input output short long first last simple small large new").split()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB (Linux)."""
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def lora_worker(variant: str, steps: int, rank: int) -> None:
+    """Fine-tune one variant and print its measurements as JSON."""
+    cfg = gpt.get_config("124M", **MODEL_OVERRIDES)
+    torch.manual_seed(123)
+    model = gpt.GPTModel(cfg)
+    if VARIANTS[variant] is not None:
+        apply_lora(model, rank=rank, alpha=2 * rank, targets=VARIANTS[variant])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tokens.bin")
+        rng = np.random.default_rng(0)
+        training.save_tokens(rng.integers(0, cfg["vocab_size"], 50_000), path)
+        loader = training.create_dataloader(training.TokenDataset(path, SEQ_LEN),
+                                            BATCH_SIZE, seed=0)
+        config = training.TrainingConfig(max_steps=steps, warmup_steps=1,
+                                         log_interval=0, peak_flops=1.0)
+        trainer = training.Trainer(model, loader, config)
+        history = trainer.train()[WARMUP_STEPS_EXCLUDED:]
+
+        state_bytes = sum(t.nbytes for state in trainer.optimizer.state.values()
+                          for t in state.values() if torch.is_tensor(t))
+        trainable = count_trainable_parameters(model)
+        if VARIANTS[variant] is None:
+            weights_path = os.path.join(tmp, "model.pt")
+            torch.save(model.state_dict(), weights_path)
+        else:
+            weights_path = save_lora(model, os.path.join(tmp, "adapter.safetensors"))
+        file_mb = os.path.getsize(weights_path) / 2 ** 20
+
+    print(json.dumps({
+        "trainable": trainable,
+        "total": gpt.count_parameters(model),
+        "grads_mb": trainable * 4 / 2 ** 20,
+        "state_mb": state_bytes / 2 ** 20,
+        "peak_rss_mb": peak_rss_mb(),
+        "step_ms": statistics.median(s.step_time for s in history) * 1000,
+        "forward_ms": statistics.median(s.forward_time for s in history) * 1000,
+        "backward_ms": statistics.median(s.backward_time for s in history) * 1000,
+        "optimizer_ms": statistics.median(s.optimizer_time for s in history) * 1000,
+        "file_mb": file_mb,
+    }))
+
+
+def benchmark_lora(steps: int, rank: int):
+    """Run the full fine-tuning vs LoRA benchmark."""
+    print("⏱️ LoRA vs Full Fine-Tuning Benchmark")
+    print("=" * 96)
+    print(f"124M model, batch {BATCH_SIZE} x {SEQ_LEN} tokens, LoRA rank {rank}, "
+          f"median over steps {WARMUP_STEPS_EXCLUDED}-{steps - 1} "
+          f"({torch.get_num_threads()} threads):\n")
+    print(f"{'variant':>10} {'trainable':>12} {'share':>7} {'grads MB':>9} "
+          f"{'AdamW MB':>9} {'peak RSS':>9} {'step ms':>8} {'fwd':>6} {'bwd':>6} "
+          f"{'opt':>6} {'file MB':>8}")
+
+    for variant in VARIANTS:
+        result = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "lora", "--worker", variant,
+             "--steps", str(steps), "--rank", str(rank)],
+            check=True, capture_output=True, text=True)
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{variant:>10} {row['trainable']:>12,} "
+              f"{row['trainable'] / row['total']:>7.2%} {row['grads_mb']:>9.1f} "
+              f"{row['state_mb']:>9.1f} {row['peak_rss_mb']:>9.0f} "
+              f"{row['step_ms']:>8.0f} {row['forward_ms']:>6.0f} "
+              f"{row['backward_ms']:>6.0f} {row['optimizer_ms']:>6.0f} "
+              f"{row['file_mb']:>8.2f}")
+
+    print("\nThe frozen base weights still take part in the forward and backward "
+          "passes, so LoRA saves\nmostly the weight-gradient matmuls, the optimizer "
+          "step and optimizer memory.")
+
+
+def classification_examples(vocab_size: int):
+    """SMS-like examples: 10-120 tokens, label 1 when token 1000 occurs."""
+    rng = np.random.default_rng(0)
+    examples = []
+    for i in range(NUM_EXAMPLES):
+        ids = rng.integers(1001, vocab_size, rng.integers(10, MAX_EXAMPLE_TOKENS + 1))
+        if i % 2:
+            ids[rng.integers(len(ids))] = 1000
+        examples.append((ids.tolist(), i % 2))
+    return examples
+
+
+def classification_run(trainable_blocks: int, epochs: int, cache_dtype):
+    """Epoch times of end-to-end and cached training for one setting."""
+    cfg = gpt.get_config("124M", **MODEL_OVERRIDES)
+    examples = classification_examples(cfg["vocab_size"])
+    collate = ClassificationCollator()
+
+    def fresh_classifier():
+        torch.manual_seed(123)
+        classifier = GPTClassifier(gpt.GPTModel(cfg), 2, trainable_blocks)
+        optimizer = torch.optim.AdamW(
+            [p for p in classifier.parameters() if p.requires_grad], lr=5e-5)
+        return classifier, optimizer
+
+    def epoch_times(classifier, optimizer, dataset, collate_fn, cached):
+        loader = DataLoader(dataset, CLASSIFIER_BATCH_SIZE, shuffle=True,
+                            collate_fn=collate_fn, generator=torch.Generator().manual_seed(0))
+        times, losses = [], []
+        for _ in range(epochs):
+            start = time.perf_counter()
+            loss, _ = train_classifier_epoch(classifier, loader, optimizer, cached)
+            times.append(time.perf_counter() - start)
+            losses.append(loss)
+        return times, losses
+
+    classifier, optimizer = fresh_classifier()
+    direct, direct_losses = epoch_times(classifier, optimizer, examples, collate, False)
+
+    classifier, optimizer = fresh_classifier()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        build_feature_cache(classifier,
+                            DataLoader(examples, CLASSIFIER_BATCH_SIZE, collate_fn=collate),
+                            tmp, len(examples), MAX_EXAMPLE_TOKENS, cache_dtype)
+        build = time.perf_counter() - start
+        dataset = CachedFeatures(tmp)
+        cache_mb = dataset.features.nbytes / 2 ** 20
+        cached, cached_losses = epoch_times(classifier, optimizer, dataset,
+                                            collate_cached_features, True)
+        del dataset
+    drift = max(abs(a - b) for a, b in zip(direct_losses, cached_losses))
+    return direct, build, cache_mb, cached, drift
+
+
+def benchmark_classification(epochs: int):
+    """Run the end-to-end vs cached-feature classification benchmark."""
+    print("⏱️ Classification Fine-Tuning: End-to-End vs Cached Frozen Features")
+    print("=" * 96)
+    print(f"124M model, {NUM_EXAMPLES} examples of 10-{MAX_EXAMPLE_TOKENS} tokens, "
+          f"batch {CLASSIFIER_BATCH_SIZE}, {epochs} epochs, "
+          f"median epoch time ({torch.get_num_threads()} threads):\n")
+    print(f"{'trainable':>10} {'cache':>8} {'e2e epoch s':>12} {'build s':>8} "
+          f"{'cache MB':>9} {'cached epoch s':>15} {'speedup':>8} "
+          f"{'total e2e s':>12} {'total cached s':>15} {'loss drift':>11}")
+
+    for trainable_blocks in (1, 0):
+        for dtype in (np.float32, np.float16):
+            if trainable_blocks == 0 and dtype == np.float16:
+                continue  # Head-only caches are tiny either way
+            direct, build, cache_mb, cached, drift = classification_run(
+                trainable_blocks, epochs, dtype)
+            label = f"{trainable_blocks} block" if trainable_blocks else "head only"
+            print(f"{label:>10} {np.dtype(dtype).name:>8} "
+                  f"{statistics.median(direct):>12.2f} {build:>8.2f} {cache_mb:>9.1f} "
+                  f"{statistics.median(cached):>15.2f} "
+                  f"{statistics.median(direct) / statistics.median(cached):>7.1f}x "
+                  f"{sum(direct):>12.1f} {build + sum(cached):>15.1f} {drift:>11.1e}")
+
+    print("\nBuilding the cache costs about one inference pass over the data; every "
+          "later epoch\nruns only the trainable layers.")
+
+
+def instruction_entries():
+    """Alpaca-like entries of random clauses (30% with an input field)."""
+    rng = np.random.default_rng(0)
+
+    def sentence(low, high):
+        clauses = [" ".join(rng.choice(WORDS, rng.integers(1, 3)))
+                   for _ in range(rng.integers(low, high))]
+        return ", ".join(clauses) + rng.choice([".", "?", "!"])
+
+    return [{"instruction": sentence(2, 12),
+             "input": sentence(4, 30) if rng.random() < 0.3 else "",
+             "output": sentence(2, 60)} for _ in range(NUM_INSTRUCTIONS)]
+
+
+def padding_fraction(loader) -> float:
+    """Share of padded input positions over an epoch."""
+    padded = total = 0
+    for _, target_ids in loader:
+        total += target_ids.numel()
+        padded += int((target_ids == -100).sum())
+    return padded / total
+
+
+def benchmark_instruction():
+    """Run the on-the-fly vs pre-tokenized instruction data benchmark."""
+    print("⏱️ Instruction Data: Per-Epoch Tokenization vs Pre-Tokenized Cache")
+    print("=" * 96)
+    entries = instruction_entries()
+    text = " ".join(format_prompt(e) + e["output"] for e in entries[:2000])
+    tokenizer = tokenization.TextTokenizer(vocabulary.build_vocabulary(
+        vocabulary.preprocess_text(text)))
+    eot_id = tokenizer.str_to_int["<|endoftext|>"]
+    collate = InstructionCollator(pad_id=eot_id)
+    json_mb = len(json.dumps(entries).encode("utf-8")) / 2 ** 20
+    print(f"\n{NUM_INSTRUCTIONS:,} entries ({json_mb:.1f} MB of JSON), vocabulary "
+          f"{len(tokenizer.str_to_int):,}, batch {INSTRUCTION_BATCH_SIZE}:\n")
+
+    def epoch(dataset) -> float:
+        loader = DataLoader(dataset, INSTRUCTION_BATCH_SIZE, shuffle=True,
+                            collate_fn=collate, generator=torch.Generator().manual_seed(0))
+        start = time.perf_counter()
+        for _ in loader:
+            pass
+        return time.perf_counter() - start
+
+    class OnTheFly(torch.utils.data.Dataset):
+        def __len__(self):
+            return len(entries)
+
+        def __getitem__(self, idx):
+            return tokenize_entry(entries[idx], tokenizer, eot_id)
+
+    on_the_fly = epoch(OnTheFly())
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        build_instruction_cache(entries, tokenizer, tmp)
+        build = time.perf_counter() - start
+        cache_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 2 ** 20
+        start = time.perf_counter()
+        dataset = InstructionDataset(tmp)
+        open_ms = (time.perf_counter() - start) * 1000
+        cached = epoch(dataset)
+
+        random_padding = padding_fraction(DataLoader(
+            dataset, INSTRUCTION_BATCH_SIZE, shuffle=True, collate_fn=InstructionCollator(
+                eot_id, mask_prompt=False)))
+        bucketed_padding = padding_fraction(DataLoader(
+            dataset, batch_sampler=training.LengthBucketSampler(
+                dataset.lengths, INSTRUCTION_BATCH_SIZE),
+            collate_fn=InstructionCollator(eot_id, mask_prompt=False)))
+        tokens = dataset.meta["num_tokens"]
+        del dataset
+
+    print(f"{'pipeline':>34} {'seconds':>8} {'examples/s':>11}")
+    print(f"{'template + tokenize every epoch':>34} {on_the_fly:>8.2f} "
+          f"{NUM_INSTRUCTIONS / on_the_fly:>11,.0f}")
+    print(f"{'build cache (once)':>34} {build:>8.2f} {NUM_INSTRUCTIONS / build:>11,.0f}")
+    print(f"{'open cache':>34} {open_ms / 1000:>8.3f} {'':>11}")
+    print(f"{'epoch from cache':>34} {cached:>8.2f} {NUM_INSTRUCTIONS / cached:>11,.0f}")
+    print(f"\nEpoch speedup {on_the_fly / cached:.1f}x; cache {cache_mb:.1f} MB for "
+          f"{tokens:,} tokens; padding {random_padding:.1%} with random batches, "
+          f"{bucketed_padding:.1%} with LengthBucketSampler.")
+
+
+def main():
+    """Run the selected benchmark sections."""
+    parser = argparse.ArgumentParser(description="Fine-tuning module benchmarks")
+    parser.add_argument("section", nargs="?", default="all", choices=["lora", "classification", "instruction", "all"])
+    parser.add_argument("--steps", type=int, default=8, help="Optimizer steps per run")
+    parser.add_argument("--rank", type=int, default=8, help="LoRA rank")
+    parser.add_argument("--epochs", type=int, default=3,
+                        help="Classifier training epochs")
+    parser.add_argument("--worker", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        lora_worker(args.worker, args.steps, args.rank)
+        return
+    if args.section in ("lora", "all"):
+        benchmark_lora(args.steps, args.rank)
+    if args.section in ("classification", "all"):
+        benchmark_classification(args.epochs)
+    if args.section in ("instruction", "all"):
+        benchmark_instruction()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Classification fine-tuning with a frozen backbone and cached features.
+
+For tasks such as spam or sentiment detection, the language-model head of
+``GPTModel`` is replaced by a small classification head, and usually only
+the last transformer blocks (plus the final norm and the head) are trained.
+The frozen part then computes the same activations for an example in every
+epoch, so ``build_feature_cache`` runs it once and writes its output to
+memory-mapped ``.npy`` files. Training from ``CachedFeatures`` only runs the
+trainable layers, and the cache is paged in from disk as needed.
+
+The frozen layers always run in evaluation mode (no dropout), so cached and
+end-to-end training see exactly the same features.
+"""
+
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset
+
+EOT_TOKEN_ID = 50256
+
+FEATURES_FILE = "features.npy"
+LABELS_FILE = "labels.npy"
+LENGTHS_FILE = "lengths.npy"
+
+
+class GPTClassifier(nn.Module):
+    """
+    ``GPTModel`` with a classification head on the last token.
+
+    The embeddings and the first blocks are frozen; the last
+    ``trainable_blocks`` blocks, the final norm and the new head are trained.
+
+    Args:
+        model: Pretrained ``GPTModel`` (its ``out_head`` is replaced)
+        num_classes: Number of output classes
+        trainable_blocks: Transformer blocks to fine-tune, counted from the end
+
+    Example:
+        >>> classifier = GPTClassifier(model, num_classes=2, trainable_blocks=1)
+        >>> logits = classifier(input_ids, lengths)  # (batch, num_classes)
+    """
+
+    def __init__(self, model: nn.Module, num_classes: int, trainable_blocks: int = 1):
+        """Freeze the backbone and attach the head."""
+        super().__init__()
+        num_blocks = len(model.trf_blocks)
+        if not 0 <= trainable_blocks <= num_blocks:
+            raise ValueError(f"trainable_blocks must be in [0, {num_blocks}], "
+                             f"got {trainable_blocks}")
+        self.cfg = model.cfg
+        self.trainable_blocks = trainable_blocks
+        split = num_blocks - trainable_blocks
+        self.tok_emb, self.pos_emb, self.drop_emb = model.tok_emb, model.pos_emb, model.drop_emb
+        self.frozen_blocks = nn.Sequential(*model.trf_blocks[:split])
+        self.blocks = nn.Sequential(*model.trf_blocks[split:])
+        self.final_norm = model.final_norm
+        self.head = nn.Linear(model.cfg["emb_dim"], num_classes)
+
+        for module in self.frozen_modules():
+            for p in module.parameters():
+                p.requires_grad_(False)
+
+    def frozen_modules(self) -> List[nn.Module]:
+        """Modules whose output can be cached."""
+        return [self.tok_emb, self.pos_emb, self.drop_emb, self.frozen_blocks]
+
+    def train(self, mode: bool = True) -> "GPTClassifier":
+        """Set the training mode, keeping the frozen layers in evaluation mode."""
+        super().train(mode)
+        for module in self.frozen_modules():
+            module.eval()
+        return self
+
+    @torch.no_grad()
+    def features(self, in_idx: torch.Tensor) -> torch.Tensor:
+        """
+        Output of the frozen layers.
+
+        Args:
+            in_idx: Token IDs of shape (batch, num_tokens)
+
+        Returns:
+            Hidden states of shape (batch, num_tokens, emb_dim)
+        """
+        positions = torch.arange(in_idx.shape[1], device=in_idx.device)
+        x = self.drop_emb(self.tok_emb(in_idx) + self.pos_emb(positions))
+        return self.frozen_blocks(x)
+
+    def classify(self, hidden: torch.Tensor,
+                 lengths: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Run the trainable layers on frozen features.
+
+        Args:
+            hidden: Output of ``features``, (batch, num_tokens, emb_dim); with
+                no trainable blocks, the last-token features (batch, emb_dim)
+                are enough
+            lengths: Number of real (unpadded) tokens per row; the last real
+                token is classified (defaults to the last position)
+
+        Returns:
+            Class logits of shape (batch, num_classes)
+        """
+        if hidden.dim() == 3:
+            hidden = self.blocks(hidden)
+            hidden = last_token(hidden, lengths)
+        return self.head(self.final_norm(hidden))
+
+    def forward(self, in_idx: torch.Tensor,
+                lengths: Optional[torch.Tensor] = None) -> torch.Tensor:
+        return self.classify(self.features(in_idx), lengths)
+
+
+def last_token(hidden: torch.Tensor, lengths: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    Hidden state of the last real token of every row.
+
+    Args:
+        hidden: Hidden states of shape (batch, num_tokens, emb_dim)
+        lengths: Unpadded length of every row (defaults to all tokens)
+
+    Returns:
+        Tensor of shape (batch, emb_dim)
+    """
+    if lengths is None:
+        return hidden[:, -1]
+    return hidden[torch.arange(hidden.shape[0], device=hidden.device), lengths - 1]
+
+
+class ClassificationCollator:
+    """
+    Pad (token_ids, label) examples on the right to the longest in the batch.
+
+    Padding comes after the last real token, so with causal attention it
+    never changes the features the classifier reads.
+
+    Args:
+        pad_id: Token used for padding
+        max_length: Truncate longer examples to this many tokens
+
+    Returns (when called):
+        ``(input_ids, labels, lengths)``
+    """
+
+    def __init__(self, pad_id: int = EOT_TOKEN_ID, max_length: Optional[int] = None):
+        """Store the padding options."""
+        self.pad_id = pad_id
+        self.max_length = max_length
+
+    def __call__(self, examples: List[Tuple[Sequence[int], int]]) -> Tuple[torch.Tensor, ...]:
+        sequences = [list(ids)[:self.max_length] for ids, _ in examples]
+        lengths = torch.tensor([len(ids) for ids in sequences])
+        input_ids = torch.full((len(sequences), int(lengths.max())), self.pad_id)
+        for i, ids in enumerate(sequences):
+            input_ids[i, :len(ids)] = torch.tensor(ids)
+        labels = torch.tensor([int(label) for _, label in examples])
+        return input_ids, labels, lengths
+
+
+def build_feature_cache(classifier: GPTClassifier, loader: Iterable, directory: str,
+                        num_examples: int, max_length: int,
+                        dtype: np.dtype = np.float32) -> str:
+    """
+    Run the frozen layers once over a dataset and store their output.
+
+    With trainable blocks the full sequences are stored, shape (examples,
+    max_length, emb_dim); for a head-only classifier only the last-token
+    features, shape (examples, emb_dim).
+
+    Args:
+        classifier: Classifier whose frozen layers produce the features
+        loader: Unshuffled loader of ``(input_ids, labels, lengths)`` batches
+        directory: Where the ``.npy`` files are written
+        num_examples: Number of examples the loader yields
+        max_length: Longest example (in tokens)
+        dtype: Storage type of the features (float16 halves the file)
+
+    Returns:
+        ``directory``, to pass to ``CachedFeatures``
+    """
+    os.makedirs(directory, exist_ok=True)
+    emb_dim = classifier.cfg["emb_dim"]
+    shape = ((num_examples, max_length, emb_dim) if classifier.trainable_blocks
+             else (num_examples, emb_dim))
+    features = np.lib.format.open_memmap(os.path.join(directory, FEATURES_FILE),
+                                         mode="w+", dtype=dtype, shape=shape)
+    labels = np.empty(num_examples, dtype=np.int64)
+    lengths = np.empty(num_examples, dtype=np.int64)
+
+    classifier.eval()
+    start = 0
+    for input_ids, batch_labels, batch_lengths in loader:
+        end = start + len(input_ids)
+        hidden = classifier.features(input_ids)
+        if classifier.trainable_blocks:
+            features[start:end, :hidden.shape[1]] = hidden.numpy()
+        else:
+            features[start:end] = last_token(hidden, batch_lengths).numpy()
+        labels[start:end] = batch_labels.numpy()
+        lengths[start:end] = batch_lengths.numpy()
+        start = end
+    if start != num_examples:
+        raise ValueError(f"Loader yielded {start} examples, expected {num_examples}")
+
+    features.flush()
+    del features
+    np.save(os.path.join(directory, LABELS_FILE), labels)
+    np.save(os.path.join(directory, LENGTHS_FILE), lengths)
+    return directory
+
+
+class CachedFeatures(Dataset):
+    """
+    Frozen-layer features read from a cache written by ``build_feature_cache``.
+
+    Args:
+        directory: Cache directory
+
+    Example:
+        >>> dataset = CachedFeatures("cache/spam-train")
+        >>> loader = DataLoader(dataset, batch_size=8, shuffle=True,
+        ...                     collate_fn=collate_cached_features)
+    """
+
+    def __init__(self, directory: str):
+        """Map the feature file without reading it."""
+        self.directory = directory
+        self.features = np.load(os.path.join(directory, FEATURES_FILE), mmap_mode="r")
+        self.labels = np.load(os.path.join(directory, LABELS_FILE))
+        self.lengths = np.load(os.path.join(directory, LENGTHS_FILE))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, int, int]:
+        length = int(self.lengths[idx])
+        rows = self.features[idx, :length] if self.features.ndim == 3 else self.features[idx]
+        return torch.from_numpy(np.array(rows, dtype=np.float32)), int(self.labels[idx]), length
+
+
+def collate_cached_features(examples: List[Tuple[torch.Tensor, int, int]]
+                            ) -> Tuple[torch.Tensor, ...]:
+    """
+    Batch cached features, zero-padding sequences to the longest in the batch.
+
+    Args:
+        examples: Items of ``CachedFeatures``
+
+    Returns:
+        ``(features, labels, lengths)``
+    """
+    features = [f for f, _, _ in examples]
+    if features[0].dim() == 2:
+        features = nn.utils.rnn.pad_sequence(features, batch_first=True)
+    else:
+        features = torch.stack(features)
+    labels = torch.tensor([label for _, label, _ in examples])
+    lengths = torch.tensor([length for _, _, length in examples])
+    return features, labels, lengths
+
+
+def train_classifier_epoch(classifier: GPTClassifier, loader: DataLoader,
+                           optimizer: torch.optim.Optimizer,
+                           cached: bool = False) -> Tuple[float, float]:
+    """
+    Train for one epoch.
+
+    Args:
+        classifier: Classifier to train
+        loader: Batches of ``(input_ids, labels, lengths)``, or of
+            ``(features, labels, lengths)`` when ``cached``
+        optimizer: Optimizer over the trainable parameters
+        cached: Whether the loader yields cached features
+
+    Returns:
+        Average loss and accuracy over the epoch
+    """
+    classifier.train()
+    total_loss, correct, count = 0.0, 0, 0
+    for inputs, labels, lengths in loader:
+        logits = (classifier.classify(inputs, lengths) if cached
+                  else classifier(inputs, lengths))
+        loss = F.cross_entropy(logits, labels)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+        total_loss += loss.item() * len(labels)
+        correct += int((logits.argmax(dim=-1) == labels).sum())
+        count += len(labels)
+    return total_loss / count, correct / count
+
+
+@torch.no_grad()
+def calc_accuracy(classifier: GPTClassifier, loader: DataLoader,
+                  cached: bool = False) -> float:
+    """
+    Fraction of correctly classified examples.
+
+    Args:
+        classifier: Classifier to evaluate
+        loader: Batches as for ``train_classifier_epoch``
+        cached: Whether the loader yields cached features
+
+    Returns:
+        Accuracy in [0, 1]
+    """
+    classifier.eval()
+    correct, count = 0, 0
+    for inputs, labels, lengths in loader:
+        logits = (classifier.classify(inputs, lengths) if cached
+                  else classifier(inputs, lengths))
+        correct += int((logits.argmax(dim=-1) == labels).sum())
+        count += len(labels)
+    return correct / count if count else float("nan")
@@ -0,0 +1,223 @@
+"""
+Instruction fine-tuning data: Alpaca-style prompts, tokenized once.
+
+Each entry (``instruction``, optional ``input``, ``output``) is rendered with
+the Alpaca template, and the prompt and the response are tokenized
+separately so the boundary between them is exact. ``build_instruction_cache``
+does this once for the whole dataset and writes
+
+- ``tokens.bin``: the token IDs of all examples, back to back (uint16 when
+  the vocabulary fits, as in ``save_tokens`` of Module 6)
+- ``offsets.npy``: where every example starts (one extra entry at the end)
+- ``prompt_lengths.npy``: the number of prompt tokens of every example,
+  which is the whole response-only loss mask in one integer
+- ``meta.json``: storage type, end-of-text token and example count
+
+``InstructionDataset`` maps the token file, so epochs only slice arrays, and
+``InstructionCollator`` pads each batch to its longest example and sets the
+targets of prompt and padding positions to ``IGNORE_INDEX``. The batches
+plug into the ``Trainer`` of Module 6 unchanged.
+"""
+
+import json
+import os
+from importlib import import_module
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+_training = import_module("..06_training", __package__)
+IGNORE_INDEX = import_module("..06_training.loss_functions", __package__).IGNORE_INDEX
+
+TOKENS_FILE = "tokens.bin"
+OFFSETS_FILE = "offsets.npy"
+PROMPT_LENGTHS_FILE = "prompt_lengths.npy"
+META_FILE = "meta.json"
+
+ALPACA_HEADER = ("Below is an instruction that describes a task. "
+                 "Write a response that appropriately completes the request.")
+
+
+def format_prompt(entry: Dict[str, str]) -> str:
+    """
+    Render the prompt part of an entry with the Alpaca template.
+
+    Args:
+        entry: Dict with ``instruction`` and an optional ``input``
+
+    Returns:
+        Prompt text ending with the response header
+    """
+    prompt = f"{ALPACA_HEADER}\n\n### Instruction:\n{entry['instruction']}"
+    if entry.get("input"):
+        prompt += f"\n\n### Input:\n{entry['input']}"
+    return prompt + "\n\n### Response:\n"
+
+
+def tokenize_entry(entry: Dict[str, str], tokenizer: Any,
+                   eot_id: int) -> Tuple[List[int], int]:
+    """
+    Tokenize one entry.
+
+    Args:
+        entry: Dict with ``instruction``, optional ``input`` and ``output``
+        tokenizer: Tokenizer with ``encode``
+        eot_id: End-of-text token appended to the response
+
+    Returns:
+        Token IDs of prompt + response + end of text, and the prompt length
+    """
+    prompt_ids = tokenizer.encode(format_prompt(entry))
+    return prompt_ids + tokenizer.encode(entry["output"]) + [eot_id], len(prompt_ids)
+
+
+def _eot_id(tokenizer: Any, eot_id: Optional[int]) -> int:
+    if eot_id is not None:
+        return eot_id
+    vocab = getattr(tokenizer, "str_to_int", {})
+    if "<|endoftext|>" not in vocab:
+        raise ValueError("Tokenizer has no <|endoftext|> token; pass eot_id")
+    return vocab["<|endoftext|>"]
+
+
+def build_instruction_cache(entries: Iterable[Dict[str, str]], tokenizer: Any,
+                            directory: str, eot_id: Optional[int] = None) -> str:
+    """
+    Template and tokenize a dataset once and write it to disk.
+
+    Args:
+        entries: Instruction entries (e.g. the parsed Alpaca JSON)
+        tokenizer: Tokenizer with ``encode`` (and ``str_to_int`` when
+            ``eot_id`` is not given)
+        directory: Where the cache files are written
+        eot_id: End-of-text token (defaults to the tokenizer's ``<|endoftext|>``)
+
+    Returns:
+        ``directory``, to pass to ``InstructionDataset``
+    """
+    eot_id = _eot_id(tokenizer, eot_id)
+    tokens: List[int] = []
+    offsets = [0]
+    prompt_lengths = []
+    for entry in entries:
+        ids, prompt_length = tokenize_entry(entry, tokenizer, eot_id)
+        tokens += ids
+        offsets.append(len(tokens))
+        prompt_lengths.append(prompt_length)
+
+    os.makedirs(directory, exist_ok=True)
+    dtype = np.uint16 if max(tokens, default=0) <= np.iinfo(np.uint16).max else np.uint32
+    _training.save_tokens(tokens, os.path.join(directory, TOKENS_FILE), dtype=dtype)
+    np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(directory, PROMPT_LENGTHS_FILE),
+            np.asarray(prompt_lengths, dtype=np.int32))
+    with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"dtype": np.dtype(dtype).name, "eot_id": eot_id,
+                   "num_examples": len(prompt_lengths), "num_tokens": len(tokens)}, f)
+    return directory
+
+
+class InstructionDataset(Dataset):
+    """
+    Pre-tokenized instruction examples read from a cache directory.
+
+    Args:
+        directory: Cache written by ``build_instruction_cache``
+
+    Example:
+        >>> dataset = InstructionDataset("cache/alpaca")
+        >>> sampler = LengthBucketSampler(dataset.lengths, batch_size=8)
+        >>> loader = DataLoader(dataset, batch_sampler=sampler,
+        ...                     collate_fn=InstructionCollator(pad_id=dataset.eot_id))
+    """
+
+    def __init__(self, directory: str):
+        """Map the token file without reading it."""
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.eot_id: int = self.meta["eot_id"]
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE))
+        self.prompt_lengths = np.load(os.path.join(directory, PROMPT_LENGTHS_FILE))
+        path = os.path.join(directory, TOKENS_FILE)
+        self.tokens = (np.memmap(path, dtype=self.meta["dtype"], mode="r")
+                       if self.meta["num_tokens"] else np.empty(0, dtype=self.meta["dtype"]))
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Number of tokens of every example (for ``LengthBucketSampler``)."""
+        return np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.prompt_lengths)
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, int]:
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return (torch.from_numpy(self.tokens[start:end].astype(np.int64)),
+                int(self.prompt_lengths[idx]))
+
+
+class InstructionCollator:
+    """
+    Pad (token_ids, prompt_length) examples to the longest in the batch.
+
+    Every example yields input ``ids[:-1]`` and target ``ids[1:]``. Targets
+    at padding positions, and with ``mask_prompt`` also those predicting
+    prompt tokens, are ``IGNORE_INDEX``, so only the response (and its
+    end-of-text token) is learned.
+
+    Examples longer than ``max_length`` lose prompt tokens from the left
+    first (down to the last one, which predicts the first response token),
+    so truncation never removes the whole response; a response that alone
+    exceeds ``max_length`` is cut at the end.
+
+    Args:
+        pad_id: Token used for padding inputs
+        max_length: Maximum input length (longer examples are truncated)
+        mask_prompt: Exclude the prompt from the loss
+
+    Returns (when called):
+        ``(input_ids, target_ids)``
+    """
+
+    def __init__(self, pad_id: int, max_length: Optional[int] = None,
+                 mask_prompt: bool = True):
+        """Store the padding options."""
+        self.pad_id = pad_id
+        self.max_length = max_length
+        self.mask_prompt = mask_prompt
+
+    def truncate(self, ids: torch.Tensor, prompt_length: int) -> Tuple[torch.Tensor, int]:
+        """
+        Fit one example into ``max_length + 1`` tokens, keeping the response.
+
+        Args:
+            ids: Token IDs of prompt + response + end of text
+            prompt_length: Number of prompt tokens
+
+        Returns:
+            The kept token IDs and their number of prompt tokens
+        """
+        if self.max_length is None or len(ids) <= self.max_length + 1:
+            return ids, prompt_length
+        drop = min(len(ids) - self.max_length - 1, max(prompt_length - 1, 0))
+        return ids[drop:drop + self.max_length + 1], prompt_length - drop
+
+    def __call__(self, examples: Sequence[Tuple[Sequence[int], int]]
+                 ) -> Tuple[torch.Tensor, torch.Tensor]:
+        rows = [self.truncate(torch.as_tensor(ids), prompt_length)
+                for ids, prompt_length in examples]
+        width = max(len(row) for row, _ in rows) - 1
+        input_ids = torch.full((len(rows), width), self.pad_id)
+        target_ids = torch.full((len(rows), width), IGNORE_INDEX)
+        for i, (row, prompt_length) in enumerate(rows):
+            n = len(row) - 1
+            input_ids[i, :n] = row[:-1]
+            target_ids[i, :n] = row[1:]
+            if self.mask_prompt:
+                # Target j predicts token j + 1: the first response token is
+                # the target at position prompt_length - 1
+                target_ids[i, :max(prompt_length - 1, 0)] = IGNORE_INDEX
+        return input_ids, target_ids
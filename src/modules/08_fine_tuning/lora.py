@@ -0,0 +1,224 @@
+"""
+Low-rank adaptation (LoRA) for parameter-efficient fine-tuning.
+
+Full fine-tuning updates every weight, so AdamW keeps two extra fp32 copies
+of the whole model and each fine-tuned variant is a full-size checkpoint.
+LoRA freezes the pretrained weights and learns a low-rank update for chosen
+linear layers instead:
+
+    y = x W^T + (alpha / r) * x A^T B^T,    A: (r, in), B: (out, r)
+
+Only ``A`` and ``B`` are trained, a fraction of a percent of the model for
+small ``r``. ``B`` starts at zero, so training begins from the pretrained
+model exactly. Adapters are saved on their own as small files, and for
+inference the update can be merged into ``W`` so the adapted model runs at
+the speed of the original.
+"""
+
+import json
+import math
+from importlib import import_module
+from typing import Dict, Sequence
+
+import torch
+import torch.nn as nn
+
+_checkpoint = import_module("..05_gpt_model.checkpoint", __package__)
+_format = import_module("..05_gpt_model.lora_format", __package__)
+
+# Suffixes of the linear layers in GPTModel's transformer blocks
+ATTENTION_TARGETS = _format.ATTENTION_TARGETS
+MLP_TARGETS = _format.MLP_TARGETS
+EXPERT_TARGETS = _format.EXPERT_TARGETS
+DEFAULT_TARGETS = _format.DEFAULT_TARGETS
+ALL_TARGETS = _format.ALL_TARGETS
+load_lora_config = _format.load_lora_config
+_matches = _format.matches_target
+
+
+class LoRALinear(nn.Module):
+    """
+    Frozen ``nn.Linear`` plus a trainable low-rank update.
+
+    Args:
+        base: Pretrained layer (its parameters are frozen)
+        rank: Rank ``r`` of the update
+        alpha: Scaling numerator; the update is multiplied by ``alpha / rank``
+        dropout: Dropout applied to the input of the low-rank path
+
+    Example:
+        >>> layer = LoRALinear(nn.Linear(768, 768), rank=8, alpha=16)
+        >>> out = layer(torch.randn(2, 4, 768))  # Equals the base layer at init
+    """
+
+    def __init__(self, base: nn.Linear, rank: int = 8, alpha: float = 16.0,
+                 dropout: float = 0.0):
+        """Freeze the base layer and initialize ``A`` randomly, ``B`` at zero."""
+        super().__init__()
+        if rank < 1:
+            raise ValueError(f"rank must be at least 1, got {rank}")
+        self.base = base
+        for p in self.base.parameters():
+            p.requires_grad_(False)
+        self.rank = rank
+        self.alpha = alpha
+        self.scaling = alpha / rank
+        factory = {"device": base.weight.device, "dtype": base.weight.dtype}
+        self.lora_A = nn.Parameter(torch.empty(rank, base.in_features, **factory))
+        self.lora_B = nn.Parameter(torch.zeros(base.out_features, rank, **factory))
+        nn.init.kaiming_uniform_(self.lora_A, a=math.sqrt(5))
+        self.dropout = nn.Dropout(dropout) if dropout > 0 else nn.Identity()
+
+    @property
+    def in_features(self) -> int:
+        return self.base.in_features
+
+    @property
+    def out_features(self) -> int:
+        return self.base.out_features
+
+    def delta_weight(self) -> torch.Tensor:
+        """The update ``(alpha / r) * B @ A`` in the shape of the base weight."""
+        return (self.lora_B @ self.lora_A) * self.scaling
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        update = self.dropout(x) @ self.lora_A.T @ self.lora_B.T
+        return self.base(x) + update * self.scaling
+
+    def merged(self) -> nn.Linear:
+        """
+        The base layer with the update folded into its weight.
+
+        Returns:
+            ``nn.Linear`` computing the same function without the extra matmuls
+        """
+        with torch.no_grad():
+            self.base.weight += self.delta_weight().to(self.base.weight.dtype)
+        return self.base
+
+    def extra_repr(self) -> str:
+        return f"rank={self.rank}, alpha={self.alpha}"
+
+
+def apply_lora(model: nn.Module, rank: int = 8, alpha: float = 16.0,
+               dropout: float = 0.0,
+               targets: Sequence[str] = DEFAULT_TARGETS) -> nn.Module:
+    """
+    Freeze a model and wrap its target linear layers in ``LoRALinear``, in place.
+
+    Args:
+        model: Model to adapt (for example a ``GPTModel``)
+        rank: Rank of every update
+        alpha: Scaling numerator (the update is scaled by ``alpha / rank``)
+        dropout: Dropout on the input of the low-rank path
+        targets: Module name suffixes to adapt, e.g. ``ATTENTION_TARGETS``,
+            ``MLP_TARGETS`` or ``ALL_TARGETS``; ``EXPERT_TARGETS`` for the
+            experts of mixture-of-experts blocks
+
+    Returns:
+        The same model; only the LoRA parameters require gradients
+    """
+    for p in model.parameters():
+        p.requires_grad_(False)
+    replaced = 0
+    for name, module in list(model.named_modules()):
+        for child_name, child in list(module.named_children()):
+            full_name = f"{name}.{child_name}" if name else child_name
+            if isinstance(child, nn.Linear) and _matches(full_name, targets):
+                setattr(module, child_name, LoRALinear(child, rank, alpha, dropout))
+                replaced += 1
+    if not replaced:
+        raise ValueError(f"No nn.Linear layer matches the targets {list(targets)}")
+    model.lora_config = {"rank": rank, "alpha": alpha, "dropout": dropout,
+                         "targets": list(targets)}
+    return model
+
+
+def lora_state_dict(model: nn.Module) -> Dict[str, torch.Tensor]:
+    """
+    The adapter weights of a model, without the frozen base weights.
+
+    Args:
+        model: Model adapted with ``apply_lora``
+
+    Returns:
+        Mapping from parameter name to ``lora_A`` / ``lora_B`` tensors
+    """
+    return {name: p for name, p in model.named_parameters()
+            if name.endswith(("lora_A", "lora_B"))}
+
+
+def save_lora(model: nn.Module, path: str) -> str:
+    """
+    Save only the adapter weights and settings (a small safetensors file).
+
+    Args:
+        model: Model adapted with ``apply_lora``
+        path: Destination, e.g. ``"adapters/spam.safetensors"``
+
+    Returns:
+        Path to pass to ``load_lora``
+    """
+    return _checkpoint.save_state_dict(lora_state_dict(model), path,
+                                       _format.lora_metadata(model.lora_config))
+
+
+def load_lora(model: nn.Module, path: str) -> nn.Module:
+    """
+    Load adapter weights into a model, applying LoRA first if needed.
+
+    Args:
+        model: Base model (or one already adapted with the same settings)
+        path: File written by ``save_lora``
+
+    Returns:
+        The adapted model
+    """
+    reader = _checkpoint.open_checkpoint(path)
+    config = json.loads(reader.metadata["lora_config"])
+    if getattr(model, "lora_config", None) is None:
+        apply_lora(model, **config)
+    params = lora_state_dict(model)
+    missing = set(params) - set(reader.keys())
+    unexpected = set(reader.keys()) - set(params)
+    if missing or unexpected:
+        raise ValueError(f"Adapter {path} does not fit the model: missing "
+                         f"{sorted(missing)}, unexpected {sorted(unexpected)}")
+    with torch.no_grad():
+        for name, p in params.items():
+            p.copy_(reader.get_tensor(name))
+    return model
+
+
+def merge_lora(model: nn.Module) -> nn.Module:
+    """
+    Fold every adapter into its base weight and remove the LoRA layers, in place.
+
+    The result has exactly the structure (and speed) of the original model.
+
+    Args:
+        model: Model adapted with ``apply_lora``
+
+    Returns:
+        The same model with plain ``nn.Linear`` layers
+    """
+    for name, module in list(model.named_modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, LoRALinear):
+                setattr(module, child_name, child.merged())
+    if hasattr(model, "lora_config"):
+        del model.lora_config
+    return model
+
+
+def count_trainable_parameters(model: nn.Module) -> int:
+    """
+    Count the parameters that receive gradients.
+
+    Args:
+        model: Model to inspect
+
+    Returns:
+        Number of parameters with ``requires_grad``
+    """
+    return sum(p.numel() for p in model.parameters() if p.requires_grad)
@@ -0,0 +1,323 @@
+"""
+Simple test script for the fine-tuning module.
+
+This script tests LoRA fine-tuning:
+1. A freshly adapted model computes exactly what the base model computes,
+   and only the adapter weights are trainable (also with the experts of a
+   mixture-of-experts model as targets)
+2. Training changes the adapters and leaves the base weights untouched
+3. Adapters round-trip through a small file into a fresh base model
+4. Merging folds the adapters into plain linear layers with the same output
+5. A classifier trained from memory-mapped frozen-layer features follows
+   exactly the same trajectory as end-to-end training
+6. The instruction cache reproduces on-the-fly templating and tokenization,
+   and the collator keeps only response tokens in the loss, also when
+   truncating a prompt that fills the maximum length
+
+Run from the repository root:
+    python -m src.modules.08_fine_tuning.test
+"""
+
+import copy
+import os
+import tempfile
+from importlib import import_module
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from .classification import (
+    CachedFeatures,
+    ClassificationCollator,
+    GPTClassifier,
+    build_feature_cache,
+    calc_accuracy,
+    collate_cached_features,
+    train_classifier_epoch,
+)
+from .instruction_data import (
+    IGNORE_INDEX,
+    InstructionCollator,
+    InstructionDataset,
+    build_instruction_cache,
+    format_prompt,
+    tokenize_entry,
+)
+from .lora import (
+    ALL_TARGETS,
+    ATTENTION_TARGETS,
+    EXPERT_TARGETS,
+    MLP_TARGETS,
+    LoRALinear,
+    apply_lora,
+    count_trainable_parameters,
+    load_lora,
+    load_lora_config,
+    merge_lora,
+    save_lora,
+)
+
+gpt = import_module("..05_gpt_model", __package__)
+tokenization = import_module("..01_tokenization", __package__)
+vocabulary = import_module("..01_tokenization.build_vocabulary", __package__)
+training = import_module("..06_training", __package__)
+
+TINY_CONFIG = gpt.get_config("124M", vocab_size=50, context_length=16, emb_dim=32,
+                             n_heads=2, n_layers=2, drop_rate=0.0)
+
+
+def make_base() -> nn.Module:
+    torch.manual_seed(0)
+    return gpt.GPTModel(TINY_CONFIG).eval()
+
+
+def fine_tune(model: nn.Module, steps: int = 20) -> None:
+    """A few AdamW steps on a fixed batch (the loss must go down)."""
+    torch.manual_seed(1)
+    batch = torch.randint(0, 50, (4, 17))
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad],
+                                  lr=1e-2)
+    model.train()
+    losses = []
+    for _ in range(steps):
+        logits = model(batch[:, :-1])
+        loss = nn.functional.cross_entropy(logits.flatten(0, 1), batch[:, 1:].flatten())
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        losses.append(loss.item())
+    model.eval()
+    assert losses[-1] < losses[0], losses
+
+
+def test_apply_lora():
+    """Test injection, freezing and the identity at initialization."""
+    print("\n=== Testing LoRA Injection ===")
+
+    base = make_base()
+    idx = torch.randint(0, 50, (2, 8))
+    expected = base(idx)
+    model = apply_lora(copy.deepcopy(base), rank=4, alpha=8, targets=ALL_TARGETS)
+
+    adapted = [name for name, m in model.named_modules() if isinstance(m, LoRALinear)]
+    assert len(adapted) == 6 * TINY_CONFIG["n_layers"], adapted
+    assert not isinstance(model.out_head, LoRALinear), "out_head is not a target"
+    assert torch.equal(model(idx), expected), "B = 0 must leave the output unchanged"
+
+    trainable = count_trainable_parameters(model)
+    d, rank = TINY_CONFIG["emb_dim"], 4
+    # Per block: 4 attention layers (d -> d) and 2 MLP layers (d <-> 4d)
+    per_block = 4 * rank * (d + d) + 2 * rank * (d + 4 * d)
+    assert trainable == TINY_CONFIG["n_layers"] * per_block
+    assert all(name.endswith(("lora_A", "lora_B"))
+               for name, p in model.named_parameters() if p.requires_grad)
+
+    mlp_only = apply_lora(copy.deepcopy(base), targets=MLP_TARGETS)
+    assert isinstance(mlp_only.trf_blocks[0].ff.layers[0], LoRALinear)
+    assert not isinstance(mlp_only.trf_blocks[0].att.W_query, LoRALinear)
+    try:
+        apply_lora(copy.deepcopy(base), targets=["no_such_layer"])
+        raise AssertionError("Unmatched targets should raise")
+    except ValueError:
+        pass
+
+    # Mixture-of-experts blocks: every expert's two layers, not the router
+    torch.manual_seed(0)
+    moe = gpt.GPTModel(dict(TINY_CONFIG, n_experts=4, moe_top_k=2)).eval()
+    moe_expected = moe(idx)
+    apply_lora(moe, rank=4, targets=ATTENTION_TARGETS + EXPERT_TARGETS)
+    experts = [name for name, m in moe.named_modules()
+               if isinstance(m, LoRALinear) and ".experts." in name]
+    assert len(experts) == 2 * 4 * TINY_CONFIG["n_layers"], experts
+    assert not isinstance(moe.trf_blocks[0].ff.router, LoRALinear)
+    assert torch.equal(moe(idx), moe_expected)
+    print(f"{len(adapted)} layers adapted, {trainable:,} of "
+          f"{gpt.count_parameters(model):,} parameters trainable; "
+          f"{len(experts)} expert layers in an MoE model")
+
+
+def test_training_and_files():
+    """Test that training only moves adapters and that they round-trip."""
+    print("\n=== Testing LoRA Training and Adapter Files ===")
+
+    base = make_base()
+    model = apply_lora(copy.deepcopy(base), rank=4, alpha=8)
+    fine_tune(model)
+    frozen = {n.replace(".base", ""): p for n, p in model.named_parameters()
+              if not p.requires_grad}
+    for name, p in base.named_parameters():
+        assert torch.equal(frozen[name], p), f"Base weight {name} changed"
+
+    idx = torch.randint(0, 50, (2, 8))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_lora(model, os.path.join(tmp, "adapter.safetensors"))
+        size = os.path.getsize(path)
+        assert load_lora_config(path)["rank"] == 4
+        restored = load_lora(make_base(), path)
+        assert torch.equal(restored(idx), model(idx)), "Reloaded adapter differs"
+        torch.save(base.state_dict(), os.path.join(tmp, "full.pt"))
+        full_size = os.path.getsize(os.path.join(tmp, "full.pt"))
+    assert size < full_size / 5, (size, full_size)
+    print(f"Adapter file {size / 1024:.1f} KB vs full model {full_size / 1024:.1f} KB")
+
+
+def test_merge():
+    """Test that merged weights reproduce the adapted model."""
+    print("\n=== Testing LoRA Merge ===")
+
+    model = apply_lora(make_base(), rank=4, alpha=8, targets=ALL_TARGETS)
+    fine_tune(model)
+    idx = torch.randint(0, 50, (2, 8))
+    with torch.no_grad():
+        expected = model(idx)
+        merged = merge_lora(model)
+        actual = merged(idx)
+
+    assert not any(isinstance(m, LoRALinear) for m in merged.modules())
+    assert set(merged.state_dict()) == set(make_base().state_dict())
+    max_diff = (actual - expected).abs().max().item()
+    assert max_diff < 1e-4, max_diff
+    print(f"Merged model matches the adapted one (max logit difference {max_diff:.1e})")
+
+
+def classification_examples(count: int = 24):
+    """Variable-length sequences; label 1 when token 7 occurs."""
+    gen = torch.Generator().manual_seed(2)
+    examples = []
+    for i in range(count):
+        ids = torch.randint(8, 50, (int(torch.randint(3, 16, (1,), generator=gen)),),
+                            generator=gen).tolist()
+        if i % 2:
+            ids[int(torch.randint(0, len(ids), (1,), generator=gen))] = 7
+        examples.append((ids, i % 2))
+    return examples
+
+
+def test_classification_cache():
+    """Test that cached features reproduce end-to-end classifier training."""
+    print("\n=== Testing Classification with Cached Features ===")
+
+    examples = classification_examples()
+    collate = ClassificationCollator(pad_id=0)
+    classifier = GPTClassifier(make_base(), num_classes=2)
+    trainable = {n for n, p in classifier.named_parameters() if p.requires_grad}
+    assert all(n.startswith(("blocks.", "final_norm.", "head.")) for n in trainable), trainable
+
+    # Right padding does not change the prediction
+    single = classifier(*collate(examples[:1])[::2])
+    padded = classifier(*collate(examples[:4])[::2])[:1]
+    assert torch.allclose(single, padded, atol=1e-6), "Padding changed the logits"
+
+    for trainable_blocks in (1, 0):
+        results = {}
+        for cached in (False, True):
+            torch.manual_seed(3)
+            classifier = GPTClassifier(make_base(), 2, trainable_blocks)
+            optimizer = torch.optim.AdamW(
+                [p for p in classifier.parameters() if p.requires_grad], lr=1e-2)
+            with tempfile.TemporaryDirectory() as tmp:
+                dataset, collate_fn = examples, collate
+                if cached:
+                    build_feature_cache(classifier,
+                                        DataLoader(examples, batch_size=5, collate_fn=collate),
+                                        tmp, len(examples), max_length=16)
+                    dataset, collate_fn = CachedFeatures(tmp), collate_cached_features
+                    feature_shape = dataset.features.shape
+                loader = DataLoader(dataset, batch_size=4, shuffle=True, collate_fn=collate_fn,
+                                    generator=torch.Generator().manual_seed(4))
+                losses = [train_classifier_epoch(classifier, loader, optimizer, cached)[0]
+                          for _ in range(5)]
+                accuracy = calc_accuracy(classifier, loader, cached)
+                del dataset, loader
+            results[cached] = (losses, accuracy)
+
+        expected_shape = (24, 16, 32) if trainable_blocks else (24, 32)
+        assert feature_shape == expected_shape, feature_shape
+        (direct, direct_acc), (cached, cached_acc) = results[False], results[True]
+        assert max(abs(a - b) for a, b in zip(direct, cached)) < 1e-4, (direct, cached)
+        assert direct_acc == cached_acc and direct[-1] < direct[0]
+        print(f"{trainable_blocks} trainable block(s): cache {feature_shape}, "
+              f"loss {direct[0]:.3f} -> {direct[-1]:.3f} both ways, accuracy {cached_acc:.0%}")
+
+
+INSTRUCTION_ENTRIES = [
+    {"instruction": "Rewrite the sentence in passive voice.",
+     "input": "The chef cooked the meal.", "output": "The meal was cooked by the chef."},
+    {"instruction": "Name a primary color.", "input": "", "output": "Red."},
+    {"instruction": "What is the opposite of cold?", "output": "The opposite of cold is hot."},
+]
+
+
+def test_instruction_cache():
+    """Test the pre-tokenized instruction cache and the masking collator."""
+    print("\n=== Testing Instruction Data Cache ===")
+
+    text = " ".join(format_prompt(e) + e["output"] for e in INSTRUCTION_ENTRIES)
+    vocab = tokenization.build_vocabulary(vocabulary.preprocess_text(text))
+    tokenizer = tokenization.TextTokenizer(vocab)
+    eot_id = vocab["<|endoftext|>"]
+    assert "### Input:" in format_prompt(INSTRUCTION_ENTRIES[0])
+    assert "### Input:" not in format_prompt(INSTRUCTION_ENTRIES[1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_instruction_cache(INSTRUCTION_ENTRIES, tokenizer, tmp)
+        dataset = InstructionDataset(tmp)
+        assert len(dataset) == 3 and dataset.tokens.dtype == "uint16"
+        examples = [dataset[i] for i in range(len(dataset))]
+        for entry, (ids, prompt_length) in zip(INSTRUCTION_ENTRIES, examples):
+            expected_ids, expected_length = tokenize_entry(entry, tokenizer, eot_id)
+            assert ids.tolist() == expected_ids and prompt_length == expected_length
+        assert dataset.lengths.tolist() == [len(ids) for ids, _ in examples]
+
+        input_ids, target_ids = InstructionCollator(pad_id=eot_id)(examples)
+        assert input_ids.shape[1] == int(dataset.lengths.max()) - 1
+        for row, (ids, prompt_length) in enumerate(examples):
+            kept = target_ids[row] != IGNORE_INDEX
+            # Exactly the response tokens and the final end-of-text
+            assert target_ids[row][kept].tolist() == ids[prompt_length:].tolist()
+            assert tokenizer.decode(ids[prompt_length:-1].tolist()) == \
+                INSTRUCTION_ENTRIES[row]["output"]
+        _, unmasked = InstructionCollator(eot_id, mask_prompt=False)(examples)
+        assert (unmasked != IGNORE_INDEX).sum() == int(dataset.lengths.sum()) - 3
+
+        # A prompt longer than max_length is cut from the left, so every row
+        # keeps its first response tokens
+        max_length = int(dataset.prompt_lengths.min()) - 2
+        truncated, targets = InstructionCollator(eot_id, max_length=max_length)(examples)
+        assert truncated.shape[1] == max_length
+        for row, (ids, prompt_length) in enumerate(examples):
+            response = ids[prompt_length:].tolist()
+            learned = targets[row][targets[row] != IGNORE_INDEX].tolist()
+            assert learned == response[:max_length], (row, learned)
+            assert truncated[row, -len(learned)] == ids[prompt_length - 1]
+
+        model = gpt.GPTModel({**TINY_CONFIG, "vocab_size": len(vocab)})
+        loss = training.calc_loss_batch(input_ids, target_ids, model)
+        assert torch.isfinite(loss)
+        del dataset
+    print(f"{len(examples)} examples, {int(kept.sum())} of {target_ids.shape[1]} targets "
+          f"kept in the last row, loss {loss.item():.3f}")
+
+
+def main():
+    """Run all tests."""
+    print("🧪 Starting Fine-Tuning Tests")
+    print("=" * 50)
+
+    try:
+        test_apply_lora()
+        test_training_and_files()
+        test_merge()
+        test_classification_cache()
+        test_instruction_cache()
+
+        print("\n✅ All tests completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
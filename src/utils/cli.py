@@ -1,4 +1,317 @@
 """
 Command-line interface for the Build LLM project.
 Provides easy access to common operations.
-"""
\ No newline at end of file
+
+Installed as ``build-llm`` (see ``setup.py``), or run from the repository
+root with ``python -m src.utils.cli``:
+
+    build-llm build-vocab the-verdict.txt -o vocabulary.txt
+    build-llm tokenize "It had always been" --vocab vocabulary.txt
+    build-llm dedup data/*.txt -o unique.txt --processes 4
+    build-llm build-vocab unique.txt -o vocabulary.txt
+    build-llm stats data/*.txt --vocab vocabulary.txt --processes 4 --json stats.json
+    build-llm train --steps 100 --save-model model.safetensors --save-vocab vocabulary.txt
+    build-llm generate --model model.safetensors --vocab vocabulary.txt --prompt "I had"
+    build-llm bench training packing
+    build-llm bench suite run --compare
+
+Only the standard library is imported at startup. torch, numpy and the
+plotting libraries are imported inside the commands that need them, so
+``--help`` and the tokenization commands start in a few tens of
+milliseconds instead of the seconds it takes to import torch.
+"""
+
+import argparse
+import array
+import contextlib
+import os
+import runpy
+import sys
+from importlib import import_module
+from typing import List, Optional
+
+MODULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "modules")
+
+
+def _vocabulary_module():
+    return import_module("..modules.01_tokenization.build_vocabulary", __package__)
+
+
+def _load_tokenizer(vocab_path: str):
+    """Tokenizer over a vocabulary file written by ``build-vocab``."""
+    tokenization = import_module("..modules.01_tokenization", __package__)
+    with contextlib.redirect_stdout(sys.stderr):  # Keep stdout for the command's output
+        vocab = _vocabulary_module().load_vocabulary(vocab_path)
+    return tokenization.TextTokenizer(vocab)
+
+
+def benchmark_modules() -> List[str]:
+    """Module directories that provide a ``benchmark.py``."""
+    return sorted(name for name in os.listdir(MODULES_DIR)
+                  if os.path.isfile(os.path.join(MODULES_DIR, name, "benchmark.py")))
+
+
+def resolve_module(name: str) -> str:
+    """
+    Find a module directory from its number or name.
+
+    Args:
+        name: ``"06"``, ``"training"`` or ``"06_training"``
+
+    Returns:
+        Directory name, e.g. ``"06_training"``
+    """
+    modules = benchmark_modules()
+    matches = [m for m in modules
+               if name in (m, m.split("_", 1)[0], m.split("_", 1)[1])]
+    if len(matches) != 1:
+        raise ValueError(f"Unknown module '{name}'; modules with benchmarks: "
+                         f"{', '.join(modules)}")
+    return matches[0]
+
+
+def cmd_build_vocab(args: argparse.Namespace) -> int:
+    """Build a vocabulary from a text file."""
+    vocabulary = _vocabulary_module()
+    with contextlib.redirect_stdout(sys.stderr):
+        with open(args.text_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        if args.dedup:
+            text = vocabulary.remove_duplicates(text)
+        tokens = vocabulary.preprocess_text(text)
+        vocab = vocabulary.build_vocabulary(tokens)
+        vocabulary.save_vocabulary(vocab, args.output)
+    return 0
+
+
+def cmd_tokenize(args: argparse.Namespace) -> int:
+    """Encode text to token IDs, or decode token IDs back to text."""
+    tokenizer = _load_tokenizer(args.vocab)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            text = f.read()
+    elif args.text is not None:
+        text = args.text
+    else:
+        text = sys.stdin.read()
+
+    if args.decode:
+        print(tokenizer.decode([int(i) for i in text.split()]))
+        return 0
+    if args.dedup:
+        with contextlib.redirect_stdout(sys.stderr):
+            text = _vocabulary_module().remove_duplicates(text)
+    ids = tokenizer.encode(text)
+    if args.output:
+        if ids and max(ids) > 0xFFFF:
+            raise ValueError("Token IDs must fit in uint16 to be stored")
+        # Same layout as save_tokens (flat uint16), without importing numpy
+        with open(args.output, "wb") as f:
+            array.array("H", ids).tofile(f)
+        print(f"{len(ids)} tokens written to {args.output}", file=sys.stderr)
+    else:
+        print(" ".join(map(str, ids)))
+    return 0
+
+
+def cmd_dedup(args: argparse.Namespace) -> int:
+    """Remove near-duplicate lines (one document per line) from text files."""
+    import json
+
+    dedup = import_module("..modules.01_tokenization.dedup", __package__)
+    deduplicator = dedup.MinHashDeduplicator(num_perm=args.num_perm, bands=args.bands,
+                                             shingle_size=args.shingle_size,
+                                             threshold=args.threshold)
+    result = deduplicator.deduplicate_files(args.files, args.output,
+                                            num_processes=args.processes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(dict(result.to_dict(), files=args.files, output=args.output,
+                           settings=deduplicator.settings()), f, indent=2)
+    print(f"{result.num_duplicates} of {result.num_documents} documents removed "
+          f"({result.docs_per_sec:,.0f} docs/s); {result.num_documents - result.num_duplicates} "
+          f"written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    """Corpus (and vocabulary) statistics of text files, optionally in parallel."""
+    import json
+
+    stats_module = import_module("..modules.01_tokenization.utils", __package__)
+    tokenizer = _load_tokenizer(args.vocab)
+    corpus = stats_module.corpus_statistics_from_files(tokenizer, args.files, by=args.by,
+                                                       num_processes=args.processes)
+    vocabulary = stats_module.vocabulary_statistics(tokenizer.str_to_int)
+    if args.json:
+        report = {"files": args.files,
+                  "corpus": corpus.to_dict(args.top, include_counts=args.counts),
+                  "vocabulary": vocabulary.to_dict()}
+        if args.json == "-":
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+            return 0
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Statistics written to {args.json}", file=sys.stderr)
+    print(corpus.summary(args.top))
+    return 0
+
+
+def cmd_train(args: argparse.Namespace) -> int:
+    """Train a model with the Module 6 entry point."""
+    train = import_module("..modules.06_training.train", __package__)
+    train.main(args.train_args)
+    return 0
+
+
+def cmd_generate(args: argparse.Namespace) -> int:
+    """Stream a continuation of a prompt from a saved model."""
+    import asyncio  # ~50 ms to import; only generation needs it
+
+    gpt = import_module("..modules.05_gpt_model", __package__)
+    inference = import_module("..modules.07_inference", __package__)
+    tokenizer = _load_tokenizer(args.vocab)
+    model = gpt.load_model(args.model)
+    engine = inference.InferenceEngine(model, tokenizer,
+                                       context_size=model.cfg["context_length"],
+                                       kv_cache_dtype=args.kv_cache)
+    params = inference.SamplingParams(temperature=args.temperature, top_k=args.top_k,
+                                      top_p=args.top_p)
+
+    async def stream() -> None:
+        print(args.prompt, end="", flush=True)
+        async for fragment in engine.stream(args.prompt, args.max_new_tokens, params,
+                                            seed=args.seed):
+            print(fragment, end="", flush=True)
+        print()
+
+    asyncio.run(stream())
+    return 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    """Run a module's benchmark script, or the cross-module suite."""
+    if args.module == "suite":
+        module = "benchmarks"  # benchmarks/ at the repository root
+    else:
+        module = f"src.modules.{resolve_module(args.module)}.benchmark"
+    argv = sys.argv
+    sys.argv = [module] + args.bench_args
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    finally:
+        sys.argv = argv
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser with all subcommands."""
+    parser = argparse.ArgumentParser(prog="build-llm",
+                                     description="Build LLM from Scratch command-line tools")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    vocab = commands.add_parser("build-vocab", help="Build a vocabulary from a text file")
+    vocab.add_argument("text_file", help="UTF-8 text file")
+    vocab.add_argument("-o", "--output", default="vocabulary.txt",
+                       help="Vocabulary file to write (default: vocabulary.txt)")
+    vocab.add_argument("--dedup", action="store_true",
+                       help="Remove near-duplicate paragraphs first")
+    vocab.set_defaults(func=cmd_build_vocab)
+
+    tokenize = commands.add_parser("tokenize", help="Encode text to token IDs (or decode)")
+    tokenize.add_argument("text", nargs="?", help="Text to encode (default: stdin)")
+    tokenize.add_argument("--file", help="Read the text from a file")
+    tokenize.add_argument("--vocab", default="vocabulary.txt", help="Vocabulary file")
+    tokenize.add_argument("--decode", action="store_true",
+                          help="Input is whitespace-separated token IDs; print the text")
+    tokenize.add_argument("--output", help="Write the IDs as a uint16 token file "
+                          "(readable by TokenDataset) instead of printing them")
+    tokenize.add_argument("--dedup", action="store_true",
+                          help="Remove near-duplicate paragraphs before encoding")
+    tokenize.set_defaults(func=cmd_tokenize)
+
+    dedup = commands.add_parser("dedup", help="Remove near-duplicate documents "
+                                "(one per line) with MinHash-LSH")
+    dedup.add_argument("files", nargs="+", help="UTF-8 text files, one document per line")
+    dedup.add_argument("-o", "--output", required=True, help="File for the kept lines")
+    dedup.add_argument("--processes", type=int, default=1,
+                       help="Worker processes for the signatures (default: 1)")
+    dedup.add_argument("--threshold", type=float, default=0.8,
+                       help="Minimum estimated Jaccard similarity of a duplicate (default: 0.8)")
+    dedup.add_argument("--num-perm", type=int, default=128, help="MinHash functions")
+    dedup.add_argument("--bands", type=int, default=16, help="LSH bands")
+    dedup.add_argument("--shingle-size", type=int, default=5, help="Words per shingle")
+    dedup.add_argument("--json", metavar="PATH", help="Also write a JSON report")
+    dedup.set_defaults(func=cmd_dedup)
+
+    stats = commands.add_parser("stats", help="Corpus and vocabulary statistics")
+    stats.add_argument("files", nargs="+", help="UTF-8 text files (shards)")
+    stats.add_argument("--vocab", default="vocabulary.txt", help="Vocabulary file")
+    stats.add_argument("--by", choices=["file", "line"], default="file",
+                       help="One text per file, or per non-empty line (default: file)")
+    stats.add_argument("--processes", type=int, default=1,
+                       help="Worker processes, one file at a time each (default: 1)")
+    stats.add_argument("--top", type=int, default=10, help="Most frequent tokens to show")
+    stats.add_argument("--json", metavar="PATH",
+                       help="Also write the statistics as JSON ('-': print only the JSON)")
+    stats.add_argument("--counts", action="store_true",
+                       help="Include every token count in the JSON, so reports can be merged")
+    stats.set_defaults(func=cmd_stats)
+
+    train = commands.add_parser("train", add_help=False,
+                                help="Train a model (options of src.modules.06_training.train)")
+    train.add_argument("train_args", nargs=argparse.REMAINDER)
+    train.set_defaults(func=cmd_train)
+
+    generate = commands.add_parser("generate", help="Generate text from a saved model")
+    generate.add_argument("--model", required=True, help="Model saved with save_model")
+    generate.add_argument("--vocab", default="vocabulary.txt", help="Vocabulary file")
+    generate.add_argument("--prompt", required=True)
+    generate.add_argument("--max-new-tokens", type=int, default=50)
+    generate.add_argument("--temperature", type=float, default=0.0,
+                          help="0 selects greedy decoding")
+    generate.add_argument("--top-k", type=int, default=0)
+    generate.add_argument("--top-p", type=float, default=1.0)
+    generate.add_argument("--seed", type=int)
+    generate.add_argument("--kv-cache", choices=["fp32", "bf16", "int8", "fp8"],
+                          default="fp32", help="Key/value cache format")
+    generate.set_defaults(func=cmd_generate)
+
+    bench = commands.add_parser("bench", help="Run a module benchmark, e.g. "
+                                "'bench training packing', or 'bench suite run'")
+    bench.add_argument("module", help="Module number or name, e.g. 06 or training; "
+                       "'suite' for the cross-module suite in benchmarks/")
+    bench.add_argument("bench_args", nargs=argparse.REMAINDER,
+                       help="Section and options of the module's benchmark")
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the ``build-llm`` command line.
+
+    Args:
+        argv: Arguments without the program name (defaults to ``sys.argv[1:]``)
+
+    Returns:
+        Process exit code
+    """
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["train"]:
+        # argparse.REMAINDER does not capture leading options such as
+        # "--steps", so the training options are forwarded untouched
+        args = argparse.Namespace(command="train", func=cmd_train, train_args=argv[1:])
+    else:
+        args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"build-llm {args.command}: error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,281 @@
 """
 Evaluation metrics for language models.
+
+Loss and perplexity over token corpora of any size. The corpus is read from
+a memory-mapped token file (written by ``save_tokens`` in Module 6) in
+strided sliding windows, one batch at a time, so memory stays bounded by the
+batch size whatever the corpus size. The windows themselves are computed
+from their index on demand, never listed.
+
+With a stride shorter than the context length, windows overlap: every
+window scores only the tokens that the previous one did not, and uses the
+rest as context. Each token is scored exactly once, but (apart from the
+first window) with at least ``context_length - stride`` tokens of context,
+which gives a lower, more realistic perplexity than non-overlapping windows.
 """
 
-#will add later
\ No newline at end of file
+import math
+import time
+from dataclasses import dataclass
+from importlib import import_module
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.nn as nn
+import torch.nn.functional as F
+
+_loss = import_module("..modules.06_training.loss_functions", __package__)
+_distributed = import_module("..modules.06_training.distributed", __package__)
+
+Corpus = Union[str, np.ndarray, torch.Tensor]
+Window = Tuple[int, int, int]  # (begin, end, first scored input position)
+
+
+@dataclass
+class EvalResult:
+    """
+    Outcome of an evaluation run.
+
+    Attributes:
+        loss: Mean cross entropy per scored token
+        perplexity: ``exp(loss)``
+        tokens: Number of scored tokens
+        batches: Number of batches evaluated (summed over processes)
+        seconds: Wall-clock time of the run
+    """
+
+    loss: float
+    perplexity: float
+    tokens: int
+    batches: int
+    seconds: float
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.tokens / self.seconds if self.seconds > 0 else 0.0
+
+
+class SlidingWindows(Sequence[Window]):
+    """
+    Lazy sequence of the windows of ``sliding_windows``.
+
+    Window ``i`` is computed from ``i`` alone, so a corpus of any size costs
+    a few integers, and slices or shards of the windows are never built as
+    lists.
+    """
+
+    def __init__(self, num_inputs: int, context_length: int, stride: int):
+        """Store the window geometry."""
+        self.num_inputs = num_inputs
+        self.context_length = context_length
+        self.stride = stride
+        if num_inputs <= 0:
+            self._len = 0
+        else:
+            # Window i > 0 exists while window i - 1 ends before the last input
+            self._len = 1 + max(0, -(-(num_inputs - context_length) // stride))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _window(self, i: int) -> Window:
+        begin = i * self.stride
+        end = min(begin + self.context_length, self.num_inputs)
+        scored = 0 if i == 0 else min(begin - self.stride + self.context_length,
+                                      self.num_inputs)
+        return begin, end, scored
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._window(j) for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(f"window {i} out of range")
+        return self._window(i)
+
+
+def sliding_windows(num_tokens: int, context_length: int,
+                    stride: Optional[int] = None) -> SlidingWindows:
+    """
+    Windows covering a corpus so that every next-token target is scored once.
+
+    Window ``(begin, end, score_from)`` feeds tokens ``[begin, end)`` to the
+    model and scores the predictions of the inputs ``[score_from, end)``,
+    i.e. the targets ``[score_from + 1, end + 1)``.
+
+    Args:
+        num_tokens: Corpus length
+        context_length: Tokens per window
+        stride: Distance between window starts (defaults to
+            ``context_length``, i.e. non-overlapping windows)
+
+    Returns:
+        Lazy sequence of windows
+    """
+    stride = stride or context_length
+    if not 0 < stride <= context_length:
+        raise ValueError(f"stride must be in [1, context_length], got {stride}")
+    num_inputs = num_tokens - 1  # The last token has no target
+    return SlidingWindows(num_inputs, context_length, stride)
+
+
+def _open_corpus(corpus: Corpus, dtype: np.dtype) -> np.ndarray:
+    if isinstance(corpus, str):
+        return np.memmap(corpus, dtype=dtype, mode="r")
+    if torch.is_tensor(corpus):
+        return corpus.cpu().numpy()
+    return corpus
+
+
+def _window_batch(tokens: np.ndarray, windows: Sequence[Window],
+                  context_length: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Input and target rows of a batch of windows (unscored targets ignored)."""
+    width = min(context_length, max(end - begin for begin, end, _ in windows))
+    input_ids = torch.zeros(len(windows), width, dtype=torch.long)
+    target_ids = torch.full((len(windows), width), _loss.IGNORE_INDEX, dtype=torch.long)
+    for row, (begin, end, score_from) in enumerate(windows):
+        chunk = torch.from_numpy(tokens[begin:end + 1].astype(np.int64))
+        n = end - begin
+        input_ids[row, :n] = chunk[:-1]
+        offset = score_from - begin
+        target_ids[row, offset:n] = chunk[offset + 1:]
+    return input_ids, target_ids
+
+
+@torch.no_grad()
+def _loss_sum(model: nn.Module, tokens: np.ndarray, windows: Sequence[Window],
+              batch_ids: Iterable[int], context_length: int, batch_size: int,
+              max_batches: Optional[int],
+              device: Optional[torch.device]) -> Tuple[float, int, int]:
+    """Summed loss, scored tokens and batches over the given batches of windows."""
+    total, count, batches = 0.0, 0, 0
+    for batch_id in batch_ids:
+        if max_batches is not None and batches >= max_batches:
+            break
+        start = batch_id * batch_size
+        input_ids, target_ids = _window_batch(tokens, windows[start:start + batch_size],
+                                              context_length)
+        if device is not None:
+            input_ids, target_ids = input_ids.to(device), target_ids.to(device)
+        logits = model(input_ids)
+        total += F.cross_entropy(logits.flatten(0, 1).float(), target_ids.flatten(),
+                                 ignore_index=_loss.IGNORE_INDEX, reduction="sum").item()
+        count += int((target_ids != _loss.IGNORE_INDEX).sum())
+        batches += 1
+    return total, count, batches
+
+
+def _evaluate_shard(model: nn.Module, corpus: Corpus, dtype: np.dtype,
+                    windows: Sequence[Window], batch_ids: Iterable[int],
+                    context_length: int, batch_size: int,
+                    max_batches: Optional[int], num_threads: int) -> Tuple[float, int, int]:
+    """Worker of ``evaluate_corpus(num_processes > 1)``."""
+    torch.set_num_threads(num_threads)
+    model.eval()
+    return _loss_sum(model, _open_corpus(corpus, dtype), windows, batch_ids,
+                     context_length, batch_size, max_batches, None)
+
+
+def evaluate_corpus(model: nn.Module, corpus: Corpus, context_length: int,
+                    stride: Optional[int] = None, batch_size: int = 8,
+                    max_batches: Optional[int] = None,
+                    device: Optional[torch.device] = None,
+                    dtype: np.dtype = np.uint16, num_processes: int = 1) -> EvalResult:
+    """
+    Loss and perplexity of a model over a token corpus.
+
+    Runs under ``torch.no_grad`` in evaluation mode (the previous mode is
+    restored). The loss is the mean over scored tokens, not over batches,
+    so a short last batch is weighted correctly.
+
+    Parallelism, in two forms:
+
+    - Inside a data-parallel job (a process group is active), each rank
+      evaluates every ``world_size``-th batch and the sums are all-reduced,
+      so every rank returns the same result.
+    - Otherwise ``num_processes > 1`` spawns that many worker processes,
+      each with its share of the windows and of the CPU threads. Pass the
+      corpus as a file path so the workers map it instead of copying it.
+
+    Args:
+        model: Language model returning (batch, num_tokens, vocab_size) logits
+        corpus: Token file written by ``save_tokens``, or an array of token IDs
+        context_length: Tokens per window (at most the model's context length)
+        stride: Distance between window starts (defaults to ``context_length``)
+        batch_size: Windows per forward pass; bounds memory
+        max_batches: Stop after this many batches (per process), e.g. for a
+            quick validation estimate during training
+        device: Device to run on (defaults to leaving batches on the CPU)
+        dtype: Token type of a corpus file
+        num_processes: Worker processes (for a model on the CPU, outside a
+            process group)
+
+    Returns:
+        ``EvalResult`` with loss, perplexity, scored tokens and timing
+
+    Example:
+        >>> result = evaluate_corpus(model, "data/val.bin", context_length=256,
+        ...                          stride=128)
+        >>> print(f"val ppl {result.perplexity:.2f} at {result.tokens_per_sec:,.0f} tok/s")
+    """
+    start = time.perf_counter()
+    tokens = _open_corpus(corpus, dtype)
+    windows = sliding_windows(len(tokens), context_length, stride)
+    was_training = model.training
+    model.eval()
+    try:
+        # Batches are assigned round-robin by index, so the ranks' (or
+        # processes') batches match a single run
+        num_batches = -(-len(windows) // batch_size)
+        if _distributed.is_distributed():
+            rank, world_size = _distributed.get_rank(), _distributed.get_world_size()
+            sums = torch.tensor(_loss_sum(model, tokens, windows,
+                                          range(rank, num_batches, world_size),
+                                          context_length, batch_size, max_batches, device),
+                                dtype=torch.float64)
+            dist.all_reduce(sums)
+            total, count, batches = sums[0].item(), int(sums[1]), int(sums[2])
+        elif num_processes > 1:
+            threads = max(1, torch.get_num_threads() // num_processes)
+            source = corpus if isinstance(corpus, str) else tokens
+            context = torch.multiprocessing.get_context("spawn")
+            with context.Pool(num_processes) as pool:
+                results = pool.starmap(_evaluate_shard, [
+                    (model, source, dtype, windows, range(p, num_batches, num_processes),
+                     context_length, batch_size, max_batches, threads)
+                    for p in range(num_processes)])
+            total = sum(r[0] for r in results)
+            count = sum(r[1] for r in results)
+            batches = sum(r[2] for r in results)
+        else:
+            total, count, batches = _loss_sum(model, tokens, windows, range(num_batches),
+                                              context_length, batch_size, max_batches, device)
+    finally:
+        model.train(was_training)
+
+    loss = total / count if count else float("nan")
+    return EvalResult(loss=loss, perplexity=math.exp(loss) if count else float("nan"),
+                      tokens=count, batches=batches, seconds=time.perf_counter() - start)
+
+
+def perplexity(model: nn.Module, corpus: Corpus, context_length: int,
+               stride: Optional[int] = None, **kwargs) -> float:
+    """
+    Perplexity of a model over a token corpus.
+
+    Shortcut for ``evaluate_corpus(...).perplexity``; see there for the
+    remaining keyword arguments.
+
+    Args:
+        model: Language model
+        corpus: Token file written by ``save_tokens``, or an array of token IDs
+        context_length: Tokens per window
+        stride: Distance between window starts
+
+    Returns:
+        Perplexity (``exp`` of the mean loss per token)
+    """
+    return evaluate_corpus(model, corpus, context_length, stride, **kwargs).perplexity
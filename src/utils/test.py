@@ -0,0 +1,279 @@
+"""
+Simple test script for the shared utilities.
+
+This script tests the ``build-llm`` command line:
+1. ``--help`` and the tokenization and statistics commands import no heavy
+   dependencies and spend well under 200 ms on imports (measured with
+   ``python -X importtime``)
+2. ``build-vocab`` and ``tokenize`` round-trip text through token IDs and
+   write token files readable by ``TokenDataset``
+3. ``generate`` streams a continuation from a model saved with
+   ``save_model``
+
+and the attention visualization:
+4. ``AttentionCapture`` records only the selected layers and heads and does
+   not change the model's output
+5. Long attention maps are pooled and drawn with thinned labels; short ones
+   are annotated
+6. Streaming PCA over chunks equals exact PCA, for arrays, memory maps and
+   tensors, and token embeddings plot without scikit-learn
+
+Run from the repository root:
+    python -m src.utils.test
+"""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import import_module
+from typing import Dict, List
+
+from .cli import main
+
+HEAVY_MODULES = ("torch", "numpy", "matplotlib", "seaborn", "sklearn")
+IMPORT_BUDGET_MS = 200
+SAMPLE_TEXT = ('I had always thought Jack Gisburn rather a cheap genius, though a good '
+               'fellow enough, so it was no great surprise to me to hear that, in the '
+               'height of his glory, he had dropped his painting.')
+
+
+def import_times(args: List[str], cwd: str) -> Dict[str, int]:
+    """
+    Run the CLI under ``python -X importtime``.
+
+    Returns:
+        Cumulative import time in microseconds of every module imported
+    """
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "src.utils.cli"] + args,
+                            cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                # Nested imports are indented below the module that imports them
+                times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def run_cli(args: List[str]) -> str:
+    """Run the CLI in this process and return its standard output."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+        assert main(args) == 0, args
+    return out.getvalue()
+
+
+def test_startup_time():
+    """Test that light commands never import the heavy dependencies."""
+    print("\n=== Testing CLI Startup Time ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run_cli(["build-vocab", write_text(tmp), "-o", os.path.join(tmp, "vocab.txt")])
+        commands = {
+            "--help": ["--help"],
+            "tokenize": ["tokenize", SAMPLE_TEXT, "--vocab", "vocab.txt"],
+            "build-vocab": ["build-vocab", "sample.txt", "-o", "vocab2.txt"],
+            "stats": ["stats", "sample.txt", "--vocab", "vocab.txt", "--json", "stats.json"],
+        }
+        for name, args in commands.items():
+            start = time.perf_counter()
+            times = import_times(args, tmp)
+            wall_ms = (time.perf_counter() - start) * 1000
+            # Top-level entries (no indentation) add up to the total import time
+            total_ms = sum(t for n, t in times.items() if not n.startswith(" ")) / 1000
+            heavy = [n.strip() for n in times if n.strip().split(".")[0] in HEAVY_MODULES]
+            assert not heavy, f"'{name}' imports {heavy[:3]}"
+            assert total_ms < IMPORT_BUDGET_MS, f"'{name}' imports take {total_ms:.0f} ms"
+            print(f"{name:>12}: {total_ms:5.1f} ms of imports, {wall_ms:4.0f} ms wall "
+                  f"(with importtime)")
+
+
+def write_text(directory: str) -> str:
+    path = os.path.join(directory, "sample.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(SAMPLE_TEXT)
+    return path
+
+
+def test_tokenize_commands():
+    """Test vocabulary building, encoding, decoding and token files."""
+    print("\n=== Testing Tokenization Commands ===")
+
+    training = import_module("..modules.06_training", __package__)
+    with tempfile.TemporaryDirectory() as tmp:
+        vocab = os.path.join(tmp, "vocab.txt")
+        run_cli(["build-vocab", write_text(tmp), "-o", vocab])
+        ids = run_cli(["tokenize", SAMPLE_TEXT, "--vocab", vocab]).split()
+        assert ids and all(i.isdigit() for i in ids)
+        text = run_cli(["tokenize", "--decode", " ".join(ids), "--vocab", vocab]).strip()
+        assert text == SAMPLE_TEXT, text
+
+        path = os.path.join(tmp, "tokens.bin")
+        run_cli(["tokenize", "--file", os.path.join(tmp, "sample.txt"), "--vocab", vocab,
+                 "--output", path])
+        dataset = training.TokenDataset(path, context_length=4)
+        assert dataset.tokens.tolist() == [int(i) for i in ids]
+        del dataset
+    print(f"{len(ids)} tokens round-trip through encode/decode and the token file")
+
+
+def test_generate_command():
+    """Test streaming generation from a saved model."""
+    print("\n=== Testing Generate Command ===")
+
+    import torch
+
+    gpt = import_module("..modules.05_gpt_model", __package__)
+    vocabulary = import_module("..modules.01_tokenization.build_vocabulary", __package__)
+    with tempfile.TemporaryDirectory() as tmp:
+        vocab_path = os.path.join(tmp, "vocab.txt")
+        run_cli(["build-vocab", write_text(tmp), "-o", vocab_path])
+        with contextlib.redirect_stdout(io.StringIO()):
+            vocab = vocabulary.load_vocabulary(vocab_path)
+        cfg = gpt.get_config("124M", vocab_size=len(vocab), context_length=32, emb_dim=32,
+                             n_heads=2, n_layers=2, drop_rate=0.0)
+        torch.manual_seed(0)
+        model_path = gpt.save_model(gpt.GPTModel(cfg), os.path.join(tmp, "model.safetensors"))
+
+        args = ["generate", "--model", model_path, "--vocab", vocab_path,
+                "--prompt", "I had always thought", "--max-new-tokens", "5"]
+        first, second = run_cli(args), run_cli(args)
+    assert first.startswith("I had always thought") and first == second, (first, second)
+    assert len(first.strip()) > len("I had always thought")
+    print(f"Greedy output: {first.strip()!r}")
+
+
+def test_attention_visualization():
+    """Test attention capture, pooling and plotting."""
+    print("\n=== Testing Attention Visualization ===")
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import torch
+
+    from .visualization import plot_attention_weights, pool_attention
+
+    attention = import_module("..modules.03_attention", __package__)
+    gpt = import_module("..modules.05_gpt_model", __package__)
+    cfg = gpt.get_config("124M", vocab_size=100, context_length=64, emb_dim=32, n_heads=4,
+                         n_layers=3, drop_rate=0.0)
+    torch.manual_seed(0)
+    model = gpt.GPTModel(cfg).eval()
+    ids = torch.randint(0, 100, (2, 20))
+    with torch.no_grad():
+        reference = model(ids)
+        with attention.AttentionCapture(model, layers=[0, -1], heads=[1, 3]) as capture:
+            captured = model(ids)
+    assert torch.equal(reference, captured)
+    assert sorted(capture.maps) == [0, 2] and capture.maps[2].shape == (2, 2, 20, 20)
+    weights = capture.attention(-1, head=3, batch=1)
+    assert torch.allclose(weights.sum(-1), torch.ones(20))
+    assert torch.all(weights.triu(1) == 0), "Attention must be causal"
+    assert all(block.att.observer is None for block in model.trf_blocks)
+
+    # 2048 tokens pool to 512 cells of 4 x 4 weights
+    rng = np.random.default_rng(0)
+    large = rng.random((2048, 2048), dtype=np.float32)
+    pooled, row_factor, col_factor = pool_attention(large, max_size=512)
+    assert pooled.shape == (512, 512) and (row_factor, col_factor) == (4, 4)
+    assert pooled[1, 2] == large[4:8, 8:12].max()
+    mean_pooled, _, _ = pool_attention(large[:1001], max_size=500, reduce="mean")
+    assert mean_pooled.shape == (334, 410)
+    assert np.isclose(mean_pooled[-1, 0], large[999:1001, :5].mean())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tokens = [f"t{i}" for i in range(2048)]
+        start = time.perf_counter()
+        fig = plot_attention_weights(large, tokens, save_path=os.path.join(tmp, "map.png"),
+                                     max_labels=32, show=False)
+        elapsed = time.perf_counter() - start
+        assert os.path.getsize(os.path.join(tmp, "map.png")) > 0
+        ax = fig.axes[0]
+        assert len(ax.get_xticks()) <= 32 and not ax.texts
+        assert ax.get_xticklabels()[1].get_text() == "64: t64"
+        plt.close(fig)
+
+    fig = plot_attention_weights(weights, [f"w{i}" for i in range(20)], show=False)
+    assert not fig.axes[0].texts and len(fig.axes[0].get_xticks()) == 20
+    plt.close(fig)
+    fig = plot_attention_weights(weights[-4:, -8:], show=False)  # 4 queries, 8 keys
+    labels = [t.get_text() for t in fig.axes[0].get_yticklabels()]
+    assert len(fig.axes[0].texts) == 32 and labels == ["4", "5", "6", "7"]
+    plt.close(fig)
+    print(f"Captured layers {sorted(capture.maps)}, heads {capture.heads}; "
+          f"T=2048 map rendered and saved in {elapsed:.2f} s")
+
+
+def test_embedding_projection():
+    """Test streaming PCA, random projection and the embedding plot."""
+    print("\n=== Testing Embedding Projection ===")
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import torch
+
+    from .visualization import plot_token_embeddings, random_projection, streaming_pca
+
+    rng = np.random.default_rng(0)
+    # Offset far from the origin: the shifted Gram matrix must avoid cancellation
+    embeddings = (rng.standard_normal((1000, 3)) @ rng.standard_normal((3, 32))
+                  + 0.1 * rng.standard_normal((1000, 32)) + 100).astype(np.float32)
+    projected, explained = streaming_pca(embeddings, n_components=2, chunk_size=128)
+
+    centered = embeddings.astype(np.float64) - embeddings.mean(axis=0)
+    _, singular, vt = np.linalg.svd(centered, full_matrices=False)
+    expected = centered @ vt[:2].T
+    assert np.allclose(np.abs(projected), np.abs(expected), atol=1e-3)
+    assert np.allclose(explained, singular[:2] ** 2 / (singular ** 2).sum(), atol=1e-5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.npy")
+        np.save(path, embeddings)
+        from_memmap, _ = streaming_pca(np.load(path, mmap_mode="r"), chunk_size=100)
+        assert np.allclose(from_memmap, projected, atol=1e-3)
+    from_tensor, _ = streaming_pca(torch.from_numpy(embeddings), chunk_size=4096)
+    assert np.allclose(from_tensor, projected, atol=1e-3)
+
+    random_2d = random_projection(embeddings, chunk_size=300)
+    assert random_2d.shape == (1000, 2)
+    assert np.allclose(random_2d, random_projection(embeddings, chunk_size=7), atol=1e-3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fig = plot_token_embeddings(embeddings, [f"t{i}" for i in range(1000)],
+                                    save_path=os.path.join(tmp, "embeddings.png"), show=False)
+        assert len(fig.axes[0].texts) == 20
+        plt.close(fig)
+    print(f"Streaming PCA matches SVD; explained variance {np.round(explained, 3).tolist()}")
+
+
+def main_tests():
+    """Run all tests."""
+    print("🧪 Starting Utilities Tests")
+    print("=" * 50)
+
+    try:
+        test_startup_time()
+        test_tokenize_commands()
+        test_generate_command()
+        test_attention_visualization()
+        test_embedding_projection()
+
+        print("\n✅ All tests completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed with error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main_tests()
@@ -2,41 +2,146 @@
 Visualization utilities for plotting attention weights, training curves, etc.
 """
 
-import matplotlib.pyplot as plt
-import seaborn as sns
+import math
 import numpy as np
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
-def plot_attention_weights(attention_weights: np.ndarray, 
-                         tokens: List[str],
-                         figsize: tuple = (10, 8),
-                         save_path: Optional[str] = None):
+# matplotlib is imported inside the plotting functions: importing it takes
+# longer than most of what the callers do with this module.
+
+ANNOTATE_MAX_TOKENS = 16  # Larger maps are drawn without per-cell values
+
+
+def pool_attention(attention_weights: np.ndarray,
+                   max_size: int = 512,
+                   reduce: str = 'max') -> Tuple[np.ndarray, int, int]:
+    """
+    Downsample an attention map to at most ``max_size`` cells per axis.
+
+    Blocks of ``factor x factor`` weights are reduced to one cell. ``'max'``
+    keeps single strong query-key links visible (a mean over a 4x4 block
+    divides them by 16); ``'mean'`` preserves the total attention per block.
+
+    Args:
+        attention_weights: 2D array (queries, keys)
+        max_size: Maximum number of cells per axis
+        reduce: ``'max'`` or ``'mean'``
+
+    Returns:
+        Pooled array, and the number of queries and keys per cell
+    """
+    if reduce not in ('max', 'mean'):
+        raise ValueError(f"reduce must be 'max' or 'mean', got {reduce!r}")
+    weights = np.asarray(attention_weights, dtype=np.float32)
+    rows, cols = weights.shape
+    row_factor, col_factor = math.ceil(rows / max_size), math.ceil(cols / max_size)
+    if row_factor == col_factor == 1:
+        return weights, 1, 1
+
+    # Pad to whole blocks with NaN, which the nan-reductions ignore
+    padded = np.full((math.ceil(rows / row_factor) * row_factor,
+                      math.ceil(cols / col_factor) * col_factor), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = weights
+    blocks = padded.reshape(padded.shape[0] // row_factor, row_factor,
+                            padded.shape[1] // col_factor, col_factor)
+    pooled = np.nanmax(blocks, axis=(1, 3)) if reduce == 'max' else np.nanmean(blocks, axis=(1, 3))
+    return pooled, row_factor, col_factor
+
+
+def _thinned_ticks(num_cells: int, factor: int, labels: Sequence[str],
+                   max_labels: int) -> Tuple[List[float], List[str]]:
+    """Tick positions (in cells) and labels, at most ``max_labels`` of them."""
+    step = max(1, math.ceil(num_cells / max_labels))
+    positions = list(range(0, num_cells, step))
+    if factor == 1 and step == 1:
+        return positions, [labels[i] for i in positions]
+    # Thinned: label each tick with the position of its first token
+    return positions, [f"{i * factor}: {labels[i * factor]}" for i in positions]
+
+
+def plot_attention_weights(attention_weights: np.ndarray,
+                           tokens: Optional[List[str]] = None,
+                           figsize: tuple = (10, 8),
+                           save_path: Optional[str] = None,
+                           max_size: int = 512,
+                           max_labels: int = 40,
+                           reduce: str = 'max',
+                           annotate: Optional[bool] = None,
+                           ax=None,
+                           show: bool = True):
     """
     Plot attention weights as a heatmap.
-    
+
+    The map is drawn as one image (``imshow``), so rendering cost depends on
+    the figure size rather than on the number of tokens. Maps larger than
+    ``max_size`` are pooled first (see ``pool_attention``), and tick labels
+    are thinned to ``max_labels`` per axis. Small maps are annotated with
+    their values.
+
     Args:
-        attention_weights: 2D array of attention weights
-        tokens: List of token strings
+        attention_weights: 2D array (queries, keys), e.g. from
+            ``AttentionCapture.attention``; with fewer queries than keys the
+            queries are taken to be the last tokens
+        tokens: Token strings of the keys (None: positions)
         figsize: Figure size tuple
         save_path: Optional path to save the plot
+        max_size: Maximum cells per axis before pooling
+        max_labels: Maximum tick labels per axis
+        reduce: Pooling of large maps, ``'max'`` or ``'mean'``
+        annotate: Write values into the cells (None: only up to 16 tokens)
+        ax: Axes to draw into (None: a new figure)
+        show: Call ``plt.show()`` at the end
+
+    Returns:
+        The matplotlib Figure
     """
-    plt.figure(figsize=figsize)
-    
-    sns.heatmap(attention_weights,
-                xticklabels=tokens,
-                yticklabels=tokens,
-                cmap='Blues',
-                annot=True,
-                fmt='.2f')
-    
-    plt.title('Attention Weights Visualization')
-    plt.xlabel('Keys')
-    plt.ylabel('Queries')
-    
+    import matplotlib.pyplot as plt
+
+    weights = np.asarray(attention_weights, dtype=np.float32)
+    if weights.ndim != 2:
+        raise ValueError(f"Expected a 2D attention map, got shape {weights.shape}")
+    num_queries, num_keys = weights.shape
+    key_labels = list(tokens) if tokens is not None else [str(i) for i in range(num_keys)]
+    if len(key_labels) != num_keys:
+        raise ValueError(f"Got {len(key_labels)} tokens for {num_keys} keys")
+    query_labels = key_labels[num_keys - num_queries:]
+
+    pooled, row_factor, col_factor = pool_attention(weights, max_size, reduce)
+    if annotate is None:
+        annotate = max(num_queries, num_keys) <= ANNOTATE_MAX_TOKENS
+
+    if ax is None:
+        fig, ax = plt.subplots(figsize=figsize)
+    else:
+        fig = ax.figure
+    image = ax.imshow(pooled, cmap='Blues', interpolation='nearest',
+                      aspect='auto' if num_queries != num_keys else 'equal')
+    fig.colorbar(image, ax=ax)
+
+    x_positions, x_labels = _thinned_ticks(pooled.shape[1], col_factor, key_labels, max_labels)
+    y_positions, y_labels = _thinned_ticks(pooled.shape[0], row_factor, query_labels, max_labels)
+    ax.set_xticks(x_positions, x_labels, rotation=90, fontsize=8)
+    ax.set_yticks(y_positions, y_labels, fontsize=8)
+
+    if annotate and row_factor == col_factor == 1:
+        threshold = (np.nanmax(pooled) + np.nanmin(pooled)) / 2
+        for i, j in np.ndindex(pooled.shape):
+            ax.text(j, i, f"{pooled[i, j]:.2f}", ha='center', va='center', fontsize=8,
+                    color='white' if pooled[i, j] > threshold else 'black')
+
+    title = 'Attention Weights Visualization'
+    if row_factor > 1 or col_factor > 1:
+        title += f" ({reduce}-pooled {row_factor}x{col_factor})"
+    ax.set_title(title)
+    ax.set_xlabel('Keys')
+    ax.set_ylabel('Queries')
+
     if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    
-    plt.show()
+        fig.savefig(save_path, dpi=300, bbox_inches='tight')
+
+    if show:
+        plt.show()
+    return fig
 
 def plot_training_curves(train_losses: List[float], 
                         val_losses: List[float],
@@ -49,6 +154,8 @@ def plot_training_curves(train_losses: List[float],
         val_losses: List of validation losses  
         save_path: Optional path to save the plot
     """
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 6))
     
     epochs = range(1, len(train_losses) + 1)
@@ -67,38 +174,196 @@ def plot_training_curves(train_losses: List[float],
     
     plt.show()
 
+def _iter_chunks(embeddings, chunk_size: int):
+    """Yield ``(start, float32 array)`` blocks of rows of an array, memmap or tensor."""
+    for start in range(0, len(embeddings), chunk_size):
+        chunk = embeddings[start:start + chunk_size]
+        if hasattr(chunk, 'detach'):  # torch.Tensor, without importing torch
+            chunk = chunk.detach().float().cpu().numpy()
+        yield start, np.asarray(chunk, dtype=np.float32)
+
+
+def streaming_pca(embeddings,
+                  n_components: int = 2,
+                  chunk_size: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project rows onto their principal components, reading ``chunk_size`` rows at a time.
+
+    The first pass accumulates the column sums and the ``d x d`` Gram matrix
+    (in float64, after shifting by the first chunk's mean to avoid
+    cancellation); the covariance's top eigenvectors are the components.
+    The second pass projects chunk by chunk. Memory is O(d^2 + chunk_size *
+    d), so a memory-mapped table never has to be loaded whole, and the result
+    is exact PCA rather than an approximation. Only numpy is needed.
+
+    Args:
+        embeddings: 2D array (rows, d): numpy array, ``np.memmap`` or tensor
+        n_components: Number of components
+        chunk_size: Rows per chunk
+
+    Returns:
+        Projected rows (rows, n_components) and the fraction of the variance
+        each component explains
+    """
+    num_rows, dim = embeddings.shape
+    shift = None
+    gram = np.zeros((dim, dim), dtype=np.float64)
+    total = np.zeros(dim, dtype=np.float64)
+    for _, chunk in _iter_chunks(embeddings, chunk_size):
+        if shift is None:
+            shift = chunk.mean(axis=0)
+        chunk = chunk - shift
+        gram += chunk.T @ chunk
+        total += chunk.sum(axis=0, dtype=np.float64)
+
+    mean = total / num_rows
+    covariance = (gram - num_rows * np.outer(mean, mean)) / max(num_rows - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)  # Ascending
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+    components = eigenvectors[:, order]
+    # Deterministic signs: the largest loading of each component is positive
+    signs = np.sign(components[np.abs(components).argmax(axis=0), range(len(order))])
+    components = (components * signs).astype(np.float32)
+    explained = eigenvalues[order] / max(eigenvalues.clip(min=0).sum(), np.finfo(float).tiny)
+
+    center = (shift + mean).astype(np.float32)
+    projected = np.empty((num_rows, len(order)), dtype=np.float32)
+    for start, chunk in _iter_chunks(embeddings, chunk_size):
+        projected[start:start + len(chunk)] = (chunk - center) @ components
+    return projected, explained
+
+
+def random_projection(embeddings,
+                      n_components: int = 2,
+                      chunk_size: int = 8192,
+                      seed: int = 42) -> np.ndarray:
+    """
+    Project rows onto random Gaussian directions in one streaming pass.
+
+    Distances are preserved in expectation (Johnson-Lindenstrauss), but
+    unlike PCA the directions do not follow the variance, so a 2D plot
+    shows less structure. Use it when one pass over the data must suffice.
+
+    Args:
+        embeddings: 2D array (rows, d): numpy array, ``np.memmap`` or tensor
+        n_components: Output dimension
+        chunk_size: Rows per chunk
+        seed: Seed of the projection matrix
+
+    Returns:
+        Projected rows (rows, n_components)
+    """
+    num_rows, dim = embeddings.shape
+    rng = np.random.default_rng(seed)
+    matrix = (rng.standard_normal((dim, n_components)) / math.sqrt(n_components)).astype(np.float32)
+    projected = np.empty((num_rows, n_components), dtype=np.float32)
+    for start, chunk in _iter_chunks(embeddings, chunk_size):
+        projected[start:start + len(chunk)] = chunk @ matrix
+    return projected
+
+
+def reduce_embeddings(embeddings,
+                      method: str = 'pca',
+                      chunk_size: int = 8192,
+                      tsne_sample: int = 5000,
+                      seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce an embedding table to 2D.
+
+    ``'pca'`` and ``'random'`` stream over all rows (see ``streaming_pca``
+    and ``random_projection``). t-SNE is quadratic in the number of points,
+    so ``'tsne'`` first draws ``tsne_sample`` random rows, reduces them to 50
+    dimensions with PCA, then runs scikit-learn's TSNE on those.
+
+    Args:
+        embeddings: 2D array (vocab_size, d): numpy array, memmap or tensor
+        method: ``'pca'``, ``'random'`` or ``'tsne'``
+        chunk_size: Rows per chunk for the streaming methods
+        tsne_sample: Rows given to t-SNE
+        seed: Seed of the sample and of the random projection
+
+    Returns:
+        2D coordinates and the row index (token ID) of each of them
+    """
+    num_rows = len(embeddings)
+    if method == 'pca':
+        return streaming_pca(embeddings, 2, chunk_size)[0], np.arange(num_rows)
+    if method == 'random':
+        return random_projection(embeddings, 2, chunk_size, seed), np.arange(num_rows)
+    if method != 'tsne':
+        raise ValueError(f"method must be 'pca', 'random' or 'tsne', got {method!r}")
+
+    from sklearn.manifold import TSNE
+
+    rng = np.random.default_rng(seed)
+    indices = np.sort(rng.choice(num_rows, size=min(tsne_sample, num_rows), replace=False))
+    sample = embeddings[indices]
+    if hasattr(sample, 'detach'):
+        sample = sample.detach().float().cpu().numpy()
+    reduced, _ = streaming_pca(np.asarray(sample, dtype=np.float32),
+                               min(50, sample.shape[1]), chunk_size)
+    perplexity = min(30.0, (len(indices) - 1) / 3)
+    coords = TSNE(n_components=2, perplexity=perplexity, init='pca',
+                  random_state=seed).fit_transform(reduced)
+    return coords.astype(np.float32), indices
+
+
 def plot_token_embeddings(embeddings: np.ndarray,
-                         tokens: List[str],
-                         method: str = 'pca'):
+                          tokens: Optional[List[str]] = None,
+                          method: str = 'pca',
+                          chunk_size: int = 8192,
+                          tsne_sample: int = 5000,
+                          max_labels: int = 20,
+                          save_path: Optional[str] = None,
+                          show: bool = True):
     """
     Plot token embeddings in 2D using dimensionality reduction.
-    
+
+    See ``reduce_embeddings`` for the methods; PCA and random projection
+    handle full vocabularies (50k x 768 in about a second) without
+    scikit-learn, which only ``'tsne'`` needs.
+
     Args:
-        embeddings: Token embedding matrix
-        tokens: List of token strings
-        method: Dimensionality reduction method ('pca' or 'tsne')
+        embeddings: Token embedding matrix (numpy array, memmap or tensor)
+        tokens: List of token strings, indexed by token ID
+        method: Dimensionality reduction method ('pca', 'random' or 'tsne')
+        chunk_size: Rows per chunk for the streaming methods
+        tsne_sample: Number of tokens plotted with 'tsne'
+        max_labels: Number of plotted tokens to label
+        save_path: Optional path to save the plot
+        show: Call ``plt.show()`` at the end
+
+    Returns:
+        The matplotlib Figure
     """
-    from sklearn.decomposition import PCA
-    from sklearn.manifold import TSNE
-    
-    if method == 'pca':
-        reducer = PCA(n_components=2)
-    else:
-        reducer = TSNE(n_components=2, random_state=42)
-    
-    embeddings_2d = reducer.fit_transform(embeddings)
-    
-    plt.figure(figsize=(12, 8))
-    scatter = plt.scatter(embeddings_2d[:, 0], embeddings_2d[:, 1], alpha=0.7)
-    
+    import matplotlib.pyplot as plt
+
+    embeddings_2d, indices = reduce_embeddings(embeddings, method, chunk_size,
+                                               tsne_sample)
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    # Smaller markers for large vocabularies; rasterized so vector output stays small
+    ax.scatter(embeddings_2d[:, 0], embeddings_2d[:, 1], alpha=0.7, rasterized=True,
+               s=max(1.0, min(20.0, 20000 / len(indices))))
+
     # Add labels for a subset of points
-    for i, token in enumerate(tokens[:20]):  # Show first 20 tokens
-        plt.annotate(token, (embeddings_2d[i, 0], embeddings_2d[i, 1]),
-                    xytext=(5, 5), textcoords='offset points',
-                    fontsize=8, alpha=0.8)
-    
-    plt.title(f'Token Embeddings Visualization ({method.upper()})')
-    plt.xlabel('Component 1')
-    plt.ylabel('Component 2')
-    plt.grid(True, alpha=0.3)
-    plt.show()
\ No newline at end of file
+    if tokens is not None:
+        for i, token_id in enumerate(indices[:max_labels]):
+            ax.annotate(tokens[token_id], (embeddings_2d[i, 0], embeddings_2d[i, 1]),
+                        xytext=(5, 5), textcoords='offset points',
+                        fontsize=8, alpha=0.8)
+
+    title = f'Token Embeddings Visualization ({method.upper()})'
+    if len(indices) < len(embeddings):
+        title += f' of {len(indices):,} sampled tokens'
+    ax.set_title(title)
+    ax.set_xlabel('Component 1')
+    ax.set_ylabel('Component 2')
+    ax.grid(True, alpha=0.3)
+
+    if save_path:
+        fig.savefig(save_path, dpi=300, bbox_inches='tight')
+
+    if show:
+        plt.show()
+    return fig